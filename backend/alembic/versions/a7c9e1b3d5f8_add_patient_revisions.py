@@ -0,0 +1,121 @@
+"""add per-patient revision counter maintained by statement-level triggers
+
+Revision ID: a7c9e1b3d5f8
+Revises: f6b8d0a2c4e7
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e1b3d5f8'
+down_revision: Union[str, None] = 'f6b8d0a2c4e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tablo -> hastayı belirleyen kolon
+TRACKED_TABLES = {
+    'patient.sharded_patient_demographics': 'id',
+    'clinical.sharded_clinical_muayeneler': 'hasta_id',
+    'clinical.sharded_clinical_operasyonlar': 'hasta_id',
+    'clinical.sharded_clinical_notlar': 'hasta_id',
+    'clinical.sharded_clinical_tetkikler': 'hasta_id',
+    'clinical.sharded_clinical_fotograflar': 'hasta_id',
+    'clinical.sharded_clinical_istirahat_raporlari': 'hasta_id',
+    'clinical.sharded_clinical_durum_bildirir_raporlari': 'hasta_id',
+    'clinical.sharded_clinical_tibbi_mudahale_raporlari': 'hasta_id',
+    'clinical.sharded_clinical_trus_biyopsileri': 'hasta_id',
+    'clinical.sharded_clinical_telefon_gorusmeleri': 'hasta_id',
+    'finance.sharded_finance_islemler': 'hasta_id',
+    'public.hasta_dosyalari': 'hasta_id',
+    # Zaman çizelgesi (timeline / workspace) randevu ve eski finans hareketlerini de gösterir
+    'public.randevular': 'hasta_id',
+    'public.hasta_finans_hareketleri': 'hasta_id',
+}
+
+# Transition table'lı trigger tek olay için tanımlanabilir: INSERT / UPDATE / DELETE ayrı trigger
+EVENTS = {
+    'INSERT': 'REFERENCING NEW TABLE AS new_rows',
+    'UPDATE': 'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'DELETE': 'REFERENCING OLD TABLE AS old_rows',
+}
+
+
+def _function_name(key: str) -> str:
+    return f'patient.bump_revision_by_{key}'
+
+
+# Revizyon = mikro saniye zaman damgası, en az bir öncekinin +1'i (aynı hastaya eşzamanlı yazımlar
+# satır kilidinde sıralanır, commit sırasıyla monoton kalır). Çok satırlı yazımlarda aynı hasta_id
+# tekrar eder: id'ler önce tekilleştirilir, zaman damgası bir kez alınır (clock_timestamp() volatile
+# olduğundan satır başına ayrı değer üretir; aynı hasta iki kez upsert edilirse ON CONFLICT hata verir)
+BUMP_REVISIONS_SQL = """
+    CREATE OR REPLACE FUNCTION patient.bump_revisions(ids uuid[]) RETURNS void AS $$
+        INSERT INTO patient.sharded_patient_revisions AS r (hasta_id, revision, updated_at)
+        SELECT d.id, t.ts, now()
+        FROM (SELECT DISTINCT id FROM unnest(ids) AS id WHERE id IS NOT NULL) AS d,
+             (SELECT (extract(epoch FROM clock_timestamp()) * 1000000)::bigint AS ts) AS t
+        ON CONFLICT (hasta_id) DO UPDATE
+            SET revision = GREATEST(r.revision + 1, EXCLUDED.revision),
+                updated_at = now()
+    $$ LANGUAGE sql
+"""
+
+
+def trigger_function_sql(key: str) -> str:
+    # Statement-level: toplu INSERT / COPY / UPDATE başına tek upsert (satır başına değil)
+    return f"""
+        CREATE OR REPLACE FUNCTION {_function_name(key)}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM patient.bump_revisions(ARRAY(SELECT {key} FROM new_rows));
+            ELSIF TG_OP = 'UPDATE' THEN
+                PERFORM patient.bump_revisions(ARRAY(SELECT {key} FROM new_rows UNION SELECT {key} FROM old_rows));
+            ELSE
+                PERFORM patient.bump_revisions(ARRAY(SELECT {key} FROM old_rows));
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+
+
+def trigger_sql(table: str, key: str, event: str) -> str:
+    return f"""
+        CREATE TRIGGER trg_patient_revision_{event.lower()}
+        AFTER {event} ON {table}
+        {EVENTS[event]}
+        FOR EACH STATEMENT EXECUTE FUNCTION {_function_name(key)}()
+    """
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sharded_patient_revisions',
+        sa.Column('hasta_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('hasta_id'),
+        schema='patient'
+    )
+
+    op.execute(BUMP_REVISIONS_SQL)
+    for key in sorted(set(TRACKED_TABLES.values())):
+        op.execute(trigger_function_sql(key))
+
+    for table, key in TRACKED_TABLES.items():
+        for event in EVENTS:
+            op.execute(trigger_sql(table, key, event))
+
+
+def downgrade() -> None:
+    for table in TRACKED_TABLES:
+        for event in EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS trg_patient_revision_{event.lower()} ON {table}")
+    for key in sorted(set(TRACKED_TABLES.values())):
+        op.execute(f"DROP FUNCTION IF EXISTS {_function_name(key)}()")
+    op.execute("DROP FUNCTION IF EXISTS patient.bump_revisions(uuid[])")
+    op.drop_table('sharded_patient_revisions', schema='patient')
@@ -0,0 +1,39 @@
+"""add composite keyset indexes to audit_logs
+
+Revision ID: a9c3e5f7b1d2
+Revises: f7a1c2d3e4b5
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f7b1d2'
+down_revision: Union[str, None] = 'f7a1c2d3e4b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (created_at, id) keyset sıralaması; filtreli sorgular için filtre kolonu önde.
+    # Tek kolonlu action / created_at index'leri bunların önekleri olduğu için kaldırılır
+    # (audit_logs yazma yoğun bir tablo, gereksiz index her INSERT'e maliyet ekler).
+    op.create_index('ix_audit_logs_created_at_id', 'audit_logs', ['created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_user_created_at', 'audit_logs', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_action_created_at', 'audit_logs', ['action', 'created_at', 'id'], unique=False)
+    op.create_index(
+        'ix_audit_logs_resource_created_at', 'audit_logs',
+        ['resource_type', 'resource_id', 'created_at', 'id'], unique=False
+    )
+    op.drop_index('ix_audit_logs_created_at', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_action', table_name='audit_logs')
+
+
+def downgrade() -> None:
+    op.create_index('ix_audit_logs_action', 'audit_logs', ['action'], unique=False)
+    op.create_index('ix_audit_logs_created_at', 'audit_logs', ['created_at'], unique=False)
+    op.drop_index('ix_audit_logs_resource_created_at', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_action_created_at', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_created_at', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_created_at_id', table_name='audit_logs')
@@ -0,0 +1,49 @@
+"""add ai_scribe_jobs table
+
+Revision ID: b2d4f6a8c0e1
+Revises: a9c3e5f7b1d2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a8c0e1'
+down_revision: Union[str, None] = 'a9c3e5f7b1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ai_scribe_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('patient_id', sa.String(), nullable=True),
+        sa.Column('protocol_no', sa.String(), nullable=True),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('template', sa.String(), nullable=True),
+        sa.Column('include_transcript', sa.Boolean(), nullable=True),
+        sa.Column('mime_type', sa.String(), nullable=False),
+        sa.Column('spool_path', sa.String(), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ai_scribe_jobs_status_created_at', 'ai_scribe_jobs', ['status', 'created_at'], unique=False)
+    op.create_index('ix_ai_scribe_jobs_user_created_at', 'ai_scribe_jobs', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ai_scribe_jobs_user_created_at', table_name='ai_scribe_jobs')
+    op.drop_index('ix_ai_scribe_jobs_status_created_at', table_name='ai_scribe_jobs')
+    op.drop_table('ai_scribe_jobs')
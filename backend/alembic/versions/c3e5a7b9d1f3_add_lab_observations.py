@@ -0,0 +1,46 @@
+"""add normalized numeric lab observation table for trend queries
+
+Revision ID: c3e5a7b9d1f3
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7b9d1f3'
+down_revision: Union[str, None] = 'b2d4f6a8c0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sharded_clinical_lab_observations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tetkik_id', sa.Integer(), nullable=False),
+        sa.Column('hasta_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('test_code', sa.String(length=50), nullable=False),
+        sa.Column('tarih', sa.DateTime(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('unit', sa.String(length=50), nullable=True),
+        sa.Column('flag', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tetkik_id'], ['clinical.sharded_clinical_tetkikler.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tetkik_id'),
+        schema='clinical'
+    )
+    op.create_index(
+        'ix_lab_observations_hasta_code_tarih', 'sharded_clinical_lab_observations',
+        ['hasta_id', 'test_code', 'tarih'], unique=False, schema='clinical'
+    )
+    # Mevcut tetkikler: python -m maintenance.backfill_lab_observations
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lab_observations_hasta_code_tarih', table_name='sharded_clinical_lab_observations', schema='clinical')
+    op.drop_table('sharded_clinical_lab_observations', schema='clinical')
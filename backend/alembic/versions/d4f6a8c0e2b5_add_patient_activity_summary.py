@@ -0,0 +1,109 @@
+"""add per-patient first visit / last activity summary for dashboard charts
+
+Revision ID: d4f6a8c0e2b5
+Revises: c3e5a7b9d1f3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6a8c0e2b5'
+down_revision: Union[str, None] = 'c3e5a7b9d1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SOURCE_TABLES = ('sharded_clinical_muayeneler', 'sharded_clinical_notlar')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sharded_clinical_patient_activity',
+        sa.Column('hasta_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('first_visit', sa.DateTime(), nullable=True),
+        sa.Column('last_activity', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('hasta_id'),
+        schema='clinical'
+    )
+    op.create_index(op.f('ix_clinical_sharded_clinical_patient_activity_first_visit'), 'sharded_clinical_patient_activity', ['first_visit'], unique=False, schema='clinical')
+    op.create_index(op.f('ix_clinical_sharded_clinical_patient_activity_last_activity'), 'sharded_clinical_patient_activity', ['last_activity'], unique=False, schema='clinical')
+
+    # Tek hastanın özetini kaynaktan yeniden hesaplar (tarih / hasta değişen UPDATE'ler için)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION clinical.recompute_patient_activity(pid uuid) RETURNS void AS $$
+            INSERT INTO clinical.sharded_clinical_patient_activity (hasta_id, first_visit, last_activity, updated_at)
+            SELECT pid,
+                   (SELECT min(tarih) FROM clinical.sharded_clinical_muayeneler WHERE hasta_id = pid),
+                   GREATEST(
+                       (SELECT max(tarih) FROM clinical.sharded_clinical_muayeneler WHERE hasta_id = pid),
+                       (SELECT max(tarih) FROM clinical.sharded_clinical_notlar WHERE hasta_id = pid)
+                   ),
+                   now()
+            ON CONFLICT (hasta_id) DO UPDATE
+                SET first_visit = EXCLUDED.first_visit,
+                    last_activity = EXCLUDED.last_activity,
+                    updated_at = now()
+        $$ LANGUAGE sql
+    """)
+    # INSERT: artımlı LEAST / GREATEST (tablo taraması yok); UPDATE: etkilenen hasta(lar) yeniden hesaplanır
+    op.execute("""
+        CREATE OR REPLACE FUNCTION clinical.track_patient_activity() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                IF NEW.hasta_id IS NOT NULL AND NEW.tarih IS NOT NULL THEN
+                    INSERT INTO clinical.sharded_clinical_patient_activity (hasta_id, first_visit, last_activity)
+                    VALUES (
+                        NEW.hasta_id,
+                        CASE WHEN TG_TABLE_NAME = 'sharded_clinical_muayeneler' THEN NEW.tarih END,
+                        NEW.tarih
+                    )
+                    ON CONFLICT (hasta_id) DO UPDATE
+                        SET first_visit = LEAST(clinical.sharded_clinical_patient_activity.first_visit, EXCLUDED.first_visit),
+                            last_activity = GREATEST(clinical.sharded_clinical_patient_activity.last_activity, EXCLUDED.last_activity),
+                            updated_at = now();
+                END IF;
+            ELSE
+                IF NEW.hasta_id IS NOT NULL THEN
+                    PERFORM clinical.recompute_patient_activity(NEW.hasta_id);
+                END IF;
+                IF OLD.hasta_id IS NOT NULL AND OLD.hasta_id IS DISTINCT FROM NEW.hasta_id THEN
+                    PERFORM clinical.recompute_patient_activity(OLD.hasta_id);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in SOURCE_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER trg_patient_activity
+            AFTER INSERT OR UPDATE OF hasta_id, tarih ON clinical.{table}
+            FOR EACH ROW EXECUTE FUNCTION clinical.track_patient_activity()
+        """)
+
+    # Mevcut veri: tek geçişte doldurulur
+    op.execute("""
+        INSERT INTO clinical.sharded_clinical_patient_activity (hasta_id, first_visit, last_activity)
+        SELECT hasta_id, min(tarih) FILTER (WHERE kaynak = 'muayene'), max(tarih)
+        FROM (
+            SELECT hasta_id, tarih, 'muayene' AS kaynak FROM clinical.sharded_clinical_muayeneler
+            UNION ALL
+            SELECT hasta_id, tarih, 'not' AS kaynak FROM clinical.sharded_clinical_notlar
+        ) aktivite
+        WHERE hasta_id IS NOT NULL AND tarih IS NOT NULL
+        GROUP BY hasta_id
+    """)
+
+
+def downgrade() -> None:
+    for table in SOURCE_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_patient_activity ON clinical.{table}")
+    op.execute("DROP FUNCTION IF EXISTS clinical.track_patient_activity()")
+    op.execute("DROP FUNCTION IF EXISTS clinical.recompute_patient_activity(uuid)")
+    op.drop_index(op.f('ix_clinical_sharded_clinical_patient_activity_last_activity'), table_name='sharded_clinical_patient_activity', schema='clinical')
+    op.drop_index(op.f('ix_clinical_sharded_clinical_patient_activity_first_visit'), table_name='sharded_clinical_patient_activity', schema='clinical')
+    op.drop_table('sharded_clinical_patient_activity', schema='clinical')
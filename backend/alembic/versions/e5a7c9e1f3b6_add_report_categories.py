@@ -0,0 +1,31 @@
+"""add precomputed service_category / reference_category columns for dashboard distributions
+
+Revision ID: e5a7c9e1f3b6
+Revises: d4f6a8c0e2b5
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9e1f3b6'
+down_revision: Union[str, None] = 'd4f6a8c0e2b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sharded_clinical_muayeneler', sa.Column('service_category', sa.String(length=50), nullable=True), schema='clinical')
+    op.create_index('ix_muayene_tarih_service_category', 'sharded_clinical_muayeneler', ['tarih', 'service_category'], unique=False, schema='clinical')
+    op.add_column('sharded_patient_demographics', sa.Column('reference_category', sa.String(length=20), nullable=True), schema='patient')
+    op.create_index(op.f('ix_patient_sharded_patient_demographics_reference_category'), 'sharded_patient_demographics', ['reference_category'], unique=False, schema='patient')
+    # Mevcut kayıtlar: python -m maintenance.reclassify_categories --execute
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_patient_sharded_patient_demographics_reference_category'), table_name='sharded_patient_demographics', schema='patient')
+    op.drop_column('sharded_patient_demographics', 'reference_category', schema='patient')
+    op.drop_index('ix_muayene_tarih_service_category', table_name='sharded_clinical_muayeneler', schema='clinical')
+    op.drop_column('sharded_clinical_muayeneler', 'service_category', schema='clinical')
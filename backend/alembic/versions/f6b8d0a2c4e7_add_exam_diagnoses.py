@@ -0,0 +1,71 @@
+"""add normalized exam diagnosis table with code prefix and trigram indexes
+
+Revision ID: f6b8d0a2c4e7
+Revises: e5a7c9e1f3b6
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0a2c4e7'
+down_revision: Union[str, None] = 'e5a7c9e1f3b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_table(
+        'sharded_clinical_exam_diagnoses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('hasta_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tarih', sa.DateTime(), nullable=False),
+        sa.Column('position', sa.SmallInteger(), nullable=False),
+        sa.Column('icd_code', sa.String(length=50), nullable=True),
+        sa.Column('text', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['exam_id'], ['clinical.sharded_clinical_muayeneler.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        schema='clinical'
+    )
+
+    # Mevcut muayeneler: tanı pozisyonları satırlara açılır (index'ler doldurulduktan sonra kurulur)
+    op.execute("""
+        INSERT INTO clinical.sharded_clinical_exam_diagnoses (exam_id, hasta_id, tarih, position, icd_code, text)
+        SELECT m.id, m.hasta_id, m.tarih, d.position, NULLIF(upper(btrim(d.kod)), ''), NULLIF(btrim(d.tani), '')
+        FROM clinical.sharded_clinical_muayeneler m
+        CROSS JOIN LATERAL (VALUES
+            (1, m.tani1, m.tani1_kodu),
+            (2, m.tani2, m.tani2_kodu),
+            (3, m.tani3, m.tani3_kodu),
+            (4, m.tani4, m.tani4_kodu),
+            (5, m.tani5, m.tani5_kodu)
+        ) AS d(position, tani, kod)
+        WHERE m.is_deleted = false
+          AND m.hasta_id IS NOT NULL
+          AND (NULLIF(btrim(d.tani), '') IS NOT NULL OR NULLIF(btrim(d.kod), '') IS NOT NULL)
+    """)
+
+    op.create_index('ix_exam_diagnoses_icd_code_tarih', 'sharded_clinical_exam_diagnoses', ['icd_code', 'tarih'], unique=False, schema='clinical', postgresql_ops={'icd_code': 'text_pattern_ops'})
+    op.create_index('ix_exam_diagnoses_text_trgm', 'sharded_clinical_exam_diagnoses', ['text'], unique=False, schema='clinical', postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'})
+    op.create_index('ix_exam_diagnoses_hasta_tarih', 'sharded_clinical_exam_diagnoses', ['hasta_id', 'tarih'], unique=False, schema='clinical')
+    op.create_index(op.f('ix_clinical_sharded_clinical_exam_diagnoses_exam_id'), 'sharded_clinical_exam_diagnoses', ['exam_id'], unique=False, schema='clinical')
+
+    # Gelişmiş aramada tanı kutusu tedavi / sonuç alanlarını da tarar
+    op.create_index('ix_muayene_tedavi_trgm', 'sharded_clinical_muayeneler', ['tedavi'], unique=False, schema='clinical', postgresql_using='gin', postgresql_ops={'tedavi': 'gin_trgm_ops'})
+    op.create_index('ix_muayene_sonuc_trgm', 'sharded_clinical_muayeneler', ['sonuc'], unique=False, schema='clinical', postgresql_using='gin', postgresql_ops={'sonuc': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_muayene_sonuc_trgm', table_name='sharded_clinical_muayeneler', schema='clinical')
+    op.drop_index('ix_muayene_tedavi_trgm', table_name='sharded_clinical_muayeneler', schema='clinical')
+    op.drop_index(op.f('ix_clinical_sharded_clinical_exam_diagnoses_exam_id'), table_name='sharded_clinical_exam_diagnoses', schema='clinical')
+    op.drop_index('ix_exam_diagnoses_hasta_tarih', table_name='sharded_clinical_exam_diagnoses', schema='clinical')
+    op.drop_index('ix_exam_diagnoses_text_trgm', table_name='sharded_clinical_exam_diagnoses', schema='clinical')
+    op.drop_index('ix_exam_diagnoses_icd_code_tarih', table_name='sharded_clinical_exam_diagnoses', schema='clinical')
+    op.drop_table('sharded_clinical_exam_diagnoses', schema='clinical')
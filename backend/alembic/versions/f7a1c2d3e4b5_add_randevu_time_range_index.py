@@ -0,0 +1,30 @@
+"""add GiST time-range index to randevular for calendar window queries
+
+Revision ID: f7a1c2d3e4b5
+Revises: d4e5f6g7h8i9
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a1c2d3e4b5'
+down_revision: Union[str, None] = 'd4e5f6g7h8i9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # AppointmentRepository._window_condition ile birebir aynı ifade olmalı,
+    # aksi halde planner index'i kullanmaz.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_randevular_time_range
+        ON randevular USING gist (tstzrange(start, "end", '[]'))
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_randevular_time_range")
@@ -28,6 +28,16 @@ async def get_current_user(
 ) -> User:
     return await validate_token(token, db)
 
+async def get_current_user_released(
+    token: str = Depends(oauth2_scheme),
+) -> User:
+    """
+    get_current_user ile aynı, ancak session sadece doğrulama süresince açık kalır.
+    Uzun süre bekleyen (long-poll, iş sonucu bekleyen) endpoint'ler havuzdan bağlantı tutmasın diye.
+    """
+    async with SessionLocal() as db:
+        return await validate_token(token, db)
+
 async def get_current_user_from_token(
     token: str,
     db: AsyncSession = Depends(get_db)
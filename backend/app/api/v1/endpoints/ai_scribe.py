@@ -1,10 +1,15 @@
 """
 AI Scribe API Endpoints
 """
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pathlib import Path
+from sqlalchemy import select
 from typing import Optional, List
+import json
 import logging
+import time
+import uuid
 
 from app.api import deps
 from app.core.config import settings
@@ -14,10 +19,16 @@ from app.schemas.ai_scribe import (
     AIScribeMode,
     AIScribeStatusResponse,
     AIScribeTemplateInfo,
-    AIScribeTextRequest
+    AIScribeTextRequest,
+    AIScribeJobResponse
 )
+from app.db.session import SessionLocal
 from app.repositories.patient.models import ShardedPatientDemographics
 from app.services.ai_scribe_service import get_ai_scribe_service
+from app.services.ai_scribe_jobs import (
+    ai_scribe_jobs, spool_upload, job_to_dict, JobQueueFullError,
+    JOB_DONE, JOB_FAILED, TERMINAL_STATUSES,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -38,7 +49,8 @@ async def get_ai_scribe_status(
         gemini_available=service.is_gemini_available(),
         local_whisper=local_status.get("whisper", False),
         local_ollama=local_status.get("ollama", False),
-        templates_count=len(service.get_available_templates())
+        templates_count=len(service.get_available_templates()),
+        circuits=service.runtime.snapshot()
     )
 
 
@@ -53,98 +65,220 @@ async def get_templates(
     return service.get_available_templates()
 
 
+ALLOWED_AUDIO_TYPES = ["audio/webm", "audio/mpeg", "audio/mp3", "audio/wav", "audio/mp4", "audio/ogg"]
+MIN_AUDIO_BYTES = 1000
+MAX_WAIT_SECONDS = 30
+# /analyze: iş zaman aşımı + kuyrukta bekleme payı; aralıklarla istemci bağlantısı kontrol edilir
+ANALYZE_DEADLINE_MARGIN_SECONDS = 60
+ANALYZE_POLL_SECONDS = 5
+
+
+async def _lookup_protocol_no(patient_id: Optional[str]) -> Optional[str]:
+    if not patient_id:
+        return None
+    try:
+        # Kısa ömürlü session: bağlantı sorgudan hemen sonra havuza döner
+        async with SessionLocal() as db:
+            stmt = select(ShardedPatientDemographics.protokol_no).where(ShardedPatientDemographics.id == patient_id)
+            return (await db.execute(stmt)).scalar_one_or_none()
+    except Exception as e:
+        logger.warning(f"Could not fetch protocol number for patient {patient_id}: {e}")
+        return None
+
+
+async def _enqueue_audio(
+    audio: UploadFile,
+    mode: str,
+    template: Optional[str],
+    include_transcript: bool,
+    patient_id: Optional[str],
+    current_user,
+) -> dict:
+    """Doğrulama + diske yazma + iş kaydı. Ses belleğe okunmaz, DB bağlantısı tutulmaz."""
+    if not settings.AI_SCRIBE_ENABLED:
+        raise HTTPException(
+            status_code=403,
+            detail="AI Scribe özelliği devre dışı. Lütfen ayarlardan aktifleştirin."
+        )
+
+    content_type = audio.content_type or "audio/webm"
+    if not any(t in content_type for t in ALLOWED_AUDIO_TYPES):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Desteklenmeyen dosya formatı: {content_type}. Desteklenen formatlar: webm, mp3, wav, m4a, ogg"
+        )
+
+    try:
+        request = AIScribeRequest(mode=mode, template=template, include_transcript=include_transcript)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = str(uuid.uuid4())
+    try:
+        spool_path, size = await spool_upload(audio, job_id, content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if size < MIN_AUDIO_BYTES:
+        Path(spool_path).unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Ses dosyası çok kısa veya boş.")
+
+    try:
+        return await ai_scribe_jobs.submit(
+            job_id=job_id,
+            request=request,
+            mime_type=content_type,
+            spool_path=spool_path,
+            size_bytes=size,
+            user_id=current_user.id,
+            patient_id=patient_id,
+            protocol_no=await _lookup_protocol_no(patient_id),
+        )
+    except JobQueueFullError:
+        Path(spool_path).unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=503,
+            detail="AI Scribe kuyruğu dolu. Lütfen birkaç dakika sonra tekrar deneyin.",
+            headers={"Retry-After": "30"},
+        )
+    except Exception:
+        Path(spool_path).unlink(missing_ok=True)
+        raise
+
+
+async def _get_owned_job(job_id: str, current_user):
+    job = await ai_scribe_jobs.get(job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_superuser):
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return job
+
+
+@router.post("/jobs", response_model=AIScribeJobResponse, status_code=202)
+async def create_analysis_job(
+    audio: UploadFile = File(..., description="Audio file (webm, mp3, wav, m4a)"),
+    mode: str = Form("gemini", description="Analysis mode: gemini or local"),
+    template: Optional[str] = Form(None, description="Template name"),
+    include_transcript: bool = Form(False, description="Include transcript in response"),
+    patient_id: Optional[str] = Form(None, description="Patient ID for file naming"),
+    current_user = Depends(deps.get_current_user_released)
+):
+    """
+    Ses dosyasını analiz kuyruğuna ekler ve hemen döner (202).
+    Sonuç GET /jobs/{id} (wait ile long-poll) veya GET /jobs/{id}/stream (SSE) ile alınır.
+    """
+    return await _enqueue_audio(audio, mode, template, include_transcript, patient_id, current_user)
+
+
+@router.get("/jobs/{job_id}", response_model=AIScribeJobResponse)
+async def get_analysis_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="İş bitmemişse en fazla bu kadar saniye bekle"),
+    current_user = Depends(deps.get_current_user_released)
+):
+    """İş durumunu döndürür. wait > 0 ise durum değişene kadar bekler (long-poll)."""
+    job = await _get_owned_job(job_id, current_user)
+    if wait and job.status not in TERMINAL_STATUSES:
+        await ai_scribe_jobs.wait_for_change(job_id, wait)
+        job = await _get_owned_job(job_id, current_user)
+    return job_to_dict(job, ai_scribe_jobs.partials(job_id))
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_analysis_job(
+    job_id: str,
+    request: Request,
+    token: str = Query(..., description="Access token (EventSource header gönderemez)"),
+):
+    """
+    İş durumunu Server-Sent Events ile akıtır; done/failed olayıyla akış kapanır.
+    Parçalı transkripsiyonda her yeni parça 'partial' olayı olarak gönderilir.
+    """
+    async with SessionLocal() as db:
+        current_user = await deps.validate_token(token, db)
+    job = await _get_owned_job(job_id, current_user)
+
+    async def event_source():
+        nonlocal job
+        last_status = None
+        sent_partials = 0
+        while True:
+            partials = ai_scribe_jobs.partials(job_id)
+            for index in range(sent_partials, len(partials)):
+                data = json.dumps({"index": index, "text": partials[index]}, ensure_ascii=False)
+                yield f"event: partial\ndata: {data}\n\n"
+            sent_partials = max(sent_partials, len(partials))
+            if job.status != last_status:
+                last_status = job.status
+                payload = AIScribeJobResponse.model_validate(job_to_dict(job)).model_dump(mode="json")
+                yield f"event: {job.status}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                break
+            await ai_scribe_jobs.wait_for_change(job_id, settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+            if await request.is_disconnected():
+                break
+            job = await ai_scribe_jobs.get(job_id)
+            if job is None:
+                break
+            if job.status == last_status and len(ai_scribe_jobs.partials(job_id)) == sent_partials:
+                yield ": ping\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/analyze", response_model=AIScribeResponse)
 async def analyze_audio(
+    http_request: Request,
     audio: UploadFile = File(..., description="Audio file (webm, mp3, wav, m4a)"),
     mode: str = Form("gemini", description="Analysis mode: gemini or local"),
     template: Optional[str] = Form(None, description="Template name"),
     include_transcript: bool = Form(False, description="Include transcript in response"),
     patient_id: Optional[str] = Form(None, description="Patient ID for file naming"),
-    db: AsyncSession = Depends(deps.get_db),
-    current_user = Depends(deps.get_current_user)
+    current_user = Depends(deps.get_current_user_released)
 ):
     """
-    Ses dosyasını analiz et ve klinik verileri çıkar.
+    Ses dosyasını analiz et ve klinik verileri çıkar (senkron uyumluluk endpoint'i).
     
     - **audio**: Ses dosyası (webm, mp3, wav, m4a formatları desteklenir)
     - **mode**: Analiz modu - 'gemini', 'local', 'hybrid_google_local', 'hybrid_google_gemini'
     - **template**: Kullanılacak şablon adı (opsiyonel)
     - **include_transcript**: Transkripti yanıta dahil et
     - **patient_id**: Hasta ID (Kayıtların protokol no ile isimlendirilmesi için)
+
+    İş kuyruğunu kullanır ve sonucu bekler; bekleme sırasında DB bağlantısı tutulmaz.
+    AI_SCRIBE_JOB_TIMEOUT + pay içinde bitmezse 504 döner (iş arka planda sürer, GET /jobs/{id} ile alınabilir).
+    Yeni istemciler POST /jobs kullanmalı.
     """
-    protocol_no = None
-    if patient_id:
-        try:
-            # Query the database for the patient's protocol number
-            from sqlalchemy import select
-            stmt = select(ShardedPatientDemographics).where(ShardedPatientDemographics.id == patient_id)
-            result_db = await db.execute(stmt)
-            patient_obj = result_db.scalar_one_or_none()
-            if patient_obj:
-                protocol_no = patient_obj.protokol_no
-        except Exception as e:
-            logger.warning(f"Could not fetch protocol number for patient {patient_id}: {e}")
-    if not settings.AI_SCRIBE_ENABLED:
-        raise HTTPException(
-            status_code=403,
-            detail="AI Scribe özelliği devre dışı. Lütfen ayarlardan aktifleştirin."
-        )
-    
-    # Validate file type
-    allowed_types = ["audio/webm", "audio/mpeg", "audio/mp3", "audio/wav", "audio/mp4", "audio/ogg"]
-    content_type = audio.content_type or "audio/webm"
-    
-    if not any(t in content_type for t in allowed_types):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Desteklenmeyen dosya formatı: {content_type}. Desteklenen formatlar: webm, mp3, wav, m4a, ogg"
-        )
-    
-    # Read audio bytes
-    audio_bytes = await audio.read()
-    
-    if len(audio_bytes) < 1000:
-        raise HTTPException(
-            status_code=400,
-            detail="Ses dosyası çok kısa veya boş."
-        )
-    
-    if len(audio_bytes) > 150 * 1024 * 1024:  # 150MB limit
-        raise HTTPException(
-            status_code=400,
-            detail="Ses dosyası çok büyük. Maksimum 150MB."
-        )
-    
-    request = AIScribeRequest(
-        mode=mode,
-        template=template,
-        include_transcript=include_transcript
-    )
-    
-    # Analyze
-    service = get_ai_scribe_service()
-    
-    try:
-        result = await service.analyze_consultation(
-            audio_bytes=audio_bytes,
-            mime_type=content_type,
-            request=request,
-            protocol_no=protocol_no
-        )
-        return result
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Analiz sırasında hata oluştu: {str(e)}"
-        )
+    job = await _enqueue_audio(audio, mode, template, include_transcript, patient_id, current_user)
+    job_id = job["id"]
+    deadline = time.monotonic() + settings.AI_SCRIBE_JOB_TIMEOUT + ANALYZE_DEADLINE_MARGIN_SECONDS
+    while True:
+        stored = await ai_scribe_jobs.get(job_id)
+        if stored is None:
+            raise HTTPException(status_code=500, detail="Analiz işi kayboldu.")
+        if stored.status == JOB_DONE:
+            return stored.result
+        if stored.status == JOB_FAILED:
+            raise HTTPException(status_code=400, detail=stored.error or "Analiz sırasında hata oluştu")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=504,
+                detail={"message": "Analiz zamanında tamamlanmadı.", "job_id": job_id},
+            )
+        if await http_request.is_disconnected():
+            # İstemci gitti: iş kuyrukta tamamlanır, bu istek beklemeyi bırakır
+            raise HTTPException(status_code=499, detail="İstemci bağlantıyı kapattı.")
+        await ai_scribe_jobs.wait_for_change(job_id, min(ANALYZE_POLL_SECONDS, remaining))
 
 
 @router.post("/analyze-text", response_model=AIScribeResponse)
 async def analyze_text(
     request: AIScribeTextRequest,
-    current_user = Depends(deps.get_current_user)
+    current_user = Depends(deps.get_current_user_released)
 ):
     """
     Metin girdisini analiz et ve klinik verileri çıkar.
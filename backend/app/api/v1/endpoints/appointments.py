@@ -1,41 +1,163 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from app.api import deps
+from app.core.config import settings
 from app.repositories.appointment_repository import AppointmentRepository
-from app.schemas.appointment import RandevuCreate, RandevuUpdate, RandevuResponse
+from app.schemas.appointment import (
+    RandevuCreate, RandevuUpdate, RandevuResponse, CalendarEvent, ConflictInfo, AvailableSlot
+)
+from app.services.scheduling_service import scheduling_engine, BLOCKED_TYPE
+from app.utils.http_cache import make_etag, etag_matches
 
 router = APIRouter()
 
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Saat dilimsiz değerler UTC kabul edilir; karşılaştırmalar hep aware UTC ile yapılır."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _as_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        return None
+
+
+def _bounded_window(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """
+    Eksik uçları tamamlayıp pencereyi CALENDAR_MAX_WINDOW_DAYS ile sınırlar.
+    Pencere verilmezse tüm randevu geçmişi yerine bugün etrafındaki varsayılan pencere kullanılır.
+    """
+    max_window = timedelta(days=settings.CALENDAR_MAX_WINDOW_DAYS)
+    start, end = _as_utc(start), _as_utc(end)
+    if start is None and end is None:
+        start = datetime.now(timezone.utc) - timedelta(days=31)
+    if start is None:
+        start = end - max_window
+    if end is None or end - start > max_window:
+        end = start + max_window
+    return start, end
+
+
 @router.get("/", response_model=List[RandevuResponse])
 async def get_appointments(
     start: Optional[str] = Query(None, description="Start datetime ISO string"),
     end: Optional[str] = Query(None, description="End datetime ISO string"),
     db: AsyncSession = Depends(deps.get_db)
 ):
-    """Get all appointments, optionally filtered by date range."""
+    """Get appointments in a bounded date range (defaults around today)."""
     repo = AppointmentRepository(db)
-    
-    start_dt = None
-    end_dt = None
-    
-    if start:
-        try:
-            start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-        except:
-            pass
-    
-    if end:
-        try:
-            end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-        except:
-            pass
-    
+    start_dt, end_dt = _bounded_window(_parse_iso(start), _parse_iso(end))
     appointments = await repo.get_all(start=start_dt, end=end_dt)
     return appointments
 
+@router.get("/calendar", response_model=List[CalendarEvent])
+async def get_calendar(
+    request: Request,
+    response: Response,
+    start: str = Query(..., description="Window start (ISO datetime)"),
+    end: str = Query(..., description="Window end (ISO datetime)"),
+    doctor_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(deps.get_db)
+):
+    """
+    Takvim görünümü için projection endpoint'i.
+    Pencere zorunludur ve CALENDAR_MAX_WINDOW_DAYS ile sınırlıdır.
+    ETag / If-None-Match desteklenir: pencere değişmediyse 304 döner ve veri sorgusu hiç çalışmaz.
+    """
+    start_dt = _parse_iso(start)
+    end_dt = _parse_iso(end)
+    if not start_dt or not end_dt:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih formatı (ISO 8601 bekleniyor)")
+    if end_dt < start_dt:
+        raise HTTPException(status_code=400, detail="Bitiş tarihi başlangıçtan önce olamaz")
+    if end_dt - start_dt > timedelta(days=settings.CALENDAR_MAX_WINDOW_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Takvim penceresi en fazla {settings.CALENDAR_MAX_WINDOW_DAYS} gün olabilir"
+        )
+
+    repo = AppointmentRepository(db)
+    count, last_change, id_sum = await repo.get_calendar_fingerprint(start_dt, end_dt, doctor_id)
+    etag = make_etag("calendar", start_dt.isoformat(), end_dt.isoformat(), doctor_id, count, last_change, id_sum)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return await repo.get_calendar_window(start_dt, end_dt, doctor_id)
+
+@router.get("/availability", response_model=List[AvailableSlot])
+async def get_availability(
+    doctor: Optional[str] = Query(None, description="Doktor adı (Doktorlar tanımındaki adSoyad)"),
+    after: Optional[str] = Query(None, description="Bu andan sonraki slotlar (ISO datetime, varsayılan: şimdi)"),
+    count: int = Query(5, ge=1, le=50),
+    duration: Optional[int] = Query(None, ge=5, le=600, description="Dakika; verilmezse randevu türünden alınır"),
+    type: Optional[str] = Query(None, description="Randevu türü (Muayene, Kontrol...)"),
+    db: AsyncSession = Depends(deps.get_db)
+):
+    """Doktorun mesai saatleri içindeki ilk boş slotlarını döner."""
+    after_dt = _parse_iso(after) if after else None
+    if after and not after_dt:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih formatı (ISO 8601 bekleniyor)")
+
+    slots = await scheduling_engine.next_free_slots(
+        db, doctor=doctor, after=after_dt, count=count,
+        duration_minutes=duration, appointment_type=type,
+    )
+    return [AvailableSlot(start=s, end=e, doctor_name=doctor) for s, e in slots]
+
+@router.get("/conflicts", response_model=List[ConflictInfo])
+async def get_conflicts(
+    start: str = Query(..., description="ISO datetime"),
+    end: str = Query(..., description="ISO datetime"),
+    doctor_name: Optional[str] = Query(None),
+    doctor_id: Optional[int] = Query(None),
+    exclude_id: Optional[int] = Query(None, description="Düzenlenen randevunun ID'si"),
+    db: AsyncSession = Depends(deps.get_db)
+):
+    """Verilen aralıkta aynı doktorla çakışan aktif randevular."""
+    start_dt = _parse_iso(start)
+    end_dt = _parse_iso(end)
+    if not start_dt or not end_dt or end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="Geçersiz tarih aralığı")
+
+    repo = AppointmentRepository(db)
+    return await repo.get_conflicts(start_dt, end_dt, doctor_id, doctor_name, exclude_id)
+
+async def _raise_on_conflict(
+    repo: AppointmentRepository,
+    start: datetime,
+    end: datetime,
+    doctor_id: Optional[int],
+    doctor_name: Optional[str],
+    exclude_id: Optional[int] = None,
+):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="Bitiş saati başlangıçtan sonra olmalı")
+    # Kilit create / update commit'ine kadar tutulur: eşzamanlı iki kayıt aynı slotu alamaz
+    await repo.lock_schedule(start, end, doctor_id, doctor_name)
+    conflicts = await repo.get_conflicts(start, end, doctor_id, doctor_name, exclude_id)
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Bu saat aralığında çakışan randevu var",
+                "conflicts": [ConflictInfo.model_validate(c).model_dump(mode="json") for c in conflicts],
+            }
+        )
+
 @router.get("/{randevu_id}", response_model=RandevuResponse)
 async def get_appointment(
     randevu_id: int,
@@ -61,10 +183,14 @@ async def get_patient_appointments(
 @router.post("/", response_model=RandevuResponse)
 async def create_appointment(
     randevu_in: RandevuCreate,
+    force: bool = Query(False, description="Çakışmaya rağmen kaydet (overbooking onayı)"),
     db: AsyncSession = Depends(deps.get_db)
 ):
-    """Create a new appointment."""
+    """Create a new appointment. Çakışma varsa `force` verilmedikçe 409 döner."""
     repo = AppointmentRepository(db)
+    # BLOCKED kayıtlar bilinçli olarak mevcut randevuların üzerine konabilir
+    if not force and randevu_in.status != 'cancelled' and randevu_in.type != BLOCKED_TYPE:
+        await _raise_on_conflict(repo, randevu_in.start, randevu_in.end, randevu_in.doctor_id, randevu_in.doctor_name)
     appointment = await repo.create(randevu_in)
     return appointment
 
@@ -72,10 +198,27 @@ async def create_appointment(
 async def update_appointment(
     randevu_id: int,
     randevu_in: RandevuUpdate,
+    force: bool = Query(False, description="Çakışmaya rağmen kaydet (overbooking onayı)"),
     db: AsyncSession = Depends(deps.get_db)
 ):
-    """Update an existing appointment."""
+    """Update an existing appointment. Zaman/doktor değişiyorsa çakışma kontrolü yapılır."""
     repo = AppointmentRepository(db)
+    changes = randevu_in.model_dump(exclude_unset=True)
+    if not force and changes.keys() & {"start", "end", "doctor_id", "doctor_name", "status"}:
+        current = await repo.get_by_id(randevu_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Randevu bulunamadı")
+        merged = {
+            f: changes.get(f, getattr(current, f))
+            for f in ("start", "end", "doctor_id", "doctor_name", "status")
+        }
+        # Sadece durum değişikliği (ör. iptal, onay) çakışma kontrolünü tetiklemez
+        moved = any(merged[f] != getattr(current, f) for f in ("start", "end", "doctor_id", "doctor_name"))
+        reactivated = current.status == 'cancelled' and merged["status"] != 'cancelled'
+        if (moved or reactivated) and merged["status"] != 'cancelled':
+            await _raise_on_conflict(
+                repo, merged["start"], merged["end"], merged["doctor_id"], merged["doctor_name"], exclude_id=randevu_id
+            )
     appointment = await repo.update(randevu_id, randevu_in)
     if not appointment:
         raise HTTPException(status_code=404, detail="Randevu bulunamadı")
@@ -1,69 +1,255 @@
-from typing import Any, List, Optional
+import base64
+import csv
+import io
+import json
+from typing import Any, List, Optional, Tuple
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, desc, func, text, tuple_
+from sqlalchemy.dialects.postgresql import psycopg2
 from app.api import deps
+from app.db.session import SessionLocal
 from app.models.audit import AuditLog
 from app.models.user import User
-from app.schemas.audit import AuditLog as AuditLogSchema
+from app.schemas.audit import AuditLog as AuditLogSchema, AuditLogPage, AuditLogCount
 
 router = APIRouter()
 
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = [
+    "id", "created_at", "action", "user_id", "username",
+    "resource_type", "resource_id", "ip_address", "user_agent", "details",
+]
+
+
+def encode_cursor(created_at: datetime, log_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, log_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), log_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+
+
+def _filtered(
+    query,
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+):
+    """Filtreler ix_audit_logs_* bileşik index'lerinin ön kolonlarıyla eşleşir."""
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if user_id:
+        query = query.filter(AuditLog.user_id == user_id)
+    if resource_type:
+        query = query.filter(AuditLog.resource_type == resource_type)
+    if resource_id:
+        query = query.filter(AuditLog.resource_id == resource_id)
+    if start_date:
+        query = query.filter(AuditLog.created_at >= start_date)
+    if end_date:
+        query = query.filter(AuditLog.created_at <= end_date)
+    return query
+
+
+def _base_query():
+    return select(AuditLog, User.username, User.email).outerjoin(User, AuditLog.user_id == User.id)
+
+
+def _keyset_order(query):
+    # id rastgele 6 karakterlik kod: aynı created_at değerinde deterministik sıra için ikinci anahtar
+    return query.order_by(desc(AuditLog.created_at), desc(AuditLog.id))
+
+
+def _row_to_dict(row) -> dict:
+    log, username, email = row[0], row[1], row[2]
+    return {
+        "id": str(log.id),
+        "action": log.action,
+        "user_id": log.user_id,
+        "username": email or username or "Sistem",
+        "resource_type": log.resource_type,
+        "resource_id": log.resource_id,
+        "details": log.details,
+        "ip_address": log.ip_address,
+        "user_agent": log.user_agent,
+        "created_at": log.created_at
+    }
+
+
+def _require_superuser(current_user: User) -> None:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not authorized to view audit logs")
+
+
 @router.get("/", response_model=List[AuditLogSchema])
 async def read_audit_logs(
     db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Keyset imleci (/page yanıtındaki next_cursor); verilirse skip yok sayılır"),
     action: Optional[str] = None,
     user_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     current_user: User = Depends(deps.get_current_user)
 ) -> Any:
     """
     Retrieve audit logs. Only accessible by superusers.
+    Offset (skip) geriye uyumluluk için duruyor; derin sayfalarda /page (keyset) kullanılmalı.
     """
-    if not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not authorized to view audit logs")
-    
-    # Build query with join to get usernames and emails
-    query = select(AuditLog, User.username, User.email).outerjoin(
-        User, AuditLog.user_id == User.id
-    ).order_by(desc(AuditLog.created_at))
-    
-    if action:
-        query = query.filter(AuditLog.action == action)
-    if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
-    if start_date:
-        query = query.filter(AuditLog.created_at >= start_date)
-    if end_date:
-        query = query.filter(AuditLog.created_at <= end_date)
-        
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
+    _require_superuser(current_user)
+
+    query = _filtered(_base_query(), action, user_id, resource_type, resource_id, start_date, end_date)
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(created_at, log_id))
+    else:
+        query = query.offset(skip)
+
+    result = await db.execute(_keyset_order(query).limit(limit))
+    return [_row_to_dict(row) for row in result.all()]
+
+
+@router.get("/page", response_model=AuditLogPage)
+async def read_audit_log_page(
+    db: AsyncSession = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Keyset sayfalama: (created_at, id) < imleç. Sayfa derinliğinden bağımsız olarak
+    index üzerinde sadece `limit` satır okunur.
+    """
+    _require_superuser(current_user)
+
+    query = _filtered(_base_query(), action, user_id, resource_type, resource_id, start_date, end_date)
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(created_at, log_id))
+
+    # Bir fazla satır okuyarak sonraki sayfanın varlığını ayrı COUNT sorgusu olmadan anla
+    result = await db.execute(_keyset_order(query).limit(limit + 1))
     rows = result.all()
-    
-    # Transform rows to include identifier (email or username)
-    audit_logs = []
-    for row in rows:
-        log = row[0]  # AuditLog object
-        username = row[1]  # username from User table
-        email = row[2]     # email from User table
-        
-        audit_logs.append({
-            "id": str(log.id),
-            "action": log.action,
-            "user_id": log.user_id,
-            "username": email or username or "Sistem",
-            "resource_type": log.resource_type,
-            "resource_id": log.resource_id,
-            "details": log.details,
-            "ip_address": log.ip_address,
-            "user_agent": log.user_agent,
-            "created_at": log.created_at
-        })
-    
-    return audit_logs
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {"items": [_row_to_dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+@router.get("/count", response_model=AuditLogCount)
+async def count_audit_logs(
+    db: AsyncSession = Depends(deps.get_db),
+    mode: str = Query("approx", pattern="^(approx|exact)$"),
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Kayıt sayısı. 'approx' modu planner tahminini kullanır (milyonlarca satırda milisaniyeler),
+    'exact' modu gerçek COUNT(*) çalıştırır.
+    """
+    _require_superuser(current_user)
+
+    filters = (action, user_id, resource_type, resource_id, start_date, end_date)
+    if mode == "exact":
+        query = _filtered(select(func.count()).select_from(AuditLog), *filters)
+        return {"count": (await db.execute(query)).scalar() or 0, "approximate": False}
+
+    if not any(f is not None and f != "" for f in filters):
+        # Filtresiz: istatistiklerden tablo satır tahmini
+        res = await db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'audit_logs'::regclass"))
+        estimate = res.scalar() or 0
+        if estimate > 0:
+            return {"count": int(estimate), "approximate": True}
+
+    # Named paramstyle + cast'siz derleme: text() içinde aynı bind parametreleriyle tekrar çalıştırılabilir
+    compiled = _filtered(select(AuditLog.id), *filters).compile(dialect=psycopg2.dialect(paramstyle="named"))
+    res = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), compiled.params)
+    plan = res.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = plan[0]["Plan"].get("Plan Rows", 0) if plan else 0
+    return {"count": int(estimate), "approximate": True}
+
+
+def _export_line(record: dict, fmt: str) -> str:
+    record = dict(record)
+    record["created_at"] = record["created_at"].isoformat() if record["created_at"] else None
+    if fmt == "ndjson":
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    record["details"] = json.dumps(record["details"], ensure_ascii=False, default=str) if record["details"] else ""
+    buf = io.StringIO()
+    csv.writer(buf).writerow([record.get(c) for c in EXPORT_COLUMNS])
+    return buf.getvalue()
+
+
+@router.get("/export")
+async def export_audit_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Filtrelenmiş denetim kayıtlarını NDJSON veya CSV olarak akıtır (KVKK incelemeleri için).
+    Sunucu tarafı imleç (stream + yield_per) kullanıldığı için bellek kullanımı kayıt sayısından bağımsızdır.
+    """
+    _require_superuser(current_user)
+
+    query = _keyset_order(_filtered(
+        _base_query(), action, user_id, resource_type, resource_id, start_date, end_date
+    )).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async def generate():
+        if format == "csv":
+            buf = io.StringIO()
+            csv.writer(buf).writerow(EXPORT_COLUMNS)
+            yield "\ufeff" + buf.getvalue()  # Excel Türkçe karakterleri doğru açsın
+        # İstek session'ı yerine export süresince yaşayan ayrı bir session
+        async with SessionLocal() as session:
+            async with session.begin():
+                result = await session.stream(query)
+                async for partition in result.partitions(EXPORT_BATCH_SIZE):
+                    yield "".join(_export_line(_row_to_dict(row), format) for row in partition)
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M")
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="audit_logs_{stamp}.{format}"'},
+    )
@@ -1,15 +1,17 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
 from uuid import UUID
 from fastapi.responses import FileResponse
 import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.repositories.clinical.repository import ClinicalRepository
+from app.repositories.clinical.repository import ClinicalRepository, MUAYENE_LIST_COLUMNS, OPERASYON_LIST_COLUMNS
+from app.repositories.clinical.models import ShardedMuayene, ShardedOperasyon, ShardedTetkikSonuc, ShardedFotografArsivi
+from app.services.patient_revision import conditional_get, since_datetime, DELETED_IDS_HEADER, MAX_SINCE
 from app.api import deps
 from app.schemas.clinical import (
-    MuayeneCreate, MuayeneUpdate, MuayeneResponse, 
-    OperasyonCreate, OperasyonResponse, OperasyonUpdate,
+    MuayeneCreate, MuayeneUpdate, MuayeneResponse, MuayeneListItem,
+    OperasyonCreate, OperasyonResponse, OperasyonUpdate, OperasyonListItem,
     HastaNotuCreate, HastaNotuResponse, HastaNotuUpdate,
     FotografCreate, FotografResponse, FotografUpdate,
     TetkikSonucCreate, TetkikSonucResponse, TetkikSonucUpdate,
@@ -28,26 +30,67 @@ router = APIRouter()
 async def version_check():
     return {"version": "V2_WITH_PHOTOS", "status": "active"}
 
+# Liste endpoint'leri için görünüm modu:
+# summary -> sadece liste kolonları (MuayeneListItem / OperasyonListItem), full -> tüm kayıt
+VIEW_PATTERN = "^(summary|full)$"
+
+def _as_view(rows: list, summary: bool, list_schema, full_schema) -> list:
+    schema = list_schema if summary else full_schema
+    return [schema.model_validate(r) for r in rows]
+
+# Hasta listeleri: ETag hasta revizyonundan (değişmediyse 304, veri sorgusu yok).
+# ?since=<X-Patient-Revision> verilirse yalnız o revizyondan sonra değişen kayıtlar döner,
+# silinenlerin id'leri X-Deleted-Ids başlığındadır.
+SINCE_QUERY = Query(None, ge=0, le=MAX_SINCE, description="Delta modu: önceki yanıttaki X-Patient-Revision değeri")
+
+async def _patient_changes(response: Response, db: AsyncSession, model, hasta_id: str, since: int, *conditions, columns=None, summary: bool = False) -> list:
+    try:
+        patient_id = UUID(hasta_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz hasta id")
+    rows, deleted_ids = await ClinicalRepository(db).get_patient_changes(
+        model, patient_id, since_datetime(since), *conditions, columns=columns, summary=summary
+    )
+    response.headers[DELETED_IDS_HEADER] = ",".join(str(i) for i in deleted_ids)
+    return rows
+
 # --- MUAYENE ---
-@router.get("/muayeneler/report", response_model=List[MuayeneResponse])
+@router.get("/muayeneler/report", response_model=List[Union[MuayeneListItem, MuayeneResponse]])
 async def read_muayeneler_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     search: Optional[str] = None,
+    view: str = Query("summary", pattern=VIEW_PATTERN, description="summary (varsayılan) | full"),
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     repo = ClinicalRepository(db)
-    return await repo.get_all_muayeneler(start_date=start_date, end_date=end_date, search=search)
+    summary = view == "summary"
+    rows = await repo.get_all_muayeneler(start_date=start_date, end_date=end_date, search=search, summary=summary)
+    return _as_view(rows, summary, MuayeneListItem, MuayeneResponse)
 
-@router.get("/patients/{hasta_id}/muayeneler", response_model=List[MuayeneResponse])
+@router.get("/patients/{hasta_id}/muayeneler", response_model=List[Union[MuayeneResponse, MuayeneListItem]])
 async def read_muayeneler(
+    request: Request,
+    response: Response,
     hasta_id: str,
+    view: str = Query("full", pattern=VIEW_PATTERN, description="full (varsayılan) | summary"),
+    since: Optional[int] = SINCE_QUERY,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
+    not_modified = await conditional_get(request, response, db, hasta_id, "muayeneler", view, since)
+    if not_modified is not None:
+        return not_modified
     try:
+        summary = view == "summary"
+        if since is not None:
+            rows = await _patient_changes(response, db, ShardedMuayene, hasta_id, since, columns=MUAYENE_LIST_COLUMNS, summary=summary)
+            return _as_view(rows, summary, MuayeneListItem, MuayeneResponse)
         from app.controllers.legacy_adapters.clinical_adapter import ClinicalLegacyAdapter
         adapter = ClinicalLegacyAdapter(db)
-        return await adapter.get_patient_muayeneler(hasta_id)
+        rows = await adapter.get_patient_muayeneler(hasta_id, summary=summary)
+        return _as_view(rows, summary, MuayeneListItem, MuayeneResponse)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -175,25 +218,42 @@ async def delete_muayene(
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- OPERASYON ---
-@router.get("/operasyonlar/report", response_model=List[OperasyonResponse])
+@router.get("/operasyonlar/report", response_model=List[Union[OperasyonListItem, OperasyonResponse]])
 async def read_operasyonlar_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     search: Optional[str] = None,
+    view: str = Query("summary", pattern=VIEW_PATTERN, description="summary (varsayılan) | full"),
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     repo = ClinicalRepository(db)
-    return await repo.get_all_operasyonlar(start_date=start_date, end_date=end_date, search=search)
+    summary = view == "summary"
+    rows = await repo.get_all_operasyonlar(start_date=start_date, end_date=end_date, search=search, summary=summary)
+    return _as_view(rows, summary, OperasyonListItem, OperasyonResponse)
 
-@router.get("/patients/{hasta_id}/operasyonlar", response_model=List[OperasyonResponse])
+@router.get("/patients/{hasta_id}/operasyonlar", response_model=List[Union[OperasyonResponse, OperasyonListItem]])
 async def read_operasyonlar(
+    request: Request,
+    response: Response,
     hasta_id: str,
+    view: str = Query("full", pattern=VIEW_PATTERN, description="full (varsayılan) | summary"),
+    since: Optional[int] = SINCE_QUERY,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
+    not_modified = await conditional_get(request, response, db, hasta_id, "operasyonlar", view, since)
+    if not_modified is not None:
+        return not_modified
     try:
+        summary = view == "summary"
+        if since is not None:
+            rows = await _patient_changes(response, db, ShardedOperasyon, hasta_id, since, columns=OPERASYON_LIST_COLUMNS, summary=summary)
+            return _as_view(rows, summary, OperasyonListItem, OperasyonResponse)
         from app.controllers.legacy_adapters.clinical_adapter import ClinicalLegacyAdapter
         adapter = ClinicalLegacyAdapter(db)
-        return await adapter.get_patient_operasyonlar(hasta_id)
+        rows = await adapter.get_patient_operasyonlar(hasta_id, summary=summary)
+        return _as_view(rows, summary, OperasyonListItem, OperasyonResponse)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -323,9 +383,14 @@ async def delete_operasyon(
 # --- TAKIP ---
 @router.get("/patients/{hasta_id}/takip", response_model=List[HastaNotuResponse])
 async def read_takip(
+    request: Request,
+    response: Response,
     hasta_id: str,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
+    not_modified = await conditional_get(request, response, db, hasta_id, "takip")
+    if not_modified is not None:
+        return not_modified
     repo = ClinicalRepository(db)
     return await repo.get_takip_by_patient(hasta_id)
 
@@ -424,10 +489,18 @@ async def delete_takip(
 # --- FOTOĞRAF ARŞİVİ ---
 @router.get("/patients/{hasta_id}/photos", response_model=List[FotografResponse])
 async def read_photos(
+    request: Request,
+    response: Response,
     hasta_id: str,
+    since: Optional[int] = SINCE_QUERY,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     """Get all photos for a patient."""
+    not_modified = await conditional_get(request, response, db, hasta_id, "photos", since)
+    if not_modified is not None:
+        return not_modified
+    if since is not None:
+        return await _patient_changes(response, db, ShardedFotografArsivi, hasta_id, since)
     print(f"DEBUG_GET_PHOTOS_START: patient={hasta_id}")
     repo = ClinicalRepository(db)
     results = await repo.get_photos_by_patient(hasta_id)
@@ -516,10 +589,18 @@ async def delete_photo(
 # --- GÖRÜNTÜLEME (TetkikSonuc - Goruntuleme) ---
 @router.get("/patients/{hasta_id}/imagings", response_model=List[TetkikSonucResponse])
 async def read_imagings(
+    request: Request,
+    response: Response,
     hasta_id: str,
+    since: Optional[int] = SINCE_QUERY,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     """Get all imaging results for a patient."""
+    not_modified = await conditional_get(request, response, db, hasta_id, "imagings", since)
+    if not_modified is not None:
+        return not_modified
+    if since is not None:
+        return await _patient_changes(response, db, ShardedTetkikSonuc, hasta_id, since, ShardedTetkikSonuc.kategori == "Goruntuleme")
     repo = ClinicalRepository(db)
     return await repo.get_tetkik_sonuclari_by_patient(hasta_id, kategori="Goruntuleme")
 
@@ -608,10 +689,18 @@ async def delete_imaging(
 # --- LABORATUVAR ---
 @router.get("/patients/{hasta_id}/labs", response_model=List[TetkikSonucResponse])
 async def read_labs(
+    request: Request,
+    response: Response,
     hasta_id: str,
+    since: Optional[int] = SINCE_QUERY,
     db: AsyncSession = Depends(deps.get_db)
 ) -> Any:
     """Get all lab results for a patient."""
+    not_modified = await conditional_get(request, response, db, hasta_id, "labs", since)
+    if not_modified is not None:
+        return not_modified
+    if since is not None:
+        return await _patient_changes(response, db, ShardedTetkikSonuc, hasta_id, since, ShardedTetkikSonuc.kategori == "Laboratuvar")
     repo = ClinicalRepository(db)
     return await repo.get_tetkik_sonuclari_by_patient(hasta_id, kategori="Laboratuvar")
 
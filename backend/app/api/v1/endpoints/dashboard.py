@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc, case
 
 from app.api.deps import get_db
+from app.core.instrumentation import timed
 from app.schemas.dashboard import DashboardData, DashboardSummary, HeatmapCell, RecentActivity
 from app.repositories.patient.models import ShardedPatientDemographics
 from app.models.appointment import Randevu, AppointmentStatus
@@ -17,7 +18,7 @@ from app.api import deps
 from app.models.user import User
 
 @router.get("", response_model=DashboardData)
-@cache(expire=60)
+@cache(expire=60, namespace="dashboard")  # change feed commit'lerde bu namespace'i temizler
 async def get_dashboard_data(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
@@ -44,8 +45,6 @@ async def get_dashboard_data(
     last_month_start = datetime.combine(date(last_month_year, last_month_val, 1), datetime.min.time())
     
     # --- 2. Consolidated Patient Queries ---
-    import time
-    s_p = time.time()
     stmt_patients = select(
         func.count(ShardedPatientDemographics.id).label("total"),
         func.count(case((and_(ShardedPatientDemographics.created_at >= today_start, ShardedPatientDemographics.created_at <= today_end), 1))).label("today"),
@@ -53,9 +52,9 @@ async def get_dashboard_data(
         func.count(case((ShardedPatientDemographics.created_at >= month_start, 1))).label("month"),
         func.count(case((and_(ShardedPatientDemographics.created_at >= last_month_start, ShardedPatientDemographics.created_at < month_start), 1))).label("last_month")
     )
-    res_p = await db.execute(stmt_patients)
-    p_stats = res_p.fetchone()
-    print(f"DEBUG: Patient stats query took {time.time() - s_p:.4f}s")
+    with timed("patient_stats"):
+        res_p = await db.execute(stmt_patients)
+        p_stats = res_p.fetchone()
     
     total_patients = p_stats.total or 0
     count_this_month = p_stats.month or 0
@@ -76,8 +75,9 @@ async def get_dashboard_data(
         trend = "up"
 
     # --- 3. Occupancy & Appointment Stats ---
-    s_a = time.time()
-    TOTAL_SLOTS = 20
+    # Kapasite mesai saatleri / slot süresinden gelir (hafta sonu 0 olabilir)
+    from app.services.scheduling_service import scheduling_engine
+    TOTAL_SLOTS = scheduling_engine.day_capacity(today)
     stmt_appts = select(
         func.count(case((and_(Randevu.start >= today_start, Randevu.start <= today_end, Randevu.status != AppointmentStatus.cancelled), 1))).label("today_filled"),
         func.count(case((and_(Randevu.start >= today_start, Randevu.start <= today_end, Randevu.status != AppointmentStatus.cancelled, Randevu.type.ilike('%Muayene%')), 1))).label("today_exam"),
@@ -87,9 +87,9 @@ async def get_dashboard_data(
         func.count(case((Randevu.start >= month_start, 1))).label("month_total"),
         func.count(case((and_(Randevu.start >= last_month_start, Randevu.start < month_start), 1))).label("last_month_total")
     )
-    res_a = await db.execute(stmt_appts)
-    a_stats = res_a.fetchone()
-    print(f"DEBUG: Appointment stats query took {time.time() - s_a:.4f}s")
+    with timed("appointment_stats"):
+        res_a = await db.execute(stmt_appts)
+        a_stats = res_a.fetchone()
     
     filled_slots = a_stats.today_filled or 0
     exam_count = a_stats.today_exam or 0
@@ -103,16 +103,15 @@ async def get_dashboard_data(
     heatmap_data = [] # Heatmap not used in frontend
 
     # --- 6. Recent Activity ---
-    s_r = time.time()
     from sqlalchemy.orm import selectinload
-    res_recent_eager = await db.execute(
-        select(Randevu)
-        .options(selectinload(Randevu.hasta))
-        .order_by(desc(Randevu.start))
-        .limit(5)
-    )
-    recent_appts_eager = res_recent_eager.scalars().all()
-    print(f"DEBUG: Recent activity query took {time.time() - s_r:.4f}s")
+    with timed("recent_activity"):
+        res_recent_eager = await db.execute(
+            select(Randevu)
+            .options(selectinload(Randevu.hasta))
+            .order_by(desc(Randevu.start))
+            .limit(5)
+        )
+        recent_appts_eager = res_recent_eager.scalars().all()
     
     recent_activity_data = [] # Define variable
     
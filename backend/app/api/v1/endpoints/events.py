@@ -0,0 +1,61 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.change_feed import change_feed, format_sse
+
+router = APIRouter()
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    token: str = Query(..., description="Access token (EventSource header gönderemez)"),
+    topics: Optional[str] = Query(None, description="Virgüllü liste: appointment,patient,finance"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    since: Optional[int] = Query(None, description="Last-Event-ID yerine query ile sıra numarası"),
+):
+    """
+    Server-Sent Events ile canlı değişiklik akışı.
+    Dashboard / takvim polling yerine bu akışı dinler ve gelen delta'yı kendi cache'ine uygular.
+    'reset' olayı gelirse istemci ilgili verileri bir kez yeniden çekmelidir.
+    """
+    # Bağlantı saatlerce açık kalır: yetki kontrolü için kısa ömürlü session açılıp hemen bırakılır,
+    # aksi halde her açık sekme havuzdan bir DB bağlantısı tutar.
+    async with SessionLocal() as db:
+        await deps.validate_token(token, db)
+
+    topic_set = {t.strip() for t in topics.split(",") if t.strip()} if topics else None
+    resume_from = last_event_id if last_event_id is not None else since
+    sub = change_feed.subscribe(topic_set)
+    backlog = change_feed.replay_since(resume_from)
+
+    async def event_source():
+        try:
+            yield "retry: 3000\n\n"
+            if backlog is None:
+                yield format_sse({"topic": "reset", "action": "reset", "data": {}})
+            else:
+                for ev in backlog:
+                    if not topic_set or ev["topic"] in topic_set:
+                        yield format_sse(ev)
+
+            async for ev in change_feed.stream(sub, settings.CHANGE_FEED_HEARTBEAT_SECONDS):
+                if await request.is_disconnected():
+                    break
+                yield format_sse(ev) if ev else ": ping\n\n"
+        finally:
+            change_feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Nginx buffering kapalı olmalı
+        },
+    )
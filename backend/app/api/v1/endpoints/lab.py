@@ -1,6 +1,7 @@
-from datetime import datetime
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body
+from datetime import date
+from typing import Any, List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Form
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -42,6 +43,26 @@ async def parse_lab_pdf(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF işlenirken hata oluştu: {str(e)}")
 
+@router.post("/parse-pdf/import", response_model=List[TetkikSonucResponse])
+async def import_lab_pdf(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    file: UploadFile = File(...),
+    hasta_id: UUID = Form(...),
+    tarih: Optional[date] = Form(None),
+    current_user = Depends(deps.get_current_user)
+) -> Any:
+    """PDF lab panelini ayrıştırır ve tüm sonuçları tek transaction'da hastaya kaydeder."""
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Sadece PDF dosyaları kabul edilmektedir.")
+
+    parsed = PDFLabParserService.parse_pdf(await file.read())
+    if not parsed.success:
+        raise HTTPException(status_code=422, detail=parsed.message)
+
+    repo = ClinicalRepository(db)
+    return await repo.bulk_create_tetkik_sonuclari(PDFLabParserService.to_tetkik_sonuclari(parsed, hasta_id, tarih))
+
 @router.post("/analyze", response_model=LabAnalysisResponse)
 async def analyze_lab_file(
     file: UploadFile = File(...)
@@ -75,11 +96,13 @@ async def create_urine(
     
     hasta_id = payload.get("hasta_id")
     tarih = payload.get("tarih")
+    rows: List[TetkikSonucCreate] = []
     
-    async def add(name, val, unit=""):
+    # Panel satırları toplanır ve tek transaction'da yazılır (yarım panel kalmaz)
+    def add(name, val, unit=""):
         if val:
             s = str(val) + (f" {unit}" if unit else "")
-            await repo.create_tetkik_sonuc(TetkikSonucCreate(
+            rows.append(TetkikSonucCreate(
                 hasta_id=hasta_id,
                 tarih=tarih,
                 tetkik_adi=name,
@@ -87,36 +110,37 @@ async def create_urine(
                 kategori="Laboratuvar"
             ))
 
-    await add("İdrar - Dansite", payload.get("dansite"))
-    await add("İdrar - pH", payload.get("ph"))
-    await add("İdrar - Protein", payload.get("protein"))
-    await add("İdrar - Glukoz", payload.get("glukoz"))
-    await add("İdrar - Keton", payload.get("keton"))
-    await add("İdrar - Bilirubin", payload.get("bilirubin"))
-    await add("İdrar - Ürobilinojen", payload.get("urobilinojen"))
-    await add("İdrar - Nitrit", payload.get("nitrit"))
-    await add("İdrar - Lökosit Esteraz", payload.get("lokosit_esteraz"))
-    await add("İdrar - Kan/Hemoglobin", payload.get("kan"))
+    add("İdrar - Dansite", payload.get("dansite"))
+    add("İdrar - pH", payload.get("ph"))
+    add("İdrar - Protein", payload.get("protein"))
+    add("İdrar - Glukoz", payload.get("glukoz"))
+    add("İdrar - Keton", payload.get("keton"))
+    add("İdrar - Bilirubin", payload.get("bilirubin"))
+    add("İdrar - Ürobilinojen", payload.get("urobilinojen"))
+    add("İdrar - Nitrit", payload.get("nitrit"))
+    add("İdrar - Lökosit Esteraz", payload.get("lokosit_esteraz"))
+    add("İdrar - Kan/Hemoglobin", payload.get("kan"))
     
-    await add("İdrar Mik. - Lökosit", payload.get("mik_lokosit"), "/HPF")
-    await add("İdrar Mik. - Eritrosit", payload.get("mik_eritrosit"), "/HPF")
-    await add("İdrar Mik. - Epitel", payload.get("mik_epitel"))
-    await add("İdrar Mik. - Bakteri", payload.get("mik_bakteri"))
-    await add("İdrar Mik. - Kristaller", payload.get("mik_kristaller"))
-    await add("İdrar Mik. - Silindirler", payload.get("mik_silindirler"))
-
-    await add("İdrar - Sediment", payload.get("sediment"))
-    await add("İdrar Notu", payload.get("notlar"))
+    add("İdrar Mik. - Lökosit", payload.get("mik_lokosit"), "/HPF")
+    add("İdrar Mik. - Eritrosit", payload.get("mik_eritrosit"), "/HPF")
+    add("İdrar Mik. - Epitel", payload.get("mik_epitel"))
+    add("İdrar Mik. - Bakteri", payload.get("mik_bakteri"))
+    add("İdrar Mik. - Kristaller", payload.get("mik_kristaller"))
+    add("İdrar Mik. - Silindirler", payload.get("mik_silindirler"))
+
+    add("İdrar - Sediment", payload.get("sediment"))
+    add("İdrar Notu", payload.get("notlar"))
     
     kultur = payload.get("kultur")
     if kultur:
         k_map = {"ureme_yok": "Üreme Yok", "ureme_var": "Üreme Var", "kontamine": "Kontamine"}
-        await add("İdrar Kültürü", k_map.get(kultur, kultur))
+        add("İdrar Kültürü", k_map.get(kultur, kultur))
         
-    await add("İdrar Kül. - Koloni", payload.get("koloni"), "cfu/ml")
-    await add("İdrar Kül. - Bakteri", payload.get("bakteri"))
-    await add("İdrar Kül. - Antibiyogram", payload.get("antibiyotik"))
-    
+    add("İdrar Kül. - Koloni", payload.get("koloni"), "cfu/ml")
+    add("İdrar Kül. - Bakteri", payload.get("bakteri"))
+    add("İdrar Kül. - Antibiyogram", payload.get("antibiyotik"))
+
+    await repo.bulk_create_tetkik_sonuclari(rows)
     return True
 
 @router.post("/spermiogram", response_model=bool)
@@ -219,17 +243,17 @@ async def create_genel_lab_batch(
     payload: List[dict] = Body(...),
     current_user = Depends(deps.get_current_user)
 ) -> Any:
-    """Create a batch of lab results."""
+    """Create a batch of lab results (tek INSERT ... RETURNING, tek commit)."""
     repo = ClinicalRepository(db)
-    results = []
+    rows = []
     for item in payload:
         # Validate required fields
         if not item.get("hasta_id") or not item.get("tetkik_adi"):
             continue
             
-        res = await repo.create_tetkik_sonuc(TetkikSonucCreate(
+        rows.append(TetkikSonucCreate(
             hasta_id=item.get("hasta_id"),
-            tarih=item.get("tarih") or datetime.now(),
+            tarih=item.get("tarih") or date.today(),
             tetkik_adi=item.get("tetkik_adi"),
             sonuc=item.get("sonuc"),
             birim=item.get("birim"),
@@ -237,8 +261,7 @@ async def create_genel_lab_batch(
             sembol=item.get("sembol"),
             kategori="Laboratuvar"
         ))
-        results.append(res)
-    return results
+    return await repo.bulk_create_tetkik_sonuclari(rows)
 
 @router.delete("/genel/batch", response_model=bool)
 async def delete_genel_lab_batch(
@@ -247,8 +270,7 @@ async def delete_genel_lab_batch(
     ids: List[int] = Body(...),
     current_user = Depends(deps.get_current_user)
 ) -> Any:
-    """Delete a batch of lab results."""
+    """Delete a batch of lab results (tek UPDATE ile soft delete)."""
     repo = ClinicalRepository(db)
-    for res_id in ids:
-        await repo.delete_tetkik_sonuc(res_id)
+    await repo.bulk_delete_tetkik_sonuclari(ids)
     return True
@@ -3,23 +3,138 @@ Patient Report API Endpoint
 
 Provides aggregated patient reports for PDF generation with graceful degradation.
 """
+import asyncio
+import logging
 from datetime import datetime
+from typing import List, Optional, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
 from app.api import deps
 from app.models.user import User
 from app.core.user_context import UserContext
-from app.schemas.patient_report import PatientReportDTO
+from app.core.config import settings
+from app.repositories.patient.models import ShardedPatientDemographics
+from app.repositories.patient.search import build_advanced_search_query
+from app.schemas.patient_report import PatientReportDTO, PatientReportBatchRequest
+from app.services.audit_service import AuditService
 from app.services.orchestrators.report_orchestrator import get_report_orchestrator
-from app.services.pdf_report_service import PDFReportService
-from fastapi.responses import StreamingResponse
+from app.services.pdf.cache import pdf_cache
+from app.services.pdf.renderer import pdf_renderer
+from app.services.pdf_report_service import PDF_LAYOUT_VERSION, render_patient_report
+from app.utils.http_cache import make_etag, etag_matches
+from app.utils.zip_stream import ZipStream
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+async def _resolve_batch_patients(db: AsyncSession, body: PatientReportBatchRequest) -> List[UUID]:
+    if body.filter is None:
+        # Verilen sıra korunur, tekrarlar atılır
+        return list(dict.fromkeys(body.patient_ids or []))
+
+    stmt = build_advanced_search_query(**body.filter.model_dump())
+    if body.patient_ids:
+        stmt = stmt.where(ShardedPatientDemographics.id.in_(body.patient_ids))
+    stmt = stmt.order_by(ShardedPatientDemographics.soyad, ShardedPatientDemographics.ad)
+    # Sınırın bir fazlası okunur: aşıldığı sessizce kırpılmadan anlaşılsın
+    result = await db.execute(stmt.limit(settings.PDF_BATCH_MAX_PATIENTS + 1))
+    return [row[0] for row in result.all()]
+
+
+@router.post("/batch/pdf")
+async def get_patient_reports_zip(
+    body: PatientReportBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(deps.get_current_user)
+) -> StreamingResponse:
+    """
+    Birden çok hasta için PDF raporlarını tek ZIP olarak akıtır (sigorta denetimi, sevk yazıları).
+
+    Hastalar liste (patient_ids) veya gelişmiş arama filtresiyle seçilir. Veri, gruplar halinde
+    shard başına tek sorguyla çekilir; PDF'ler render havuzunda üretilir ve her biri biter bitmez
+    arşive yazılıp istemciye gönderilir (arşivin tamamı bellekte tutulmaz). Bulunamayan veya
+    üretilemeyen raporlar arşivdeki HATALAR.txt dosyasında listelenir.
+    """
+    if not body.patient_ids and body.filter is None:
+        raise HTTPException(status_code=400, detail="patient_ids veya filter verilmelidir")
+
+    patient_ids = await _resolve_batch_patients(db, body)
+    if not patient_ids:
+        raise HTTPException(status_code=404, detail="Rapor oluşturulacak hasta bulunamadı")
+    if len(patient_ids) > settings.PDF_BATCH_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tek seferde en fazla {settings.PDF_BATCH_MAX_PATIENTS} hasta raporlanabilir"
+        )
+
+    context = UserContext(
+        user_id=current_user.id,
+        username=current_user.username,
+        role=current_user.role
+    )
+    # Toplu erişim tek denetim kaydıyla tutulur (hasta başına kayıt yerine id listesi)
+    await AuditService.log(
+        db=db,
+        action="PATIENT_REPORT_BATCH",
+        user_id=current_user.id,
+        resource_type="patient",
+        details={"count": len(patient_ids), "patient_ids": [str(pid) for pid in patient_ids]},
+    )
+    # get_db yanıt akışı bittikten sonra commit eder: bağlantı kopar veya render hata verirse kayıt
+    # kaybolmasın diye denetim kaydı akış başlamadan kalıcı yazılır
+    await db.commit()
+    orchestrator = get_report_orchestrator(db, context)
+
+    async def _render(pid: UUID, report: PatientReportDTO) -> Tuple[UUID, Optional[bytes]]:
+        try:
+            return pid, await pdf_renderer.render(render_patient_report, report)
+        except Exception as e:
+            logger.error(f"Batch PDF render failed for patient {pid}: {e}")
+            return pid, None
+
+    async def stream():
+        archive = ZipStream()
+        failures: List[str] = []
+        chunk_size = max(1, settings.PDF_BATCH_CHUNK_SIZE)
+        for offset in range(0, len(patient_ids), chunk_size):
+            chunk = patient_ids[offset:offset + chunk_size]
+            reports = await orchestrator.get_patient_reports(chunk)
+            # Okuma transaction'ı render / gönderim süresince açık kalmaz (sonraki grup yenisini açar)
+            await db.commit()
+            failures.extend(f"{pid}: hasta bulunamadı" for pid in chunk if pid not in reports)
+
+            tasks = [asyncio.ensure_future(_render(pid, report)) for pid, report in reports.items()]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    pid, pdf_bytes = await next_done
+                    if pdf_bytes is None:
+                        failures.append(f"{pid}: rapor üretilemedi")
+                        continue
+                    yield archive.add(f"Patient_Report_{pid}.pdf", pdf_bytes)
+            finally:
+                # İstemci bağlantıyı keserse bekleyen render işleri iptal edilir
+                for task in tasks:
+                    task.cancel()
+
+        if failures:
+            yield archive.add("HATALAR.txt", "\n".join(failures).encode("utf-8"))
+        yield archive.close()
+
+    filename = f"Patient_Reports_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    return StreamingResponse(
+        stream(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 @router.get("/{patient_id}", response_model=PatientReportDTO)
 async def get_patient_report(
     patient_id: UUID,
@@ -48,11 +163,16 @@ async def get_patient_report(
 @router.get("/{patient_id}/pdf")
 async def get_patient_report_pdf(
     patient_id: UUID,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(deps.get_current_user)
-) -> StreamingResponse:
+) -> Response:
     """
-    Generate and stream a resilient PDF report for the patient.
+    Generate a resilient PDF report for the patient.
+
+    ETag hastanın rapora giren verisinin revizyonundan türetilir: veri değişmediyse 304 döner,
+    istemcide yoksa önbellekteki PDF gönderilir; yalnız veri değiştiğinde yeniden üretilir
+    (render worker havuzunda, event loop dışında).
     """
     context = UserContext(
         user_id=current_user.id,
@@ -61,18 +181,26 @@ async def get_patient_report_pdf(
     )
     
     orchestrator = get_report_orchestrator(db, context)
-    report_data = await orchestrator.get_patient_report(patient_id)
-    
-    # Generate PDF via service
-    pdf_stream = PDFReportService.generate_patient_report_pdf(report_data)
-    
+    revision = await orchestrator.get_report_revision(patient_id)
+    etag = make_etag("patient-report-pdf", patient_id, PDF_LAYOUT_VERSION, *revision)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    pdf_bytes = pdf_cache.get(etag)
+    if pdf_bytes is None:
+        report_data = await orchestrator.get_patient_report(patient_id)
+        pdf_bytes = await pdf_renderer.render(render_patient_report, report_data)
+        if report_data.warnings:
+            # Kısmi (shard hatalı) rapor önbelleğe / istemciye kalıcı olarak verilmez
+            headers = {"Cache-Control": "no-store"}
+        else:
+            pdf_cache.set(etag, pdf_bytes)
+
     filename = f"Patient_Report_{patient_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
-    
-    return StreamingResponse(
-        pdf_stream,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
 
 
 @router.get("/{patient_id}/status")
@@ -1,11 +1,11 @@
 from typing import Any, List, Optional
 from uuid import UUID
-from datetime import date, datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
 from app.core.limiter import limiter
 from fastapi_cache.decorator import cache
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func, cast, Date, distinct
+from sqlalchemy import select, func
 from sqlalchemy.dialects.postgresql import UUID as PgUUID
 from fastapi.responses import StreamingResponse
 import csv
@@ -21,8 +21,10 @@ from app.models.user import User
 from app.controllers.legacy_adapters.patient_controller import PatientController
 from app.core.user_context import UserContext
 from app.repositories.patient.models import ShardedPatientDemographics
-from app.repositories.clinical.models import ShardedMuayene, ShardedOperasyon
+from app.repositories.patient.search import build_advanced_search_query
 from app.services.orchestrators.patient_orchestrator import PatientOrchestrator
+from app.services.patient_revision import conditional_get
+from app.services.orchestrators.workspace_orchestrator import PatientWorkspaceOrchestrator, WORKSPACE_SECTIONS, parse_sections
 
 router = APIRouter()
 
@@ -61,7 +63,7 @@ async def advanced_search(
 ) -> Any:
     """Advanced patient search with cross-table filtering and pagination."""
     try:
-        base_stmt = _build_advanced_search_query(
+        base_stmt = build_advanced_search_query(
             tani, yas_min, yas_max, muayene_tarihi_baslangic, muayene_tarihi_bitis,
             son_islem_tarihi_baslangic, son_islem_tarihi_bitis, ilk_kayit_tarihi_baslangic, ilk_kayit_tarihi_bitis,
             operasyon_tarihi_baslangic, operasyon_tarihi_bitis, operasyon_adi, sikayet, bulgu
@@ -151,7 +153,7 @@ async def export_advanced_search(
     """Export advanced search results as CSV."""
     async def generate():
         try:
-            base_stmt = _build_advanced_search_query(
+            base_stmt = build_advanced_search_query(
                 tani, yas_min, yas_max, muayene_tarihi_baslangic, muayene_tarihi_bitis,
                 son_islem_tarihi_baslangic, son_islem_tarihi_bitis, ilk_kayit_tarihi_baslangic, ilk_kayit_tarihi_bitis,
                 operasyon_tarihi_baslangic, operasyon_tarihi_bitis, operasyon_adi, sikayet, bulgu
@@ -237,17 +239,34 @@ async def create_patient(
 
 # --- INSTANCE ROUTES (DYNAMIC) ---
 
+# Hasta ekranı uç noktaları hasta revizyonundan ETag üretir (değişmediyse 304, bkz. services.patient_revision)
+
 @router.get("/{id}/timeline")
-async def get_patient_timeline(*, db: AsyncSession = Depends(deps.get_db), id: UUID) -> List[dict]:
+async def get_patient_timeline(*, request: Request, response: Response, db: AsyncSession = Depends(deps.get_db), id: UUID) -> Any:
     """Get patient timeline."""
+    not_modified = await conditional_get(request, response, db, id, "timeline")
+    if not_modified is not None:
+        return not_modified
     controller = PatientController(db)
     return await controller.get_timeline(id)
 
 @router.get("/{id}", response_model=PatientLegacyResponse)
-async def read_patient(*, request: Request, db: AsyncSession = Depends(deps.get_db), id: UUID) -> Any:
+async def read_patient(*, request: Request, response: Response, db: AsyncSession = Depends(deps.get_db), id: UUID) -> Any:
     """Get patient by ID."""
+    context = UserContext(user_id=getattr(request.state, "user_id", None), username=getattr(request.state, "username", None), ip_address=request.client.host if request.client else None)
+    not_modified = await conditional_get(request, response, db, id, "profile")
+    if not_modified is not None:
+        # 304'te get_patient_profile (@audited) çalışmaz: önbellekten gösterilen açılış da erişim kaydına girer
+        if context.user_id:
+            try:
+                await AuditService.log(
+                    db=db, action="PATIENT_VIEW", user_id=context.user_id, resource_type="patient", resource_id=str(id),
+                    details={"method": "get_patient_profile", "not_modified": True}, ip_address=context.ip_address
+                )
+            except Exception as e:
+                print(f"AUDIT LOG ERROR: {e}")
+        return not_modified
     try:
-        context = UserContext(user_id=getattr(request.state, "user_id", None), username=getattr(request.state, "username", None), ip_address=request.client.host)
         controller = PatientController(db, context)
         patient = await controller.get_patient_profile(id)
         if not patient: raise HTTPException(status_code=404, detail="Patient not found")
@@ -258,11 +277,59 @@ async def read_patient(*, request: Request, db: AsyncSession = Depends(deps.get_
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{id}/counts")
-async def get_patient_counts(*, db: AsyncSession = Depends(deps.get_db), id: UUID) -> Any:
+async def get_patient_counts(*, request: Request, response: Response, db: AsyncSession = Depends(deps.get_db), id: UUID) -> Any:
     """Get record counts for a patient."""
+    not_modified = await conditional_get(request, response, db, id, "counts")
+    if not_modified is not None:
+        return not_modified
     controller = PatientController(db)
     return await controller.get_counts(id)
 
+@router.get("/{id}/workspace")
+async def get_patient_workspace(
+    *,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    id: UUID,
+    sections: Optional[str] = Query(None, description=f"Virgülle ayrılmış bölümler (boş = hepsi): {', '.join(WORKSPACE_SECTIONS)}"),
+    view: str = Query("summary", pattern="^(summary|full)$", description="Muayene / operasyon listeleri: summary (varsayılan) | full"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Liste bölümlerinde en yeni N kayıt"),
+    current_user: User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Hasta ekranının tüm bölümleri tek istekte (tek kimlik doğrulama, tek erişim kaydı).
+    Bölüm yanıtları ayrı uç noktalarla aynı şekildedir; hata veren bölüm atlanır ve warnings'e yazılır.
+    """
+    try:
+        selected = parse_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    not_modified = await conditional_get(request, response, db, id, "workspace", ",".join(selected), view, limit)
+
+    # Açılış başına tek PATIENT_VIEW kaydı (304 ile önbellekten gösterilen açılışlar da dahil)
+    try:
+        await AuditService.log(
+            db=db, action="PATIENT_VIEW", user_id=current_user.id, resource_type="patient", resource_id=str(id),
+            details={"access_type": "workspace", "sections": selected},
+            ip_address=request.client.host if request.client else None
+        )
+    except Exception as e:
+        print(f"AUDIT LOG ERROR: {e}")
+
+    if not_modified is not None:
+        return not_modified
+
+    workspace = await PatientWorkspaceOrchestrator().get_workspace(id, selected, summary=view == "summary", limit=limit)
+    if "patient" in selected and "patient" in workspace and workspace["patient"] is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if workspace["warnings"]:
+        # Kısmi çalışma alanı revizyon ETag'i ile önbelleğe alınmaz (sonraki açılışlar 304 ile eksik kalırdı)
+        del response.headers["ETag"]
+        response.headers["Cache-Control"] = "no-store"
+    return workspace
+
 @router.put("/{id}", response_model=PatientResponse)
 async def update_patient(*, db: AsyncSession = Depends(deps.get_db), id: UUID, patient_in: PatientUpdate, current_user: User = Depends(deps.get_current_user)) -> Any:
     """Update a patient."""
@@ -297,77 +364,3 @@ async def delete_patient(*, db: AsyncSession = Depends(deps.get_db), id: UUID, c
     except Exception as e:
         import traceback; traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal Error: {str(e)}")
-
-# --- UTILITIES ---
-
-def _build_advanced_search_query(
-    tani: Optional[str], yas_min: Optional[int], yas_max: Optional[int],
-    muayene_tarihi_baslangic: Optional[str], muayene_tarihi_bitis: Optional[str],
-    son_islem_tarihi_baslangic: Optional[str], son_islem_tarihi_bitis: Optional[str],
-    ilk_kayit_tarihi_baslangic: Optional[str], ilk_kayit_tarihi_bitis: Optional[str],
-    operasyon_tarihi_baslangic: Optional[str], operasyon_tarihi_bitis: Optional[str],
-    operasyon_adi: Optional[str], sikayet: Optional[str], bulgu: Optional[str],
-):
-    base_stmt = select(ShardedPatientDemographics.id).where(ShardedPatientDemographics.is_deleted == False)
-
-    if yas_min is not None or yas_max is not None:
-        today = date.today()
-        if yas_max is not None:
-            try: min_dob = today.replace(year=today.year - yas_max - 1)
-            except ValueError: min_dob = today.replace(year=today.year - yas_max - 1, day=28)
-            base_stmt = base_stmt.where(ShardedPatientDemographics.dogum_tarihi >= min_dob)
-        if yas_min is not None:
-            try: max_dob = today.replace(year=today.year - yas_min)
-            except ValueError: max_dob = today.replace(year=today.year - yas_min, day=28)
-            base_stmt = base_stmt.where(ShardedPatientDemographics.dogum_tarihi <= max_dob)
-
-    if ilk_kayit_tarihi_baslangic: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.created_at, Date) >= ilk_kayit_tarihi_baslangic)
-    if ilk_kayit_tarihi_bitis: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.created_at, Date) <= ilk_kayit_tarihi_bitis)
-
-    if tani:
-        t_subq = select(ShardedMuayene.hasta_id).where(and_(
-            ShardedMuayene.is_deleted == False,
-            or_(
-                ShardedMuayene.tani1.ilike(f"%{tani}%"), ShardedMuayene.tani2.ilike(f"%{tani}%"),
-                ShardedMuayene.tani3.ilike(f"%{tani}%"), ShardedMuayene.tani4.ilike(f"%{tani}%"),
-                ShardedMuayene.tani5.ilike(f"%{tani}%"),
-                ShardedMuayene.tani1_kodu.ilike(f"%{tani}%"), ShardedMuayene.tani2_kodu.ilike(f"%{tani}%"),
-                ShardedMuayene.tani3_kodu.ilike(f"%{tani}%"), ShardedMuayene.tani4_kodu.ilike(f"%{tani}%"),
-                ShardedMuayene.tani5_kodu.ilike(f"%{tani}%"),
-                ShardedMuayene.tedavi.ilike(f"%{tani}%"), ShardedMuayene.sonuc.ilike(f"%{tani}%")
-            )
-        )).distinct()
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(t_subq))
-
-    if muayene_tarihi_baslangic or muayene_tarihi_bitis:
-        m_cond = [ShardedMuayene.is_deleted == False]
-        if muayene_tarihi_baslangic: m_cond.append(cast(ShardedMuayene.tarih, Date) >= muayene_tarihi_baslangic)
-        if muayene_tarihi_bitis: m_cond.append(cast(ShardedMuayene.tarih, Date) <= muayene_tarihi_bitis)
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(select(ShardedMuayene.hasta_id).where(and_(*m_cond)).distinct()))
-
-    if son_islem_tarihi_baslangic: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.updated_at, Date) >= son_islem_tarihi_baslangic)
-    if son_islem_tarihi_bitis: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.updated_at, Date) <= son_islem_tarihi_bitis)
-
-    if operasyon_tarihi_baslangic or operasyon_tarihi_bitis:
-        op_cond = [ShardedOperasyon.is_deleted == False]
-        if operasyon_tarihi_baslangic: op_cond.append(cast(ShardedOperasyon.tarih, Date) >= operasyon_tarihi_baslangic)
-        if operasyon_tarihi_bitis: op_cond.append(cast(ShardedOperasyon.tarih, Date) <= operasyon_tarihi_bitis)
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(select(ShardedOperasyon.hasta_id).where(and_(*op_cond)).distinct()))
-
-    if operasyon_adi:
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
-            select(ShardedOperasyon.hasta_id).where(and_(ShardedOperasyon.is_deleted == False, ShardedOperasyon.ameliyat.ilike(f"%{operasyon_adi}%"))).distinct()
-        ))
-
-    if sikayet:
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
-            select(ShardedMuayene.hasta_id).where(and_(ShardedMuayene.is_deleted == False, ShardedMuayene.sikayet.ilike(f"%{sikayet}%"))).distinct()
-        ))
-
-    if bulgu:
-        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
-            select(ShardedMuayene.hasta_id).where(and_(ShardedMuayene.is_deleted == False, or_(
-                ShardedMuayene.bulgu_notu.ilike(f"%{bulgu}%"), ShardedMuayene.fizik_muayene.ilike(f"%{bulgu}%")
-            ))).distinct()
-        ))
-    return base_stmt
@@ -11,12 +11,12 @@ class ClinicalLegacyAdapter:
     def __init__(self, db: AsyncSession, context: Optional[UserContext] = None):
         self.orchestrator = ClinicalOrchestrator(db, context)
 
-    async def get_patient_muayeneler(self, hasta_id: str):
-        history = await self.orchestrator.get_patient_clinical_history(UUID(hasta_id))
+    async def get_patient_muayeneler(self, hasta_id: str, summary: bool = False):
+        history = await self.orchestrator.get_patient_clinical_history(UUID(hasta_id), summary=summary)
         return history.get("examinations", [])
 
-    async def get_patient_operasyonlar(self, hasta_id: str):
-        history = await self.orchestrator.get_patient_clinical_history(UUID(hasta_id))
+    async def get_patient_operasyonlar(self, hasta_id: str, summary: bool = False):
+        history = await self.orchestrator.get_patient_clinical_history(UUID(hasta_id), summary=summary)
         return history.get("operations", [])
 
     async def create_muayene(self, muayene_in_dict: dict):
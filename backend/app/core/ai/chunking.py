@@ -0,0 +1,257 @@
+"""
+Uzun kayıtlar için parçalı (chunked) transkripsiyon.
+
+Ses 16 kHz mono PCM'e çözülür, enerji tabanlı basit bir VAD ile sessizlik noktalarından
+~AI_SCRIBE_CHUNK_SECONDS uzunluğunda örtüşen parçalara bölünür. Parçalar VoiceProvider
+üzerinden eşzamanlı yazıya dökülür, örtüşmeden kaynaklanan tekrar eden kelimeler
+birleştirmede atılır. Sırası tamamlanan her parça on_partial ile anında bildirilir.
+
+Çözme (decode) yapılamazsa (ffmpeg yok, desteklenmeyen WAV) None döner ve çağıran
+taraf tek istekli eski akışa düşer.
+"""
+import asyncio
+import io
+import logging
+import re
+import shutil
+import wave
+from array import array
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from app.core.ai.interfaces import VoiceProvider
+
+try:  # C hızında RMS; Python 3.13'te kaldırıldı, yoksa saf Python'a düşer
+    import audioop
+except ImportError:  # pragma: no cover
+    audioop = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit
+FRAME_MS = 30
+
+
+@dataclass(frozen=True)
+class Segment:
+    index: int
+    start_ms: int
+    end_ms: int
+
+
+# --- Decode ---
+
+def _wav_to_pcm(audio_bytes: bytes) -> Optional[Tuple[bytes, int]]:
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getcomptype() != "NONE":
+                return None
+            channels, rate = wav.getnchannels(), wav.getframerate()
+            pcm = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if channels == 2:
+        if audioop is None:
+            return None
+        pcm = audioop.tomono(pcm, SAMPLE_WIDTH, 0.5, 0.5)
+    elif channels != 1:
+        return None
+    return pcm, rate
+
+
+async def decode_to_pcm(audio_bytes: bytes, mime_type: str) -> Optional[Tuple[bytes, int]]:
+    """Sesi mono 16-bit PCM'e çevirir. (pcm, sample_rate) ya da çözülemiyorsa None."""
+    if "wav" in mime_type:
+        decoded = _wav_to_pcm(audio_bytes)
+        if decoded:
+            return decoded
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+
+    proc = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pcm, err = await proc.communicate(audio_bytes)
+    if proc.returncode != 0 or not pcm:
+        logger.warning(f"ffmpeg decode failed ({mime_type}): {err.decode(errors='ignore')[:200]}")
+        return None
+    return pcm, SAMPLE_RATE
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+# --- VAD / Segment planning ---
+
+def frame_energies(pcm: bytes, sample_rate: int, frame_ms: int = FRAME_MS) -> List[int]:
+    frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+    if audioop is not None:
+        return [audioop.rms(pcm[i:i + frame_bytes], SAMPLE_WIDTH) for i in range(0, len(pcm), frame_bytes)]
+
+    samples = array("h")
+    samples.frombytes(pcm[: len(pcm) - len(pcm) % SAMPLE_WIDTH])
+    step = frame_bytes // SAMPLE_WIDTH
+    energies = []
+    for i in range(0, len(samples), step):
+        frame = samples[i:i + step]
+        energies.append(int((sum(s * s for s in frame) / max(1, len(frame))) ** 0.5))
+    return energies
+
+
+def silence_threshold(energies: Sequence[int]) -> int:
+    """
+    Gürültü tabanı (en sessiz %5) ile konuşma seviyesi (%90) arasına göre eşik.
+    Dinamik aralık yoksa (sürekli konuşma / sürekli gürültü) -1 döner: hiçbir kare sessiz sayılmaz.
+    """
+    if not energies:
+        return -1
+    ordered = sorted(energies)
+    floor = ordered[len(ordered) * 5 // 100]
+    loud = ordered[len(ordered) * 90 // 100]
+    if loud <= max(floor * 2, 50):
+        return -1
+    return floor + (loud - floor) // 10
+
+
+def plan_segments(
+    energies: Sequence[int],
+    target_ms: int,
+    max_ms: int,
+    overlap_ms: int,
+    frame_ms: int = FRAME_MS,
+) -> List[Segment]:
+    """
+    Kesim noktalarını hedef uzunluğa en yakın sessiz kareye koyar; pencerede sessizlik
+    yoksa max_ms'de keser. Her parça bir öncekine overlap_ms kadar taşar (kelime bölünmesine karşı).
+    """
+    n = len(energies)
+    if n == 0:
+        return []
+    target, longest = max(1, target_ms // frame_ms), max(1, max_ms // frame_ms)
+    overlap = overlap_ms // frame_ms
+    threshold = silence_threshold(energies)
+
+    cuts: List[Tuple[int, int]] = []
+    start = 0
+    while start < n:
+        if n - start <= longest:
+            cuts.append((start, n))
+            break
+        lo, hi, ideal = start + target // 2, start + longest, start + target
+        silent = [i for i in range(lo, hi) if energies[i] <= threshold]
+        end = min(silent, key=lambda i: abs(i - ideal)) if silent else hi
+        cuts.append((start, end))
+        start = end
+
+    return [
+        Segment(index=i, start_ms=max(0, s - (overlap if i else 0)) * frame_ms, end_ms=e * frame_ms)
+        for i, (s, e) in enumerate(cuts)
+    ]
+
+
+# --- Stitching ---
+
+_WORD_NORMALIZE = re.compile(r"[^\w]", re.UNICODE)
+MAX_OVERLAP_WORDS = 12
+
+
+def _norm(word: str) -> str:
+    return _WORD_NORMALIZE.sub("", word).casefold()
+
+
+def merge_overlap(previous: List[str], incoming: List[str]) -> List[str]:
+    """incoming'in başında previous'un sonuyla örtüşen kelimeleri atar."""
+    limit = min(len(previous), len(incoming), MAX_OVERLAP_WORDS)
+    for k in range(limit, 0, -1):
+        tail = [_norm(w) for w in previous[-k:]]
+        head = [_norm(w) for w in incoming[:k]]
+        # Tek kelimelik eşleşme "ve", "bu" gibi kısa kelimelerde yanlış pozitif üretir
+        if tail == head and (k > 1 or len(tail[0]) >= 4):
+            return incoming[k:]
+    return incoming
+
+
+def stitch_transcripts(parts: Sequence[str]) -> str:
+    words: List[str] = []
+    for part in parts:
+        words.extend(merge_overlap(words, part.split()))
+    return " ".join(words)
+
+
+# --- Pipeline ---
+
+async def transcribe_chunked(
+    provider: VoiceProvider,
+    audio_bytes: bytes,
+    mime_type: str,
+    *,
+    target_seconds: int,
+    max_seconds: int,
+    overlap_ms: int,
+    concurrency: int,
+    slot: Optional[Callable[[], Any]] = None,
+    on_partial: Optional[Callable[[int, int, str], None]] = None,
+) -> Optional[str]:
+    """
+    Parçalı transkripsiyon. Ses çözülemiyorsa None döner (çağıran tek parça yola düşer).
+    on_partial(index, total, text): sırası gelen her parçanın (örtüşmesi atılmış) metni.
+    """
+    decoded = await decode_to_pcm(audio_bytes, mime_type)
+    if decoded is None:
+        return None
+    pcm, rate = decoded
+
+    energies = await asyncio.to_thread(frame_energies, pcm, rate)
+    segments = plan_segments(energies, target_seconds * 1000, max_seconds * 1000, overlap_ms)
+    if len(segments) <= 1:
+        return None
+
+    def offset(ms: int) -> int:
+        return ms * rate // 1000 * SAMPLE_WIDTH
+
+    limiter = asyncio.Semaphore(max(1, concurrency))
+    total = len(segments)
+
+    async def run(seg: Segment) -> Tuple[int, str]:
+        chunk = pcm_to_wav(pcm[offset(seg.start_ms):offset(seg.end_ms)], rate)
+        async with limiter:
+            async with (slot() if slot else nullcontext()):
+                return seg.index, await provider.transcribe(chunk, "audio/wav")
+
+    words: List[str] = []
+    done: dict = {}
+    next_index = 0
+    tasks = [asyncio.create_task(run(seg)) for seg in segments]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, text = await finished
+            done[index] = text or ""
+            # Parçalar sırasız biter; sadece kesintisiz ön ek birleştirilip yayınlanır
+            while next_index in done:
+                piece = merge_overlap(words, done.pop(next_index).split())
+                words.extend(piece)
+                if on_partial:
+                    on_partial(next_index, total, " ".join(piece))
+                next_index += 1
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    logger.info(f"Chunked transcription: {total} segments, {len(words)} words")
+    return " ".join(words)
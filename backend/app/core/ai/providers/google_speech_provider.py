@@ -1,10 +1,10 @@
 import base64
 import logging
-import httpx
 from typing import Optional
 
 from app.core.config import settings
 from app.core.ai.interfaces import VoiceProvider
+from app.core.ai.runtime import provider_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -50,23 +50,23 @@ class GoogleSTTProvider(VoiceProvider):
             }
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(self.url, json=payload, timeout=60.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Parse results
-                # Response format: { results: [ { alternatives: [ { transcript: "..." } ] } ] }
-                results = data.get("results", [])
-                full_transcript = []
-                for res in results:
-                    if "alternatives" in res and len(res["alternatives"]) > 0:
-                        full_transcript.append(res["alternatives"][0]["transcript"])
-                
-                return " ".join(full_transcript)
-            except Exception as e:
-                logger.error(f"Google STT failed: {e}")
-                # Detail handling could be better
-                raise
+        client = provider_runtime.client("google_stt")
+        try:
+            response = await client.post(self.url, json=payload, timeout=60.0)
+            response.raise_for_status()
+            data = response.json()
+            
+            # Parse results
+            # Response format: { results: [ { alternatives: [ { transcript: "..." } ] } ] }
+            results = data.get("results", [])
+            full_transcript = []
+            for res in results:
+                if "alternatives" in res and len(res["alternatives"]) > 0:
+                    full_transcript.append(res["alternatives"][0]["transcript"])
+            
+            return " ".join(full_transcript)
+        except Exception as e:
+            logger.error(f"Google STT failed: {e}")
+            # Detail handling could be better
+            raise
 
@@ -1,10 +1,9 @@
-import httpx
 import json
 import logging
 from typing import Dict, Any
 
-from app.core.config import settings
 from app.core.ai.interfaces import VoiceProvider, LLMProvider
+from app.core.ai.runtime import provider_runtime
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +15,19 @@ class LocalVoiceProvider(VoiceProvider):
         """
         Transcribe audio using local Whisper service.
         """
-        async with httpx.AsyncClient(timeout=settings.AI_SCRIBE_TIMEOUT) as client:
-            filename = "recording.webm" # Default, Whisper endpoint might ignore this or rely on content-type
-            files = {"audio": (filename, audio_bytes, mime_type)}
-            
-            try:
-                response = await client.post(self.endpoint, files=files)
-                response.raise_for_status()
-                return response.json().get("text", "")
-            except Exception as e:
-                logger.error(f"Local Whisper transcription failed: {e}")
-                raise
+        # Uygulama ömrü boyunca yaşayan keep-alive istemci (bkz. app.core.ai.runtime)
+        client = provider_runtime.client("local_whisper")
+        # Parçalı transkripsiyonda WAV gönderilir; Whisper endpoint uzantıya bakabiliyor
+        filename = "recording.wav" if "wav" in mime_type else "recording.webm"
+        files = {"audio": (filename, audio_bytes, mime_type)}
+
+        try:
+            response = await client.post(self.endpoint, files=files)
+            response.raise_for_status()
+            return response.json().get("text", "")
+        except Exception as e:
+            logger.error(f"Local Whisper transcription failed: {e}")
+            raise
 
 class LocalLLMProvider(LLMProvider):
     def __init__(self, endpoint: str, model: str):
@@ -37,28 +38,28 @@ class LocalLLMProvider(LLMProvider):
         """
         Analyze text using local Ollama service.
         """
-        async with httpx.AsyncClient(timeout=settings.AI_SCRIBE_TIMEOUT) as client:
-            # We construct the prompt by combining template + text, similar to Gemini
-            llm_prompt = f"{template}\n\n## TRANSCRIPT:\n{text}"
-            
-            payload = {
-                "model": self.model,
-                "prompt": llm_prompt,
-                "format": "json",
-                "stream": False,
-                # "options": {"temperature": temperature} # Ollama supports options
-            }
-            
-            try:
-                llm_response = await client.post(
-                    self.endpoint,
-                    json=payload
-                )
-                llm_response.raise_for_status()
-                
-                # Parse Ollama response
-                # Ollama returns 'response' field
-                return json.loads(llm_response.json().get("response", "{}"))
-            except Exception as e:
-                logger.error(f"Local LLM analysis failed: {e}")
-                raise
+        client = provider_runtime.client("local_llm")
+        # We construct the prompt by combining template + text, similar to Gemini
+        llm_prompt = f"{template}\n\n## TRANSCRIPT:\n{text}"
+
+        payload = {
+            "model": self.model,
+            "prompt": llm_prompt,
+            "format": "json",
+            "stream": False,
+            # "options": {"temperature": temperature} # Ollama supports options
+        }
+
+        try:
+            llm_response = await client.post(
+                self.endpoint,
+                json=payload
+            )
+            llm_response.raise_for_status()
+
+            # Parse Ollama response
+            # Ollama returns 'response' field
+            return json.loads(llm_response.json().get("response", "{}"))
+        except Exception as e:
+            logger.error(f"Local LLM analysis failed: {e}")
+            raise
@@ -0,0 +1,215 @@
+"""
+AI sağlayıcı çalışma zamanı: paylaşılan HTTP istemcileri, eşzamanlılık limitleri,
+devre kesiciler (circuit breaker) ve önbellekli sağlık durumu.
+
+- Her HTTP sağlayıcısı için uygulama ömrü boyunca yaşayan tek bir keep-alive httpx.AsyncClient
+  (startup'ta açılır, shutdown'da kapanır). Bağlantı kurulum süresi kısa tutulur; kapalı bir
+  servis 120 saniyelik okuma zaman aşımı yerine milisaniyeler içinde hata verir.
+- Ardışık hatalarda devre açılır; açık devredeki sağlayıcı çağrılmadan ProviderUnavailableError
+  fırlatılır, böylece yedek sağlayıcıya hemen geçilir. Süre dolunca tek bir deneme çağrısına izin verilir.
+- Sağlık kontrolü AI_SCRIBE_HEALTH_TTL saniye önbelleklenir (/ai-scribe/status her çağrıda servis yoklamaz).
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sağlayıcı başına eşzamanlılık limitleri (Gemini kotası, tek GPU'lu yerel Whisper/Ollama)
+PROVIDER_LIMITS: Dict[str, Callable[[], int]] = {
+    "gemini": lambda: settings.AI_SCRIBE_CONCURRENCY_GEMINI,
+    "google_stt": lambda: settings.AI_SCRIBE_CONCURRENCY_GOOGLE_STT,
+    "local_whisper": lambda: settings.AI_SCRIBE_CONCURRENCY_LOCAL_WHISPER,
+    "local_llm": lambda: settings.AI_SCRIBE_CONCURRENCY_LOCAL_LLM,
+}
+
+# Sağlık kontrolü yapılan yerel servisler: status yanıtındaki anahtar -> (sağlayıcı, endpoint)
+LOCAL_SERVICES: Dict[str, tuple] = {
+    "whisper": ("local_whisper", lambda: settings.LOCAL_WHISPER_ENDPOINT),
+    "ollama": ("local_llm", lambda: settings.LOCAL_LLM_ENDPOINT),
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderUnavailableError(Exception):
+    """Sağlayıcının devresi açık (yakın zamanda art arda hata verdi veya sağlık kontrolü başarısız)."""
+
+    def __init__(self, provider: str, retry_in: float = 0):
+        self.provider = provider
+        self.retry_in = retry_in
+        super().__init__(f"{provider} şu anda kullanılamıyor (yeniden deneme {retry_in:.0f}s sonra)")
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def before_call(self) -> bool:
+        """Çağrı devre kapalıysa False döner. Çağıran deneme (probe) çağrısıysa True döner. Aksi halde ProviderUnavailableError."""
+        if self.state == CLOSED:
+            return False
+        elapsed = self._clock() - self.opened_at
+        if self.state == OPEN and elapsed >= self.reset_seconds:
+            # Tek deneme çağrısı; sonucu devrenin kapanıp kapanmayacağını belirler
+            self.state = HALF_OPEN
+            return True
+        if self.state == HALF_OPEN:
+            # Deneme çağrısı sürüyor: ikinci bir deneme yapılmaz
+            raise ProviderUnavailableError(self.name, 0)
+        raise ProviderUnavailableError(self.name, max(0.0, self.reset_seconds - elapsed))
+
+    def end_probe(self) -> None:
+        """Başarıyla sonuçlanmayan deneme (hata, iptal, girdi hatası) devreyi yeniden açar; HALF_OPEN'da takılı kalmaz."""
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+            self.opened_at = self._clock()
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self, trip: bool = False) -> None:
+        self.failures += 1
+        if trip or self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"AI provider circuit opened: {self.name} ({self.failures} failures)")
+            self.state = OPEN
+            self.opened_at = self._clock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN and self._clock() - self.opened_at < self.reset_seconds
+
+
+def _is_failure(exc: BaseException) -> bool:
+    # ValueError: girdi / yapılandırma hatası (geçersiz ses, eksik API key) - sağlayıcı sağlığını etkilemez
+    return not isinstance(exc, (ValueError, ProviderUnavailableError, asyncio.CancelledError))
+
+
+def _is_down(exc: BaseException) -> bool:
+    # Bağlantı hiç kurulamadıysa servis kapalıdır: eşik beklemeden devreyi aç
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+class ProviderRuntime:
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._health: Dict[str, tuple] = {}  # key -> (checked_at, ok)
+        self._health_lock: Optional[asyncio.Lock] = None
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        for name in ("local_whisper", "local_llm", "google_stt"):
+            self.client(name)
+
+    async def stop(self) -> None:
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(c.aclose() for c in clients.values()), return_exceptions=True)
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        """Sağlayıcının paylaşılan istemcisi (startup dışında ilk kullanımda açılır: script / test)."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            limit = max(1, PROVIDER_LIMITS[name]()) if name in PROVIDER_LIMITS else 10
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.AI_SCRIBE_TIMEOUT, connect=settings.AI_SCRIBE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=limit * 2, max_keepalive_connections=limit),
+            )
+            self._clients[name] = client
+        return client
+
+    # --- Call guard ---
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, settings.AI_SCRIBE_BREAKER_FAILURES, settings.AI_SCRIBE_BREAKER_RESET_SECONDS)
+            self._breakers[name] = breaker
+        return breaker
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(name)
+        if sem is None:
+            sem = asyncio.Semaphore(max(1, PROVIDER_LIMITS[name]()))
+            self._semaphores[name] = sem
+        return sem
+
+    @asynccontextmanager
+    async def call(self, name: str):
+        """
+        Sağlayıcı çağrısı: devre açıksa beklemeden ProviderUnavailableError, değilse limit
+        dahilinde sıraya girer. Sonuç devre kesiciye işlenir.
+        """
+        breaker = self.breaker(name)
+        probe = breaker.before_call()
+        try:
+            async with self._semaphore(name):
+                # Sırada beklerken başka bir çağrı devreyi açmış olabilir
+                if breaker.is_open:
+                    raise ProviderUnavailableError(name, breaker.reset_seconds)
+                try:
+                    yield
+                except BaseException as exc:
+                    if _is_failure(exc):
+                        breaker.record_failure(trip=_is_down(exc))
+                    raise
+                else:
+                    breaker.record_success()
+        finally:
+            if probe:
+                breaker.end_probe()
+
+    # --- Health ---
+
+    async def _probe(self, endpoint: str) -> bool:
+        parts = urlsplit(endpoint)
+        try:
+            # Herhangi bir HTTP yanıtı (404 dahil) servisin ayakta olduğunu gösterir
+            await self.client("health").get(f"{parts.scheme}://{parts.netloc}/", timeout=settings.AI_SCRIBE_CONNECT_TIMEOUT)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def health(self) -> Dict[str, bool]:
+        if self._health_lock is None:
+            self._health_lock = asyncio.Lock()
+        async with self._health_lock:
+            now = time.monotonic()
+            stale = [
+                key for key in LOCAL_SERVICES
+                if key not in self._health or now - self._health[key][0] >= settings.AI_SCRIBE_HEALTH_TTL
+            ]
+            if stale:
+                results = await asyncio.gather(*(self._probe(LOCAL_SERVICES[k][1]()) for k in stale))
+                for key, ok in zip(stale, results):
+                    self._health[key] = (now, ok)
+                    if not ok:
+                        self.breaker(LOCAL_SERVICES[key][0]).record_failure(trip=True)
+
+        return {
+            key: ok and not self.breaker(LOCAL_SERVICES[key][0]).is_open
+            for key, (_, ok) in self._health.items()
+        }
+
+    def snapshot(self) -> Dict[str, str]:
+        return {name: b.state for name, b in self._breakers.items()}
+
+
+provider_runtime = ProviderRuntime()
@@ -64,6 +64,105 @@ class Settings(BaseSettings):
     LOCAL_LLM_ENDPOINT: str = "http://localhost:11434/api/generate"
     LOCAL_LLM_MODEL: str = "mistral:7b"
     AI_SCRIBE_RECORDINGS_PATH: str = "static/recordings"
+    # Asenkron iş kuyruğu: yüklenen ses diske yazılır, sonuç arka planda üretilir
+    AI_SCRIBE_SPOOL_DIR: str = "uploads/ai_scribe_spool"
+    AI_SCRIBE_MAX_UPLOAD_MB: int = 150
+    AI_SCRIBE_JOB_WORKERS: int = 4  # Aynı anda işlenen en fazla iş (süreç başına)
+    AI_SCRIBE_JOB_QUEUE_SIZE: int = 50  # Dolarsa yeni iş 503 ile reddedilir
+    AI_SCRIBE_JOB_RETENTION_HOURS: int = 24  # Tamamlanan iş kayıtlarının saklanma süresi
+    AI_SCRIBE_JOB_TIMEOUT: int = 600  # Tek bir işin (sağlayıcı sırası dahil) azami süresi, saniye
+    # Sağlayıcı başına eşzamanlılık limiti (kota / yerel GPU kapasitesi)
+    AI_SCRIBE_CONCURRENCY_GEMINI: int = 3
+    AI_SCRIBE_CONCURRENCY_GOOGLE_STT: int = 3
+    AI_SCRIBE_CONCURRENCY_LOCAL_WHISPER: int = 1
+    AI_SCRIBE_CONCURRENCY_LOCAL_LLM: int = 1
+    # Sağlayıcı HTTP istemcileri / devre kesici
+    AI_SCRIBE_CONNECT_TIMEOUT: float = 3.0  # Kapalı servis 120s beklemeden hata versin
+    AI_SCRIBE_BREAKER_FAILURES: int = 3  # Art arda bu kadar hatada sağlayıcı devre dışı bırakılır
+    AI_SCRIBE_BREAKER_RESET_SECONDS: int = 30  # Açık devre bu süre sonra tek denemeye izin verir
+    AI_SCRIBE_HEALTH_TTL: int = 30  # Yerel servis sağlık kontrolü önbellek süresi
+    # LLM sonuç önbelleği (aynı ses / PDF / metin tekrar gönderildiğinde sağlayıcı çağrılmaz)
+    AI_RESULT_CACHE_ENABLED: bool = True
+    AI_RESULT_CACHE_TTL: int = 86400  # saniye
+    AI_RESULT_CACHE_MAX_ENTRIES: int = 5000  # Redis'te tutulan en fazla sonuç
+    AI_RESULT_CACHE_DIR: str = "uploads/ai_result_cache"  # Redis yoksa disk önbelleği
+    AI_RESULT_CACHE_MAX_DISK_MB: int = 200
+    # PII maskeleme: isim sayılmayacak klinik terimler (boşsa app/core/pii_whitelist.txt)
+    PII_WHITELIST_FILE: str = ""
+    # Parçalı transkripsiyon (uzun kayıtlar): VAD ile sessizlikten bölünen örtüşen parçalar
+    AI_SCRIBE_CHUNKING_ENABLED: bool = True
+    AI_SCRIBE_CHUNK_SECONDS: int = 30  # Hedef parça uzunluğu
+    AI_SCRIBE_CHUNK_MAX_SECONDS: int = 50  # Sessizlik bulunamazsa zorunlu kesim (Google STT senkron limiti 60s)
+    AI_SCRIBE_CHUNK_OVERLAP_MS: int = 1000
+    AI_SCRIBE_CHUNK_CONCURRENCY: int = 4  # Tek kayıt için aynı anda gönderilen parça sayısı
+    
+    # --- TAKVİM AYARLARI ---
+    # Takvim sorgularında izin verilen en geniş pencere (aylık görünüm ± 1 ay = ~93 gün)
+    CALENDAR_MAX_WINDOW_DAYS: int = 100
+    # Çalışma saatleri (klinik yerel saati) ve slot çözünürlüğü - boş slot / doluluk hesabı için
+    CALENDAR_TIMEZONE: str = "Europe/Istanbul"
+    CALENDAR_WORKDAY_START: str = "09:00"
+    CALENDAR_WORKDAY_END: str = "18:00"
+    CALENDAR_WORKING_WEEKDAYS: str = "0,1,2,3,4"  # 0=Pazartesi ... 6=Pazar
+    CALENDAR_SLOT_MINUTES: int = 30
+    CALENDAR_AVAILABILITY_CACHE_TTL: int = 300  # saniye; diğer worker'ların yazdıklarını yakalamak için
+    CALENDAR_AVAILABILITY_CACHE_MAX_DAYS: int = 400  # bellekte tutulan en fazla gün; geçmiş günler her yüklemede atılır
+
+    # --- CANLI DEĞİŞİKLİK AKIŞI (SSE) ---
+    # Randevu / hasta / finans commit'leri Redis pub/sub üzerinden tüm worker'lara yayılır (Redis yoksa process içi)
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_FEED_CHANNEL: str = "urolog:changes"
+    CHANGE_FEED_HEARTBEAT_SECONDS: int = 15
+    CHANGE_FEED_HISTORY: int = 500  # Last-Event-ID ile yeniden bağlanan istemciye tekrar gönderilecek olay sayısı
+    CHANGE_FEED_QUEUE_SIZE: int = 200  # Yavaş istemci bu kadar geride kalırsa 'reset' alır
+
+    # --- PDF RAPOR AYARLARI ---
+    # Raporlar event loop dışında, varlıkları önceden yüklenmiş worker process'lerde üretilir
+    PDF_RENDER_WORKERS: int = 2  # 0: process havuzu yok, tek arka plan thread'i (PyMuPDF thread-safe değil)
+    PDF_CACHE_MAX_MB: int = 64  # ETag anahtarlı üretilmiş PDF önbelleği (worker başına, bellekte)
+    PDF_BATCH_MAX_PATIENTS: int = 1000  # Toplu (ZIP) raporda en fazla hasta
+    PDF_BATCH_CHUNK_SIZE: int = 100  # Veri bu büyüklükteki gruplar halinde çekilir / render edilir
+
+    # --- LABORATUVAR AYARLARI ---
+    # Toplu tetkik yazımında bu satır sayısından itibaren INSERT ... RETURNING yerine COPY kullanılır
+    LAB_BULK_COPY_THRESHOLD: int = 1000
+
+    # --- RAPOR / DASHBOARD AYARLARI ---
+    # True: trend grafikleri clinical.sharded_clinical_patient_activity özet tablosundan okunur,
+    # False: her istekte muayene + not tablolarından hesaplanır (sonuç aynıdır)
+    REPORT_ACTIVITY_SUMMARY: bool = True
+
+    # --- HASTA REVİZYONU (ETag / ?since delta) ---
+    # Delta modunda since anından bu kadar önce başlayan transaction'ların yazımları da tekrar gönderilir
+    # (geç commit olan yazım kaçmaz; istemci kayıtları id ile birleştirir)
+    PATIENT_DELTA_OVERLAP_SECONDS: int = 60
+
+    # --- HASTA ÇALIŞMA ALANI (GET /patients/{id}/workspace) ---
+    # Bir çalışma alanı isteğinin havuzdan aynı anda kullanabileceği en fazla bağlantı (bölüm grubu başına bir)
+    PATIENT_WORKSPACE_CONCURRENCY: int = 4
+
+    # --- ANALİTİK DIŞA AKTARIM (Parquet, maintenance.export_analytics) ---
+    ANALYTICS_EXPORT_DIR: str = "exports/analytics"
+    # Takma ad (HMAC) anahtarı; boşsa SECRET_KEY'den türetilir. Değişirse dışa aktarım baştan yazılır.
+    ANALYTICS_PSEUDONYM_KEY: str = ""
+
+    # --- ANALİTİK MOTOR (DuckDB, isteğe bağlı) ---
+    # "duckdb": kohort / tanı / servis raporları ANALYTICS_EXPORT_DIR replikasından okunur; "postgres": kapalı
+    ANALYTICS_ENGINE: str = "postgres"
+    ANALYTICS_DUCKDB_THREADS: int = 4
+    # Replika bundan eskiyse raporlar PostgreSQL'e döner (dakika)
+    ANALYTICS_MAX_STALENESS_MINUTES: int = 1440
+
+    # --- İSTEK ENSTRÜMANTASYONU (/metrics, yavaş istek / sorgu logu) ---
+    METRICS_ENABLED: bool = True
+    # Boş değilse /metrics "Authorization: Bearer <token>" ister; production'da boşsa /metrics kapalıdır (404)
+    METRICS_TOKEN: str = ""
+    SLOW_REQUEST_MS: int = 1000
+    SLOW_QUERY_MS: int = 200
+    # Aynı normalize SQL bir istekte bu kadar tekrarlanırsa N+1 şüphesi olarak loglanır
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # "X-Profile: 1" başlığı production'da yalnız bu açıkken dikkate alınır
+    REQUEST_PROFILING: bool = False
     
     # --- GOOGLE CALENDAR AYARLARI ---
     GOOGLE_CLIENT_ID: str = ""
@@ -0,0 +1,324 @@
+"""
+İstek düzeyinde performans ölçümü: route başına süre, DB süresi, sorgu sayısı, N+1 tespiti.
+
+- InstrumentationMiddleware her HTTP isteği için bir RequestStats açar (contextvar; istek içinde
+  başlatılan task'lar aynı nesneyi görür).
+- install_query_hooks(engine) SQLAlchemy cursor event'leriyle her sorgunun süresini ve
+  normalize edilmiş SQL'ini aktif isteğe yazar.
+- Metrikler Prometheus metin formatında /metrics'ten okunur (etiket: route şablonu, ham path değil).
+- SLOW_REQUEST_MS / SLOW_QUERY_MS aşımları ve N+1 şüpheleri tek satır JSON olarak loglanır.
+- "X-Profile: 1" başlığı (production'da REQUEST_PROFILING açıkken) yanıta Server-Timing ekler.
+"""
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+PROFILE_HEADER = b"x-profile"
+UNMATCHED_ROUTE = "unmatched"  # 404'ler: ham path etiketi kardinaliteyi patlatır
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current: ContextVar[Optional["RequestStats"]] = ContextVar("request_stats", default=None)
+
+
+# =============================================================================
+# SQL normalizasyonu
+# =============================================================================
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_CAST = re.compile(r"\?::[\w\[\]]+")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Literal / parametre / IN listelerini '?' ile değiştirir; aynı sorgu şekli aynı metni verir."""
+    sql = _SQL_STRING.sub("?", statement)
+    sql = _SQL_PARAM.sub("?", sql)
+    sql = _SQL_NUMBER.sub("?", sql)
+    sql = _SQL_CAST.sub("?", sql)
+    sql = _SQL_IN_LIST.sub("(?...)", sql)
+    return _SQL_SPACE.sub(" ", sql).strip()
+
+
+# =============================================================================
+# İstek istatistikleri
+# =============================================================================
+
+@dataclass
+class RequestStats:
+    method: str
+    path: str
+    started: float = field(default_factory=time.perf_counter)
+    db_seconds: float = 0.0
+    queries: int = 0
+    statements: Counter = field(default_factory=Counter)
+    slow_queries: List[Dict[str, Any]] = field(default_factory=list)
+    spans: Dict[str, float] = field(default_factory=dict)
+
+    def record_query(self, statement: str, elapsed: float) -> None:
+        self.queries += 1
+        self.db_seconds += elapsed
+        sql = normalize_sql(statement)
+        self.statements[sql] += 1
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            self.slow_queries.append({"sql": sql, "ms": round(elapsed * 1000, 1)})
+
+    def repeated_statements(self) -> List[Tuple[str, int]]:
+        """N+1 şüphesi: bir istekte N_PLUS_ONE_THRESHOLD kez ve üzeri çalışan aynı sorgu şekli."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= settings.N_PLUS_ONE_THRESHOLD]
+
+    def server_timing(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        parts = [f"app;dur={elapsed * 1000:.1f}", f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"']
+        parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        return ", ".join(parts)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """İstek içindeki bir bloğun süresini Server-Timing'e ekler (ad: boşluksuz token)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.spans[name] = stats.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+# =============================================================================
+# Prometheus metrikleri
+# =============================================================================
+
+METRIC_DEFINITIONS = {
+    "http_requests_total": ("counter", "HTTP requests by route and status"),
+    "http_request_duration_seconds": ("histogram", "Request wall time by route"),
+    "http_request_db_seconds_total": ("counter", "Database time spent inside requests by route"),
+    "http_request_db_queries_total": ("counter", "Database statements executed inside requests by route"),
+    "http_request_n_plus_one_total": ("counter", "Requests that repeated one statement shape N_PLUS_ONE_THRESHOLD+ times"),
+    "http_request_slow_queries_total": ("counter", "Statements slower than SLOW_QUERY_MS by route"),
+}
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    """Süreç içi sayaç / histogram deposu (çok worker'da her worker ayrı scrape edilir)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[tuple, List[float]]] = defaultdict(dict)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][key] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # [bucket sayıları..., toplam, adet]
+            series = self._histograms[name].setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRIC_DEFINITIONS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for key, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}{_format_labels(key)} {value:g}")
+                    continue
+                for key, series in sorted(self._histograms.get(name, {}).items()):
+                    for bound, count in zip(self.buckets, series):
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {count:g}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {series[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {series[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# =============================================================================
+# SQLAlchemy event hook'ları
+# =============================================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record_query(statement, elapsed)
+    elif elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        # İstek dışı (arka plan işi, bakım betiği) yavaş sorgu
+        logger.warning(json.dumps({"event": "slow_query", "ms": round(elapsed * 1000, 1), "sql": normalize_sql(statement)}, ensure_ascii=False))
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def install_query_hooks(engine) -> None:
+    """AsyncEngine veya Engine; aynı engine'e ikinci kez eklenmez."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# =============================================================================
+# /metrics erişimi
+# =============================================================================
+
+def metrics_access_status(authorization: Optional[str]) -> Optional[int]:
+    """
+    /metrics için reddedilecekse HTTP durum kodu, izinliyse None.
+    Production'da METRICS_TOKEN boşsa uç nokta kapalıdır (route / sorgu bilgisi herkese açılmaz).
+    """
+    if not settings.METRICS_ENABLED:
+        return 404
+    if not settings.METRICS_TOKEN:
+        return 404 if settings.ENVIRONMENT == "production" else None
+    if not hmac.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+        return 401
+    return None
+
+
+# =============================================================================
+# ASGI middleware
+# =============================================================================
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _profiling_requested(scope) -> bool:
+    if settings.ENVIRONMENT == "production" and not settings.REQUEST_PROFILING:
+        return False
+    return any(name == PROFILE_HEADER and value.strip() in (b"1", b"true") for name, value in scope.get("headers", []))
+
+
+class InstrumentationMiddleware:
+    """
+    Example:
+        app.add_middleware(InstrumentationMiddleware)
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope["path"])
+        token = _current.set(stats)
+        profile = _profiling_requested(scope)
+        response = {"status": 500, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                # SSE bağlantıları saatlerce açık kalır: süre histogramını / yavaş istek logunu bozmasın
+                response["streaming"] = headers.get("content-type", "").startswith("text/event-stream")
+                if profile:
+                    headers.append("Server-Timing", stats.server_timing())
+                    headers.append("X-DB-Query-Count", str(stats.queries))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._finish(stats, _route_template(scope), response["status"], response["streaming"], profile)
+
+    def _finish(self, stats: RequestStats, route: str, status: int, streaming: bool, profile: bool) -> None:
+        elapsed = time.perf_counter() - stats.started
+        labels = {"method": stats.method, "route": route}
+        registry = self.registry
+        registry.inc("http_requests_total", status=str(status), **labels)
+        registry.inc("http_request_db_seconds_total", stats.db_seconds, **labels)
+        registry.inc("http_request_db_queries_total", stats.queries, **labels)
+        if stats.slow_queries:
+            registry.inc("http_request_slow_queries_total", len(stats.slow_queries), **labels)
+        repeated = stats.repeated_statements()
+        if repeated:
+            registry.inc("http_request_n_plus_one_total", **labels)
+        if not streaming:
+            registry.observe("http_request_duration_seconds", elapsed, **labels)
+
+        record = {
+            "method": stats.method, "route": route, "path": stats.path, "status": status,
+            "ms": round(elapsed * 1000, 1), "db_ms": round(stats.db_seconds * 1000, 1), "queries": stats.queries,
+        }
+        for slow in stats.slow_queries:
+            logger.warning(json.dumps({"event": "slow_query", **slow, "route": route}, ensure_ascii=False))
+        if repeated:
+            logger.warning(json.dumps({
+                "event": "n_plus_one", **record, "repeated": [{"sql": sql, "count": n} for sql, n in repeated[:5]],
+            }, ensure_ascii=False))
+        if not streaming and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            logger.warning(json.dumps({"event": "slow_request", **record, "spans": _span_ms(stats)}, ensure_ascii=False))
+        if profile:
+            logger.info(json.dumps({
+                "event": "profile", **record, "spans": _span_ms(stats),
+                "statements": [{"sql": sql, "count": n} for sql, n in stats.statements.most_common(20)],
+            }, ensure_ascii=False))
+
+
+def _span_ms(stats: RequestStats) -> Dict[str, float]:
+    return {name: round(seconds * 1000, 1) for name, seconds in stats.spans.items()}
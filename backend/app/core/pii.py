@@ -0,0 +1,190 @@
+"""
+PII maskeleme motoru (AI Scribe girdisi/çıktısı ve audit log detayları ortak kullanır).
+
+- Desenler modül yüklenirken bir kez derlenir; her metin tek bir birleşik regex geçişiyle taranır
+  (TC kimlik no, cep telefonu ve büyük harfle başlayan kelime dizileri aynı taramada).
+- Klinik terim beyaz listesi dosyadan (pii_whitelist.txt veya PII_WHITELIST_FILE) bir set olarak
+  yüklenir; kelime başına O(1) kontrol yapılır ve kararlar önbelleklenir.
+- İsteğe bağlı hasta adı sözlüğü (demografiden ad/soyad) verilirse bu kelimeler tek başına
+  geçseler bile kesin olarak maskelenir.
+"""
+import re
+from pathlib import Path
+from typing import Any, FrozenSet, Iterable, Optional
+
+from app.core.config import settings
+
+WHITELIST_PATH = Path(__file__).parent / "pii_whitelist.txt"
+
+ID_MASK = "[ID_MASKED]"
+PHONE_MASK = "[PHONE_MASKED]"
+NAME_MASK = "[NAME_MASKED]"
+REDACTED = "[REDACTED]"
+
+# Anahtar adına göre tamamen gizlenen alanlar (audit log detayları, dışa aktarımlar)
+SENSITIVE_KEYS: FrozenSet[str] = frozenset({
+    # Turkish keys
+    "ad", "soyad", "tc", "tc_kimlik", "email", "telefon", "cep_tel",
+    "ev_tel", "is_tel", "adres", "dogum_tarihi", "sifre", "parola",
+    # English equivalents and common security keys
+    "first_name", "last_name", "surname", "ssn", "phone", "mobile",
+    "address", "birth_date", "password", "secret", "token", "auth",
+    "cvv", "credit_card", "iban",
+})
+
+_UPPER = "A-ZİĞÜŞÖÇ"
+_LOWER = "a-zıiğüşöç"
+_WORD = rf"[{_UPPER}][{_LOWER}]+"
+_NUMBERS = r"(?P<id>[1-9]\d{10})|(?P<phone>0?5\d{9})"
+# Baştaki lookahead, SRE'nin aday olmayan konumları (küçük harf, noktalama) tek karakter
+# kontrolüyle atlamasını sağlar; alternatiflerin her konumda ayrı ayrı denenmesinden ~2x hızlı.
+_START = rf"(?=[\d{_UPPER}])\b"
+
+# Sadece numara maskeleme (audit detayları: serbest metindeki TC / telefon)
+_NUMBER_PATTERN = re.compile(rf"(?=\d)\b(?:{_NUMBERS})\b")
+# Numara + en az iki büyük harfli kelime dizisi ("Ahmet Yılmaz")
+_NAME_RUN_PATTERN = re.compile(rf"{_START}(?:{_NUMBERS}|(?P<words>{_WORD}(?:\s+{_WORD})+))\b")
+# Hasta adı sözlüğü varsa tek kelimeler de adaydır ("Ahmet bey")
+_WORD_RUN_PATTERN = re.compile(rf"{_START}(?:{_NUMBERS}|(?P<words>{_WORD}(?:\s+{_WORD})*))\b")
+_SPACE_SPLIT = re.compile(r"(\s+)")
+
+# Bu uzunluktaki beyaz liste terimleri kök olarak da eşleşir: "prostat" -> "Prostatit", "mesane" -> "Mesanede"
+_MIN_STEM = 5
+
+_NAME, _KEEP, _CANDIDATE = 0, 1, 2
+_CACHE_SIZE = 16384
+
+
+def fold(word: str) -> str:
+    """Türkçe büyük/küçük harf duyarsız karşılaştırma anahtarı (I -> ı, İ -> i)."""
+    return word.replace("I", "ı").replace("İ", "i").lower()
+
+
+def load_terms(path: Path) -> FrozenSet[str]:
+    terms = set()
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            terms.add(fold(line))
+    return frozenset(terms)
+
+
+def name_tokens(*names: Optional[str]) -> FrozenSet[str]:
+    """Demografi ad/soyad alanlarından maskelenecek kelime seti ("Ayşe Nur" -> {"ayşe", "nur"})."""
+    return frozenset(
+        fold(token) for name in names if name for token in name.split() if len(token) > 1
+    )
+
+
+class PIIScrubber:
+    def __init__(self, clinical_terms: Iterable[str] = (), sensitive_keys: Iterable[str] = SENSITIVE_KEYS):
+        self.clinical_terms = frozenset(fold(t) for t in clinical_terms)
+        self._stems = frozenset(t for t in self.clinical_terms if len(t) >= _MIN_STEM)
+        self.sensitive_keys = frozenset(k.lower() for k in sensitive_keys)
+        # Kelime -> (katlanmış hali, klinik mi) ve dizi -> maskelenmiş hali; sınırlı boyutlu önbellekler
+        self._words: dict = {}
+        self._runs: dict = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PIIScrubber":
+        return cls(load_terms(path))
+
+    def is_sensitive_key(self, key: Any) -> bool:
+        return isinstance(key, str) and key.lower() in self.sensitive_keys
+
+    def is_clinical(self, word: str) -> bool:
+        return self._word(word)[1]
+
+    def _word(self, word: str) -> tuple:
+        info = self._words.get(word)
+        if info is None:
+            folded = fold(word)
+            clinical = folded in self.clinical_terms or any(
+                folded[:n] in self._stems for n in range(len(folded) - 1, _MIN_STEM - 1, -1)
+            )
+            if len(self._words) >= _CACHE_SIZE:
+                self._words.clear()
+            info = self._words[word] = (folded, clinical)
+        return info
+
+    def _mask_words(self, run: str, names: FrozenSet[str]) -> str:
+        if not names:
+            cached = self._runs.get(run)
+            if cached is not None:
+                return cached
+
+        parts = _SPACE_SPLIT.split(run)
+        words = parts[::2]
+        labels = []
+        for word in words:
+            folded, clinical = self._word(word)
+            if names and folded in names:
+                labels.append(_NAME)
+            else:
+                labels.append(_KEEP if clinical else _CANDIDATE)
+
+        # Ardışık en az iki aday kelime veya sözlükteki bir ada bitişik aday -> isim
+        i = 0
+        while i < len(labels):
+            if labels[i] != _CANDIDATE:
+                i += 1
+                continue
+            j = i
+            while j < len(labels) and labels[j] == _CANDIDATE:
+                j += 1
+            touches_name = (i > 0 and labels[i - 1] == _NAME) or (j < len(labels) and labels[j] == _NAME)
+            if j - i >= 2 or touches_name:
+                labels[i:j] = [_NAME] * (j - i)
+            i = j
+
+        if _NAME not in labels:
+            result = run
+        else:
+            out = []
+            for index, (word, label) in enumerate(zip(words, labels)):
+                if label == _NAME and index and labels[index - 1] == _NAME:
+                    continue  # bitişik isim kelimeleri tek maskeye iner
+                if index:
+                    out.append(parts[2 * index - 1])
+                out.append(NAME_MASK if label == _NAME else word)
+            result = "".join(out)
+
+        if not names:
+            if len(self._runs) >= _CACHE_SIZE:
+                self._runs.clear()
+            self._runs[run] = result
+        return result
+
+    def scrub_text(self, text: str, names: FrozenSet[str] = frozenset(), mask_names: bool = True) -> str:
+        if not mask_names:
+            pattern = _NUMBER_PATTERN
+        else:
+            pattern = _WORD_RUN_PATTERN if names else _NAME_RUN_PATTERN
+
+        def replace(match: "re.Match[str]") -> str:
+            kind = match.lastgroup
+            if kind == "id":
+                return ID_MASK
+            if kind == "phone":
+                return PHONE_MASK
+            return self._mask_words(match.group(), names)
+
+        return pattern.sub(replace, text)
+
+    def scrub(self, data: Any, names: FrozenSet[str] = frozenset(), mask_names: bool = True) -> Any:
+        """dict / list yapılarını dolaşarak tüm metin değerlerini maskeler."""
+        if isinstance(data, str):
+            return self.scrub_text(data, names, mask_names)
+        if isinstance(data, dict):
+            return {k: self.scrub(v, names, mask_names) for k, v in data.items()}
+        if isinstance(data, list):
+            return [self.scrub(i, names, mask_names) for i in data]
+        return data
+
+
+def _build_default() -> PIIScrubber:
+    path = Path(settings.PII_WHITELIST_FILE) if settings.PII_WHITELIST_FILE else WHITELIST_PATH
+    return PIIScrubber.from_file(path)
+
+
+pii_scrubber = _build_default()
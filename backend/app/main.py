@@ -1,11 +1,11 @@
 from fastapi import FastAPI, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import traceback
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
 from app.core.config import settings
-from app.api.v1.endpoints import auth, patients, clinical, lab, finance, appointments, documents, dashboard, settings as settings_endpoint, reports, system, integrations, audit, stock, ai_scribe, patient_report, lab_analysis
+from app.api.v1.endpoints import auth, patients, clinical, lab, finance, appointments, documents, dashboard, settings as settings_endpoint, reports, system, integrations, audit, stock, ai_scribe, patient_report, lab_analysis, events
 
 # ... (omitted headers)
 
@@ -15,6 +15,10 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from app.core.limiter import limiter
+from app.core.instrumentation import (
+    METRICS_PATH, InstrumentationMiddleware, install_query_hooks, metrics, metrics_access_status,
+)
+from app.db.session import engine
 from sqlalchemy import text
 
 from redis import asyncio as aioredis
@@ -65,6 +69,10 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
+# İstek süresi / DB süresi / sorgu sayısı (en dışta: CORS ve rate limit dahil ölçülür)
+install_query_hooks(engine)
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 app.include_router(patients.router, prefix=f"{settings.API_V1_STR}/patients", tags=["patients"])
 app.include_router(clinical.router, prefix=f"{settings.API_V1_STR}/clinical", tags=["clinical"])
@@ -82,6 +90,7 @@ app.include_router(stock.router, prefix=f"{settings.API_V1_STR}/stock", tags=["s
 app.include_router(ai_scribe.router, prefix=f"{settings.API_V1_STR}/ai-scribe", tags=["ai-scribe"])
 app.include_router(patient_report.router, prefix=f"{settings.API_V1_STR}/patient-report", tags=["patient-report"])
 app.include_router(lab_analysis.router, prefix=f"{settings.API_V1_STR}/lab-analysis", tags=["lab-analysis"])
+app.include_router(events.router, prefix=f"{settings.API_V1_STR}/events", tags=["events"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -100,6 +109,35 @@ async def startup_event():
         FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
         print("ℹ️ Using InMemory cache as fallback.")
 
+    from app.services.change_feed import change_feed
+    await change_feed.start()
+
+    from app.core.ai.runtime import provider_runtime
+    await provider_runtime.start()
+
+    from app.services.result_cache import result_cache
+    await result_cache.start()
+
+    from app.services.ai_scribe_jobs import ai_scribe_jobs
+    await ai_scribe_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.change_feed import change_feed
+    await change_feed.stop()
+
+    from app.services.ai_scribe_jobs import ai_scribe_jobs
+    await ai_scribe_jobs.stop()
+
+    from app.core.ai.runtime import provider_runtime
+    await provider_runtime.stop()
+
+    from app.services.result_cache import result_cache
+    await result_cache.stop()
+
+    from app.services.pdf.renderer import pdf_renderer
+    await pdf_renderer.stop()
+
 @app.get("/health")
 async def health_check(db: AsyncSession = Depends(deps.get_db)):
     health_status = {
@@ -138,6 +176,15 @@ async def health_check(db: AsyncSession = Depends(deps.get_db)):
 
     return health_status
 
+@app.get(METRICS_PATH, include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    status = metrics_access_status(request.headers.get("authorization"))
+    if status == 404:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if status == 401:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 from fastapi.staticfiles import StaticFiles
 import os
 
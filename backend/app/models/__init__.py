@@ -12,6 +12,7 @@ from .finance import (
 from .appointment import Randevu
 from .user_oauth import UserOAuth
 from .audit import AuditLog
+from .ai_scribe_job import AIScribeJob
 from .stock import StokUrun, StokAlim, StokHareket
 
 
@@ -0,0 +1,41 @@
+import uuid
+
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Integer, Boolean, Index
+from sqlalchemy.sql import func
+from app.models.base_class import Base
+
+
+class AIScribeJob(Base):
+    """
+    Asenkron AI Scribe analiz işi.
+    Ses dosyası spool_path'te diskte bekler; sonuç işlendikten sonra result alanına yazılır ve dosya silinir.
+    """
+    __tablename__ = "ai_scribe_jobs"
+    __table_args__ = (
+        # Başlangıçta yarım kalan işlerin kurtarılması ve eski kayıtların temizliği için
+        Index("ix_ai_scribe_jobs_status_created_at", "status", "created_at"),
+        Index("ix_ai_scribe_jobs_user_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    patient_id = Column(String, nullable=True)
+    protocol_no = Column(String, nullable=True)
+
+    # İstek parametreleri
+    mode = Column(String, nullable=False)
+    template = Column(String, nullable=True)
+    include_transcript = Column(Boolean, default=False)
+    mime_type = Column(String, nullable=False)
+    spool_path = Column(String, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+
+    # queued -> running -> done | failed
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Integer, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base_class import Base
@@ -6,12 +6,19 @@ from app.utils.code_generator import generate_unique_code
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Keyset sayfalama (created_at DESC, id DESC) + filtre kombinasyonları için bileşik index'ler
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_created_at", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at", "id"),
+        Index("ix_audit_logs_resource_created_at", "resource_type", "resource_id", "created_at", "id"),
+    )
 
     # 6-char alphanumeric code as Primary Key
     id = Column(String(6), primary_key=True, default=generate_unique_code)
     
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    action = Column(String, nullable=False, index=True) # e.g. "USER_LOGIN", "PATIENT_VIEW"
+    action = Column(String, nullable=False) # e.g. "USER_LOGIN", "PATIENT_VIEW"
     
     # Target resource information
     resource_type = Column(String, nullable=True) # e.g. "patient", "finance_transaction"
@@ -22,6 +29,6 @@ class AuditLog(Base):
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", backref="audit_logs")
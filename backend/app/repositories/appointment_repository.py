@@ -1,41 +1,200 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, func, literal, literal_column, DateTime
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from typing import List, Optional, Tuple, Any, Dict
 from datetime import datetime
 from app.models.appointment import Randevu
+from app.models.user import User
+from app.repositories.patient.models import ShardedPatientDemographics
 from app.schemas.appointment import RandevuCreate, RandevuUpdate
+from app.services.scheduling_service import scheduling_engine, doctor_key, BLOCKED_TYPE
+
+
+def _active_condition():
+    # Sadece silinmemişleri getir (Aktif randevular)
+    return or_(Randevu.is_deleted != 1, Randevu.is_deleted.is_(None))
+
+
+def _window_condition(start: datetime, end: datetime, probe_bounds: str = '[]'):
+    """
+    Randevu aralığı [start, end] penceresiyle kesişiyor mu?
+    `tstzrange(start, "end")` ifadesi ix_randevular_time_range (GiST) index'i ile birebir eşleşir;
+    eski `end >= :start AND start <= :end` koşulu tüm geçmişi tarıyordu.
+    probe_bounds='()' verilirse uç uca değen randevular (09:00-09:15 / 09:15-09:30) kesişmiş sayılmaz.
+    """
+    bounds = literal_column("'[]'")  # bind parametresi olursa index ifadesiyle eşleşmez
+    return func.tstzrange(Randevu.start, Randevu.end, bounds).op('&&')(
+        func.tstzrange(
+            literal(start, DateTime(timezone=True)),
+            literal(end, DateTime(timezone=True)),
+            literal_column(f"'{probe_bounds}'")
+        )
+    )
+
 
 class AppointmentRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def get_all(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Randevu]:
-        query = select(Randevu).options(
-            selectinload(Randevu.hasta),
-            selectinload(Randevu.doctor)
-        )
-        conditions = []
+        # RandevuResponse sadece 'hasta' ilişkisini serialize eder; 'doctor' yüklemek gereksizdi.
+        query = select(Randevu).options(selectinload(Randevu.hasta))
+        conditions = [_active_condition()]
         
-        if start:
+        if start and end:
+            conditions.append(_window_condition(start, end))
+        elif start:
             # Event ends after the start of our window
             conditions.append(Randevu.end >= start)
-        if end:
+        elif end:
             # Event starts before the end of our window
             conditions.append(Randevu.start <= end)
         
-        # Sadece silinmemişleri getir (Aktif randevular)
-        from sqlalchemy import or_
-        conditions.append(or_(Randevu.is_deleted != 1, Randevu.is_deleted.is_(None)))
-        
-        if conditions:
-            query = query.filter(and_(*conditions))
-        
+        query = query.filter(and_(*conditions))
         query = query.order_by(Randevu.start.desc())
         result = await self.db.execute(query)
         return result.scalars().all()
 
+    # --- Calendar (Projection) ---
+    def _calendar_conditions(self, start: datetime, end: datetime, doctor_id: Optional[int] = None) -> list:
+        conditions = [_active_condition(), _window_condition(start, end)]
+        if doctor_id is not None:
+            conditions.append(Randevu.doctor_id == doctor_id)
+        return conditions
+
+    async def get_calendar_window(
+        self, start: datetime, end: datetime, doctor_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Takvim ekranı için hafif sorgu: ORM nesnesi yerine sadece çizilen kolonlar seçilir,
+        hasta ve doktor bilgisi tek sorguda LEFT JOIN ile gelir (selectinload yok).
+        """
+        stmt = (
+            select(
+                Randevu.id, Randevu.hasta_id, Randevu.title, Randevu.type,
+                Randevu.start, Randevu.end, Randevu.status, Randevu.notes,
+                Randevu.doctor_id, Randevu.doctor_name,
+                ShardedPatientDemographics.ad, ShardedPatientDemographics.soyad,
+                ShardedPatientDemographics.cep_tel,
+                User.username, User.full_name,
+            )
+            .outerjoin(ShardedPatientDemographics, Randevu.hasta_id == ShardedPatientDemographics.id)
+            .outerjoin(User, Randevu.doctor_id == User.id)
+            .where(and_(*self._calendar_conditions(start, end, doctor_id)))
+            .order_by(Randevu.start)
+        )
+        result = await self.db.execute(stmt)
+
+        events = []
+        for row in result.all():
+            events.append({
+                "id": row.id,
+                "hasta_id": row.hasta_id,
+                "title": row.title,
+                "type": row.type,
+                "start": row.start,
+                "end": row.end,
+                "status": row.status,
+                "notes": row.notes,
+                "doctor_id": row.doctor_id,
+                "doctor_name": row.doctor_name,
+                "hasta": {
+                    "id": row.hasta_id, "ad": row.ad, "soyad": row.soyad, "cep_tel": row.cep_tel
+                } if row.hasta_id and row.ad is not None else None,
+                "doctor": {
+                    "id": row.doctor_id, "username": row.username, "full_name": row.full_name
+                } if row.doctor_id and row.username is not None else None,
+            })
+        return events
+
+    async def get_calendar_fingerprint(
+        self, start: datetime, end: datetime, doctor_id: Optional[int] = None
+    ) -> Tuple[int, Optional[datetime], int]:
+        """
+        Pencerenin değişip değişmediğini anlamak için ucuz özet (ETag kaynağı):
+        kayıt sayısı, en son değişiklik zamanı ve id toplamı (silme + ekleme aynı anda olursa da yakalar).
+        """
+        stmt = select(
+            func.count(Randevu.id),
+            func.max(func.coalesce(Randevu.updated_at, Randevu.created_at)),
+            func.coalesce(func.sum(Randevu.id), 0),
+        ).where(and_(*self._calendar_conditions(start, end, doctor_id)))
+        result = await self.db.execute(stmt)
+        count, last_change, id_sum = result.one()
+        return int(count or 0), last_change, int(id_sum or 0)
+
+    # --- Scheduling (Conflict / Availability) ---
+    async def get_conflicts(
+        self,
+        start: datetime,
+        end: datetime,
+        doctor_id: Optional[int] = None,
+        doctor_name: Optional[str] = None,
+        exclude_id: Optional[int] = None,
+    ) -> List[Randevu]:
+        """
+        Aynı doktorun [start, end) aralığıyla çakışan aktif randevularını döner (iptaller hariç).
+        Doktoru olmayan BLOCKED kayıtlar tüm kliniği kapattığı için her doktorla çakışır.
+        Doktor adı ve ID'si aynı kişiye çözülür: yalnız doctor_id'si olan kayıt kullanıcının adıyla eşleşir.
+        """
+        doctor_conditions = [and_(Randevu.doctor_name.is_(None), Randevu.doctor_id.is_(None), Randevu.type == BLOCKED_TYPE)]
+        if doctor_name:
+            doctor_conditions.append(Randevu.doctor_name == doctor_name)
+            doctor_conditions.append(and_(
+                Randevu.doctor_name.is_(None),
+                Randevu.doctor_id.in_(select(User.id).where(User.full_name == doctor_name)),
+            ))
+        if doctor_id is not None:
+            doctor_conditions.append(Randevu.doctor_id == doctor_id)
+            doctor_conditions.append(Randevu.doctor_name == select(User.full_name).where(User.id == doctor_id).scalar_subquery())
+        if not doctor_name and doctor_id is None:
+            doctor_conditions.append(and_(Randevu.doctor_name.is_(None), Randevu.doctor_id.is_(None)))
+
+        conditions = [
+            _active_condition(),
+            or_(Randevu.status != 'cancelled', Randevu.status.is_(None)),
+            _window_condition(start, end, probe_bounds='()'),
+            or_(*doctor_conditions),
+        ]
+        if exclude_id is not None:
+            conditions.append(Randevu.id != exclude_id)
+
+        result = await self.db.execute(select(Randevu).where(and_(*conditions)).order_by(Randevu.start))
+        return result.scalars().all()
+
+    async def lock_schedule(
+        self,
+        start: datetime,
+        end: datetime,
+        doctor_id: Optional[int] = None,
+        doctor_name: Optional[str] = None,
+    ) -> None:
+        """
+        Çakışma kontrolü ile yazma arasını aynı doktor / gün için sıraya sokar (check-then-insert yarışı).
+        Transaction ömürlü advisory lock: create / update'in commit'inde (veya rollback'te) bırakılır.
+        Günler artan sırada kilitlenir (çok günlük randevularda deadlock olmaz).
+        """
+        if not doctor_name and doctor_id is not None:
+            doctor_name = (await self.db.execute(select(User.full_name).where(User.id == doctor_id))).scalar()
+        key = doctor_key(doctor_name, doctor_id)
+        for day in scheduling_engine.days_between(start, end):
+            await self.db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"randevu:{key}:{day.isoformat()}"))))
+
+    async def get_busy_intervals(self, start: datetime, end: datetime) -> List[Any]:
+        """Boş slot hesabı için pencere içindeki aktif (iptal edilmemiş) randevuların zaman kolonları."""
+        stmt = select(
+            Randevu.id, Randevu.start, Randevu.end, Randevu.type, Randevu.status,
+            Randevu.title, Randevu.doctor_id, Randevu.doctor_name,
+            User.full_name.label("doctor_full_name"),
+        ).outerjoin(User, Randevu.doctor_id == User.id).where(and_(
+            _active_condition(),
+            or_(Randevu.status != 'cancelled', Randevu.status.is_(None)),
+            _window_condition(start, end),
+        ))
+        result = await self.db.execute(stmt)
+        return result.all()
+
     async def get_by_id(self, randevu_id: int) -> Optional[Randevu]:
         result = await self.db.execute(
             select(Randevu).options(selectinload(Randevu.hasta)).filter(Randevu.id == randevu_id)
@@ -53,6 +212,7 @@ class AppointmentRepository:
         self.db.add(db_obj)
         await self.db.commit()
         await self.db.refresh(db_obj)
+        scheduling_engine.apply_change(db_obj.id, db_obj)
         
         # Reload with relationship
         result = await self.db.execute(
@@ -74,6 +234,7 @@ class AppointmentRepository:
         
         await self.db.commit()
         await self.db.refresh(db_obj)
+        scheduling_engine.apply_change(db_obj.id, db_obj)
         
         # Reload with relationship
         result = await self.db.execute(
@@ -92,4 +253,5 @@ class AppointmentRepository:
         db_obj.is_deleted = 1
         db_obj.delete_reason = reason
         await self.db.commit()
+        scheduling_engine.apply_change(randevu_id, None)
         return True
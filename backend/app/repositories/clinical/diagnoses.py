@@ -0,0 +1,95 @@
+"""
+Muayene tanılarının (tani1..tani5 / tani1_kodu..tani5_kodu) normalize tablosu için satır üretimi ve sorgu yardımcıları.
+
+clinical.sharded_clinical_exam_diagnoses her muayene tanısı için bir satır tutar; ClinicalRepository
+muayene yazılırken aynı transaction'da günceller. Kod aramaları prefix'tir ("N40", "N40.*" -> N40.x)
+ve icd_code üzerindeki text_pattern_ops B-tree index'ini, metin aramaları trigram (GIN) index'ini kullanır.
+"""
+from datetime import date, datetime
+from typing import Any, List, Optional, Union
+
+from sqlalchemy import Select, and_, or_, select
+
+from app.repositories.clinical.models import ShardedExamDiagnosis
+
+DIAGNOSIS_POSITIONS = range(1, 6)
+
+
+def normalize_icd_code(code: Optional[str]) -> Optional[str]:
+    """'n40.0 ' -> 'N40.0'; arama girdisindeki sondaki '*' / '.*' atılır."""
+    if not code:
+        return None
+    code = code.strip().upper().rstrip("*").rstrip(".")
+    return code or None
+
+
+def diagnosis_rows(exam: Any) -> List[dict]:
+    """ShardedMuayene nesnesinden tanı satırları (boş pozisyonlar atlanır)."""
+    if exam.hasta_id is None:
+        return []
+    rows = []
+    for position in DIAGNOSIS_POSITIONS:
+        text = (getattr(exam, f"tani{position}", None) or "").strip() or None
+        code = normalize_icd_code(getattr(exam, f"tani{position}_kodu", None))
+        if text or code:
+            rows.append({
+                "exam_id": exam.id,
+                "hasta_id": exam.hasta_id,
+                "tarih": exam.tarih,
+                "position": position,
+                "icd_code": code[:50] if code else None,
+                "text": text[:255] if text else None,
+            })
+    return rows
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def diagnosis_conditions(
+    icd_code: Optional[str] = None,
+    text: Optional[str] = None,
+    start_date: Optional[Union[date, datetime]] = None,
+    end_date: Optional[Union[date, datetime]] = None,
+    match_any: bool = False,
+) -> list:
+    """
+    ShardedExamDiagnosis üzerinde filtreler. match_any=True: kod prefix'i VEYA metin eşleşmesi
+    (tek serbest arama kutusu için; kod ve metin aynı girdiden gelir).
+    """
+    d = ShardedExamDiagnosis
+    matches = []
+    code = normalize_icd_code(icd_code)
+    if code:
+        matches.append(d.icd_code.like(f"{escape_like(code)}%", escape="\\"))
+    if text and text.strip():
+        matches.append(d.text.ilike(f"%{escape_like(text.strip())}%", escape="\\"))
+
+    conditions = []
+    if matches:
+        conditions.append(or_(*matches) if match_any else and_(*matches))
+    if start_date:
+        conditions.append(d.tarih >= start_date)
+    if end_date:
+        conditions.append(d.tarih <= end_date)
+    return conditions
+
+
+def patients_with_diagnosis(
+    icd_code: Optional[str] = None,
+    text: Optional[str] = None,
+    start_date: Optional[Union[date, datetime]] = None,
+    end_date: Optional[Union[date, datetime]] = None,
+    match_any: bool = False,
+) -> Select:
+    """
+    Tanısı eşleşen hastaların id'leri (IN alt sorgusu olarak kullanılır).
+
+    Example:
+        # 3 yıldaki tüm BPH hastaları
+        stmt = patients_with_diagnosis("N40.*", start_date=date(2022, 1, 1))
+    """
+    return select(ShardedExamDiagnosis.hasta_id).where(
+        *diagnosis_conditions(icd_code, text, start_date, end_date, match_any)
+    ).distinct()
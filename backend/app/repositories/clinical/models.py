@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, func, Boolean, Float, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.base import Base
 
 class ShardedMuayene(Base):
     __tablename__ = "sharded_clinical_muayeneler"
-    __table_args__ = {"schema": "clinical"}
+    __table_args__ = (
+        # Dönem içi hizmet dağılımı (GROUP BY service_category) index üzerinden okunur
+        Index("ix_muayene_tarih_service_category", "tarih", "service_category"),
+        # Gelişmiş aramada tanı kutusu (ILIKE '%...%', pg_trgm)
+        Index("ix_muayene_tedavi_trgm", "tedavi", postgresql_using="gin", postgresql_ops={"tedavi": "gin_trgm_ops"}),
+        Index("ix_muayene_sonuc_trgm", "sonuc", postgresql_using="gin", postgresql_ops={"sonuc": "gin_trgm_ops"}),
+        {"schema": "clinical"},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     hasta_id = Column(UUID(as_uuid=True), index=True)
@@ -44,6 +51,7 @@ class ShardedMuayene(Base):
     tani4_kodu = Column(String(50), nullable=True)
     tani5 = Column(String(255), nullable=True)
     tani5_kodu = Column(String(50), nullable=True)
+    service_category = Column(String(50), nullable=True)  # app.services.report_classification, yazma anında
     oneriler = Column(Text, nullable=True)
     sonuc = Column(Text, nullable=True)
     
@@ -81,6 +89,33 @@ class ShardedMuayene(Base):
     created_by = Column(Integer, nullable=True)
     updated_by = Column(Integer, nullable=True)
 
+class ShardedExamDiagnosis(Base):
+    """
+    ShardedMuayene.tani1..tani5 / tani1_kodu..tani5_kodu alanlarının satır bazlı hali (tanı başına bir satır).
+    ClinicalRepository tarafından muayene ile aynı transaction'da tutulur; muayene silinince satırlar da silinir.
+    Sorgu yardımcıları: app.repositories.clinical.diagnoses
+    """
+    __tablename__ = "sharded_clinical_exam_diagnoses"
+    __table_args__ = (
+        # Kod prefix araması (LIKE 'N40%') + dönem filtresi
+        Index("ix_exam_diagnoses_icd_code_tarih", "icd_code", "tarih", postgresql_ops={"icd_code": "text_pattern_ops"}),
+        # Tanı metninde ILIKE '%...%' (pg_trgm)
+        Index("ix_exam_diagnoses_text_trgm", "text", postgresql_using="gin", postgresql_ops={"text": "gin_trgm_ops"}),
+        Index("ix_exam_diagnoses_hasta_tarih", "hasta_id", "tarih"),
+        {"schema": "clinical"},
+    )
+
+    id = Column(Integer, primary_key=True)
+    exam_id = Column(
+        Integer, ForeignKey("clinical.sharded_clinical_muayeneler.id", ondelete="CASCADE"),
+        nullable=False, index=True
+    )
+    hasta_id = Column(UUID(as_uuid=True), nullable=False)
+    tarih = Column(DateTime, nullable=False)
+    position = Column(SmallInteger, nullable=False)  # 1..5 (tani1 = birincil tanı)
+    icd_code = Column(String(50), nullable=True)  # Büyük harf, boşluksuz
+    text = Column(String(255), nullable=True)
+
 class ShardedOperasyon(Base):
     __tablename__ = "sharded_clinical_operasyonlar"
     __table_args__ = {"schema": "clinical"}
@@ -152,6 +187,46 @@ class ShardedTetkikSonuc(Base):
     created_by = Column(Integer, nullable=True)
     updated_by = Column(Integer, nullable=True)
 
+class ShardedLabObservation(Base):
+    """
+    ShardedTetkikSonuc'tan türetilen sayısal gözlem (trend grafikleri için).
+    Tetkik yazılırken ClinicalRepository tarafından, eski kayıtlar için
+    maintenance.backfill_lab_observations ile doldurulur; tetkik silinince satır da silinir.
+    """
+    __tablename__ = "sharded_clinical_lab_observations"
+    __table_args__ = (
+        # Hasta + test serisi tek index aralığında, tarih sıralı okunur
+        Index("ix_lab_observations_hasta_code_tarih", "hasta_id", "test_code", "tarih"),
+        {"schema": "clinical"},
+    )
+
+    id = Column(Integer, primary_key=True)
+    tetkik_id = Column(
+        Integer, ForeignKey("clinical.sharded_clinical_tetkikler.id", ondelete="CASCADE"),
+        unique=True, nullable=False
+    )
+    hasta_id = Column(UUID(as_uuid=True), nullable=False)
+    test_code = Column(String(50), nullable=False)
+    tarih = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    unit = Column(String(50), nullable=True)
+    flag = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ShardedPatientActivity(Base):
+    """
+    Hasta başına ilk muayene / son aktivite (muayene + not) özeti; dashboard grafikleri için.
+    Satırlar veritabanı trigger'ları ile tutulur (uygulama, sync_shards ve toplu aktarım yazımları dahil),
+    bkz. alembic d4f6a8c0e2b5.
+    """
+    __tablename__ = "sharded_clinical_patient_activity"
+    __table_args__ = {"schema": "clinical"}
+
+    hasta_id = Column(UUID(as_uuid=True), primary_key=True)
+    first_visit = Column(DateTime, nullable=True, index=True)  # İlk muayene (yalnız notu olan hastada NULL)
+    last_activity = Column(DateTime, nullable=True, index=True)  # Son muayene veya not
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ShardedFotografArsivi(Base):
     __tablename__ = "sharded_clinical_fotograflar"
     __table_args__ = {"schema": "clinical"}
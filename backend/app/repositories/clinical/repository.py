@@ -1,16 +1,39 @@
 from typing import List, Optional, Any
 from uuid import UUID
 from datetime import datetime, date, time, timezone
-from sqlalchemy import select, and_, update, or_
+from sqlalchemy import select, and_, update, or_, insert, delete, text, func
+from sqlalchemy.orm import load_only
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.user_context import UserContext
 from app.core.audit import audited
 from app.repositories.clinical.models import (
     ShardedMuayene, ShardedOperasyon, ShardedClinicalNote, 
     ShardedTetkikSonuc, ShardedFotografArsivi, ShardedIstirahatRaporu,
     ShardedDurumBildirirRaporu, ShardedTibbiMudahaleRaporu, ShardedTrusBiyopsi,
-    ShardedTelefonGorusmesi
+    ShardedTelefonGorusmesi, ShardedLabObservation, ShardedExamDiagnosis
 )
+from app.repositories.clinical.diagnoses import diagnosis_rows, patients_with_diagnosis
+from app.services.lab_normalization import observation_from_tetkik
+from app.services.report_classification import classify_exam
+
+# Liste görünümlerinde yüklenen kolon grupları (summary mod).
+# oyku, fizik_muayene, recete gibi büyük Text alanları detay ekranında ayrıca (get_examination) okunur.
+MUAYENE_LIST_COLUMNS = (
+    ShardedMuayene.id, ShardedMuayene.hasta_id, ShardedMuayene.tarih, ShardedMuayene.sikayet,
+    ShardedMuayene.tani1, ShardedMuayene.tani1_kodu, ShardedMuayene.tani2, ShardedMuayene.tani2_kodu,
+    ShardedMuayene.doktor,
+)
+OPERASYON_LIST_COLUMNS = (
+    ShardedOperasyon.id, ShardedOperasyon.hasta_id, ShardedOperasyon.tarih, ShardedOperasyon.ameliyat,
+    ShardedOperasyon.pre_op_tani, ShardedOperasyon.post_op_tani, ShardedOperasyon.anestezi_tur,
+)
+
+
+def _list_mode(stmt, columns, summary: bool):
+    # raiseload: liste modunda yüklenmemiş bir kolona erişilirse sessiz lazy-load (async'te hata) yerine açık hata
+    return stmt.options(load_only(*columns, raiseload=True)) if summary else stmt
+
 
 class ClinicalRepository:
     def __init__(self, session: AsyncSession, context: Optional[UserContext] = None):
@@ -24,10 +47,15 @@ class ClinicalRepository:
         return result.scalar_one_or_none()
 
     @audited(action="CLINICAL_VIEW", resource_type="patient", id_arg_name="patient_id")
-    async def get_examinations_by_patient(self, patient_id: UUID) -> List[ShardedMuayene]:
+    async def get_examinations_by_patient(
+        self, patient_id: UUID, summary: bool = False, limit: Optional[int] = None
+    ) -> List[ShardedMuayene]:
         stmt = select(ShardedMuayene).where(
             and_(ShardedMuayene.hasta_id == patient_id, ShardedMuayene.is_deleted == False)
         ).order_by(ShardedMuayene.tarih.desc())
+        stmt = _list_mode(stmt, MUAYENE_LIST_COLUMNS, summary)
+        if limit:
+            stmt = stmt.limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
@@ -43,10 +71,12 @@ class ClinicalRepository:
             valid_data["tarih"] = datetime.combine(valid_data["tarih"], datetime.min.time())
             
         db_exam = ShardedMuayene(**valid_data)
+        db_exam.service_category = classify_exam(db_exam)
         if self.context:
             db_exam.created_by = self.context.user_id
         self.session.add(db_exam)
         await self.session.flush()
+        await self._sync_exam_diagnoses(db_exam)
         await self.session.commit()
         await self.session.refresh(db_exam)
         return db_exam
@@ -59,15 +89,55 @@ class ClinicalRepository:
         for field, value in exam_in.items():
             if hasattr(db_exam, field):
                 setattr(db_exam, field, value)
+        db_exam.service_category = classify_exam(db_exam)
         if self.context:
             db_exam.updated_by = self.context.user_id
         await self.session.flush()
+        await self._sync_exam_diagnoses(db_exam, replace=True)
         await self.session.commit()
         await self.session.refresh(db_exam)
         return db_exam
 
-    async def get_all_muayeneler(self, start_date: Optional[str] = None, end_date: Optional[str] = None, search: Optional[str] = None) -> List[ShardedMuayene]:
-        query = select(ShardedMuayene).where(ShardedMuayene.is_deleted == False)
+    # --- Delta (?since) okuması ---
+    async def get_patient_changes(
+        self, model: Any, patient_id: UUID, since: datetime, *conditions: Any,
+        columns: Optional[tuple] = None, summary: bool = False
+    ) -> tuple:
+        """
+        since'ten sonra eklenen / güncellenen kayıtlar ve bu aralıkta silinen kayıtların id'leri.
+        Liste uç noktalarının filtreleri (kategori vb.) conditions ile aynen verilir.
+        """
+        changed_at = func.coalesce(model.updated_at, model.created_at)
+        stmt = select(model).where(
+            model.hasta_id == patient_id, model.is_deleted == False, changed_at >= since, *conditions
+        ).order_by(model.tarih.desc())
+        if columns:
+            stmt = _list_mode(stmt, columns, summary)
+        rows = (await self.session.execute(stmt)).scalars().all()
+
+        deleted = await self.session.execute(
+            select(model.id).where(model.hasta_id == patient_id, model.is_deleted == True, changed_at >= since, *conditions)
+        )
+        return rows, list(deleted.scalars().all())
+
+    # --- Tanılar (normalize tanı tablosu, muayene ile aynı transaction'da) ---
+    async def _sync_exam_diagnoses(self, exam: ShardedMuayene, replace: bool = False) -> None:
+        if replace:
+            await self.session.execute(delete(ShardedExamDiagnosis).where(ShardedExamDiagnosis.exam_id == exam.id))
+        rows = diagnosis_rows(exam)
+        if rows:
+            await self.session.execute(insert(ShardedExamDiagnosis), rows)
+
+    async def get_patient_ids_with_diagnosis(
+        self, icd_code: Optional[str] = None, text: Optional[str] = None,
+        start_date: Optional[date] = None, end_date: Optional[date] = None
+    ) -> List[UUID]:
+        """Örn. ("N40.*", start_date=...) -> dönemde BPH tanısı almış hastalar (index taraması)."""
+        result = await self.session.execute(patients_with_diagnosis(icd_code, text, start_date, end_date))
+        return list(result.scalars().all())
+
+    async def get_all_muayeneler(self, start_date: Optional[str] = None, end_date: Optional[str] = None, search: Optional[str] = None, summary: bool = False) -> List[ShardedMuayene]:
+        query = _list_mode(select(ShardedMuayene).where(ShardedMuayene.is_deleted == False), MUAYENE_LIST_COLUMNS, summary)
         if start_date:
             query = query.where(ShardedMuayene.tarih >= start_date)
         if end_date:
@@ -80,7 +150,7 @@ class ClinicalRepository:
                     ShardedMuayene.tani1.ilike(f"%{search}%")
                 )
             )
-        result = await self.session.execute(query)
+        result = await self.session.execute(query.order_by(ShardedMuayene.tarih.desc()))
         return result.scalars().all()
 
     # --- Operations ---
@@ -89,10 +159,15 @@ class ClinicalRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def get_operations_by_patient(self, patient_id: UUID) -> List[ShardedOperasyon]:
+    async def get_operations_by_patient(
+        self, patient_id: UUID, summary: bool = False, limit: Optional[int] = None
+    ) -> List[ShardedOperasyon]:
         stmt = select(ShardedOperasyon).where(
             and_(ShardedOperasyon.hasta_id == patient_id, ShardedOperasyon.is_deleted == False)
         ).order_by(ShardedOperasyon.tarih.desc())
+        stmt = _list_mode(stmt, OPERASYON_LIST_COLUMNS, summary)
+        if limit:
+            stmt = stmt.limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
@@ -121,22 +196,27 @@ class ClinicalRepository:
         await self.session.refresh(db_op)
         return db_op
 
-    async def get_all_operasyonlar(self, start_date: Optional[str] = None, end_date: Optional[str] = None, search: Optional[str] = None) -> List[ShardedOperasyon]:
-        query = select(ShardedOperasyon).where(ShardedOperasyon.is_deleted == False)
+    async def get_all_operasyonlar(self, start_date: Optional[str] = None, end_date: Optional[str] = None, search: Optional[str] = None, summary: bool = False) -> List[ShardedOperasyon]:
+        query = _list_mode(select(ShardedOperasyon).where(ShardedOperasyon.is_deleted == False), OPERASYON_LIST_COLUMNS, summary)
         if start_date:
             query = query.where(ShardedOperasyon.tarih >= start_date)
         if end_date:
             query = query.where(ShardedOperasyon.tarih <= end_date)
         if search:
             query = query.where(ShardedOperasyon.ameliyat.ilike(f"%{search}%"))
-        result = await self.session.execute(query)
+        result = await self.session.execute(query.order_by(ShardedOperasyon.tarih.desc().nulls_last()))
         return result.scalars().all()
 
     # --- Clinical Notes ---
-    async def get_notes_by_patient(self, patient_id: UUID) -> List[ShardedClinicalNote]:
+    async def get_notes_by_patient(self, patient_id: UUID, limit: Optional[int] = None) -> List[ShardedClinicalNote]:
         stmt = select(ShardedClinicalNote).where(
             and_(ShardedClinicalNote.hasta_id == patient_id, ShardedClinicalNote.is_deleted == False)
-        ).order_by(ShardedClinicalNote.tarih.desc())
+        )
+        if limit:
+            # Tarihsiz notlar Python sıralamasında (combine_takip) en sona düşer; kesim de aynı sırayla
+            stmt = stmt.order_by(ShardedClinicalNote.tarih.desc().nulls_last(), ShardedClinicalNote.created_at.desc()).limit(limit)
+        else:
+            stmt = stmt.order_by(ShardedClinicalNote.tarih.desc())
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
@@ -163,7 +243,11 @@ class ClinicalRepository:
     async def get_takip_by_patient(self, patient_id: UUID) -> List[dict]:
         notes = await self.get_notes_by_patient(patient_id)
         exams = await self.get_examinations_by_patient(patient_id)
-        
+        return self.combine_takip(notes, exams)
+
+    @staticmethod
+    def combine_takip(notes: list, exams: list) -> List[dict]:
+        """Takip listesi: notlar + muayene özetleri (tam kolonlu muayene gerekir: oyku), tarihe göre."""
         combined = []
         for n in notes:
             combined.append({
@@ -236,11 +320,15 @@ class ClinicalRepository:
         return res.rowcount > 0
 
     # --- Tetkikler (Imagings/Labs) ---
-    async def get_tetkikler_by_patient(self, patient_id: UUID, kategori: Optional[str] = None) -> List[ShardedTetkikSonuc]:
+    async def get_tetkikler_by_patient(
+        self, patient_id: UUID, kategori: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[ShardedTetkikSonuc]:
         conditions = [ShardedTetkikSonuc.hasta_id == patient_id, ShardedTetkikSonuc.is_deleted == False]
         if kategori:
             conditions.append(ShardedTetkikSonuc.kategori == kategori)
         stmt = select(ShardedTetkikSonuc).where(and_(*conditions)).order_by(ShardedTetkikSonuc.tarih.desc())
+        if limit:
+            stmt = stmt.limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
@@ -258,6 +346,7 @@ class ClinicalRepository:
         if self.context: db_obj.created_by = self.context.user_id
         self.session.add(db_obj)
         await self.session.flush()
+        await self._sync_lab_observations([db_obj])
         await self.session.commit()
         await self.session.refresh(db_obj)
         return db_obj
@@ -269,6 +358,7 @@ class ClinicalRepository:
         for k, v in data.items():
             if hasattr(db_obj, k): setattr(db_obj, k, v)
         await self.session.flush()
+        await self._sync_lab_observations([db_obj], replace=True)
         await self.session.commit()
         await self.session.refresh(db_obj)
         return db_obj
@@ -276,12 +366,104 @@ class ClinicalRepository:
     async def delete_tetkik_sonuc(self, id: int) -> bool:
         stmt = update(ShardedTetkikSonuc).where(ShardedTetkikSonuc.id == id).values(is_deleted=True)
         res = await self.session.execute(stmt)
+        await self._delete_lab_observations([id])
         await self.session.commit()
         return res.rowcount > 0
 
+    # --- Tetkikler: toplu yazma (panel / PDF / cihaz aktarımı) ---
+    _TETKIK_COLUMNS = (
+        "hasta_id", "tarih", "kategori", "tetkik_adi", "sonuc", "birim",
+        "referans_araligi", "sembol", "dosya_yolu", "dosya_adi",
+    )
+
+    def _tetkik_row(self, item: Any) -> dict:
+        data = item.model_dump() if hasattr(item, 'model_dump') else dict(item)
+        row = {col: data.get(col) for col in self._TETKIK_COLUMNS}
+        # Kolon timestamp; şemadan gelen date gece yarısına çevrilir (asyncpg date kabul etmez)
+        if isinstance(row["tarih"], date) and not isinstance(row["tarih"], datetime):
+            row["tarih"] = datetime.combine(row["tarih"], time.min)
+        row["is_deleted"] = False
+        row["created_by"] = self.context.user_id if self.context else None
+        return row
+
+    async def bulk_create_tetkik_sonuclari(self, items: List[Any], commit: bool = True) -> List[ShardedTetkikSonuc]:
+        """
+        Bir panelin / toplu aktarımın tüm satırlarını tek transaction'da yazar (hepsi ya da hiçbiri).
+
+        - Küçük/orta partiler: çok satırlı INSERT ... RETURNING (satır başına flush/commit/refresh yok).
+        - LAB_BULK_COPY_THRESHOLD ve üzeri: id'ler sequence'ten tek sorguda ayrılır, satırlar COPY ile
+          yazılır; dönen nesneler bu id'lerle kurulur (ek SELECT yok).
+        """
+        rows = [self._tetkik_row(item) for item in items]
+        if not rows:
+            return []
+
+        if len(rows) >= settings.LAB_BULK_COPY_THRESHOLD:
+            created = await self._copy_tetkik_rows(rows)
+        else:
+            result = await self.session.scalars(insert(ShardedTetkikSonuc).returning(ShardedTetkikSonuc, sort_by_parameter_order=True), rows)
+            created = list(result.all())
+
+        await self._sync_lab_observations(created)
+        if commit:
+            await self.session.commit()
+        return created
+
+    async def _copy_tetkik_rows(self, rows: List[dict]) -> List[ShardedTetkikSonuc]:
+        table = ShardedTetkikSonuc.__table__
+        ids = (await self.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+            {"table": f"{table.schema}.{table.name}", "n": len(rows)},
+        )).scalars().all()
+
+        columns = ("id",) + tuple(rows[0].keys())
+        conn = await self.session.connection()
+        raw = await conn.get_raw_connection()
+        # Aynı bağlantı = aynı transaction: COPY de commit / rollback'e dahil
+        await raw.driver_connection.copy_records_to_table(
+            table.name,
+            schema_name=table.schema,
+            columns=list(columns),
+            records=[(row_id, *row.values()) for row_id, row in zip(ids, rows)],
+        )
+        return [ShardedTetkikSonuc(id=row_id, **row) for row_id, row in zip(ids, rows)]
+
+    async def bulk_delete_tetkik_sonuclari(self, ids: List[int], commit: bool = True) -> int:
+        """Set tabanlı soft delete; zaten silinmiş kayıtlar sayılmaz."""
+        if not ids:
+            return 0
+        stmt = (
+            update(ShardedTetkikSonuc)
+            .where(and_(ShardedTetkikSonuc.id.in_(ids), ShardedTetkikSonuc.is_deleted == False))
+            .values(is_deleted=True, updated_by=self.context.user_id if self.context else None)
+            .execution_options(synchronize_session=False)
+        )
+        res = await self.session.execute(stmt)
+        await self._delete_lab_observations(ids)
+        if commit:
+            await self.session.commit()
+        return res.rowcount
+
+    # --- Lab gözlemleri (sayısal trend tablosu, tetkik ile aynı transaction'da) ---
+    async def _sync_lab_observations(self, tetkikler: List[Any], replace: bool = False) -> None:
+        if replace:
+            await self._delete_lab_observations([t.id for t in tetkikler])
+        rows = [obs for obs in map(observation_from_tetkik, tetkikler) if obs is not None]
+        if rows:
+            await self.session.execute(insert(ShardedLabObservation), rows)
+
+    async def _delete_lab_observations(self, tetkik_ids: List[int]) -> None:
+        if tetkik_ids:
+            await self.session.execute(
+                delete(ShardedLabObservation).where(ShardedLabObservation.tetkik_id.in_(tetkik_ids))
+                .execution_options(synchronize_session=False)
+            )
+
     # --- Photos ---
-    async def get_photos_by_patient(self, patient_id: UUID) -> List[ShardedFotografArsivi]:
+    async def get_photos_by_patient(self, patient_id: UUID, limit: Optional[int] = None) -> List[ShardedFotografArsivi]:
         stmt = select(ShardedFotografArsivi).where(and_(ShardedFotografArsivi.hasta_id == patient_id, ShardedFotografArsivi.is_deleted == False))
+        if limit:
+            stmt = stmt.order_by(ShardedFotografArsivi.tarih.desc().nulls_last(), ShardedFotografArsivi.id.desc()).limit(limit)
         res = await self.session.execute(stmt)
         return res.scalars().all()
 
@@ -509,10 +691,23 @@ class ClinicalRepository:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def get_examinations_for_patients(self, patient_ids: List[UUID]) -> List[ShardedMuayene]:
+        """Birden çok hastanın tüm muayeneleri tek sorguda (hasta, tarih desc sıralı)."""
+        if not patient_ids:
+            return []
+        stmt = (
+            select(ShardedMuayene)
+            .where(and_(ShardedMuayene.hasta_id.in_(patient_ids), ShardedMuayene.is_deleted == False))
+            .order_by(ShardedMuayene.hasta_id, ShardedMuayene.tarih.desc())
+        )
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
     # --- Deletes ---
     async def delete_examination(self, exam_id: int) -> bool:
         stmt = update(ShardedMuayene).where(ShardedMuayene.id == exam_id).values(is_deleted=True, updated_by=self.context.user_id if self.context else None)
         result = await self.session.execute(stmt)
+        await self.session.execute(delete(ShardedExamDiagnosis).where(ShardedExamDiagnosis.exam_id == exam_id))
         await self.session.flush()
         await self.session.commit()
         return result.rowcount > 0
@@ -547,6 +742,12 @@ class ClinicalRepository:
                 .values(is_deleted=True, updated_by=self.context.user_id if self.context else None)
             )
             await self.session.execute(stmt)
+        await self.session.execute(delete(ShardedExamDiagnosis).where(ShardedExamDiagnosis.hasta_id == patient_id))
+        # Trend sorguları gözlem tablosunu tetkik.is_deleted'e bakmadan okur
+        await self.session.execute(
+            delete(ShardedLabObservation).where(ShardedLabObservation.hasta_id == patient_id)
+            .execution_options(synchronize_session=False)
+        )
         await self.session.flush()
         await self.session.commit()
         return True
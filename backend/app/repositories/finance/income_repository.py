@@ -2,7 +2,7 @@ from typing import List, Optional, Tuple
 from uuid import UUID
 from datetime import date, datetime
 from sqlalchemy import select, func, and_, or_, case, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories.finance.models import (
     ShardedFinansIslem, ShardedFinansIslemSatir, 
@@ -15,6 +15,7 @@ from app.schemas.finance import (
 )
 from app.core.user_context import UserContext
 from app.core.audit import audited
+from app.services.change_feed import stage_change
 
 class IncomeRepository:
     def __init__(self, session: AsyncSession, context: Optional[UserContext] = None):
@@ -49,6 +50,22 @@ class IncomeRepository:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def get_transactions_for_patients(self, patient_ids: List[UUID]) -> List[ShardedFinansIslem]:
+        """Birden çok hastanın işlemleri tek sorguda; satır / ödeme ilişkileri yüklenmez (özet için)."""
+        if not patient_ids:
+            return []
+        stmt = (
+            select(ShardedFinansIslem)
+            .options(load_only(
+                ShardedFinansIslem.id, ShardedFinansIslem.hasta_id, ShardedFinansIslem.islem_tipi,
+                ShardedFinansIslem.net_tutar, ShardedFinansIslem.tarih, raiseload=True
+            ))
+            .where(and_(ShardedFinansIslem.hasta_id.in_(patient_ids), ShardedFinansIslem.is_deleted == False))
+            .order_by(ShardedFinansIslem.hasta_id, ShardedFinansIslem.tarih.desc())
+        )
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
     async def get_transaction(self, tx_id: int) -> Optional[ShardedFinansIslem]:
         stmt = (
             select(ShardedFinansIslem)
@@ -142,6 +159,7 @@ class IncomeRepository:
         )
         await self.session.execute(stmt)
         await self.session.flush()
+        stage_change(self.session, "finance", "deleted", {"hasta_id": patient_id})
         return True
 
     async def get_financial_summary(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> dict:
@@ -6,6 +6,7 @@ from app.repositories.patient.models import ShardedPatientDemographics
 from app.schemas.patient.demographics import PatientDemographicsCreate, PatientDemographicsUpdate
 from app.core.user_context import UserContext
 from app.core.audit import audited
+from app.services.report_classification import classify_reference
 
 class DemographicsRepository:
     def __init__(self, session: AsyncSession, context: Optional[UserContext] = None):
@@ -20,6 +21,16 @@ class DemographicsRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def get_by_ids(self, patient_ids: List[UUID]) -> List[ShardedPatientDemographics]:
+        """Toplu okuma (rapor / export): tek IN sorgusu. Erişim kaydı çağıran tarafta toplu tutulur."""
+        if not patient_ids:
+            return []
+        stmt = select(ShardedPatientDemographics).where(
+            and_(ShardedPatientDemographics.id.in_(patient_ids), ShardedPatientDemographics.is_deleted == False)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
     async def get_multi(self, skip: int = 0, limit: int = 100, search: str = None, ad: str = None, soyad: str = None) -> List[ShardedPatientDemographics]:
         stmt = select(ShardedPatientDemographics).where(
             ShardedPatientDemographics.is_deleted == False
@@ -99,6 +110,7 @@ class DemographicsRepository:
         data['protokol_no'] = protocol_no
         
         db_patient = ShardedPatientDemographics(**data)
+        db_patient.reference_category = classify_reference(db_patient.referans)
         if self.context:
             db_patient.created_by = self.context.user_id
         self.session.add(db_patient)
@@ -128,6 +140,8 @@ class DemographicsRepository:
         for field, value in update_data.items():
             if hasattr(db_patient, field):
                 setattr(db_patient, field, value)
+        if 'referans' in update_data:
+            db_patient.reference_category = classify_reference(db_patient.referans)
             
         if self.context:
             db_patient.updated_by = self.context.user_id
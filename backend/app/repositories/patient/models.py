@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, Date, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, func, Date, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -33,6 +33,7 @@ class ShardedPatientDemographics(Base):
     ev_tel = Column(String(20), nullable=True)
     is_tel = Column(String(20), nullable=True)
     referans = Column(String(100), nullable=True)
+    reference_category = Column(String(20), nullable=True, index=True)  # app.services.report_classification, yazma anında
     postakodu = Column(String(10), nullable=True)
     kurum = Column(String(100), nullable=True)
     sigorta = Column(String(100), nullable=True)
@@ -55,3 +56,17 @@ class ShardedPatientDemographics(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     created_by = Column(Integer, nullable=True)
     updated_by = Column(Integer, nullable=True)
+
+
+class ShardedPatientRevision(Base):
+    """
+    Hasta başına monoton revizyon: hasta, klinik, finans veya doküman tablolarındaki her yazımda
+    (veritabanı trigger'ları, bkz. alembic a7c9e1b3d5f8) artar. ETag / ?since delta modu buna dayanır.
+    Değer mikro saniye cinsinden zaman damgasıdır (en az +1), böylece since -> zaman çevrilebilir.
+    """
+    __tablename__ = "sharded_patient_revisions"
+    __table_args__ = {"schema": "patient"}
+
+    hasta_id = Column(UUID(as_uuid=True), primary_key=True)
+    revision = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,82 @@
+"""
+Gelişmiş hasta araması: filtrelerden hasta id'lerini seçen sorgu.
+
+/patients/advanced-search, CSV dışa aktarımı ve toplu PDF raporu (filtreyle seçim) aynı sorguyu kullanır.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Date, and_, cast, or_, select, union
+
+from app.repositories.clinical.diagnoses import patients_with_diagnosis
+from app.repositories.clinical.models import ShardedMuayene, ShardedOperasyon
+from app.repositories.patient.models import ShardedPatientDemographics
+
+
+def build_advanced_search_query(
+    tani: Optional[str], yas_min: Optional[int], yas_max: Optional[int],
+    muayene_tarihi_baslangic: Optional[str], muayene_tarihi_bitis: Optional[str],
+    son_islem_tarihi_baslangic: Optional[str], son_islem_tarihi_bitis: Optional[str],
+    ilk_kayit_tarihi_baslangic: Optional[str], ilk_kayit_tarihi_bitis: Optional[str],
+    operasyon_tarihi_baslangic: Optional[str], operasyon_tarihi_bitis: Optional[str],
+    operasyon_adi: Optional[str], sikayet: Optional[str], bulgu: Optional[str],
+):
+    base_stmt = select(ShardedPatientDemographics.id).where(ShardedPatientDemographics.is_deleted == False)
+
+    if yas_min is not None or yas_max is not None:
+        today = date.today()
+        if yas_max is not None:
+            try: min_dob = today.replace(year=today.year - yas_max - 1)
+            except ValueError: min_dob = today.replace(year=today.year - yas_max - 1, day=28)
+            base_stmt = base_stmt.where(ShardedPatientDemographics.dogum_tarihi >= min_dob)
+        if yas_min is not None:
+            try: max_dob = today.replace(year=today.year - yas_min)
+            except ValueError: max_dob = today.replace(year=today.year - yas_min, day=28)
+            base_stmt = base_stmt.where(ShardedPatientDemographics.dogum_tarihi <= max_dob)
+
+    if ilk_kayit_tarihi_baslangic: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.created_at, Date) >= ilk_kayit_tarihi_baslangic)
+    if ilk_kayit_tarihi_bitis: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.created_at, Date) <= ilk_kayit_tarihi_bitis)
+
+    if tani:
+        # Tanı kodu (prefix) / metni normalize tanı tablosundan, tedavi / sonuç muayeneden (trigram index'li)
+        t_subq = union(
+            patients_with_diagnosis(icd_code=tani, text=tani, match_any=True),
+            select(ShardedMuayene.hasta_id).where(and_(
+                ShardedMuayene.is_deleted == False,
+                or_(ShardedMuayene.tedavi.ilike(f"%{tani}%"), ShardedMuayene.sonuc.ilike(f"%{tani}%"))
+            )),
+        )
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(t_subq))
+
+    if muayene_tarihi_baslangic or muayene_tarihi_bitis:
+        m_cond = [ShardedMuayene.is_deleted == False]
+        if muayene_tarihi_baslangic: m_cond.append(cast(ShardedMuayene.tarih, Date) >= muayene_tarihi_baslangic)
+        if muayene_tarihi_bitis: m_cond.append(cast(ShardedMuayene.tarih, Date) <= muayene_tarihi_bitis)
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(select(ShardedMuayene.hasta_id).where(and_(*m_cond)).distinct()))
+
+    if son_islem_tarihi_baslangic: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.updated_at, Date) >= son_islem_tarihi_baslangic)
+    if son_islem_tarihi_bitis: base_stmt = base_stmt.where(cast(ShardedPatientDemographics.updated_at, Date) <= son_islem_tarihi_bitis)
+
+    if operasyon_tarihi_baslangic or operasyon_tarihi_bitis:
+        op_cond = [ShardedOperasyon.is_deleted == False]
+        if operasyon_tarihi_baslangic: op_cond.append(cast(ShardedOperasyon.tarih, Date) >= operasyon_tarihi_baslangic)
+        if operasyon_tarihi_bitis: op_cond.append(cast(ShardedOperasyon.tarih, Date) <= operasyon_tarihi_bitis)
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(select(ShardedOperasyon.hasta_id).where(and_(*op_cond)).distinct()))
+
+    if operasyon_adi:
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
+            select(ShardedOperasyon.hasta_id).where(and_(ShardedOperasyon.is_deleted == False, ShardedOperasyon.ameliyat.ilike(f"%{operasyon_adi}%"))).distinct()
+        ))
+
+    if sikayet:
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
+            select(ShardedMuayene.hasta_id).where(and_(ShardedMuayene.is_deleted == False, ShardedMuayene.sikayet.ilike(f"%{sikayet}%"))).distinct()
+        ))
+
+    if bulgu:
+        base_stmt = base_stmt.where(ShardedPatientDemographics.id.in_(
+            select(ShardedMuayene.hasta_id).where(and_(ShardedMuayene.is_deleted == False, or_(
+                ShardedMuayene.bulgu_notu.ilike(f"%{bulgu}%"), ShardedMuayene.fizik_muayene.ilike(f"%{bulgu}%")
+            ))).distinct()
+        ))
+    return base_stmt
@@ -1,43 +1,121 @@
+import logging
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc, extract, distinct, union_all, or_, case, cast, String
+from sqlalchemy import select, func, and_, desc, extract, distinct, union_all, or_, case, cast, String, DateTime, literal_column
 from datetime import date, timedelta, datetime
 from typing import List, Dict, Any, Optional
 
+from app.core.config import settings
 from app.repositories.patient.models import ShardedPatientDemographics
-from app.repositories.clinical.models import ShardedOperasyon, ShardedMuayene, ShardedClinicalNote
+from app.repositories.clinical.models import ShardedOperasyon, ShardedMuayene, ShardedClinicalNote, ShardedPatientActivity, ShardedExamDiagnosis
+from app.repositories.clinical.diagnoses import diagnosis_conditions
 from app.repositories.finance.models import ShardedFinansIslem
 from app.models.appointment import Randevu
+from app.services.analytics_engine import COHORT_MONTHS, analytics_engine
+from app.services.report_classification import (
+    REFERENCE_LABELS, SERVICE_MAPPINGS, OTHER_SERVICE, classify_reference, classify_service
+)
 from app.schemas.report import (
     DashboardKPI, ChartDataPoint, PerformanceKPI, HeatmapData,
     CohortRow, DiagnosisFilterResult, DiagnosisTrendPoint, DiagnosisStats,
     ReferenceCategory, ServiceDistribution
 )
+logger = logging.getLogger(__name__)
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _week_start(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def _next_bucket(d: date, unit: str) -> date:
+    if unit == "week":
+        return d + timedelta(weeks=1)
+    return date(d.year + (1 if d.month == 12 else 0), 1 if d.month == 12 else d.month + 1, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def _replica_cohorts(months_back: int, today: date) -> List[CohortRow]:
+    """get_cohort_analysis'in replika karşılığı: tüm kohortlar tek DuckDB sorgusunda."""
+    last_cohort = _month_start(today)
+    counts = await analytics_engine.cohort_counts(_add_months(last_cohort, -months_back), last_cohort, today)
+    cohorts = []
+    for i in range(months_back, -1, -1):
+        key = _add_months(last_cohort, -i).strftime("%Y-%m")
+        retention = {f"month_{m}": counts.get((key, m), 0) for m in range(COHORT_MONTHS + 1)}
+        cohorts.append(CohortRow(cohort_month=key, total_patients=retention["month_0"], **retention))
+    return cohorts
+
+
+def _last_activity_per_patient():
+    """(hasta_id, max_tarih): hastanın son muayene / not tarihi."""
+    if settings.REPORT_ACTIVITY_SUMMARY:
+        return select(
+            ShardedPatientActivity.hasta_id,
+            ShardedPatientActivity.last_activity.label("max_tarih")
+        ).subquery("latest_per_patient")
+
+    m_stmt = select(ShardedMuayene.hasta_id, ShardedMuayene.tarih)
+    n_stmt = select(ShardedClinicalNote.hasta_id, ShardedClinicalNote.tarih)
+    combined_stmt = union_all(m_stmt, n_stmt).alias("combined")
+    return select(
+        combined_stmt.c.hasta_id,
+        func.max(combined_stmt.c.tarih).label("max_tarih")
+    ).group_by(combined_stmt.c.hasta_id).subquery("latest_per_patient")
+
+
+def _first_visit_per_patient():
+    """(hasta_id, first_date): hastanın ilk muayene tarihi."""
+    if settings.REPORT_ACTIVITY_SUMMARY:
+        return select(
+            ShardedPatientActivity.hasta_id,
+            ShardedPatientActivity.first_visit.label("first_date")
+        ).subquery("first_exams")
+
+    return select(
+        ShardedMuayene.hasta_id,
+        func.min(ShardedMuayene.tarih).label("first_date")
+    ).group_by(ShardedMuayene.hasta_id).subquery("first_exams")
+
+
+async def _bucketed_chart(db: AsyncSession, ts_col, value_expr, first: date, last: date, unit: str, label_fmt: str, *filters) -> List[ChartDataPoint]:
+    """
+    Zaman serisi grafiği tek sorguda: değerler date_trunc ile kovalara gruplanır, generate_series
+    ile üretilen tüm kovalara LEFT JOIN yapılır (boş ay / hafta 0 döner).
+    first / last: ilk ve son kovanın başlangıcı (unit'e hizalı).
+    """
+    lower = datetime.combine(first, datetime.min.time())
+    upper = datetime.combine(_next_bucket(last, unit), datetime.min.time())
+
+    buckets = select(
+        func.generate_series(
+            cast(lower, DateTime),
+            cast(datetime.combine(last, datetime.min.time()), DateTime),
+            literal_column(f"interval '1 {unit}'")
+        ).label("bucket")
+    ).subquery("buckets")
+
+    # Birim literal yazılır: SELECT ve GROUP BY'daki ifade aynı kalmalı (bind parametresi olursa PG eşlemez)
+    bucket = func.date_trunc(literal_column(f"'{unit}'"), cast(ts_col, DateTime))
+    grouped = select(bucket.label("bucket"), value_expr.label("value")) \
+        .where(ts_col >= lower, ts_col < upper, *filters) \
+        .group_by(bucket) \
+        .subquery("grouped")
+
+    query = select(buckets.c.bucket, func.coalesce(grouped.c.value, 0)) \
+        .select_from(buckets.outerjoin(grouped, grouped.c.bucket == buckets.c.bucket)) \
+        .order_by(buckets.c.bucket)
+
+    res = await db.execute(query)
+    return [ChartDataPoint(name=b.strftime(label_fmt), value=float(v or 0)) for b, v in res.all()]
 
-# Reference category mappings
-REFERENCE_CATEGORIES = {
-    "hekim": {
-        "label": "Hekim Referansı",
-        "keywords": ["dr.", "dr ", "doktor", "hekim", "uzman", "prof.", "doç.", "yrd.doç.", "op.dr.", "pratisyen"]
-    },
-    "hasta": {
-        "label": "Hasta Referansı",
-        "keywords": ["hasta", "tanıdık", "arkadaş", "akraba", "aile", "komşu", "tavsiye", "öneri"]
-    },
-    "dijital": {
-        "label": "Dijital/Akademik",
-        "keywords": ["web", "internet", "google", "makale", "yayın", "sosyal medya", "instagram", "facebook", "twitter", "youtube", "linkedin"]
-    }
-}
-
-# Service/Subspecialty mappings based on diagnosis codes and keywords
-SERVICE_MAPPINGS = {
-    "Üroonkoloji": ["C61", "C67", "C64", "C65", "C66", "C68", "D41", "tümör", "kanser", "onko", "malign"],
-    "Androloji": ["N48", "N49", "N50", "erekti", "impotans", "infertil", "varikosel", "peyronie", "libido"],
-    "Taş Hastalığı": ["N20", "N21", "N22", "N23", "taş", "ürolitiyaz", "nefrolitiyaz", "ESWL", "URS", "PCNL"],
-    "Prostat": ["N40", "N41", "N42", "BPH", "prostat", "TURP", "prostatit"],
-    "Enfeksiyon": ["N30", "N34", "N39", "sistit", "üretrit", "piyelonefrit", "enfeksiyon", "idrar yolu"],
-    "Ürodinamik": ["N31", "N32", "N39.3", "N39.4", "inkontinans", "aşırı aktif", "nörojenik", "ürodinami"]
-}
 
 class ReportRepository:
     
@@ -288,6 +366,12 @@ class ReportRepository:
     @staticmethod
     async def get_cohort_analysis(db: AsyncSession, months_back: int = 6) -> List[CohortRow]:
         today = date.today()
+        if analytics_engine.enabled:
+            try:
+                return await _replica_cohorts(months_back, today)
+            except Exception as e:
+                logger.warning(f"Cohort analysis on analytics replica failed, falling back to PostgreSQL: {e}")
+
         cohorts = []
 
         for i in range(months_back, -1, -1):
@@ -382,20 +466,15 @@ class ReportRepository:
         if not end_date:
             end_date = today
 
-        # Build filter conditions
-        conditions = [ShardedMuayene.tarih >= start_date, ShardedMuayene.tarih <= end_date]
-        
-        if icd_code:
-            conditions.append(or_(
-                ShardedMuayene.tani1_kodu.ilike(f"%{icd_code}%"),
-                ShardedMuayene.tani2_kodu.ilike(f"%{icd_code}%")
-            ))
-        
-        if diagnosis_text:
-            conditions.append(or_(
-                ShardedMuayene.tani1.ilike(f"%{diagnosis_text}%"),
-                ShardedMuayene.tani2.ilike(f"%{diagnosis_text}%")
-            ))
+        # Tanı filtresi normalize tanı tablosu üzerinden: kod prefix'i (B-tree) / metin (trigram) index'i
+        period = [ShardedMuayene.tarih >= start_date, ShardedMuayene.tarih <= end_date]
+        if icd_code or diagnosis_text:
+            matching_exams = select(ShardedExamDiagnosis.exam_id).where(
+                *diagnosis_conditions(icd_code, diagnosis_text, start_date, end_date)
+            )
+            conditions = period + [ShardedMuayene.id.in_(matching_exams)]
+        else:
+            conditions = period
 
         # Get matching patients
         query = select(
@@ -405,11 +484,26 @@ class ReportRepository:
             ShardedMuayene.tani1,
             ShardedMuayene.tani1_kodu,
             ShardedMuayene.tarih
-        ).join(ShardedPatientDemographics, ShardedMuayene.hasta_id == ShardedPatientDemographics.id).where(and_(*conditions)).order_by(desc(ShardedMuayene.tarih))
+        ).join(ShardedPatientDemographics, ShardedMuayene.hasta_id == ShardedPatientDemographics.id).where(and_(*conditions))
 
-        res = await db.execute(query)
-        rows = res.all()
+        # Toplamlar replikadan (varsa); hasta listesi ad / soyad içerdiği için her zaman PostgreSQL'den
+        first_year = today.year - 2
+        aggregates = None
+        if analytics_engine.enabled:
+            try:
+                aggregates = await analytics_engine.diagnosis_aggregates(
+                    icd_code, diagnosis_text, start_date, end_date, first_year, today.year
+                )
+            except Exception as e:
+                logger.warning(f"Diagnosis stats on analytics replica failed, falling back to PostgreSQL: {e}")
+
+        if aggregates is not None:
+            total_count, total_portfolio, per_year = aggregates
+        else:
+            res_count = await db.execute(select(func.count()).select_from(query.subquery()))
+            total_count = res_count.scalar() or 0
 
+        res = await db.execute(query.order_by(desc(ShardedMuayene.tarih)).limit(100))
         patients = [
             DiagnosisFilterResult(
                 id=str(row[0]),
@@ -418,46 +512,42 @@ class ReportRepository:
                 tani=row[3] or "",
                 tani_kodu=row[4] or "",
                 tarih=row[5].isoformat() if row[5] else ""
-            ) for row in rows
+            ) for row in res.all()
         ]
 
-        # Calculate total count and percentage of portfolio
-        total_count = len(patients)
-        
-        res_total_patients = await db.execute(select(func.count(distinct(ShardedPatientDemographics.id))))
-        total_portfolio = res_total_patients.scalar() or 1
-        percentage = (total_count / total_portfolio) * 100
-
-        # Calculate trend (yearly comparison)
-        trend = []
-        for year_offset in range(2, -1, -1):
-            trend_year = today.year - year_offset
-            trend_start = date(trend_year, 1, 1)
-            trend_end = date(trend_year, 12, 31)
-            
-            trend_conditions = [ShardedMuayene.tarih >= trend_start, ShardedMuayene.tarih <= trend_end]
-            if icd_code:
-                trend_conditions.append(or_(
-                    ShardedMuayene.tani1_kodu.ilike(f"%{icd_code}%"),
-                    ShardedMuayene.tani2_kodu.ilike(f"%{icd_code}%")
-                ))
-            if diagnosis_text:
-                trend_conditions.append(or_(
-                    ShardedMuayene.tani1.ilike(f"%{diagnosis_text}%"),
-                    ShardedMuayene.tani2.ilike(f"%{diagnosis_text}%")
-                ))
-            
+        if aggregates is None:
+            # Calculate percentage of portfolio
+            res_total_patients = await db.execute(select(func.count(distinct(ShardedPatientDemographics.id))))
+            total_portfolio = res_total_patients.scalar()
+
+            # Calculate trend (yearly comparison): son 3 yıl tek gruplu sorguda
+            trend_window = [date(first_year, 1, 1), datetime(today.year + 1, 1, 1)]
+            if icd_code or diagnosis_text:
+                source, ts, hasta = ShardedExamDiagnosis, ShardedExamDiagnosis.tarih, ShardedExamDiagnosis.hasta_id
+                trend_conditions = diagnosis_conditions(icd_code, diagnosis_text)
+            else:
+                source, ts, hasta = ShardedMuayene, ShardedMuayene.tarih, ShardedMuayene.hasta_id
+                trend_conditions = []
+            year = extract("year", ts)
             res_trend = await db.execute(
-                select(func.count(distinct(ShardedMuayene.hasta_id))).where(and_(*trend_conditions))
+                select(year, func.count(distinct(hasta)))
+                .select_from(source)
+                .where(ts >= trend_window[0], ts < trend_window[1], *trend_conditions)
+                .group_by(year)
             )
-            trend_count = res_trend.scalar() or 0
-            trend.append(DiagnosisTrendPoint(period=str(trend_year), count=trend_count))
+            per_year = {int(y): c for y, c in res_trend.all()}
+
+        percentage = (total_count / (total_portfolio or 1)) * 100
+        trend = [
+            DiagnosisTrendPoint(period=str(y), count=per_year.get(y, 0))
+            for y in range(first_year, today.year + 1)
+        ]
 
         return DiagnosisStats(
             total_count=total_count,
             percentage_of_portfolio=round(percentage, 2),
             trend=trend,
-            patients=patients[:100]  # Limit to first 100 patients
+            patients=patients  # İlk 100 muayene (LIMIT sorguda)
         )
 
     @staticmethod
@@ -468,43 +558,34 @@ class ReportRepository:
         if not end_date:
             end_date = today
 
-        # Get all references with counts
-        query = select(ShardedPatientDemographics.referans, func.count(distinct(ShardedPatientDemographics.id))) \
+        # Referanslar kategorisiyle birlikte gruplanır (kategori yazma anında hesaplanmış)
+        query = select(
+            ShardedPatientDemographics.reference_category,
+            ShardedPatientDemographics.referans,
+            func.count(distinct(ShardedPatientDemographics.id))
+        ) \
             .join(ShardedMuayene, ShardedPatientDemographics.id == ShardedMuayene.hasta_id) \
             .where(and_(
                 ShardedPatientDemographics.referans.isnot(None),
                 ShardedPatientDemographics.referans != "",
                 ShardedMuayene.tarih >= start_date,
                 ShardedMuayene.tarih <= end_date
-            )).group_by(ShardedPatientDemographics.referans)
+            )).group_by(ShardedPatientDemographics.reference_category, ShardedPatientDemographics.referans)
         
         res = await db.execute(query)
         rows = res.all()
 
-        # Categorize references
         categories = {
-            "hekim": {"label": "Hekim Referansı", "count": 0, "sources": []},
-            "hasta": {"label": "Hasta Referansı", "count": 0, "sources": []},
-            "dijital": {"label": "Dijital/Akademik", "count": 0, "sources": []},
-            "diger": {"label": "Diğer", "count": 0, "sources": []}
+            key: {"label": label, "count": 0, "sources": []} for key, label in REFERENCE_LABELS.items()
         }
 
-        total_count = sum(row[1] for row in rows)
+        total_count = sum(row[2] for row in rows)
 
-        for ref_name, count in rows:
-            ref_lower = ref_name.lower() if ref_name else ""
-            categorized = False
-            
-            for cat_key, cat_data in REFERENCE_CATEGORIES.items():
-                if any(kw in ref_lower for kw in cat_data["keywords"]):
-                    categories[cat_key]["count"] += count
-                    categories[cat_key]["sources"].append(ChartDataPoint(name=ref_name, value=count))
-                    categorized = True
-                    break
-            
-            if not categorized:
-                categories["diger"]["count"] += count
-                categories["diger"]["sources"].append(ChartDataPoint(name=ref_name, value=count))
+        for cat_key, ref_name, count in rows:
+            # Henüz sınıflandırılmamış (backfill öncesi) kayıt: anında hesaplanır
+            cat_key = cat_key or classify_reference(ref_name) or "diger"
+            categories[cat_key]["count"] += count
+            categories[cat_key]["sources"].append(ChartDataPoint(name=ref_name, value=count))
 
         result = []
         for cat_key, cat_data in categories.items():
@@ -527,40 +608,53 @@ class ReportRepository:
         if not end_date:
             end_date = today
 
-        # Get all diagnoses in period
-        query = select(
-            ShardedMuayene.tani1,
-            ShardedMuayene.tani1_kodu,
-            ShardedMuayene.tani2,
-            ShardedMuayene.tani2_kodu,
-            func.count(ShardedMuayene.id).label('count')
-        ).where(and_(
+        classified_rows = unclassified_rows = None
+        if analytics_engine.enabled:
+            try:
+                classified_rows, unclassified_rows = await analytics_engine.service_counts(start_date, end_date)
+            except Exception as e:
+                logger.warning(f"Service distribution on analytics replica failed, falling back to PostgreSQL: {e}")
+                classified_rows = unclassified_rows = None
+
+        period = and_(
             ShardedMuayene.tarih >= start_date,
             ShardedMuayene.tarih <= end_date
-        )).group_by(ShardedMuayene.tani1, ShardedMuayene.tani1_kodu, ShardedMuayene.tani2, ShardedMuayene.tani2_kodu)
-
-        res = await db.execute(query)
-        rows = res.all()
+        )
+        if classified_rows is None:
+            res = await db.execute(
+                select(ShardedMuayene.service_category, func.count(ShardedMuayene.id))
+                .where(period)
+                .group_by(ShardedMuayene.service_category)
+            )
+            classified_rows = res.all()
 
-        # Categorize by service
         service_counts = {service: 0 for service in SERVICE_MAPPINGS.keys()}
-        service_counts["Diğer"] = 0
+        service_counts[OTHER_SERVICE] = 0
         total_count = 0
+        unclassified = False
 
-        for row in rows:
-            tani1, kod1, tani2, kod2, count = row
-            combined_text = f"{tani1 or ''} {kod1 or ''} {tani2 or ''} {kod2 or ''}".lower()
+        for service, count in classified_rows:
+            if service is None:
+                unclassified = True
+                continue
+            service_counts[service] = service_counts.get(service, 0) + count
             total_count += count
-            categorized = False
-            
-            for service, keywords in SERVICE_MAPPINGS.items():
-                if any(kw.lower() in combined_text for kw in keywords):
-                    service_counts[service] += count
-                    categorized = True
-                    break
-            
-            if not categorized:
-                service_counts["Diğer"] += count
+
+        if unclassified:
+            # Backfill öncesi kayıtlar: tanı kombinasyonuna göre gruplanıp anında sınıflandırılır
+            if unclassified_rows is None:
+                res = await db.execute(
+                    select(
+                        ShardedMuayene.tani1, ShardedMuayene.tani1_kodu,
+                        ShardedMuayene.tani2, ShardedMuayene.tani2_kodu,
+                        func.count(ShardedMuayene.id)
+                    ).where(period, ShardedMuayene.service_category.is_(None))
+                    .group_by(ShardedMuayene.tani1, ShardedMuayene.tani1_kodu, ShardedMuayene.tani2, ShardedMuayene.tani2_kodu)
+                )
+                unclassified_rows = res.all()
+            for tani1, kod1, tani2, kod2, count in unclassified_rows:
+                service_counts[classify_service(tani1, kod1, tani2, kod2)] += count
+                total_count += count
 
         result = []
         for service, count in service_counts.items():
@@ -575,48 +669,17 @@ class ReportRepository:
 
     @staticmethod
     async def get_patient_trends(db: AsyncSession, start_date_filter: Optional[date] = None, end_date_filter: Optional[date] = None) -> List[ChartDataPoint]:
-        # Monthly activity trend
+        # Monthly activity trend: son aktivitesi o aya düşen hasta sayısı
         if not end_date_filter:
             end_date_filter = date.today()
         if not start_date_filter:
             start_date_filter = end_date_filter - timedelta(days=180) # Default 6 months
-            start_date_filter = date(start_date_filter.year, start_date_filter.month, 1)
 
-        data = []
-        
-        # Combine activity sources
-        m_stmt = select(ShardedMuayene.hasta_id, ShardedMuayene.tarih)
-        n_stmt = select(ShardedClinicalNote.hasta_id, ShardedClinicalNote.tarih)
-        combined_stmt = union_all(m_stmt, n_stmt).alias("combined")
-        
-        # Get latest activity per patient
-        latest_per_patient = select(
-            combined_stmt.c.hasta_id,
-            func.max(combined_stmt.c.tarih).label("max_tarih")
-        ).group_by(combined_stmt.c.hasta_id).subquery()
-
-        # Iterate months
-        current = date(start_date_filter.year, start_date_filter.month, 1)
-        while current <= end_date_filter:
-            next_month_year = current.year + (1 if current.month == 12 else 0)
-            next_month_month = 1 if current.month == 12 else current.month + 1
-            next_month = date(next_month_year, next_month_month, 1)
-            
-            res = await db.execute(
-                select(func.count(latest_per_patient.c.hasta_id))
-                .where(and_(
-                    latest_per_patient.c.max_tarih >= current, 
-                    latest_per_patient.c.max_tarih < next_month
-                ))
-            )
-            cnt = res.scalar() or 0
-            
-            month_name = current.strftime("%b %y")
-            data.append(ChartDataPoint(name=month_name, value=float(cnt)))
-            
-            current = next_month
-            
-        return data
+        latest_per_patient = _last_activity_per_patient()
+        return await _bucketed_chart(
+            db, latest_per_patient.c.max_tarih, func.count(latest_per_patient.c.hasta_id),
+            _month_start(start_date_filter), _month_start(end_date_filter), "month", "%b %y"
+        )
 
     @staticmethod
     async def get_revenue_chart(db: AsyncSession, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[ChartDataPoint]:
@@ -624,31 +687,12 @@ class ReportRepository:
             end_date = date.today()
         if not start_date:
             start_date = end_date - timedelta(days=180) # Default 6 months
-            start_date = date(start_date.year, start_date.month, 1)
-            
-        data = []
-        
-        # Iterate months
-        current = date(start_date.year, start_date.month, 1)
-        while current <= end_date:
-            next_month_year = current.year + (1 if current.month == 12 else 0)
-            next_month_month = 1 if current.month == 12 else current.month + 1
-            next_month = date(next_month_year, next_month_month, 1)
-            
-            res = await db.execute(select(func.sum(ShardedFinansIslem.net_tutar)).where(
-                and_(
-                    ShardedFinansIslem.tarih >= datetime.combine(current, datetime.min.time()), 
-                    ShardedFinansIslem.tarih < datetime.combine(next_month, datetime.min.time()),
-                    ShardedFinansIslem.islem_tipi == 'gelir'
-                )
-            ))
-            amount = res.scalar() or 0.0
-            month_name = current.strftime("%b %y")
-            data.append(ChartDataPoint(name=month_name, value=float(amount)))
-            
-            current = next_month
-            
-        return data
+
+        return await _bucketed_chart(
+            db, ShardedFinansIslem.tarih, func.sum(ShardedFinansIslem.net_tutar),
+            _month_start(start_date), _month_start(end_date), "month", "%b %y",
+            ShardedFinansIslem.islem_tipi == 'gelir'
+        )
 
     @staticmethod
     async def get_operation_chart(db: AsyncSession, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[ChartDataPoint]:
@@ -679,37 +723,13 @@ class ReportRepository:
             end_date_filter = date.today()
         if not start_date_filter:
             start_date_filter = end_date_filter - timedelta(weeks=8)
-            
-        # Align start_date to Monday
-        start_date = start_date_filter - timedelta(days=start_date_filter.weekday())
-        
-        # Get first-ever examination date for each patient
-        first_exams = select(
-            ShardedMuayene.hasta_id,
-            func.min(ShardedMuayene.tarih).label("first_date")
-        ).group_by(ShardedMuayene.hasta_id).subquery()
-        
-        data = []
-        
-        current = start_date
-        while current <= end_date_filter:
-            next_week = current + timedelta(weeks=1)
-            
-            res = await db.execute(
-                select(func.count(first_exams.c.hasta_id))
-                .where(and_(
-                    first_exams.c.first_date >= current,
-                    first_exams.c.first_date < next_week
-                ))
-            )
-            count = res.scalar() or 0
-            
-            label = current.strftime("%d %b '%y")
-            data.append(ChartDataPoint(name=label, value=float(count)))
-            
-            current = next_week
-            
-        return data
+
+        # İlk muayenesi o haftaya düşen hasta sayısı (haftalar Pazartesi başlar, date_trunc('week') ile aynı)
+        first_exams = _first_visit_per_patient()
+        return await _bucketed_chart(
+            db, first_exams.c.first_date, func.count(first_exams.c.hasta_id),
+            _week_start(start_date_filter), _week_start(end_date_filter), "week", "%d %b '%y"
+        )
 
     @staticmethod
     async def get_weekly_drilldown(db: AsyncSession, label: str) -> List[Dict[str, Any]]:
@@ -720,10 +740,7 @@ class ReportRepository:
         except:
             return []
 
-        first_exams = select(
-            ShardedMuayene.hasta_id,
-            func.min(ShardedMuayene.tarih).label("first_date")
-        ).group_by(ShardedMuayene.hasta_id).subquery()
+        first_exams = _first_visit_per_patient()
 
         query = select(ShardedPatientDemographics.id, ShardedPatientDemographics.ad, ShardedPatientDemographics.soyad) \
             .join(first_exams, ShardedPatientDemographics.id == first_exams.c.hasta_id) \
@@ -750,15 +767,7 @@ class ReportRepository:
         except:
             return []
 
-        # Combine activity sources for latest activity
-        m_stmt = select(ShardedMuayene.hasta_id, ShardedMuayene.tarih)
-        n_stmt = select(ShardedClinicalNote.hasta_id, ShardedClinicalNote.tarih)
-        combined_stmt = union_all(m_stmt, n_stmt).alias("combined")
-        
-        latest_per_patient = select(
-            combined_stmt.c.hasta_id,
-            func.max(combined_stmt.c.tarih).label("max_tarih")
-        ).group_by(combined_stmt.c.hasta_id).subquery()
+        latest_per_patient = _last_activity_per_patient()
 
         query = select(ShardedPatientDemographics.id, ShardedPatientDemographics.ad, ShardedPatientDemographics.soyad) \
             .join(latest_per_patient, ShardedPatientDemographics.id == latest_per_patient.c.hasta_id) \
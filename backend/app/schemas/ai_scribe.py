@@ -2,7 +2,8 @@
 AI Scribe Schemas - Pydantic modelleri
 """
 from enum import Enum
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List
 from pydantic import BaseModel, Field
 
 
@@ -103,6 +104,7 @@ class AIScribeStatusResponse(BaseModel):
     local_whisper: bool = Field(False, description="Local Whisper aktif mi?")
     local_ollama: bool = Field(False, description="Local Ollama aktif mi?")
     templates_count: int = Field(0, description="Yüklü şablon sayısı")
+    circuits: Dict[str, str] = Field(default_factory=dict, description="Sağlayıcı devre durumları (closed/open/half_open)")
 
 
 class AIScribeTemplateInfo(BaseModel):
@@ -110,3 +112,17 @@ class AIScribeTemplateInfo(BaseModel):
     id: str
     name: str
     description: str
+
+
+class AIScribeJobResponse(BaseModel):
+    """Asenkron AI Scribe işi durumu"""
+    id: str
+    status: str = Field(..., description="queued | running | done | failed")
+    mode: AIScribeMode
+    patient_id: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[AIScribeResponse] = Field(None, description="status=done olduğunda analiz sonucu")
+    partial_transcript: Optional[str] = Field(None, description="Parçalı transkripsiyonda şimdiye kadar gelen metin")
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
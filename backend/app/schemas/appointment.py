@@ -51,3 +51,48 @@ class RandevuResponse(RandevuBase):
     
     class Config:
         from_attributes = True
+
+# --- Takvim (Calendar) Projection Şemaları ---
+# Takvim ekranı sürekli poll ettiği için sadece çizilen alanlar döner.
+class CalendarPatient(BaseModel):
+    id: UUID
+    ad: str
+    soyad: str
+    cep_tel: Optional[str] = None
+
+class CalendarDoctor(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+
+class CalendarEvent(BaseModel):
+    id: int
+    hasta_id: Optional[UUID] = None
+    title: str
+    type: Optional[str] = None
+    start: datetime
+    end: datetime
+    status: Optional[str] = None
+    notes: Optional[str] = None
+    doctor_id: Optional[int] = None
+    doctor_name: Optional[str] = None
+    hasta: Optional[CalendarPatient] = None
+    doctor: Optional[CalendarDoctor] = None
+
+# --- Çakışma / Müsaitlik Şemaları ---
+class ConflictInfo(BaseModel):
+    id: int
+    title: str
+    type: Optional[str] = None
+    start: datetime
+    end: datetime
+    status: Optional[str] = None
+    doctor_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class AvailableSlot(BaseModel):
+    start: datetime
+    end: datetime
+    doctor_name: Optional[str] = None
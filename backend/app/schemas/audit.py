@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class AuditLogBase(BaseModel):
@@ -21,3 +21,12 @@ class AuditLog(AuditLogBase):
 
     class Config:
         from_attributes = True
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLog]
+    # Bir sonraki sayfa için opak keyset imleci (created_at, id); son sayfada None
+    next_cursor: Optional[str] = None
+
+class AuditLogCount(BaseModel):
+    count: int
+    approximate: bool
@@ -85,6 +85,22 @@ class MuayeneResponse(MuayeneBase):
     class Config:
         from_attributes = True
 
+# Liste görünümü (view=summary): ClinicalRepository.MUAYENE_LIST_COLUMNS ile aynı alanlar
+class MuayeneListItem(BaseModel):
+    id: int
+    hasta_id: UUID
+    tarih: Optional[date] = None
+    sikayet: Optional[str] = None
+    tani1: Optional[str] = None
+    tani1_kodu: Optional[str] = None
+    tani2: Optional[str] = None
+    tani2_kodu: Optional[str] = None
+    doktor: Optional[str] = None
+    is_promoted: Optional[bool] = None
+
+    class Config:
+        from_attributes = True
+
 # Operation/Operasyon Schema
 class OperasyonBase(BaseModel):
     tarih: Optional[date] = None
@@ -108,6 +124,18 @@ class OperasyonResponse(OperasyonBase):
     class Config:
         from_attributes = True
 
+class OperasyonListItem(BaseModel):
+    id: int
+    hasta_id: UUID
+    tarih: Optional[date] = None
+    ameliyat: Optional[str] = None
+    pre_op_tani: Optional[str] = None
+    post_op_tani: Optional[str] = None
+    anestezi_tur: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 # Takip/HastaNotu Schemas
 class HastaNotuBase(BaseModel):
     tarih: Optional[date] = None
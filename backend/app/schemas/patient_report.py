@@ -112,3 +112,27 @@ class PatientReportDTO(BaseModel):
     @property
     def is_complete(self) -> bool:
         return self.demographics is not None and self.finance_summary is not None
+
+
+class AdvancedSearchFilter(BaseModel):
+    """/patients/advanced-search ile aynı filtre alanları (toplu rapor seçimi için)."""
+    tani: Optional[str] = None
+    yas_min: Optional[int] = None
+    yas_max: Optional[int] = None
+    muayene_tarihi_baslangic: Optional[str] = None
+    muayene_tarihi_bitis: Optional[str] = None
+    son_islem_tarihi_baslangic: Optional[str] = None
+    son_islem_tarihi_bitis: Optional[str] = None
+    ilk_kayit_tarihi_baslangic: Optional[str] = None
+    ilk_kayit_tarihi_bitis: Optional[str] = None
+    operasyon_tarihi_baslangic: Optional[str] = None
+    operasyon_tarihi_bitis: Optional[str] = None
+    operasyon_adi: Optional[str] = None
+    sikayet: Optional[str] = None
+    bulgu: Optional[str] = None
+
+
+class PatientReportBatchRequest(BaseModel):
+    """Toplu PDF raporu: hasta listesi veya gelişmiş arama filtresi (biri zorunlu)."""
+    patient_ids: Optional[List[UUID]] = None
+    filter: Optional[AdvancedSearchFilter] = None
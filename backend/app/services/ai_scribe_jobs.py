@@ -0,0 +1,370 @@
+"""
+AI Scribe iş kuyruğu.
+
+/ai-scribe/analyze eskiden sesi belleğe okuyup analiz bitene kadar (Gemini dosya işleme
+beklemesi dahil) isteği ve get_db bağlantısını açık tutuyordu. Artık:
+
+1. Yükleme parça parça diske yazılır (spool), ai_scribe_jobs tablosuna 'queued' satırı eklenir.
+2. Süreç içi sınırlı sayıda worker işi alır; sağlayıcı limitleri AIScribeService.provider_slot ile uygulanır.
+3. İstemci GET /jobs/{id}?wait=N (long-poll) veya /jobs/{id}/stream (SSE) ile sonucu bekler.
+   Parçalı transkripsiyonda ara transkript parçaları (partial) işi çalıştıran süreçte bellekte tutulur
+   ve aynı kanallardan anında iletilir.
+
+DB'ye sadece durum geçişlerinde kısa ömürlü session ile dokunulur; analiz süresince
+hiçbir istek veya worker havuzdan bağlantı tutmaz.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+
+from app.core.config import settings
+from app.core.pii import name_tokens
+from app.db.session import SessionLocal
+from app.models.ai_scribe_job import AIScribeJob
+from app.repositories.patient.models import ShardedPatientDemographics
+from app.schemas.ai_scribe import AIScribeRequest
+from app.services.ai_scribe_service import get_ai_scribe_service
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = {JOB_DONE, JOB_FAILED}
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+_SUFFIXES = {
+    "audio/webm": ".webm", "audio/mpeg": ".mp3", "audio/mp3": ".mp3",
+    "audio/wav": ".wav", "audio/mp4": ".m4a", "audio/ogg": ".ogg",
+}
+
+
+class JobQueueFullError(Exception):
+    """Kuyruk kapasitesi dolu; istemci daha sonra tekrar denemeli."""
+
+
+def _spool_dir() -> Path:
+    path = Path(settings.AI_SCRIBE_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+async def spool_upload(upload: Any, job_id: str, mime_type: str) -> Tuple[str, int]:
+    """
+    UploadFile içeriğini 1MB'lık parçalar halinde diske yazar.
+    AI_SCRIBE_MAX_UPLOAD_MB aşılırsa dosya silinir ve ValueError fırlatılır.
+    """
+    max_bytes = settings.AI_SCRIBE_MAX_UPLOAD_MB * 1024 * 1024
+    suffix = next((s for t, s in _SUFFIXES.items() if t in mime_type), ".bin")
+    path = _spool_dir() / f"{job_id}{suffix}"
+
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Ses dosyası çok büyük. Maksimum {settings.AI_SCRIBE_MAX_UPLOAD_MB}MB.")
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return str(path), size
+
+
+def job_to_dict(job: AIScribeJob, partials: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "mode": job.mode,
+        "patient_id": job.patient_id,
+        "error": job.error,
+        "result": job.result,
+        "partial_transcript": " ".join(p for p in partials if p) if partials else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class AIScribeJobQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Any] = SessionLocal,
+        service_factory: Callable[[], Any] = get_ai_scribe_service,
+    ):
+        self._session_factory = session_factory
+        self._service_factory = service_factory
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._waiter_counts: Dict[str, int] = {}
+        self._reserved = 0  # submit'te DB yazımı süresince ayrılmış kuyruk yerleri
+        self._partials: Dict[str, List[str]] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.AI_SCRIBE_JOB_QUEUE_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ai-scribe-worker-{i}")
+            for i in range(max(1, settings.AI_SCRIBE_JOB_WORKERS))
+        ]
+        try:
+            await self._recover()
+        except Exception as e:
+            logger.warning(f"AI Scribe job recovery skipped: {e}")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    # --- Submit / Query ---
+
+    async def submit(
+        self,
+        *,
+        job_id: str,
+        request: AIScribeRequest,
+        mime_type: str,
+        spool_path: str,
+        size_bytes: int,
+        user_id: Optional[int] = None,
+        patient_id: Optional[str] = None,
+        protocol_no: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if self._queue is None:
+            raise RuntimeError("AI Scribe job queue is not started")
+        # Yer INSERT'ten önce ayrılır: eşzamanlı submit'ler commit edilmiş işi put_nowait'te QueueFull'a düşüremez
+        if self._queue.qsize() + self._reserved >= self._queue.maxsize:
+            raise JobQueueFullError()
+        self._reserved += 1
+        try:
+            return await self._insert_and_enqueue(
+                job_id=job_id, request=request, mime_type=mime_type, spool_path=spool_path,
+                size_bytes=size_bytes, user_id=user_id, patient_id=patient_id, protocol_no=protocol_no,
+            )
+        finally:
+            self._reserved -= 1
+
+    async def _insert_and_enqueue(
+        self,
+        *,
+        job_id: str,
+        request: AIScribeRequest,
+        mime_type: str,
+        spool_path: str,
+        size_bytes: int,
+        user_id: Optional[int],
+        patient_id: Optional[str],
+        protocol_no: Optional[str],
+    ) -> Dict[str, Any]:
+
+        job = AIScribeJob(
+            id=job_id,
+            user_id=user_id,
+            patient_id=patient_id,
+            protocol_no=protocol_no,
+            mode=request.mode.value,
+            template=request.template,
+            include_transcript=request.include_transcript,
+            mime_type=mime_type,
+            spool_path=spool_path,
+            size_bytes=size_bytes,
+            status=JOB_QUEUED,
+            attempts=0,
+        )
+        async with self._session_factory() as db:
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+            data = job_to_dict(job)
+
+        self._queue.put_nowait(job_id)
+        return data
+
+    async def get(self, job_id: str) -> Optional[AIScribeJob]:
+        async with self._session_factory() as db:
+            return await db.get(AIScribeJob, job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """
+        İşin bir sonraki durum geçişini bekler (en fazla `timeout` saniye).
+        İş başka bir süreçte çalışıyorsa olay gelmez; çağıran taraf zaman aşımından sonra DB'yi tekrar okur.
+        Son bekleyen ayrılınca olay silinir (başka süreçte işlenen işlerin olayları birikmez).
+        """
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        self._waiter_counts[job_id] = self._waiter_counts.get(job_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            remaining = self._waiter_counts.pop(job_id) - 1
+            if remaining:
+                self._waiter_counts[job_id] = remaining
+            elif self._waiters.get(job_id) is event:
+                del self._waiters[job_id]
+
+    def partials(self, job_id: str) -> List[str]:
+        """Çalışan işin şimdiye kadar gelen transkript parçaları (sadece bu süreçte çalışıyorsa)."""
+        return list(self._partials.get(job_id, []))
+
+    def _add_partial(self, job_id: str, text: str) -> None:
+        self._partials.setdefault(job_id, []).append(text)
+        self._notify(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        event = self._waiters.pop(job_id, None)
+        if event:
+            event.set()
+
+    # --- Worker ---
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"AI Scribe worker {n} failed on job {job_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _claim(self, job_id: str) -> Optional[AIScribeJob]:
+        # Koşullu UPDATE: aynı iş birden fazla süreçte kurtarılırsa sadece biri alır
+        async with self._session_factory() as db:
+            result = await db.execute(
+                update(AIScribeJob)
+                .where(AIScribeJob.id == job_id, AIScribeJob.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, started_at=func.now(), attempts=AIScribeJob.attempts + 1)
+                .returning(AIScribeJob)
+            )
+            job = result.scalar_one_or_none()
+            await db.commit()
+            return job
+
+    async def _finish(self, job_id: str, **values: Any) -> None:
+        async with self._session_factory() as db:
+            await db.execute(
+                update(AIScribeJob)
+                .where(AIScribeJob.id == job_id)
+                .values(finished_at=func.now(), spool_path=None, **values)
+            )
+            await db.commit()
+
+    async def _patient_names(self, patient_id: Optional[str]) -> FrozenSet[str]:
+        """Hastanın ad/soyad kelimeleri: analiz çıktısında tek başına geçseler de maskelenir."""
+        if not patient_id:
+            return frozenset()
+        try:
+            async with self._session_factory() as db:
+                row = (await db.execute(
+                    select(ShardedPatientDemographics.ad, ShardedPatientDemographics.soyad)
+                    .where(ShardedPatientDemographics.id == patient_id)
+                )).first()
+        except Exception as e:
+            logger.warning(f"AI Scribe job: could not load patient names for {patient_id}: {e}")
+            return frozenset()
+        return name_tokens(*row) if row else frozenset()
+
+    async def process(self, job_id: str) -> None:
+        job = await self._claim(job_id)
+        if job is None:
+            return
+        self._notify(job_id)
+
+        spool_path = Path(job.spool_path) if job.spool_path else None
+        try:
+            if spool_path is None or not spool_path.exists():
+                raise ValueError("Ses dosyası bulunamadı (sunucu yeniden başlatılmış olabilir).")
+
+            audio_bytes = await asyncio.to_thread(spool_path.read_bytes)
+            request = AIScribeRequest(
+                mode=job.mode,
+                template=job.template,
+                include_transcript=bool(job.include_transcript),
+            )
+            patient_names = await self._patient_names(job.patient_id)
+            result = await asyncio.wait_for(
+                self._service_factory().analyze_consultation(
+                    audio_bytes=audio_bytes,
+                    mime_type=job.mime_type,
+                    request=request,
+                    protocol_no=job.protocol_no,
+                    on_partial=lambda index, total, text: self._add_partial(job_id, text),
+                    patient_names=patient_names,
+                ),
+                timeout=settings.AI_SCRIBE_JOB_TIMEOUT,
+            )
+            await self._finish(job_id, status=JOB_DONE, result=result.model_dump(mode="json"), error=None)
+        except asyncio.TimeoutError:
+            await self._finish(job_id, status=JOB_FAILED, error="Analiz zaman aşımına uğradı.")
+        except ValueError as e:
+            await self._finish(job_id, status=JOB_FAILED, error=str(e))
+        except Exception as e:
+            logger.error(f"AI Scribe job {job_id} failed: {e}", exc_info=True)
+            await self._finish(job_id, status=JOB_FAILED, error=f"Analiz sırasında hata oluştu: {str(e)}")
+        finally:
+            if spool_path is not None:
+                spool_path.unlink(missing_ok=True)
+            self._partials.pop(job_id, None)
+            self._notify(job_id)
+
+    # --- Startup ---
+
+    async def _recover(self) -> None:
+        """
+        Yeniden başlatmada yarım kalan işleri kuyruğa geri alır ve süresi dolan kayıtları temizler.
+        'running' durumunda takılı kalan işler ancak JOB_TIMEOUT'un iki katından eskiyse sıfırlanır
+        (başka bir süreç hâlâ çalıştırıyor olabilir).
+        """
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=settings.AI_SCRIBE_JOB_TIMEOUT * 2)
+        expire_before = now - timedelta(hours=settings.AI_SCRIBE_JOB_RETENTION_HOURS)
+
+        async with self._session_factory() as db:
+            await db.execute(
+                update(AIScribeJob)
+                .where(AIScribeJob.status == JOB_RUNNING, AIScribeJob.started_at < stale_before)
+                .values(status=JOB_QUEUED)
+            )
+            await db.execute(
+                delete(AIScribeJob).where(
+                    AIScribeJob.status.in_(TERMINAL_STATUSES), AIScribeJob.finished_at < expire_before
+                )
+            )
+            result = await db.execute(
+                select(AIScribeJob.id)
+                .where(AIScribeJob.status == JOB_QUEUED)
+                .order_by(AIScribeJob.created_at)
+                .limit(settings.AI_SCRIBE_JOB_QUEUE_SIZE)
+            )
+            pending = list(result.scalars().all())
+            await db.commit()
+
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            logger.info(f"AI Scribe: {len(pending)} pending jobs re-queued")
+
+
+ai_scribe_jobs = AIScribeJobQueue()
@@ -4,25 +4,34 @@ Ses kaydından klinik not oluşturan yapay zeka servisi.
 Refactored to use Adapter Pattern (VoiceProvider, LLMProvider).
 """
 import os
-import re
 import json
 import time
 import logging
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, FrozenSet, List, Optional, Callable
 from datetime import datetime
 
+import httpx
+
 from app.core.config import settings
 from app.schemas.ai_scribe import AIScribeRequest, AIScribeResponse, AIScribeMode
 from app.core.ai.providers.gemini_provider import GeminiProvider
 from app.core.ai.providers.local_provider import LocalVoiceProvider, LocalLLMProvider
 from app.core.ai.providers.google_speech_provider import GoogleSTTProvider
+from app.core.ai.interfaces import VoiceProvider
+from app.core.ai.chunking import transcribe_chunked
+from app.core.ai.runtime import provider_runtime, ProviderUnavailableError
+from app.core.pii import pii_scrubber
+from app.services.result_cache import result_cache, cache_key
 
 logger = logging.getLogger(__name__)
 
 # Templates directory
 TEMPLATES_DIR = Path(__file__).parent.parent.parent / "static" / "ai_scribe_templates"
 
+# Yerel servis kapalı / erişilemez: Gemini'ye geçişi tetikleyen hatalar
+PROVIDER_DOWN_ERRORS = (ProviderUnavailableError, httpx.HTTPError)
+
 class AIScribeService:
     """AI Scribe servis sınıfı - Gemini, Local ve Hybrid mod desteği"""
     
@@ -49,6 +58,16 @@ class AIScribeService:
         # Templates cache
         self._templates_cache: Dict[str, str] = {}
         self._load_templates()
+
+        self.runtime = provider_runtime
+        self.result_cache = result_cache
+
+    def provider_slot(self, provider: str):
+        """
+        Sağlayıcı çağrısı: limit dolarsa sırada bekler, devresi açıksa beklemeden
+        ProviderUnavailableError fırlatır (bkz. app.core.ai.runtime).
+        """
+        return self.runtime.call(provider)
     
     def _load_templates(self) -> None:
         """Load templates from the templates directory"""
@@ -82,20 +101,102 @@ class AIScribeService:
         return self.gemini_provider.is_available()
     
     async def check_local_services(self) -> Dict[str, bool]:
-        """Health check for local AI services"""
-        # Ideally, providers should have a health_check method.
-        # For now, we will assume false or implement checking later.
-        # Keeping it simple for the refactor.
-        return {"whisper": True, "ollama": True} 
+        """Health check for local AI services (AI_SCRIBE_HEALTH_TTL süresince önbellekli)"""
+        return await self.runtime.health()
+
+    def _can_fallback(self, mode: AIScribeMode) -> bool:
+        # Yerel servis kapalıysa Gemini'ye geç; hibrit Google+Gemini zaten yerel servis kullanmıyor
+        return (
+            settings.AI_SCRIBE_FALLBACK_ENABLED
+            and mode in (AIScribeMode.LOCAL, AIScribeMode.HYBRID_GOOGLE_LOCAL)
+            and self.gemini_provider.is_available()
+        )
     
+    async def _transcribe(
+        self,
+        provider: VoiceProvider,
+        provider_name: str,
+        audio_bytes: bytes,
+        mime_type: str,
+        on_partial: Optional[Callable[[int, int, str], None]] = None
+    ) -> str:
+        """Uzun kayıtları parçalı, kısa / çözülemeyen kayıtları tek istekle yazıya döker."""
+        if settings.AI_SCRIBE_CHUNKING_ENABLED:
+            transcript = await transcribe_chunked(
+                provider,
+                audio_bytes,
+                mime_type,
+                target_seconds=settings.AI_SCRIBE_CHUNK_SECONDS,
+                max_seconds=settings.AI_SCRIBE_CHUNK_MAX_SECONDS,
+                overlap_ms=settings.AI_SCRIBE_CHUNK_OVERLAP_MS,
+                concurrency=settings.AI_SCRIBE_CHUNK_CONCURRENCY,
+                slot=lambda: self.provider_slot(provider_name),
+                on_partial=on_partial,
+            )
+            if transcript is not None:
+                return transcript
+
+        async with self.provider_slot(provider_name):
+            transcript = await provider.transcribe(audio_bytes, mime_type)
+        if on_partial:
+            on_partial(0, 1, transcript)
+        return transcript
+
+    def _cache_parts(self, request: AIScribeRequest, patient_names: FrozenSet[str]) -> tuple:
+        # Şablon içeriği de anahtara girer: şablon dosyası değişince eski sonuçlar kullanılmaz.
+        # Hasta adı sözlüğü maskelemeyi değiştirdiği için o da anahtarın parçası (yalnızca özeti saklanır).
+        return (
+            request.mode.value,
+            request.template or "",
+            self._build_template_prompt(request.template),
+            request.include_transcript,
+            settings.AI_SCRIBE_MODEL,
+            settings.LOCAL_LLM_MODEL,
+            "|".join(sorted(patient_names)),
+        )
+
+    @staticmethod
+    def _should_cache(request: AIScribeRequest) -> Callable[[Dict[str, Any]], bool]:
+        # Yedek sağlayıcı sonucu ve doğrulama hatası önbelleğe alınmaz: servis düzelince yeniden denenmeli
+        def check(value: Dict[str, Any]) -> bool:
+            return (
+                value.get("mode_used") == request.mode.value
+                and not (value.get("clinical_note") or "").startswith("Veri doğrulama hatası")
+            )
+        return check
+
     async def analyze_consultation(
         self, 
         audio_bytes: bytes, 
         mime_type: str,
         request: AIScribeRequest,
-        protocol_no: Optional[str] = None
+        protocol_no: Optional[str] = None,
+        on_partial: Optional[Callable[[int, int, str], None]] = None,
+        patient_names: FrozenSet[str] = frozenset()
+    ) -> AIScribeResponse:
+        """
+        Main analysis method for AUDIO.
+        on_partial(index, total, text): transkripsiyon parçaları geldikçe çağrılır (Gemini modunda çağrılmaz).
+        patient_names: hastanın ad/soyad kelimeleri (app.core.pii.name_tokens) - çıktıda kesin maskelenir.
+        Aynı kayıt aynı şablon/mod ile tekrar gönderilirse önbellekteki sonuç döner.
+        """
+        key = await cache_key("ai_scribe_audio", audio_bytes, mime_type, *self._cache_parts(request, patient_names))
+
+        async def compute() -> Dict[str, Any]:
+            result = await self._analyze_consultation_uncached(audio_bytes, mime_type, request, on_partial, patient_names)
+            return result.model_dump(mode="json")
+
+        data = await self.result_cache.get_or_compute(key, compute, should_cache=self._should_cache(request))
+        return AIScribeResponse(**data)
+
+    async def _analyze_consultation_uncached(
+        self,
+        audio_bytes: bytes,
+        mime_type: str,
+        request: AIScribeRequest,
+        on_partial: Optional[Callable[[int, int, str], None]] = None,
+        patient_names: FrozenSet[str] = frozenset()
     ) -> AIScribeResponse:
-        """Main analysis method for AUDIO"""
         
         start_time = time.time()
         logger.info(f"Starting AI Scribe analysis - mode: {request.mode}, size: {len(audio_bytes)} bytes")
@@ -112,33 +213,50 @@ class AIScribeService:
                      raise ValueError("Google Gemini API is not configured.")
                 
                 template_prompt = self._build_template_prompt(request.template)
-                raw_data = await self.gemini_provider.analyze_audio(audio_bytes, mime_type, template_prompt)
+                async with self.provider_slot("gemini"):
+                    raw_data = await self.gemini_provider.analyze_audio(audio_bytes, mime_type, template_prompt)
                 
             else:
-                # Step 1: Transcribe
-                if request.mode == AIScribeMode.LOCAL:
-                    transcript = await self.local_voice_provider.transcribe(audio_bytes, mime_type)
-                elif request.mode in [AIScribeMode.HYBRID_GOOGLE_LOCAL, AIScribeMode.HYBRID_GOOGLE_GEMINI]:
-                    transcript = await self.google_stt_provider.transcribe(audio_bytes, mime_type)
-                else:
-                    raise ValueError(f"Unknown mode: {request.mode}")
-
-                # Step 2: Intelligence Phase
                 template_prompt = self._build_template_prompt(request.template)
-                
-                if request.mode == AIScribeMode.LOCAL or request.mode == AIScribeMode.HYBRID_GOOGLE_LOCAL:
-                    raw_data = await self.local_llm_provider.analyze_text(transcript, template_prompt)
-                elif request.mode == AIScribeMode.HYBRID_GOOGLE_GEMINI:
-                    if not self.gemini_provider.is_available():
-                         raise ValueError("Google Gemini API is not available/configured for Hybrid mode.")
-                    raw_data = await self.gemini_provider.analyze_text(transcript, template_prompt)
+                try:
+                    # Step 1: Transcribe
+                    if request.mode == AIScribeMode.LOCAL:
+                        transcript = await self._transcribe(
+                            self.local_voice_provider, "local_whisper", audio_bytes, mime_type, on_partial
+                        )
+                    elif request.mode in [AIScribeMode.HYBRID_GOOGLE_LOCAL, AIScribeMode.HYBRID_GOOGLE_GEMINI]:
+                        transcript = await self._transcribe(
+                            self.google_stt_provider, "google_stt", audio_bytes, mime_type, on_partial
+                        )
+                    else:
+                        raise ValueError(f"Unknown mode: {request.mode}")
+
+                    # Step 2: Intelligence Phase
+                    if request.mode == AIScribeMode.LOCAL or request.mode == AIScribeMode.HYBRID_GOOGLE_LOCAL:
+                        async with self.provider_slot("local_llm"):
+                            raw_data = await self.local_llm_provider.analyze_text(transcript, template_prompt)
+                    elif request.mode == AIScribeMode.HYBRID_GOOGLE_GEMINI:
+                        if not self.gemini_provider.is_available():
+                             raise ValueError("Google Gemini API is not available/configured for Hybrid mode.")
+                        async with self.provider_slot("gemini"):
+                            raw_data = await self.gemini_provider.analyze_text(transcript, template_prompt)
+                except PROVIDER_DOWN_ERRORS as provider_error:
+                    if not self._can_fallback(request.mode):
+                        raise
+                    logger.warning(f"AI Scribe: local provider unavailable ({provider_error}), falling back to Gemini")
+                    mode_used = AIScribeMode.GEMINI
+                    async with self.provider_slot("gemini"):
+                        if transcript:
+                            raw_data = await self.gemini_provider.analyze_text(transcript, template_prompt)
+                        else:
+                            raw_data = await self.gemini_provider.analyze_audio(audio_bytes, mime_type, template_prompt)
             
             # Post-Processing
             if request.include_transcript and transcript:
                 raw_data["transcript"] = transcript
 
             # Sanitize and normalize data
-            sanitized_data = self._sanitize_data(raw_data)
+            sanitized_data = self._sanitize_data(raw_data, patient_names)
             
             # Normalize symptom values
             self._normalize_symptoms_in_place(sanitized_data)
@@ -169,14 +287,29 @@ class AIScribeService:
     async def analyze_text(
         self,
         text: str,
-        request: AIScribeRequest
+        request: AIScribeRequest,
+        patient_names: FrozenSet[str] = frozenset()
     ) -> AIScribeResponse:
         """Main analysis method for TEXT"""
+        # Pre-process: Scrub PII from input text (anahtar da maskelenmiş metinden üretilir)
+        scrubbed_text = self._sanitize_data(text, patient_names)
+        key = await cache_key("ai_scribe_text", scrubbed_text, *self._cache_parts(request, patient_names))
+
+        async def compute() -> Dict[str, Any]:
+            result = await self._analyze_text_uncached(scrubbed_text, request, patient_names)
+            return result.model_dump(mode="json")
+
+        data = await self.result_cache.get_or_compute(key, compute, should_cache=self._should_cache(request))
+        return AIScribeResponse(**data)
+
+    async def _analyze_text_uncached(
+        self,
+        scrubbed_text: str,
+        request: AIScribeRequest,
+        patient_names: FrozenSet[str] = frozenset()
+    ) -> AIScribeResponse:
         start_time = time.time()
-        logger.info(f"Starting AI Scribe TEXT analysis - mode: {request.mode}, length: {len(text)} chars")
-        
-        # Pre-process: Scrub PII from input text
-        scrubbed_text = self._sanitize_data(text)
+        logger.info(f"Starting AI Scribe TEXT analysis - mode: {request.mode}, length: {len(scrubbed_text)} chars")
         mode_used = request.mode
 
         try:
@@ -186,16 +319,26 @@ class AIScribeService:
             if request.mode == AIScribeMode.GEMINI or request.mode == AIScribeMode.HYBRID_GOOGLE_GEMINI:
                 if not self.gemini_provider.is_available():
                      raise ValueError("Google Gemini API is not configured.")
-                raw_data = await self.gemini_provider.analyze_text(scrubbed_text, template_prompt)
+                async with self.provider_slot("gemini"):
+                    raw_data = await self.gemini_provider.analyze_text(scrubbed_text, template_prompt)
             elif request.mode == AIScribeMode.LOCAL or request.mode == AIScribeMode.HYBRID_GOOGLE_LOCAL:
-                 raw_data = await self.local_llm_provider.analyze_text(scrubbed_text, template_prompt)
+                 try:
+                     async with self.provider_slot("local_llm"):
+                         raw_data = await self.local_llm_provider.analyze_text(scrubbed_text, template_prompt)
+                 except PROVIDER_DOWN_ERRORS as provider_error:
+                     if not self._can_fallback(request.mode):
+                         raise
+                     logger.warning(f"AI Scribe: local LLM unavailable ({provider_error}), falling back to Gemini")
+                     mode_used = AIScribeMode.GEMINI
+                     async with self.provider_slot("gemini"):
+                         raw_data = await self.gemini_provider.analyze_text(scrubbed_text, template_prompt)
             else:
                  # Default fallback or error?
                  # Assume user meant Local if they sent Local mode, or Error.
                  raise ValueError(f"Unsupported mode for text analysis: {request.mode}")
 
             # Sanitize and normalize data (Post-process)
-            sanitized_data = self._sanitize_data(raw_data)
+            sanitized_data = self._sanitize_data(raw_data, patient_names)
             
             # Normalize symptom values
             self._normalize_symptoms_in_place(sanitized_data)
@@ -250,41 +393,9 @@ class AIScribeService:
         
         return None
     
-    def _sanitize_data(self, data: Any) -> Any:
-        """Clean sensitive data (PII)"""
-        if isinstance(data, dict):
-            return {k: self._sanitize_data(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._sanitize_data(i) for i in data]
-        elif isinstance(data, str):
-            # Mask Turkish National ID (11 digits)
-            data = re.sub(r'\b[1-9]\d{10}\b', '[ID_MASKED]', data)
-            # Mask Phone Numbers
-            data = re.sub(r'\b0?5\d{9}\b', '[PHONE_MASKED]', data)
-            # Mask Potential Names (2+ capitalized words sequence, excluding start of sentence if possible, but aggressive for safety)
-            # Simple heuristic: Uppercase word followed by uppercase word (e.g. Ahmet Yilmaz)
-            # We must be careful not to mask medical terms like "Akut Prostatit" if capitalized incorrectly.
-            # However, user demanded NO NAMES.
-            # Let's use a pattern that catches "Name Surname" format strictly.
-            # \b[A-ZİĞÜŞÖÇ][a-zıiğüşöç]+\s+[A-ZİĞÜŞÖÇ][a-zıiğüşöç]+\b
-            # We will use a safe placeholder.
-            # Also avoiding UUID masking (usually lowercase/alphanum)
-            
-            name_pattern = r'\b[A-ZİĞÜŞÖÇ][a-zıiğüşöç]{1,}\s+[A-ZİĞÜŞÖÇ][a-zıiğüşöç]{1,}\b'
-            
-            # Filter out common clinical terms that might match (False positives)
-            # This is a basic implementation. Ideally, use NLP.
-            def replace_name(match):
-                val = match.group(0)
-                # Whitelist common capitalized terms in reports
-                whitelist = ["Akut", "Kronik", "Sol", "Sag", "Bobrek", "Mesane", "Prostat", "Idrar", "Klinik", "Fizik", "Muayene"]
-                if any(w in val for w in whitelist):
-                    return val
-                return "[NAME_MASKED]"
-
-            data = re.sub(name_pattern, replace_name, data)
-            return data
-        return data
+    def _sanitize_data(self, data: Any, patient_names: FrozenSet[str] = frozenset()) -> Any:
+        """Clean sensitive data (PII) - TC no, telefon, isim (bkz. app.core.pii)"""
+        return pii_scrubber.scrub(data, patient_names)
 
     def _handle_analysis_error(self, e: Exception):
         """Standardized error handling"""
@@ -0,0 +1,201 @@
+"""
+İsteğe bağlı analitik motor: ağır kohort / tanı / servis dağılımı sorgularını üretim veritabanı
+yerine takma adlandırılmış Parquet replikası (app.services.analytics_export) üzerinde DuckDB ile çalıştırır.
+
+- Replika maintenance.export_analytics ile artımlı yenilenir; motor manifest değiştiğinde
+  view'ları yeniden bağlar (şema / tablo adları PostgreSQL ile aynıdır: clinical.sharded_clinical_muayeneler).
+- ANALYTICS_ENGINE="duckdb" değilse, duckdb kurulu değilse, replika yoksa veya
+  ANALYTICS_MAX_STALENESS_MINUTES'ten eskiyse enabled False döner; ReportRepository PostgreSQL'e düşer.
+- Sorgular asyncio.to_thread ile çalışır (DuckDB senkron, GIL'i bırakır); her çağrı ayrı cursor kullanır.
+- Replikada hasta kimliği yoktur (ad / soyad yazılmaz, hasta_id takma addır): yalnız toplam / sayım döner.
+"""
+import asyncio
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.repositories.clinical.diagnoses import escape_like, normalize_icd_code
+from app.services.analytics_export import MANIFEST_NAME
+
+try:
+    import duckdb
+    DUCKDB_SUPPORT = True
+except ImportError:
+    duckdb = None
+    DUCKDB_SUPPORT = False
+
+logger = logging.getLogger(__name__)
+
+COHORT_MONTHS = 6  # CohortRow.month_0 .. month_6
+
+_COHORT_SQL = """
+WITH first_visit AS (
+    SELECT hasta_id, date_trunc('month', min(tarih)) AS cohort
+    FROM clinical.sharded_clinical_muayeneler
+    WHERE hasta_id IS NOT NULL
+    GROUP BY hasta_id
+), cohort AS (
+    SELECT hasta_id, cohort FROM first_visit WHERE cohort >= ? AND cohort <= ?
+), activity AS (
+    SELECT hasta_id, date_trunc('month', tarih) AS month FROM clinical.sharded_clinical_muayeneler WHERE tarih IS NOT NULL
+    UNION ALL
+    SELECT hasta_id, date_trunc('month', tarih) AS month FROM clinical.sharded_clinical_notlar WHERE tarih IS NOT NULL
+)
+SELECT strftime(c.cohort, '%Y-%m') AS cohort_month,
+       date_diff('month', c.cohort, a.month) AS month_offset,
+       count(DISTINCT c.hasta_id) AS patients
+FROM cohort c
+JOIN activity a ON a.hasta_id = c.hasta_id
+WHERE a.month >= c.cohort AND a.month <= c.cohort + INTERVAL 6 MONTH AND a.month <= ?
+GROUP BY 1, 2
+"""
+
+
+def diagnosis_filter(icd_code: Optional[str], text: Optional[str], alias: str = "") -> Tuple[List[str], List[Any]]:
+    """app.repositories.clinical.diagnoses.diagnosis_conditions'ın DuckDB karşılığı (kod prefix'i VE metin)."""
+    prefix = f"{alias}." if alias else ""
+    conditions, params = [], []
+    code = normalize_icd_code(icd_code)
+    if code:
+        conditions.append(f"{prefix}icd_code LIKE ? ESCAPE '\\'")
+        params.append(f"{escape_like(code)}%")
+    if text and text.strip():
+        conditions.append(f"{prefix}text ILIKE ? ESCAPE '\\'")
+        params.append(f"%{escape_like(text.strip())}%")
+    return conditions, params
+
+
+class AnalyticsEngine:
+    """
+    Example:
+        if analytics_engine.enabled:
+            counts = await analytics_engine.cohort_counts(first, last, today)
+    """
+
+    def __init__(self, export_dir: Optional[str] = None, threads: Optional[int] = None):
+        self.export_dir = Path(export_dir or settings.ANALYTICS_EXPORT_DIR)
+        self.threads = threads or settings.ANALYTICS_DUCKDB_THREADS
+        self._conn = None
+        self._manifest_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.export_dir / MANIFEST_NAME
+
+    @property
+    def enabled(self) -> bool:
+        if settings.ANALYTICS_ENGINE != "duckdb" or not DUCKDB_SUPPORT:
+            return False
+        age = self.replica_age()
+        return age is not None and age <= timedelta(minutes=settings.ANALYTICS_MAX_STALENESS_MINUTES)
+
+    def replica_age(self) -> Optional[timedelta]:
+        """Son dışa aktarımdan bu yana geçen süre; replika yoksa None."""
+        try:
+            updated_at = json.loads(self.manifest_path.read_text(encoding="utf-8")).get("updated_at")
+        except (OSError, ValueError):
+            return None
+        if not updated_at:
+            return None
+        return datetime.now(timezone.utc) - datetime.fromisoformat(updated_at)
+
+    # --- Bağlantı / view'lar ---
+    def _connection(self):
+        with self._lock:
+            mtime = self.manifest_path.stat().st_mtime
+            if self._conn is None:
+                self._conn = duckdb.connect(":memory:", config={"threads": self.threads})
+            if mtime != self._manifest_mtime:
+                self._bind_views(self._conn)
+                self._manifest_mtime = mtime
+            return self._conn
+
+    def _bind_views(self, conn) -> None:
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        for fullname, entry in manifest.get("tables", {}).items():
+            if not entry.get("partitions"):
+                continue  # boş tablo: view yok, sorgu hata verir ve çağıran PostgreSQL'e düşer
+            schema, table = fullname.split(".", 1)
+            pattern = (self.export_dir / schema / table / "*" / "*.parquet").as_posix().replace("'", "''")
+            conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+            conn.execute(
+                f'CREATE OR REPLACE VIEW "{schema}"."{table}" AS '
+                f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+            )
+        logger.info(f"Analytics replica views bound ({len(manifest.get('tables', {}))} tables)")
+
+    def _fetch(self, sql: str, params: Sequence[Any]) -> list:
+        cursor = self._connection().cursor()
+        try:
+            return cursor.execute(sql, list(params)).fetchall()
+        finally:
+            cursor.close()
+
+    async def fetch(self, sql: str, params: Sequence[Any] = ()) -> list:
+        return await asyncio.to_thread(self._fetch, sql, params)
+
+    # --- Rapor sorguları ---
+    async def cohort_counts(self, first_cohort: date, last_cohort: date, today: date) -> Dict[Tuple[str, int], int]:
+        """{(YYYY-MM, ay farkı): aktif hasta}; ay farkı 0 kohort büyüklüğüdür (ilk muayene o aydadır)."""
+        rows = await self.fetch(_COHORT_SQL, (first_cohort, last_cohort, today))
+        return {(cohort, int(offset)): int(count) for cohort, offset, count in rows}
+
+    async def service_counts(self, start: date, end: date) -> Tuple[List[tuple], List[tuple]]:
+        """(service_category, sayı) ve sınıflandırılmamış satırlar için (tani1, kod1, tani2, kod2, sayı)."""
+        period = "tarih >= ? AND tarih <= ?"
+        # Tarih parametreleri gün başı: PostgreSQL'deki date karşılaştırmasıyla aynı sınırlar
+        params = (_day(start), _day(end))
+        classified = await self.fetch(
+            f"SELECT service_category, count(*) FROM clinical.sharded_clinical_muayeneler WHERE {period} GROUP BY 1",
+            params,
+        )
+        unclassified: List[tuple] = []
+        if any(service is None for service, _ in classified):
+            unclassified = await self.fetch(
+                "SELECT tani1, tani1_kodu, tani2, tani2_kodu, count(*) FROM clinical.sharded_clinical_muayeneler "
+                f"WHERE {period} AND service_category IS NULL GROUP BY 1, 2, 3, 4",
+                params,
+            )
+        return classified, unclassified
+
+    async def diagnosis_aggregates(
+        self, icd_code: Optional[str], text: Optional[str], start: date, end: date, first_year: int, last_year: int
+    ) -> Tuple[int, int, Dict[int, int]]:
+        """(eşleşen muayene sayısı, toplam hasta, {yıl: tanılı hasta}) - ReportRepository.get_diagnosis_stats ile aynı tanımlar."""
+        conditions, params = diagnosis_filter(icd_code, text)
+        exam_filter, exam_params = "", []
+        if conditions:
+            exam_filter = (
+                " AND m.id IN (SELECT exam_id FROM clinical.sharded_clinical_exam_diagnoses "
+                f"WHERE {' AND '.join(conditions)} AND tarih >= ? AND tarih <= ?)"
+            )
+            exam_params = [*params, _day(start), _day(end)]
+
+        total = await self.fetch(
+            "SELECT count(*) FROM clinical.sharded_clinical_muayeneler m "
+            "JOIN patient.sharded_patient_demographics d ON d.id = m.hasta_id "
+            f"WHERE m.tarih >= ? AND m.tarih <= ?{exam_filter}",
+            [_day(start), _day(end), *exam_params],
+        )
+        portfolio = await self.fetch("SELECT count(DISTINCT id) FROM patient.sharded_patient_demographics")
+
+        source = "clinical.sharded_clinical_exam_diagnoses" if conditions else "clinical.sharded_clinical_muayeneler"
+        trend_filter = "".join(f" AND {c}" for c in conditions)
+        trend = await self.fetch(
+            f"SELECT year(tarih), count(DISTINCT hasta_id) FROM {source} "
+            f"WHERE tarih >= ? AND tarih < ?{trend_filter} GROUP BY 1",
+            [datetime(first_year, 1, 1), datetime(last_year + 1, 1, 1), *params],
+        )
+        return total[0][0], portfolio[0][0], {int(y): int(c) for y, c in trend}
+
+
+def _day(d: date) -> datetime:
+    return datetime.combine(d, datetime.min.time()) if not isinstance(d, datetime) else d
+
+
+analytics_engine = AnalyticsEngine()
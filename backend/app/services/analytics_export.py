@@ -0,0 +1,478 @@
+"""
+Analitik dışa aktarım: patient / clinical / finance şemalarını ay ve tablo bazında bölümlenmiş
+Parquet dosyalarına yazar (araştırma iş birlikleri ve DuckDB defterleri üretim veritabanına bağlanmaz).
+
+Dizin düzeni (hive bölümleme, DuckDB: read_parquet('.../*/*.parquet', hive_partitioning = true)):
+    <out>/<şema>/<tablo>/month=YYYY-MM/part-0.parquet
+    <out>/_manifest.json
+
+- Satırlar server-side cursor ile batch batch okunur ve Arrow RecordBatch olarak yazılır; tablo
+  belleğe alınmaz.
+- Artımlı çalışma: manifest tablo başına watermark (son görülen updated_at / created_at) tutar.
+  Sonraki çalışmada yalnız o andan beri değişen satırların düştüğü aylar ve bu satırların mevcut
+  Parquet dosyalarında bulunduğu aylar yeniden yazılır (tarihi değişen satırın eski kopyası eski
+  aydan çıkar; soft delete de updated_at'i değiştirdiği için silinen satır ay dosyasından çıkar).
+  Değişiklik kolonu olmayan küçük tablolar her çalışmada baştan yazılır; fiziksel silmeler için full=True.
+- Takma adlandırma: app.core.pii.SENSITIVE_KEYS (audit log ile aynı liste) ve dışa aktarıma özel
+  tanımlayıcı kolonlar yazılmaz; doğum tarihi yıla indirgenir; UUID kolonları (hasta_id vb.) anahtarlı
+  HMAC takma ada çevrilir (tablolar arası join korunur); serbest metin kolonları pii_scrubber'dan geçer.
+
+pyarrow isteğe bağlıdır (pip install pyarrow); yoksa PARQUET_SUPPORT False olur.
+"""
+import hashlib
+import hmac
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, String, Table, Text, func, or_, select
+from sqlalchemy.dialects.postgresql import JSON, JSONB, UUID as PgUUID
+
+from app.core.config import settings
+from app.core.pii import SENSITIVE_KEYS, pii_scrubber
+from app.db.session import SessionLocal
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    PARQUET_SUPPORT = True
+except ImportError:
+    pa = pc = pq = None
+    PARQUET_SUPPORT = False
+
+EXPORT_SCHEMAS = ("patient", "clinical", "finance")
+# Operasyonel (analitik değeri olmayan) tablolar
+SKIP_TABLES = frozenset({"patient.sharded_patient_revisions"})
+
+# Bölümleme kolonu tercih sırası; hiçbiri yoksa tablo tek bölüm (month=all) yazılır
+PARTITION_COLUMNS = ("tarih", "odeme_tarihi", "vade_tarihi", "created_at")
+ALL_PARTITION = "all"
+NULL_PARTITION = "none"
+
+# SENSITIVE_KEYS dışında dışa aktarımda yazılmayan doğrudan tanımlayıcılar
+EXPORT_SENSITIVE_COLUMNS = SENSITIVE_KEYS | frozenset({
+    "protokol_no", "kimlik_notlar", "iletisim_kisi", "postakodu", "dosya_yolu", "dosya_adi",
+    # Kişi adı / yer taşıyan serbest alanlar: scrubber isimleri güvenilir maskeleyemez
+    "dogum_yeri", "referans", "hemsire", "anestezi_ekip", "yetkili",
+})
+# Bu uzunluktan itibaren String kolonlar serbest metin sayılır ve Text gibi temizlenir
+# (kısa kod/enum kolonları: icd_kodu, durum, para_birimi... olduğu gibi yazılır)
+FREE_TEXT_MIN_LENGTH = 100
+# Kolon -> genelleştirilmiş hali (ad, dönüşüm)
+GENERALIZED_COLUMNS: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    "dogum_tarihi": ("dogum_yili", lambda v: v.year if v else None),
+}
+
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+# Watermark anında açık olan transaction'ların geç commit edilen yazımları için pay
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def export_tables(names: Optional[Iterable[str]] = None) -> List[Table]:
+    """Dışa aktarılan tablolar (şema.tablo veya tablo adıyla filtrelenebilir)."""
+    # Modeller metadata'ya kaydolsun
+    import app.repositories.patient.models  # noqa: F401
+    import app.repositories.clinical.models  # noqa: F401
+    import app.repositories.finance.models  # noqa: F401
+    from app.models.base_class import Base
+
+    wanted = set(names or ())
+    tables = []
+    for table in Base.metadata.sorted_tables:
+        if table.schema not in EXPORT_SCHEMAS or table.fullname in SKIP_TABLES:
+            continue
+        if wanted and table.fullname not in wanted and table.name not in wanted:
+            continue
+        tables.append(table)
+    return tables
+
+
+# =============================================================================
+# Takma adlandırma
+# =============================================================================
+
+def pseudonym_key() -> bytes:
+    """ANALYTICS_PSEUDONYM_KEY; boşsa SECRET_KEY'den türetilir (anahtar değişirse tüm takma adlar değişir)."""
+    if settings.ANALYTICS_PSEUDONYM_KEY:
+        return settings.ANALYTICS_PSEUDONYM_KEY.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), b"analytics-export", hashlib.sha256).digest()
+
+
+def key_id(key: bytes) -> str:
+    """Manifest'e yazılan anahtar parmak izi: anahtar değiştiğinde artımlı çalışma tam yenilemeye döner."""
+    return hashlib.sha256(b"key-id:" + key).hexdigest()[:16]
+
+
+def pseudonym(value: Any, key: bytes) -> Optional[str]:
+    if value is None:
+        return None
+    raw = value.bytes if isinstance(value, UUID) else str(value).encode()
+    return hmac.new(key, raw, hashlib.sha256).hexdigest()[:32]
+
+
+def _scrub(value: Any) -> Any:
+    return pii_scrubber.scrub_text(value) if isinstance(value, str) and value else value
+
+
+def _json_text(scrub: bool) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return json.dumps(pii_scrubber.scrub(value) if scrub else value, ensure_ascii=False, default=str)
+    return convert
+
+
+def arrow_type(column) -> Any:
+    t = column.type
+    if isinstance(t, PgUUID):
+        return pa.string()
+    if isinstance(t, Integer):
+        return pa.int64()
+    if isinstance(t, Numeric) and not isinstance(t, Float):
+        if t.precision is not None and t.scale is not None:
+            return pa.decimal128(t.precision, t.scale)
+        return pa.float64()
+    if isinstance(t, Float):
+        return pa.float64()
+    if isinstance(t, Boolean):
+        return pa.bool_()
+    if isinstance(t, DateTime):
+        return pa.timestamp("us", tz="UTC") if t.timezone else pa.timestamp("us")
+    if isinstance(t, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def is_free_text(column) -> bool:
+    t = column.type
+    if isinstance(t, Text):
+        return True
+    return isinstance(t, String) and (t.length is None or t.length >= FREE_TEXT_MIN_LENGTH)
+
+
+def column_plan(table: Table, key: bytes, scrub_text: bool = True) -> List[Tuple[int, str, Optional[Callable[[Any], Any]]]]:
+    """
+    (kaynak kolon sırası, çıktı adı, dönüşüm) listesi. Hassas kolonlar plana hiç girmez.
+    """
+    plan = []
+    for index, column in enumerate(table.columns):
+        name = column.name
+        if name in GENERALIZED_COLUMNS:
+            out_name, convert = GENERALIZED_COLUMNS[name]
+            plan.append((index, out_name, convert))
+        elif name.lower() in EXPORT_SENSITIVE_COLUMNS:
+            continue
+        elif isinstance(column.type, PgUUID):
+            plan.append((index, name, lambda v, _k=key: pseudonym(v, _k)))
+        elif isinstance(column.type, (JSON, JSONB)):
+            plan.append((index, name, _json_text(scrub_text)))
+        elif is_free_text(column) and scrub_text:
+            plan.append((index, name, _scrub))
+        else:
+            plan.append((index, name, None))
+    return plan
+
+
+def arrow_schema(table: Table, plan) -> Any:
+    columns = list(table.columns)
+    fields = []
+    for index, out_name, _ in plan:
+        column = columns[index]
+        if column.name in GENERALIZED_COLUMNS:
+            fields.append(pa.field(out_name, pa.int32()))
+        else:
+            fields.append(pa.field(out_name, arrow_type(column)))
+    return pa.schema(fields)
+
+
+# =============================================================================
+# Bölümleme
+# =============================================================================
+
+def partition_column(table: Table):
+    for name in PARTITION_COLUMNS:
+        column = table.columns.get(name)
+        if column is not None and isinstance(column.type, (Date, DateTime)):
+            return column
+    return None
+
+
+def change_column(table: Table):
+    """Artımlı çalışmada değişiklik zamanı ifadesi (updated_at / created_at), yoksa None."""
+    updated, created = table.columns.get("updated_at"), table.columns.get("created_at")
+    if updated is not None and created is not None:
+        return func.coalesce(updated, created)
+    return updated if updated is not None else created
+
+
+def partition_key(value: Any) -> str:
+    if value is None:
+        return NULL_PARTITION
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def month_range(key: str) -> Tuple[datetime, datetime]:
+    year, month = (int(p) for p in key.split("-"))
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def _aware(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+# =============================================================================
+# Manifest
+# =============================================================================
+
+class Manifest:
+    def __init__(self, path: Path, data: Optional[dict] = None):
+        self.path = path
+        self.data = data or {"version": MANIFEST_VERSION, "tables": {}}
+
+    @classmethod
+    def load(cls, out_dir: Path) -> "Manifest":
+        path = out_dir / MANIFEST_NAME
+        if path.exists():
+            return cls(path, json.loads(path.read_text(encoding="utf-8")))
+        return cls(path)
+
+    def table(self, fullname: str) -> Optional[dict]:
+        return self.data["tables"].get(fullname)
+
+    def update_table(self, fullname: str, entry: dict) -> None:
+        self.data["tables"][fullname] = entry
+
+    def save(self) -> None:
+        self.data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+# =============================================================================
+# Dışa aktarım
+# =============================================================================
+
+class AnalyticsExporter:
+    """
+    Example:
+        exporter = AnalyticsExporter(Path(settings.ANALYTICS_EXPORT_DIR))
+        stats = await exporter.run()
+    """
+
+    def __init__(
+        self, out_dir: Path, session_factory: Callable[[], Any] = SessionLocal,
+        batch_size: int = 10000, scrub_text: bool = True, full: bool = False, dry_run: bool = False
+    ):
+        if not PARQUET_SUPPORT and not dry_run:
+            raise RuntimeError("pyarrow kurulu değil (pip install pyarrow)")
+        self.out_dir = Path(out_dir)
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.scrub_text = scrub_text
+        self.full = full
+        self.dry_run = dry_run
+        self.key = pseudonym_key()
+
+    async def run(self, tables: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        manifest = Manifest.load(self.out_dir)
+        # Anahtar değiştiyse eski dosyalardaki takma adlar yenileriyle join edilemez: hepsi baştan yazılır
+        full = self.full or manifest.data.get("key_id") not in (None, key_id(self.key))
+
+        results = {}
+        for table in export_tables(tables):
+            results[table.fullname] = await self.export_table(table, manifest, full)
+            if not self.dry_run:
+                manifest.data["key_id"] = key_id(self.key)
+                manifest.save()
+        return results
+
+    async def export_table(self, table: Table, manifest: Manifest, full: bool = False) -> dict:
+        entry = manifest.table(table.fullname)
+        part_col = partition_column(table)
+        changed_at = change_column(table)
+        table_dir = self.out_dir / table.schema / table.name
+
+        async with self.session_factory() as session:
+            # Watermark dışa aktarım başlamadan alınır: bu sırada gelen yazımlar sonraki çalışmaya kalır
+            watermark = None
+            if changed_at is not None:
+                watermark = _aware((await session.execute(select(func.max(changed_at)))).scalar())
+
+            incremental = not full and entry is not None and entry.get("watermark") and changed_at is not None
+            months: Optional[List[str]] = None
+            if incremental:
+                since = datetime.fromisoformat(entry["watermark"]) - WATERMARK_OVERLAP
+                if part_col is None:
+                    changed = (await session.execute(select(func.count()).select_from(table).where(changed_at >= since))).scalar()
+                    months = [ALL_PARTITION] if changed else []
+                else:
+                    pk = _single_primary_key(table)
+                    if pk is None:
+                        res = await session.execute(
+                            select(func.date_trunc("month", part_col)).where(changed_at >= since).distinct()
+                        )
+                        months = sorted({partition_key(v) for v in res.scalars().all()})
+                    else:
+                        res = await session.execute(
+                            select(pk, func.date_trunc("month", part_col)).where(changed_at >= since)
+                        )
+                        changed_rows = res.all()
+                        current = {partition_key(month) for _, month in changed_rows}
+                        # Bölüm kolonu değişen satırın eski kopyası önceki ayın dosyasında kalmasın
+                        previous = self._partitions_containing(
+                            table, table_dir, pk, [row_id for row_id, _ in changed_rows],
+                            [m for m in entry.get("partitions", {}) if m not in current],
+                        )
+                        months = sorted(current | previous)
+
+            stats = {"mode": "incremental" if incremental else "full", "partitions": months, "rows": 0}
+            if self.dry_run or months == []:
+                return stats
+
+            partitions = dict(entry.get("partitions", {})) if incremental else {}
+            if not incremental and table_dir.exists():
+                shutil.rmtree(table_dir)
+
+            written = await self._write(session, table, part_col, months, table_dir)
+            for key in months or ():
+                partitions.pop(key, None)
+            partitions.update(written)
+            stats["rows"] = sum(written.values())
+            stats["partitions"] = sorted(written) if months is None else months
+
+        manifest.update_table(table.fullname, {
+            "watermark": watermark.isoformat() if watermark else None,
+            "partition_column": part_col.name if part_col is not None else None,
+            "partitions": dict(sorted(partitions.items())),
+            "rows": sum(partitions.values()),
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+        })
+        return stats
+
+    def _partitions_containing(self, table: Table, table_dir: Path, pk, ids: list, months: List[str]) -> set:
+        """Mevcut ay dosyalarından verilen birincil anahtarlardan birini içerenler (yalnız anahtar kolonu okunur)."""
+        if not ids or not months or self.dry_run:
+            return set()
+        plan = column_plan(table, self.key, self.scrub_text)
+        index = list(table.columns).index(pk)
+        step = next((p for p in plan if p[0] == index), None)
+        if step is None:
+            return set()
+        _, out_name, convert = step
+        field = arrow_schema(table, [step]).field(0)
+        wanted = pa.array([convert(v) if convert else v for v in ids], type=field.type)
+
+        found = set()
+        for key in months:
+            path = table_dir / f"month={key}" / "part-0.parquet"
+            if not path.exists():
+                continue
+            column = pq.read_table(path, columns=[out_name]).column(out_name)
+            if pc.any(pc.is_in(column, value_set=wanted)).as_py():
+                found.add(key)
+        return found
+
+    async def _write(self, session, table: Table, part_col, months: Optional[List[str]], table_dir: Path) -> Dict[str, int]:
+        """
+        Satırları bölüm kolonuna göre sıralı akıtır; aynı anda tek ay dosyası açıktır.
+        months verilirse yalnız o aylar yazılır (boş kalan ayın dosyası silinir).
+        """
+        plan = column_plan(table, self.key, self.scrub_text)
+        schema = arrow_schema(table, plan)
+
+        stmt = select(*table.columns)
+        if "is_deleted" in table.columns:
+            stmt = stmt.where(table.columns["is_deleted"] == False)
+        if months is not None and part_col is not None:
+            ranges = []
+            for key in months:
+                if key == NULL_PARTITION:
+                    ranges.append(part_col.is_(None))
+                else:
+                    start, end = month_range(key)
+                    ranges.append((part_col >= start) & (part_col < end))
+            stmt = stmt.where(or_(*ranges))
+        if part_col is not None:
+            stmt = stmt.order_by(part_col.asc().nulls_last())
+
+        counts: Dict[str, int] = {}
+        writer = None
+        current = None
+        part_index = list(table.columns).index(part_col) if part_col is not None else None
+
+        result = await session.stream(stmt.execution_options(yield_per=self.batch_size))
+        try:
+            async for rows in result.partitions(self.batch_size):
+                # Batch içinde ay sınırlarına göre grupla (sıralı akış: gruplar ardışık)
+                for key, group in _group_by_partition(rows, part_index):
+                    if key != current:
+                        if writer is not None:
+                            writer.close()
+                        current = key
+                        writer = _open_writer(table_dir, key, schema)
+                        counts[key] = 0
+                    writer.write_batch(_record_batch(group, plan, schema))
+                    counts[key] += len(group)
+        finally:
+            if writer is not None:
+                writer.close()
+            await result.close()
+
+        for key in counts:
+            _commit_partition(table_dir, key)
+        for key in months or ():
+            if key not in counts:
+                shutil.rmtree(table_dir / f"month={key}", ignore_errors=True)
+        return counts
+
+
+def _single_primary_key(table: Table):
+    columns = list(table.primary_key.columns)
+    return columns[0] if len(columns) == 1 else None
+
+
+def _group_by_partition(rows: list, part_index: Optional[int]) -> List[Tuple[str, list]]:
+    if part_index is None:
+        return [(ALL_PARTITION, rows)]
+    groups: List[Tuple[str, list]] = []
+    for row in rows:
+        key = partition_key(row[part_index])
+        if groups and groups[-1][0] == key:
+            groups[-1][1].append(row)
+        else:
+            groups.append((key, [row]))
+    return groups
+
+
+def _record_batch(rows: list, plan, schema) -> Any:
+    arrays = []
+    for (index, _, convert), field in zip(plan, schema):
+        values = [row[index] for row in rows]
+        if convert is not None:
+            values = [convert(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _open_writer(table_dir: Path, key: str, schema) -> Any:
+    part_dir = table_dir / f"month={key}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    return pq.ParquetWriter(str(part_dir / "part-0.parquet.tmp"), schema, compression="zstd")
+
+
+def _commit_partition(table_dir: Path, key: str) -> None:
+    """Ay dosyası tamamen yazıldıktan sonra yerine konur (okuyan DuckDB yarım dosya görmez)."""
+    part_dir = table_dir / f"month={key}"
+    os.replace(part_dir / "part-0.parquet.tmp", part_dir / "part-0.parquet")
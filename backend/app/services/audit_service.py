@@ -5,17 +5,10 @@ import json
 from datetime import date, datetime
 from uuid import UUID
 from decimal import Decimal
+from app.core.pii import SENSITIVE_KEYS, REDACTED, pii_scrubber
 
-# Sensitive keys that should NEVER be logged
-REDACTED_KEYS = {
-    # Turkish keys
-    "ad", "soyad", "tc", "tc_kimlik", "email", "telefon", "cep_tel", 
-    "ev_tel", "is_tel", "adres", "dogum_tarihi", "sifre", "parola",
-    # English equivalents and common security keys
-    "first_name", "last_name", "surname", "ssn", "phone", "mobile",
-    "address", "birth_date", "password", "secret", "token", "auth",
-    "cvv", "credit_card", "iban"
-}
+# Sensitive keys that should NEVER be logged (ortak liste: app.core.pii.SENSITIVE_KEYS)
+REDACTED_KEYS = SENSITIVE_KEYS
 
 def serialize_for_json(obj, key=None):
     """Convert non-JSON-serializable objects to serializable format and redact PII."""
@@ -23,9 +16,12 @@ def serialize_for_json(obj, key=None):
         return None
         
     # Redact PII based on key name
-    if key and key.lower() in REDACTED_KEYS:
-        return "[REDACTED]"
-        
+    if key and pii_scrubber.is_sensitive_key(key):
+        return REDACTED
+
+    # Serbest metinde geçen TC kimlik / telefon numaraları (isim sezgiseli audit metinlerinde uygulanmaz)
+    if isinstance(obj, str):
+        return pii_scrubber.scrub_text(obj, mask_names=False)
     if isinstance(obj, dict):
         return {k: serialize_for_json(v, key=k) for k, v in obj.items()}
     if isinstance(obj, (list, tuple)):
@@ -0,0 +1,299 @@
+"""
+Change Feed
+===========
+Randevu, hasta ve finans kayıtlarındaki değişiklikleri commit anında yakalayıp
+SSE (/api/v1/events/stream) üzerinden açık tarayıcı sekmelerine artımlı (delta) olarak iletir.
+
+- Yakalama: SQLAlchemy session event'leri (after_flush -> topla, after_commit -> yayınla,
+  after_rollback -> at). Repository'lerin flush/commit akışına dokunmaya gerek kalmaz.
+  ORM dışı toplu UPDATE'ler için `stage_change(session, ...)` açıkça çağrılır.
+- Dağıtım: Redis pub/sub (tüm uvicorn worker'ları aynı olayları görür). Redis yoksa process içi.
+- Sıra numarası: Redis INCR ile global; istemci Last-Event-ID ile kaçırdıklarını geri alır.
+  Redis'e yayınlanamayan (process içi) olaylar ayrı bir aralıktan numaralanır (LOCAL_SEQ_BASE),
+  iki kaynağın numaraları çakışmaz; kaynak değişince eski numarayla gelen istemci tam yenileme yapar.
+- Yük: randevu delta'sı takvimin çizdiği alanları taşır; hasta ve finans olayları yalnız id ve
+  değişiklik türüdür (akış rol filtresi olmadan tüm oturumlara gider: ad / tutar gibi veriler
+  istemcinin yetkili uç noktalardan yeniden çekmesiyle alınır).
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "change_feed_pending"
+SEQ_KEY_SUFFIX = ":seq"
+# Process içi (Redis'siz) olayların sıra numarası aralığı: Redis INCR değerleri buraya ulaşmaz
+LOCAL_SEQ_BASE = 1 << 52
+
+# Model sınıfı -> (topic, delta'ya giren alanlar)
+# Sadece ekranların çizdiği alanlar gönderilir; hasta ve finans için yalnız kimlikler (ad, tutar vb. akışa girmez).
+_TRACKED: Dict[type, Tuple[str, Tuple[str, ...]]] = {}
+_TOPIC_FIELDS: Dict[str, Tuple[str, ...]] = {}
+
+
+def _register_tracked_models() -> None:
+    if _TRACKED:
+        return
+    from app.models.appointment import Randevu
+    from app.repositories.patient.models import ShardedPatientDemographics
+    from app.repositories.finance.models import ShardedFinansIslem
+
+    _TRACKED[Randevu] = ("appointment", (
+        "id", "hasta_id", "title", "type", "start", "end", "status", "notes",
+        "doctor_id", "doctor_name", "is_deleted",
+    ))
+    _TRACKED[ShardedPatientDemographics] = ("patient", ("id", "is_deleted"))
+    _TRACKED[ShardedFinansIslem] = ("finance", ("id", "hasta_id", "is_deleted"))
+    _TOPIC_FIELDS.update(_TRACKED.values())
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _snapshot(obj: Any, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    # Sadece yüklü state okunur: flush event'i içinde lazy load (ek SQL) tetiklenmemeli
+    state = sa_inspect(obj).dict
+    return {f: _jsonable(state[f]) for f in fields if f in state}
+
+
+def stage_change(session: Any, topic: str, action: str, data: Dict[str, Any]) -> None:
+    """
+    ORM nesnesi üzerinden geçmeyen değişiklikler (toplu update) için olayı commit'e kadar bekletir.
+    AsyncSession da kabul edilir.
+    """
+    _register_tracked_models()
+    fields = _TOPIC_FIELDS.get(topic)
+    sync_session = getattr(session, "sync_session", session)
+    sync_session.info.setdefault(PENDING_KEY, []).append({
+        "topic": topic, "action": action,
+        "data": {k: _jsonable(v) for k, v in data.items() if fields is None or k in fields},
+    })
+
+
+def _collect_after_flush(session: Session, flush_context: Any) -> None:
+    _register_tracked_models()
+    pending = session.info.setdefault(PENDING_KEY, [])
+    for objects, action in ((session.new, "created"), (session.dirty, "updated"), (session.deleted, "deleted")):
+        for obj in objects:
+            tracked = _TRACKED.get(type(obj))
+            if not tracked:
+                continue
+            if action == "updated" and not session.is_modified(obj, include_collections=False):
+                continue
+            topic, fields = tracked
+            data = _snapshot(obj, fields)
+            if action == "updated" and data.get("is_deleted") in (1, True):
+                action = "deleted"
+            pending.append({"topic": topic, "action": action, "data": data})
+
+
+def _publish_after_commit(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Senkron script / migration bağlamı: dinleyen istemci yok
+    task = loop.create_task(change_feed.publish(_coalesce(pending)))
+    change_feed._tasks.add(task)
+    task.add_done_callback(change_feed._tasks.discard)
+
+
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def _coalesce(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aynı transaction içinde aynı kayda ait birden fazla flush'ı tek (son) olaya indirger."""
+    merged: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    anonymous: List[Dict[str, Any]] = []
+    for ev in events:
+        key_id = ev["data"].get("id")
+        if key_id is None:
+            anonymous.append(ev)
+            continue
+        key = (ev["topic"], key_id)
+        if key in merged:
+            first_action = merged[key]["action"]
+            merged[key]["data"].update(ev["data"])
+            merged[key]["action"] = "created" if first_action == "created" and ev["action"] != "deleted" else ev["action"]
+        else:
+            merged[key] = {"topic": ev["topic"], "action": ev["action"], "data": dict(ev["data"])}
+    return list(merged.values()) + anonymous
+
+
+class Subscriber:
+    def __init__(self, topics: Optional[Set[str]] = None) -> None:
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CHANGE_FEED_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, ev: Dict[str, Any]) -> None:
+        if self.topics and ev["topic"] not in self.topics and ev["topic"] != "reset":
+            return
+        try:
+            self.queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            # İstemci geride kaldı: kuyruğu boşalt, tam yenileme iste
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"seq": ev.get("seq"), "topic": "reset", "action": "reset", "data": {}})
+
+
+class ChangeFeed:
+    def __init__(self) -> None:
+        self._origin = uuid.uuid4().hex
+        self._subscribers: Set[Subscriber] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=settings.CHANGE_FEED_HISTORY)
+        self._local_seq = 0
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._hooks: List[Callable[[Dict[str, Any], bool], Any]] = []
+
+    # --- Lifecycle ---
+    async def start(self) -> None:
+        if not settings.CHANGE_FEED_ENABLED:
+            return
+        try:
+            from redis import asyncio as aioredis
+            redis = aioredis.from_url(
+                f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}", encoding="utf8", decode_responses=True
+            )
+            await redis.ping()
+            self._redis = redis
+            self._listener = asyncio.create_task(self._listen())
+            logger.info(f"Change feed on Redis channel '{settings.CHANGE_FEED_CHANNEL}'")
+        except Exception as e:
+            self._redis = None
+            logger.warning(f"Change feed: Redis unavailable ({e}), using in-process broadcast.")
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def add_hook(self, hook: Callable[[Dict[str, Any], bool], Any]) -> None:
+        """Her olay için çağrılır: hook(event, is_local). Önbellek tazeleme gibi yan etkiler için."""
+        self._hooks.append(hook)
+
+    # --- Publish / Dispatch ---
+    async def publish(self, events: List[Dict[str, Any]]) -> None:
+        if not settings.CHANGE_FEED_ENABLED or not events:
+            return
+        try:
+            from fastapi_cache import FastAPICache
+            await FastAPICache.clear(namespace="dashboard")
+        except Exception:
+            pass  # Cache init edilmemiş olabilir (test / script)
+
+        for ev in events:
+            ev["origin"] = self._origin
+            try:
+                if self._redis is not None:
+                    ev["seq"] = await self._redis.incr(settings.CHANGE_FEED_CHANNEL + SEQ_KEY_SUFFIX)
+                    await self._redis.publish(settings.CHANGE_FEED_CHANNEL, json.dumps(ev))
+                    continue
+            except Exception as e:
+                logger.warning(f"Change feed publish failed, delivering locally: {e}")
+            self._local_seq += 1
+            ev["seq"] = LOCAL_SEQ_BASE + self._local_seq
+            self._dispatch(ev)
+
+    async def _listen(self) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(settings.CHANGE_FEED_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    self._dispatch(json.loads(message["data"]))
+                except (ValueError, KeyError):
+                    continue
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await pubsub.close()
+
+    def _dispatch(self, ev: Dict[str, Any]) -> None:
+        if self._history and _is_local_seq(self._history[-1]["seq"]) != _is_local_seq(ev["seq"]):
+            # Numara kaynağı değişti (Redis <-> process içi): geçmiş tek aralıkta kalır
+            self._history.clear()
+        self._history.append(ev)
+        is_local = ev.get("origin") == self._origin
+        for hook in self._hooks:
+            try:
+                hook(ev, is_local)
+            except Exception as e:
+                logger.warning(f"Change feed hook error: {e}")
+        for sub in list(self._subscribers):
+            sub.offer(ev)
+
+    # --- Subscribe ---
+    def replay_since(self, last_seq: Optional[int]) -> Optional[List[Dict[str, Any]]]:
+        """last_seq'ten sonraki olaylar; geçmiş yetmiyorsa None (istemci tam yenileme yapmalı)."""
+        if last_seq is None:
+            return []
+        if self._history:
+            first, last = self._history[0]["seq"], self._history[-1]["seq"]
+            # Başka aralıktan (failover öncesi / sonrası) veya geçmişin önünden gelen numara da boşluk sayılır
+            if _is_local_seq(last_seq) != _is_local_seq(last) or first > last_seq + 1 or last_seq > last:
+                return None
+        return [ev for ev in self._history if ev["seq"] > last_seq]
+
+    def subscribe(self, topics: Optional[Set[str]] = None) -> Subscriber:
+        sub = Subscriber(topics)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    async def stream(self, sub: Subscriber, heartbeat: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Olayları sırayla verir; heartbeat süresince olay yoksa None verir (keep-alive)."""
+        while True:
+            try:
+                yield await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+
+def _is_local_seq(seq: int) -> bool:
+    return seq >= LOCAL_SEQ_BASE
+
+
+def format_sse(ev: Dict[str, Any]) -> str:
+    payload = {k: v for k, v in ev.items() if k != "origin"}
+    return f"id: {ev.get('seq', '')}\nevent: {ev['topic']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+change_feed = ChangeFeed()
+
+event.listen(Session, "after_flush", _collect_after_flush)
+event.listen(Session, "after_commit", _publish_after_commit)
+event.listen(Session, "after_rollback", _discard_after_rollback)
@@ -1,32 +1,23 @@
+import asyncio
 import json
 from typing import Optional
 from io import BytesIO
 import google.generativeai as genai
 from app.core.config import settings
 from app.schemas.lab_analysis import LabAnalysisResponse, LabTrendRequest, LabTrendResponse, LabDataPoint
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
-from datetime import datetime, date, time
-from app.repositories.clinical.models import ShardedTetkikSonuc
+from datetime import datetime
+from app.repositories.clinical.models import ShardedLabObservation
+from app.services.lab_normalization import (
+    canonical_test_name, convert_unit, lab_test_code, normalize_unit, parse_numeric,
+)
+from app.services.result_cache import result_cache, cache_key
 
-class LabAnalysisService:
-    def __init__(self):
-        self.api_key = settings.GOOGLE_API_KEY
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        else:
-            self.model = None
-
-    async def analyze_lab_file(self, file_content: bytes, mime_type: str) -> LabAnalysisResponse:
-        """
-        Analyzes a lab report file (PDF or Image) and extracts structured data.
-        """
-        if not self.model:
-            raise ValueError("Gemini API key not configured")
+LAB_MODEL_NAME = 'gemini-1.5-flash-latest'
 
-        prompt = """
+LAB_EXTRACTION_PROMPT = """
         You are an expert medical data extractor. 
         Analyze this laboratory report and extract the test results into a structured JSON format.
         
@@ -54,13 +45,48 @@ class LabAnalysisService:
         }
         """
 
+
+class LabAnalysisService:
+    def __init__(self):
+        self.api_key = settings.GOOGLE_API_KEY
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+            self.model = genai.GenerativeModel(LAB_MODEL_NAME)
+        else:
+            self.model = None
+
+    async def analyze_lab_file(self, file_content: bytes, mime_type: str) -> LabAnalysisResponse:
+        """
+        Analyzes a lab report file (PDF or Image) and extracts structured data.
+        Aynı dosya tekrar yüklenirse (çift tıklama, yeniden deneme) önbellekteki sonuç döner.
+        """
+        if not self.model:
+            raise ValueError("Gemini API key not configured")
+
+        key = await cache_key("lab_analysis", file_content, mime_type, LAB_MODEL_NAME, LAB_EXTRACTION_PROMPT)
+
+        live: Dict[str, Any] = {}
+
+        async def compute() -> Dict[str, Any]:
+            result = await self._analyze_lab_file_uncached(file_content, mime_type)
+            live["patient_name"] = result.patient_name
+            # Hasta adı önbelleğe (Redis / disk) yazılmaz: yalnız bu çağrının canlı çıkarımında döner
+            return result.model_dump(mode="json", exclude={"patient_name"})
+
+        data = await result_cache.get_or_compute(key, compute)
+        return LabAnalysisResponse(**{**data, "patient_name": live.get("patient_name")})
+
+    async def _analyze_lab_file_uncached(self, file_content: bytes, mime_type: str) -> LabAnalysisResponse:
+        prompt = LAB_EXTRACTION_PROMPT
+
         try:
             file_part = {
                 "mime_type": mime_type,
                 "data": file_content
             }
 
-            response = self.model.generate_content([prompt, file_part])
+            # Senkron SDK çağrısı: event loop'u bloklamaması için thread'de çalıştırılır
+            response = await asyncio.to_thread(self.model.generate_content, [prompt, file_part])
             
             cleaned_text = response.text.strip()
             if cleaned_text.startswith("```json"):
@@ -83,65 +109,56 @@ class LabAnalysisService:
 
     async def get_lab_trends(self, db: AsyncSession, request: LabTrendRequest) -> List[LabTrendResponse]:
         """
-        Fetch historical lab data from ShardedTetkikSonuc (Clinical Shard) and calculate trends.
+        Trend verisi normalize gözlem tablosundan okunur: (hasta_id, test_code, tarih) index'i üzerinde
+        tek aralık taraması; değerler yazılırken sayıya / kanonik birime çevrilmiştir. Eğim (aylık değişim)
+        tüm seri üzerinden en küçük kareler regresyonudur ve SQL'de regr_slope ile hesaplanır.
         """
-        # Expand test names to include known synonyms for better query coverage
-        expanded_names = []
+        # Test kodu -> istekteki kanonik ad (yanıt sırası isteği izler)
+        codes: Dict[str, str] = {}
         for name in request.test_names:
-            expanded_names.extend(self._get_test_synonyms(name))
-        
-        # Fetch from ShardedTetkikSonuc (New Unified Storage)
-        stmt = select(ShardedTetkikSonuc).where(
-            ShardedTetkikSonuc.hasta_id == request.patient_id,
-            ShardedTetkikSonuc.tetkik_adi.in_(expanded_names),
-            ShardedTetkikSonuc.is_deleted == False
-        ).order_by(ShardedTetkikSonuc.tarih.asc())
+            codes.setdefault(lab_test_code(name), self._normalize_test_name(name))
+
+        obs = ShardedLabObservation
+        days = func.extract("epoch", obs.tarih) / 86400.0
+        stmt = select(
+            obs.test_code,
+            obs.tarih,
+            obs.value,
+            obs.unit,
+            obs.flag,
+            func.regr_slope(obs.value, days).over(partition_by=obs.test_code).label("slope_per_day"),
+        ).where(
+            obs.hasta_id == request.patient_id,
+            obs.test_code.in_(list(codes)),
+        ).order_by(obs.test_code, obs.tarih.asc())
 
         res = await db.execute(stmt)
-        rows = res.scalars().all()
-        
-        # Combine and group by canonical test name
-        grouped_data: Dict[str, List[LabDataPoint]] = {self._normalize_test_name(name): [] for name in request.test_names}
-        
-        for row in rows:
-            val = self._parse_numeric(row.sonuc)
-            canonical_name = self._normalize_test_name(row.tetkik_adi)
-            if val is not None and canonical_name in grouped_data:
-                # Handle potential timezone naive/aware conversion
-                d = row.tarih if row.tarih else datetime.min
-                if isinstance(d, date) and not isinstance(d, datetime):
-                    d = datetime.combine(d, time.min)
 
-                grouped_data[canonical_name].append(LabDataPoint(
-                    value=val,
-                    date=d,
-                    unit=self._normalize_unit(row.birim or ""),
-                    flag=row.sembol
-                ))
-                
+        grouped: Dict[str, List[LabDataPoint]] = {code: [] for code in codes}
+        slopes: Dict[str, float] = {}
+        for row in res.all():
+            grouped[row.test_code].append(LabDataPoint(value=row.value, date=row.tarih, unit=row.unit or "", flag=row.flag))
+            slopes[row.test_code] = float(row.slope_per_day or 0.0) * 30.0
+
         responses = []
-        for test_name, history in grouped_data.items():
+        for code, history in grouped.items():
             if not history:
                 continue
-                
-            # Sort by date
-            history.sort(key=lambda x: x.date)
-            
-            # Normalize all points to the same unit (of the latest result)
+
+            # Kanonik birimi olmayan testlerde seri karışık birimli olabilir: son sonucun birimine çevrilir
             target_unit = history[-1].unit
+            mixed = any(point.unit != target_unit for point in history)
             for point in history:
-                point.value = self._convert_unit(test_name, point.value, point.unit, target_unit)
+                point.value = self._convert_unit(codes[code], point.value, point.unit, target_unit)
                 point.unit = target_unit
+            slope = self._calculate_slope([h.model_dump() for h in history]) if mixed else slopes.get(code, 0.0)
 
-            # Calculate metrics
             current = history[-1]
-            slope = self._calculate_slope([h.model_dump() for h in history])
-            
             # PSA Critical flag removed per user request
             is_critical = False 
             
             responses.append(LabTrendResponse(
-                test_name=test_name,
+                test_name=codes[code],
                 current_value=current.value,
                 unit=current.unit,
                 trend_slope=slope,
@@ -169,92 +186,40 @@ class LabAnalysisService:
 
     def _normalize_test_name(self, test_name: str) -> str:
         """Map raw test name to canonical version"""
-        if not test_name: return ""
-        
-        n = test_name.upper().strip()
-        
-        # PSA Mapping
-        if "SERBEST" in n and "PSA" in n: return "PSA (Serbest)"
-        if "FREE" in n and "PSA" in n: return "PSA (Serbest)"
-        if "FPSA" in n or "SPSA" in n: return "PSA (Serbest)"
-        
-        if "TOTAL" in n and "PSA" in n: return "PSA (Total)"
-        if "TPSA" in n: return "PSA (Total)"
-        if n == "PSA": return "PSA (Total)" # Assume Total if just PSA
-        
-        # Testosterone Mapping
-        if "SERBEST" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Serbest)"
-        if "FREE" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Serbest)"
-        
-        if "TOTAL" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Total)"
-        if n in ["TESTOSTERON", "TESTOSTERONE"]: return "Testosteron (Total)"
-        
-        # Urological Staples
-        if n in ["CREA", "CREATININE", "KREATININ"]: return "Kreatinin"
-        if n in ["UREA", "BUN", "URE", "ÜRE"]: return "Üre"
-        
-        return test_name.strip()
+        return canonical_test_name(test_name)
 
     def _parse_numeric(self, s: Any) -> Optional[float]:
         """Exctract numeric value from string safely"""
-        if s is None: return None
-        try:
-            # Clean: space, comma to dot, remove < > prefixes
-            clean_s = str(s).replace(',', '.').replace('<', '').replace('>', '').strip()
-            # Handle cases like "4.5 ng/ml" - take first part
-            parts = clean_s.split()
-            if parts:
-                return float(parts[0])
-            return None
-        except (ValueError, TypeError):
-            return None
+        return parse_numeric(s)
 
     def _normalize_unit(self, unit: str) -> str:
         """Standardize unit expression"""
-        if not unit: return ""
-        u = unit.lower().strip()
-        mapping = {
-            "ng/ml": "ng/mL",
-            "ng/dl": "ng/dL",
-            "mg/dl": "mg/dL",
-            "ug/l": "µg/L",
-            "u/l": "U/L",
-        }
-        return mapping.get(u, unit)
+        return normalize_unit(unit)
 
     def _convert_unit(self, test_name: str, value: float, from_unit: str, to_unit: str) -> float:
         """Convert values between units if needed"""
-        if not from_unit or not to_unit or from_unit == to_unit:
-            return value
-        
-        # Example: PSA ng/mL to ng/dL (unlikely but for robustness)
-        # 1 ng/mL = 100 ng/dL
-        f = from_unit.lower()
-        t = to_unit.lower()
-        
-        if f == "ng/ml" and t == "ng/dl": return value * 100
-        if f == "ng/dl" and t == "ng/ml": return value / 100
-        
-        return value
+        return convert_unit(value, from_unit, to_unit)
 
     def _calculate_slope(self, data: List[Dict[str, Any]]) -> float:
-        """Calculate slope (unit change per month)"""
-        if len(data) < 2:
-            return 0.0
-        
-        start = data[0]
-        end = data[-1]
-        
-        if not isinstance(start['date'], datetime) or not isinstance(end['date'], datetime):
+        """
+        Calculate slope (unit change per month): tüm noktalar üzerinden en küçük kareler regresyonu
+        (SQL regr_slope ile aynı sonuç; iki noktada uç noktalar arası değişimle aynıdır).
+        """
+        points = [(d['date'], d['value']) for d in data if isinstance(d.get('date'), datetime)]
+        if len(points) < 2:
             return 0.0
-            
-        days = (end['date'] - start['date']).days
-        if days <= 0:
+
+        origin = points[0][0]
+        xs = [(p[0] - origin).total_seconds() / 86400.0 for p in points]
+        ys = [p[1] for p in points]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        sxx = sum((x - mean_x) ** 2 for x in xs)
+        if sxx <= 0:
             return 0.0
-            
-        change = end['value'] - start['value']
+        sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
         # Normalize to monthly change (30 days)
-        return (change / days) * 30.0
+        return (sxy / sxx) * 30.0
 
 # Singleton instance
 _lab_service = LabAnalysisService()
@@ -0,0 +1,166 @@
+"""
+Serbest metin tetkik sonuçlarını sayısal gözlemlere (clinical.sharded_clinical_lab_observations) çevirir.
+
+Yazma anında (ClinicalRepository) ve backfill işinde (maintenance.backfill_lab_observations) aynı
+kurallar kullanılır; trend sorguları ham `sonuc` metnini her çağrıda yeniden ayrıştırmaz.
+- Test adı kanonik ada ve kısa test koduna eşlenir (PSA / TPSA / Total PSA -> PSA_TOTAL).
+- Birim standartlaştırılır; kanonik birimi tanımlı testlerde değer o birime çevrilir.
+- Bayrak referans aralığından (high / low / normal) hesaplanır, yoksa sembol alanı kullanılır.
+"""
+import re
+from datetime import date, datetime, time
+from typing import Any, Dict, Optional, Tuple
+
+# Kanonik ad -> test kodu (tanımsız testlerde kod, kanonik adın büyük harfli halidir)
+TEST_CODES: Dict[str, str] = {
+    "PSA (Total)": "PSA_TOTAL",
+    "PSA (Serbest)": "PSA_FREE",
+    "Testosteron (Total)": "TESTO_TOTAL",
+    "Testosteron (Serbest)": "TESTO_FREE",
+    "Kreatinin": "CREA",
+    "Üre": "UREA",
+}
+
+# Değerlerin saklandığı birim (farklı birimle gelen sonuç çevrilir)
+CANONICAL_UNITS: Dict[str, str] = {
+    "PSA_TOTAL": "ng/mL",
+    "PSA_FREE": "ng/mL",
+    "CREA": "mg/dL",
+    "UREA": "mg/dL",
+}
+
+_UNIT_ALIASES = {
+    "ng/ml": "ng/mL",
+    "ng/dl": "ng/dL",
+    "mg/dl": "mg/dL",
+    "ug/l": "µg/L",
+    "u/l": "U/L",
+}
+
+_CONVERSIONS: Dict[Tuple[str, str], float] = {
+    ("ng/mL", "ng/dL"): 100.0,
+    ("ng/dL", "ng/mL"): 0.01,
+    ("µg/L", "ng/mL"): 1.0,
+    ("ng/mL", "µg/L"): 1.0,
+}
+
+_RANGE_RE = re.compile(r"^\s*(-?\d+(?:[.,]\d+)?)\s*[-–]\s*(-?\d+(?:[.,]\d+)?)\s*$")
+_UPPER_RE = re.compile(r"^\s*(?:<|<=|≤)\s*(-?\d+(?:[.,]\d+)?)\s*$")
+_LOWER_RE = re.compile(r"^\s*(?:>|>=|≥)\s*(-?\d+(?:[.,]\d+)?)\s*$")
+
+TEST_CODE_MAX_LENGTH = 50
+
+
+def canonical_test_name(test_name: Optional[str]) -> str:
+    """Map raw test name to canonical version"""
+    if not test_name: return ""
+
+    n = test_name.upper().strip()
+
+    # PSA Mapping
+    if "SERBEST" in n and "PSA" in n: return "PSA (Serbest)"
+    if "FREE" in n and "PSA" in n: return "PSA (Serbest)"
+    if "FPSA" in n or "SPSA" in n: return "PSA (Serbest)"
+
+    if "TOTAL" in n and "PSA" in n: return "PSA (Total)"
+    if "TPSA" in n: return "PSA (Total)"
+    if n == "PSA": return "PSA (Total)" # Assume Total if just PSA
+
+    # Testosterone Mapping
+    if "SERBEST" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Serbest)"
+    if "FREE" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Serbest)"
+
+    if "TOTAL" in n and ("TESTO" in n or "TESTOSTERON" in n): return "Testosteron (Total)"
+    if n in ["TESTOSTERON", "TESTOSTERONE"]: return "Testosteron (Total)"
+
+    # Urological Staples
+    if n in ["CREA", "CREATININE", "KREATININ"]: return "Kreatinin"
+    if n in ["UREA", "BUN", "URE", "ÜRE"]: return "Üre"
+
+    return test_name.strip()
+
+
+def lab_test_code(test_name: Optional[str]) -> str:
+    canonical = canonical_test_name(test_name)
+    return TEST_CODES.get(canonical, canonical.upper())[:TEST_CODE_MAX_LENGTH]
+
+
+def parse_numeric(s: Any) -> Optional[float]:
+    """Exctract numeric value from string safely"""
+    if s is None: return None
+    try:
+        # Clean: space, comma to dot, remove < > prefixes
+        clean_s = str(s).replace(',', '.').replace('<', '').replace('>', '').strip()
+        # Handle cases like "4.5 ng/ml" - take first part
+        parts = clean_s.split()
+        if parts:
+            return float(parts[0])
+        return None
+    except (ValueError, TypeError):
+        return None
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    """Standardize unit expression"""
+    if not unit: return ""
+    return _UNIT_ALIASES.get(unit.lower().strip(), unit.strip())
+
+
+def convert_unit(value: float, from_unit: str, to_unit: str) -> float:
+    """Convert values between units if needed (bilinmeyen dönüşümde değer aynen döner)"""
+    if not from_unit or not to_unit or from_unit == to_unit:
+        return value
+    factor = _CONVERSIONS.get((normalize_unit(from_unit), normalize_unit(to_unit)))
+    return value * factor if factor is not None else value
+
+
+def _bound(raw: str) -> float:
+    return float(raw.replace(",", "."))
+
+
+def reference_flag(value: float, reference: Optional[str], sembol: Optional[str] = None) -> Optional[str]:
+    """'high' / 'low' / 'normal' (referans aralığı çözülemezse sembol alanı)."""
+    if reference:
+        match = _RANGE_RE.match(reference)
+        if match:
+            lo, hi = _bound(match.group(1)), _bound(match.group(2))
+            return "high" if value > hi else "low" if value < lo else "normal"
+        match = _UPPER_RE.match(reference)
+        if match:
+            return "high" if value > _bound(match.group(1)) else "normal"
+        match = _LOWER_RE.match(reference)
+        if match:
+            return "low" if value < _bound(match.group(1)) else "normal"
+    return sembol or None
+
+
+def observation_from_tetkik(row: Any) -> Optional[dict]:
+    """
+    ShardedTetkikSonuc satırından (nesne veya dict) gözlem satırı üretir.
+    Sayısal olmayan (görüntüleme, serbest metin) veya tarihsiz sonuçlar için None döner.
+    """
+    get = row.get if isinstance(row, dict) else (lambda key: getattr(row, key, None))
+    value = parse_numeric(get("sonuc"))
+    tarih = get("tarih")
+    if value is None or tarih is None or not get("tetkik_adi"):
+        return None
+    if isinstance(tarih, date) and not isinstance(tarih, datetime):
+        tarih = datetime.combine(tarih, time.min)
+
+    code = lab_test_code(get("tetkik_adi"))
+    unit = normalize_unit(get("birim"))
+    flag = reference_flag(value, get("referans_araligi"), get("sembol"))
+    # Bayrak orijinal birimdeki referansla hesaplandı; değer sonra kanonik birime çevrilir
+    target = CANONICAL_UNITS.get(code)
+    if target and unit != target and (unit, target) in _CONVERSIONS:
+        value, unit = convert_unit(value, unit, target), target
+
+    return {
+        "tetkik_id": get("id"),
+        "hasta_id": get("hasta_id"),
+        "test_code": code,
+        "tarih": tarih,
+        "value": value,
+        "unit": unit or target or "",
+        "flag": flag,
+    }
@@ -15,22 +15,36 @@ class ClinicalOrchestrator:
         self.patient_repo = DemographicsRepository(db, context)
         self.context = context
 
-    async def get_patient_clinical_history(self, patient_id: UUID) -> dict:
+    async def get_patient_clinical_history(self, patient_id: UUID, summary: bool = False) -> dict:
         """
         Aggregates examinations, operations, notes, and tetkikler from the clinical shard.
         Also promotes tagged notes (e.g. MUAYENE:, GENEL LAB:) to respective categories.
+        summary=True: muayene/operasyonlar sadece liste kolonlarıyla yüklenir (detay ayrı endpoint'ten).
         """
         # Ensure patient exists
         patient = await self.patient_repo.get_by_id(patient_id)
         if not patient:
             return {"error": "Patient not found"}
 
-        exams = await self.clinical_repo.get_examinations_by_patient(patient_id)
-        ops = await self.clinical_repo.get_operations_by_patient(patient_id)
+        exams = await self.clinical_repo.get_examinations_by_patient(patient_id, summary=summary)
+        ops = await self.clinical_repo.get_operations_by_patient(patient_id, summary=summary)
         all_notes = await self.clinical_repo.get_notes_by_patient(patient_id)
         imagings = await self.clinical_repo.get_tetkikler_by_patient(patient_id, kategori="Goruntuleme")
         labs = await self.clinical_repo.get_tetkikler_by_patient(patient_id, kategori="Laboratuvar")
 
+        return {
+            "patient_id": str(patient_id),
+            "patient_name": f"{patient.ad} {patient.soyad}",
+            **self.assemble_clinical_history(exams, ops, all_notes, imagings, labs)
+        }
+
+    def assemble_clinical_history(self, exams: list, ops: list, all_notes: list, imagings: list, labs: list) -> dict:
+        """
+        Yüklenmiş kayıtlardan klinik geçmişi kurar (etiketli notların terfisi + tarih sıralaması).
+        Sorgu çalıştırmaz; hasta çalışma alanı da aynı kuralları kullanır.
+        """
+        exams, labs, imagings = list(exams), list(labs), list(imagings)
+
         # Promotion logic for legacy tagged notes
         final_notes = []
         for note in all_notes:
@@ -68,10 +82,8 @@ class ClinicalOrchestrator:
         imagings.sort(key=safe_sort_key, reverse=True)
 
         return {
-            "patient_id": str(patient_id),
-            "patient_name": f"{patient.ad} {patient.soyad}",
             "examinations": exams,
-            "operations": ops,
+            "operations": list(ops),
             "notes": final_notes,
             "imagings": imagings,
             "labs": labs
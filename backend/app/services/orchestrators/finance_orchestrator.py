@@ -7,6 +7,7 @@ from app.repositories.finance.income_repository import IncomeRepository
 from app.repositories.finance.expense_repository import ExpenseRepository
 from app.repositories.patient.demographics_repository import DemographicsRepository
 from app.core.user_context import UserContext
+from app.services.change_feed import stage_change
 
 class FinanceOrchestrator:
     def __init__(self, db: AsyncSession, context: Optional[UserContext] = None):
@@ -105,6 +106,7 @@ class FinanceOrchestrator:
             .where(ShardedFinansIslem.id == tx_id)
             .values(durum='iptal', updated_by=self.context.user_id if self.context else None)
         )
+        stage_change(self.db, "finance", "updated", {"id": tx_id, "durum": "iptal"})
         await self.db.commit()
 
     async def delete_transaction(self, tx_id: int):
@@ -115,4 +117,5 @@ class FinanceOrchestrator:
             .where(ShardedFinansIslem.id == tx_id)
             .values(is_deleted=True, updated_by=self.context.user_id if self.context else None)
         )
+        stage_change(self.db, "finance", "deleted", {"id": tx_id})
         await self.db.commit()
@@ -27,7 +27,8 @@ class PatientOrchestrator:
         Matches PatientResponse schema.
         """
         patient_task = self.demographics_repo.get_by_id(patient_id)
-        clinical_task = self.clinical_repo.get_examinations_by_patient(patient_id)
+        # Profil sadece son muayeneyi gösterir; tüm geçmişi tam kolonlarla çekmeye gerek yok
+        clinical_task = self.clinical_repo.get_examinations_by_patient(patient_id, limit=1)
         
         results = await asyncio.gather(patient_task, clinical_task, return_exceptions=True)
         
@@ -6,15 +6,20 @@ Implements graceful degradation - continues with partial data if a shard fails.
 """
 import asyncio
 import logging
-from typing import Optional, List, Tuple, Any
+from collections import defaultdict
+from typing import Dict, Optional, List, Tuple, Any
 from uuid import UUID
 from datetime import datetime
 
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.patient.demographics_repository import DemographicsRepository
 from app.repositories.clinical.repository import ClinicalRepository
 from app.repositories.finance.income_repository import IncomeRepository
+from app.repositories.patient.models import ShardedPatientDemographics
+from app.repositories.clinical.models import ShardedMuayene
+from app.repositories.finance.models import ShardedFinansIslem
 from app.core.user_context import UserContext
 from app.schemas.patient_report import (
     PatientReportDTO,
@@ -100,59 +105,85 @@ class ReportOrchestrator:
             generated_at=datetime.now()
         )
 
+    async def get_patient_reports(self, patient_ids: List[UUID]) -> Dict[UUID, PatientReportDTO]:
+        """
+        Toplu rapor verisi: hasta başına orkestratör çağrısı yerine shard başına tek IN sorgusu.
+        Bulunamayan (veya silinmiş) hastalar sonuçta yer almaz. Bir shard hata verirse tekil
+        raporla aynı şekilde ilgili bölüm boş kalır ve tüm raporlara uyarı eklenir.
+        Sorgular aynı session üzerinde sırayla çalışır (AsyncSession eşzamanlı kullanılamaz).
+        """
+        warnings: List[str] = []
+        generated_at = datetime.now()
+
+        patients = await self.patient_repo.get_by_ids(patient_ids)
+        found = [p.id for p in patients]
+        if not found:
+            return {}
+
+        exams_by_patient: Dict[UUID, List[ExaminationSummary]] = defaultdict(list)
+        try:
+            for e in await self.clinical_repo.get_examinations_for_patients(found):
+                exams_by_patient[e.hasta_id].append(self._to_examination(e))
+        except Exception as e:
+            logger.error(f"Failed to fetch examinations for {len(found)} patients: {e}")
+            warnings.append("Muayene geçmişi alınamadı")
+
+        txs_by_patient: Optional[Dict[UUID, list]] = defaultdict(list)
+        try:
+            for tx in await self.income_repo.get_transactions_for_patients(found):
+                txs_by_patient[tx.hasta_id].append(tx)
+        except Exception as e:
+            logger.error(f"Failed to fetch finance for {len(found)} patients: {e}")
+            warnings.append("Finansal bilgiler alınamadı")
+            txs_by_patient = None
+
+        return {
+            p.id: PatientReportDTO(
+                demographics=self._to_demographics(p),
+                examinations=exams_by_patient.get(p.id, []),
+                lab_results=[],
+                finance_summary=self._summarize_finance(txs_by_patient.get(p.id, [])) if txs_by_patient is not None else None,
+                warnings=list(warnings),
+                generated_at=generated_at
+            )
+            for p in patients
+        }
+
+    async def get_report_revision(self, patient_id: UUID) -> Tuple[Any, ...]:
+        """
+        Raporu besleyen verinin ucuz özeti (PDF ETag / önbellek anahtarı), tek sorguda:
+        tablo başına aktif kayıt sayısı ve en son değişiklik zamanı. Soft delete updated_at'i
+        güncellediği, hard delete de sayıyı düşürdüğü için ikisi de revizyonu değiştirir.
+        """
+        parts = []
+        for model, key in (
+            (ShardedPatientDemographics, ShardedPatientDemographics.id),
+            (ShardedMuayene, ShardedMuayene.hasta_id),
+            (ShardedFinansIslem, ShardedFinansIslem.hasta_id),
+        ):
+            parts.append(
+                select(func.count(model.id).filter(model.is_deleted == False))
+                .where(key == patient_id).scalar_subquery()
+            )
+            parts.append(
+                select(func.max(func.coalesce(model.updated_at, model.created_at)))
+                .where(key == patient_id).scalar_subquery()
+            )
+        result = await self.db.execute(select(*parts))
+        return tuple(result.one())
+
     async def _fetch_demographics(self, patient_id: UUID) -> Optional[PatientDemographics]:
         """Fetch patient demographics from Patient shard."""
         patient = await self.patient_repo.get_by_id(patient_id)
         if not patient:
             return None
         
-        return PatientDemographics(
-            id=patient.id,
-            tc_kimlik=patient.tc_kimlik,
-            ad=patient.ad,
-            soyad=patient.soyad,
-            cinsiyet=patient.cinsiyet,
-            dogum_tarihi=patient.dogum_tarihi,
-            dogum_yeri=patient.dogum_yeri,
-            kan_grubu=patient.kan_grubu,
-            medeni_hal=patient.medeni_hal,
-            meslek=patient.meslek,
-            cocuk_sayisi=patient.cocuk_sayisi,
-            
-            # Contact
-            cep_tel=patient.cep_tel,
-            ev_tel=patient.ev_tel,
-            is_tel=patient.is_tel,
-            email=patient.email,
-            adres=patient.adres,
-            ilce=getattr(patient, 'ilce', None), # Should check if model has this
-            sehir=getattr(patient, 'sehir', None),
-            postakodu=patient.postakodu,
-            
-            # Institution
-            kurum=patient.kurum,
-            sigorta=patient.sigorta,
-            ozelsigorta=patient.ozelsigorta,
-            protokol_no=patient.protokol_no
-        )
+        return self._to_demographics(patient)
 
     async def _fetch_examinations(self, patient_id: UUID) -> List[ExaminationSummary]:
         """Fetch examination history from Clinical shard."""
         exams = await self.clinical_repo.get_examinations_by_patient(patient_id)
-        
-        return [
-            ExaminationSummary(
-                id=e.id,
-                tarih=e.tarih,
-                doktor=e.doktor,
-                sikayet=e.sikayet,
-                on_tani=e.tani1,
-                kesin_tani=e.tani_kesin,
-                ipss_skor=self._calculate_ipss(e),
-                iief_skor=self._calculate_iief(e)
-            )
-            for e in exams
-        ]
+        return [self._to_examination(e) for e in exams]
 
     async def _fetch_lab_results(self, patient_id: UUID) -> List[LabResultSummary]:
         """Fetch lab results from Clinical shard."""
@@ -180,23 +211,72 @@ class ReportOrchestrator:
             # We use income_repo to fetch transactions. 
             # Note: get_patient_transactions handles income/expense aggregating in the new shard if needed.
             txs = await self.income_repo.get_patient_transactions(patient_id)
-            
-            total_income = sum(float(tx.net_tutar or 0) for tx in txs if tx.islem_tipi == 'gelir')
-            total_expense = sum(float(tx.net_tutar or 0) for tx in txs if tx.islem_tipi == 'gider')
-            
-            last_payment = next((tx for tx in txs if tx.islem_tipi == 'gelir'), None)
-            
-            return FinanceSummary(
-                total_income=total_income,
-                total_expense=total_expense,
-                balance=total_income - total_expense,
-                last_payment_date=last_payment.tarih if last_payment else None,
-                pending_services=[]
-            )
+            return self._summarize_finance(txs)
         except Exception as e:
             logger.warning(f"Finance fetch failed: {e}")
             raise
 
+    # --- Mapping (tekil ve toplu rapor ortak) ---
+    @staticmethod
+    def _to_demographics(patient: Any) -> PatientDemographics:
+        return PatientDemographics(
+            id=patient.id,
+            tc_kimlik=patient.tc_kimlik,
+            ad=patient.ad,
+            soyad=patient.soyad,
+            cinsiyet=patient.cinsiyet,
+            dogum_tarihi=patient.dogum_tarihi,
+            dogum_yeri=patient.dogum_yeri,
+            kan_grubu=patient.kan_grubu,
+            medeni_hal=patient.medeni_hal,
+            meslek=patient.meslek,
+            cocuk_sayisi=patient.cocuk_sayisi,
+            
+            # Contact
+            cep_tel=patient.cep_tel,
+            ev_tel=patient.ev_tel,
+            is_tel=patient.is_tel,
+            email=patient.email,
+            adres=patient.adres,
+            ilce=getattr(patient, 'ilce', None), # Should check if model has this
+            sehir=getattr(patient, 'sehir', None),
+            postakodu=patient.postakodu,
+            
+            # Institution
+            kurum=patient.kurum,
+            sigorta=patient.sigorta,
+            ozelsigorta=patient.ozelsigorta,
+            protokol_no=patient.protokol_no
+        )
+
+    def _to_examination(self, e: Any) -> ExaminationSummary:
+        return ExaminationSummary(
+            id=e.id,
+            tarih=e.tarih,
+            doktor=e.doktor,
+            sikayet=e.sikayet,
+            on_tani=e.tani1,
+            kesin_tani=e.tani_kesin,
+            ipss_skor=self._calculate_ipss(e),
+            iief_skor=self._calculate_iief(e)
+        )
+
+    @staticmethod
+    def _summarize_finance(txs: List[Any]) -> FinanceSummary:
+        # txs tarih desc sıralı: ilk gelir kaydı son ödemedir
+        total_income = sum(float(tx.net_tutar or 0) for tx in txs if tx.islem_tipi == 'gelir')
+        total_expense = sum(float(tx.net_tutar or 0) for tx in txs if tx.islem_tipi == 'gider')
+        
+        last_payment = next((tx for tx in txs if tx.islem_tipi == 'gelir'), None)
+        
+        return FinanceSummary(
+            total_income=total_income,
+            total_expense=total_expense,
+            balance=total_income - total_expense,
+            last_payment_date=last_payment.tarih if last_payment else None,
+            pending_services=[]
+        )
+
     def _calculate_ipss(self, exam: Any) -> Optional[int]:
         """Calculate IPSS score from examination fields."""
         try:
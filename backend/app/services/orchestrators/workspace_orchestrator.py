@@ -0,0 +1,179 @@
+"""
+Patient Workspace Orchestrator
+
+Hasta açılışında ekranın ihtiyaç duyduğu tüm bölümleri (profil, sayılar, zaman çizelgesi ve
+klinik listeler) tek istekte döner.
+
+- Her bölüm grubu havuzdan ayrı bir bağlantıyla eşzamanlı çalışır (AsyncSession paylaşılamaz);
+  eşzamanlılık PATIENT_WORKSPACE_CONCURRENCY ile sınırlanır.
+- Klinik listeler ortak temel sorgulardan kurulur: muayene / operasyon / not / tetkik en fazla
+  birer kez okunur (ayrı uç noktalar muayeneler ve operasyonlar için geçmişi ikişer kez yükler).
+- limit SQL'e iner: her kaynak en yeni N kayıtla okunur; birleşik listeler (muayene + terfi eden
+  notlar, takip) birleştirmeden sonra tekrar N'e kesilir.
+- Bir bölüm hata verirse diğerleri döner, hata warnings listesine eklenir (ReportOrchestrator gibi).
+- Bölüm okumaları erişim kaydı yazmaz; çağıran taraf açılış başına tek PATIENT_VIEW kaydı tutar.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.clinical.repository import ClinicalRepository
+from app.repositories.patient.stats_repository import PatientStatsRepository
+from app.repositories.patient.timeline_repository import PatientTimelineRepository
+from app.schemas.clinical import (
+    MuayeneResponse, MuayeneListItem, OperasyonResponse, OperasyonListItem,
+    HastaNotuResponse, FotografResponse, TetkikSonucResponse,
+)
+from app.services.orchestrators.clinical_orchestrator import ClinicalOrchestrator
+
+logger = logging.getLogger(__name__)
+
+# Bölüm -> ayrı uç nokta karşılığı (yanıt şekilleri aynıdır)
+WORKSPACE_SECTIONS = (
+    "patient",       # GET /patients/{id}
+    "counts",        # GET /patients/{id}/counts
+    "timeline",      # GET /patients/{id}/timeline
+    "muayeneler",    # GET /clinical/patients/{id}/muayeneler
+    "operasyonlar",  # GET /clinical/patients/{id}/operasyonlar
+    "takip",         # GET /clinical/patients/{id}/takip
+    "photos",        # GET /clinical/patients/{id}/photos
+    "imagings",      # GET /clinical/patients/{id}/imagings
+    "labs",          # GET /clinical/patients/{id}/labs
+)
+CLINICAL_SECTIONS = ("muayeneler", "operasyonlar", "takip", "imagings", "labs")
+
+_SECTION_WARNINGS = {
+    "patient": "Hasta bilgileri alınamadı",
+    "counts": "Kayıt sayıları alınamadı",
+    "timeline": "Zaman çizelgesi alınamadı",
+    "clinical": "Klinik kayıtlar alınamadı",
+    "photos": "Fotoğraflar alınamadı",
+}
+
+
+def parse_sections(raw: Optional[str]) -> List[str]:
+    """'muayeneler,labs' -> sıralı bölüm listesi; boş -> tümü. Bilinmeyen bölümde ValueError."""
+    if not raw:
+        return list(WORKSPACE_SECTIONS)
+    requested = {s.strip() for s in raw.split(",") if s.strip()}
+    unknown = requested.difference(WORKSPACE_SECTIONS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen bölüm: {', '.join(sorted(unknown))}")
+    return [s for s in WORKSPACE_SECTIONS if s in requested]
+
+
+def _page(rows: list, limit: Optional[int]) -> list:
+    return rows[:limit] if limit else rows
+
+
+class PatientWorkspaceOrchestrator:
+    def __init__(self, session_factory: Callable[[], Any] = SessionLocal, concurrency: Optional[int] = None):
+        self._session_factory = session_factory
+        self._semaphore = asyncio.Semaphore(concurrency or settings.PATIENT_WORKSPACE_CONCURRENCY)
+
+    async def get_workspace(
+        self, patient_id: UUID, sections: Iterable[str], summary: bool = True, limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        İstenen bölümleri {bölüm: veri} olarak döner; ek olarak her zaman "warnings" anahtarı bulunur.
+        summary: muayene / operasyon listeleri liste kolonlarıyla (ayrı uç noktalardaki view=summary).
+        limit: liste bölümlerinde en yeni N kayıt (sayfa boyutu); sayım için counts bölümü kullanılır.
+        """
+        sections = [s for s in WORKSPACE_SECTIONS if s in set(sections)]
+        groups: Dict[str, Callable[[Any], Any]] = {}
+        if "patient" in sections:
+            groups["patient"] = lambda db: self._load_patient(db, patient_id)
+        if "counts" in sections:
+            groups["counts"] = lambda db: PatientStatsRepository(db).get_counts(patient_id)
+        if "timeline" in sections:
+            groups["timeline"] = lambda db: PatientTimelineRepository(db).get_timeline(patient_id)
+        clinical = [s for s in sections if s in CLINICAL_SECTIONS]
+        if clinical:
+            groups["clinical"] = lambda db: self._load_clinical(db, patient_id, clinical, summary, limit)
+        if "photos" in sections:
+            groups["photos"] = lambda db: self._load_photos(db, patient_id, limit)
+
+        names = list(groups)
+        results = await asyncio.gather(*(self._run(groups[n]) for n in names), return_exceptions=True)
+
+        workspace: Dict[str, Any] = {}
+        warnings: List[str] = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Workspace section '{name}' failed for patient {patient_id}: {result}")
+                warnings.append(_SECTION_WARNINGS[name])
+                continue
+            if name == "clinical":
+                workspace.update(result)
+            else:
+                workspace[name] = result
+
+        ordered = {s: workspace[s] for s in sections if s in workspace}
+        ordered["warnings"] = warnings
+        return ordered
+
+    async def _run(self, loader: Callable[[Any], Any]) -> Any:
+        async with self._semaphore:
+            async with self._session_factory() as db:
+                return await loader(db)
+
+    async def _load_patient(self, db, patient_id: UUID) -> Any:
+        from app.controllers.legacy_adapters.patient_controller import PatientController
+        # Context verilmez: erişim kaydı çalışma alanı başına bir kez, çağıran tarafta yazılır
+        return await PatientController(db).get_patient_profile(patient_id)
+
+    async def _load_photos(self, db, patient_id: UUID, limit: Optional[int]) -> list:
+        rows = await ClinicalRepository(db).get_photos_by_patient(patient_id, limit=limit)
+        return [FotografResponse.model_validate(r) for r in rows]
+
+    async def _load_clinical(
+        self, db, patient_id: UUID, sections: List[str], summary: bool, limit: Optional[int]
+    ) -> Dict[str, list]:
+        repo = ClinicalRepository(db)
+        wanted = set(sections)
+
+        # Takip, muayene öyküsünü (oyku) kullandığından o durumda muayeneler tam kolonla okunur
+        exams: list = []
+        if wanted & {"muayeneler", "takip"}:
+            exams = await repo.get_examinations_by_patient(
+                patient_id, summary=summary and "takip" not in wanted, limit=limit
+            )
+        ops: list = []
+        if "operasyonlar" in wanted:
+            ops = await repo.get_operations_by_patient(patient_id, summary=summary, limit=limit)
+        # Notlar takip listesinde ve etiketli notların muayeneye terfisinde kullanılır
+        notes: list = []
+        if wanted & {"muayeneler", "takip"}:
+            notes = await repo.get_notes_by_patient(patient_id, limit=limit)
+        # Görüntüleme + laboratuvar: limitsiz tek sorgu (tarih sıralı), kategoriye göre ayrılır;
+        # limit varsa en yeni N her kategori için ayrı kesilmelidir
+        tetkikler: list = []
+        if limit:
+            for section, kategori in (("imagings", "Goruntuleme"), ("labs", "Laboratuvar")):
+                if section in wanted:
+                    tetkikler.extend(await repo.get_tetkikler_by_patient(patient_id, kategori=kategori, limit=limit))
+        elif wanted & {"imagings", "labs"}:
+            tetkikler = await repo.get_tetkikler_by_patient(patient_id)
+
+        history = ClinicalOrchestrator(db).assemble_clinical_history(exams, ops, notes, [], [])
+
+        exam_schema = MuayeneListItem if summary else MuayeneResponse
+        op_schema = OperasyonListItem if summary else OperasyonResponse
+        out: Dict[str, list] = {}
+        if "muayeneler" in wanted:
+            out["muayeneler"] = [exam_schema.model_validate(r) for r in _page(history["examinations"], limit)]
+        if "operasyonlar" in wanted:
+            out["operasyonlar"] = [op_schema.model_validate(r) for r in history["operations"]]
+        if "takip" in wanted:
+            takip = repo.combine_takip(notes, exams)
+            out["takip"] = [HastaNotuResponse.model_validate(r) for r in _page(takip, limit)]
+        if "imagings" in wanted:
+            imagings = [t for t in tetkikler if t.kategori == "Goruntuleme"]
+            out["imagings"] = [TetkikSonucResponse.model_validate(r) for r in imagings]
+        if "labs" in wanted:
+            labs = [t for t in tetkikler if t.kategori == "Laboratuvar"]
+            out["labs"] = [TetkikSonucResponse.model_validate(r) for r in labs]
+        return out
@@ -0,0 +1,82 @@
+"""
+Hasta bazlı revizyon: koşullu GET (ETag / 304) ve ?since=<rev> delta modu.
+
+patient.sharded_patient_revisions hasta, klinik, finans, randevu ve doküman tablolarındaki her
+yazımda veritabanı trigger'larıyla artar (uygulama dışı yazımlar dahil). Revizyon ETag'i kullanan
+bir yanıt yeni bir tablo okumaya başlarsa o tablo da migration'daki TRACKED_TABLES'a eklenmelidir. Hasta ekranındaki uç noktalar
+önce bu tek satırı okur; revizyon değişmediyse veri sorgusu ve serileştirme hiç çalışmaz.
+
+Revizyon mikro saniye cinsinden zaman damgasıdır: since parametresi bir zamana çevrilir ve
+o andan (PATIENT_DELTA_OVERLAP_SECONDS kadar geriden) sonra değişen kayıtlar döner.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Union
+from uuid import UUID
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.patient.models import ShardedPatientRevision
+from app.utils.http_cache import etag_matches, make_etag
+
+REVISION_HEADER = "X-Patient-Revision"
+DELETED_IDS_HEADER = "X-Deleted-Ids"
+CACHE_CONTROL = "private, no-cache"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# ?since üst sınırı (datetime.max, mikro saniye); üstü 422, OverflowError'a ulaşmaz
+MAX_SINCE = (datetime.max.replace(tzinfo=timezone.utc) - EPOCH) // timedelta(microseconds=1)
+
+
+def _as_uuid(hasta_id: Union[str, UUID]) -> Optional[UUID]:
+    if isinstance(hasta_id, UUID):
+        return hasta_id
+    try:
+        return UUID(str(hasta_id))
+    except (TypeError, ValueError):
+        return None
+
+
+async def get_patient_revision(db: AsyncSession, hasta_id: Union[str, UUID]) -> int:
+    """Tek PK okuması; hiç yazım görmemiş hasta için 0."""
+    pid = _as_uuid(hasta_id)
+    if pid is None:
+        return 0
+    res = await db.execute(select(ShardedPatientRevision.revision).where(ShardedPatientRevision.hasta_id == pid))
+    return res.scalar() or 0
+
+
+def revision_etag(resource: str, hasta_id: Any, revision: int, *variant: Any) -> str:
+    """Strong ETag: aynı revizyonda yanıt bayt bayt aynıdır."""
+    return make_etag("patient", resource, hasta_id, revision, *variant, weak=False)
+
+
+def since_datetime(since: int) -> datetime:
+    """?since revizyonunu (mikro saniye) overlap payı düşülmüş UTC zamana çevirir."""
+    moment = EPOCH + timedelta(microseconds=min(since, MAX_SINCE))
+    overlap = timedelta(seconds=settings.PATIENT_DELTA_OVERLAP_SECONDS)
+    return moment - overlap if moment - EPOCH > overlap else EPOCH
+
+
+async def conditional_get(
+    request: Request, response: Response, db: AsyncSession,
+    hasta_id: Union[str, UUID], resource: str, *variant: Any
+) -> Optional[Response]:
+    """
+    ETag / revizyon başlıklarını yanıta yazar; If-None-Match eşleşirse 304 yanıtını döner.
+
+    Example:
+        not_modified = await conditional_get(request, response, db, hasta_id, "labs")
+        if not_modified is not None:
+            return not_modified
+    """
+    revision = await get_patient_revision(db, hasta_id)
+    etag = revision_etag(resource, hasta_id, revision, *variant)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, REVISION_HEADER: str(revision)}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
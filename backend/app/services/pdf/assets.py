@@ -0,0 +1,153 @@
+"""
+PDF render varlıkları (font, logo) için process-wide önbellek.
+
+Her belge için font dosyalarını yeniden aramak / okumak ve her wrap_text çağrısında yeni bir
+fitz.Font açmak yerine:
+- Font ve logo baytları process başına bir kez yüklenir (render worker'ları dahil).
+- Metin ölçümü, karakter başına 1pt genişlik tablosundan (glyph advance) yapılır; toplam * fontsize.
+- Metin, sayfa başına renk bazlı fitz.TextWriter'larda toplanır ve sayfa bitince tek seferde
+  yazılır (her insert_text çağrısı için ayrı Shape / font kaydı yok).
+- Logo bir kez decode edilip sayfadaki boyutuna küçültülür (pixmap -> PNG); belge içinde ilk
+  sayfada eklenir, sonraki sayfalarda xref ile tekrar kullanılır.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+import fitz
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../assets/branding"))
+
+# Tabloya önceden yüklenen karakterler (ASCII + Türkçe); diğerleri ilk kullanımda eklenir
+_PRELOAD_CHARS = "".join(chr(c) for c in range(32, 127)) + "çÇğĞıİöÖşŞüÜâÂîÎûÛ•–—…₺°±µ²³"
+
+
+class GlyphWidths:
+    """Karakter -> 1pt'deki genişlik tablosu (kerning yok; fitz ölçümüyle aynı sonuç)."""
+
+    def __init__(self, measure: Callable[[str], float]):
+        self._measure_char = measure
+        self._widths: Dict[str, float] = {}
+        for ch in _PRELOAD_CHARS:
+            self._measure(ch)
+
+    def _measure(self, ch: str) -> float:
+        width = self._widths[ch] = self._measure_char(ch)
+        return width
+
+    def text_length(self, text: str, fontsize: float) -> float:
+        widths = self._widths
+        total = 0.0
+        for ch in text:
+            width = widths.get(ch)
+            total += width if width is not None else self._measure(ch)
+        return total * fontsize
+
+
+@dataclass(frozen=True)
+class PDFAssets:
+    font_path: Optional[str]
+    bold_font_path: Optional[str]
+    font_bytes: Optional[bytes]
+    bold_font_bytes: Optional[bytes]
+    logo_bytes: Optional[bytes]
+    # Sayfadaki boyutuna (~100x40pt) göre küçültülmüş logo; her PDF'e orijinal 1024px görüntü gömülmez
+    logo_png: Optional[bytes]
+
+
+# Logo en fazla bu genişliğe (px) küçültülür (~100pt genişlikte ~250 dpi)
+LOGO_MAX_WIDTH_PX = 300
+
+
+def _prepare_logo(data: Optional[bytes]) -> Optional[bytes]:
+    if not data:
+        return None
+    try:
+        pixmap = fitz.Pixmap(data)
+        shrink = 0
+        while (pixmap.width >> (shrink + 1)) >= LOGO_MAX_WIDTH_PX // 2 and (pixmap.width >> shrink) > LOGO_MAX_WIDTH_PX:
+            shrink += 1
+        if shrink:
+            pixmap.shrink(shrink)
+        return pixmap.tobytes("png")
+    except Exception as e:
+        logger.warning(f"Logo could not be preprocessed, embedding original: {e}")
+        return data
+
+
+def _read(path: str) -> Optional[bytes]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=1)
+def get_assets() -> PDFAssets:
+    """Bundled Roboto fontları ve logo (process başına bir kez)."""
+    reg_path = os.path.join(ASSETS_DIR, "Roboto-Regular.ttf")
+    bold_path = os.path.join(ASSETS_DIR, "Roboto-Bold.ttf")
+    logo_bytes = _read(os.path.join(ASSETS_DIR, "logo.png"))
+    assets = PDFAssets(
+        font_path=reg_path if os.path.exists(reg_path) else None,
+        bold_font_path=bold_path if os.path.exists(bold_path) else None,
+        font_bytes=_read(reg_path),
+        bold_font_bytes=_read(bold_path),
+        logo_bytes=logo_bytes,
+        logo_png=_prepare_logo(logo_bytes),
+    )
+    if assets.font_path:
+        logger.info(f"Found bundled Roboto-Regular: {assets.font_path}")
+    if assets.bold_font_path:
+        logger.info(f"Found bundled Roboto-Bold: {assets.bold_font_path}")
+    if not assets.logo_bytes:
+        logger.warning("Logo not found for PDF caching.")
+    return assets
+
+
+def _font_file_measure(font_path: str) -> Callable[[str], float]:
+    assets = get_assets()
+    if font_path == assets.font_path and assets.font_bytes:
+        font = fitz.Font(fontbuffer=assets.font_bytes)
+    elif font_path == assets.bold_font_path and assets.bold_font_bytes:
+        font = fitz.Font(fontbuffer=assets.bold_font_bytes)
+    else:
+        font = fitz.Font(fontfile=font_path)
+    return lambda ch: font.text_length(ch, fontsize=1)
+
+
+@lru_cache(maxsize=16)
+def glyph_widths(font_path: str) -> GlyphWidths:
+    return GlyphWidths(_font_file_measure(font_path))
+
+
+def text_length(text: str, fontsize: float, font_path: Optional[str] = None, font_name: str = "helv") -> float:
+    if font_path:
+        return glyph_widths(font_path).text_length(text, fontsize)
+    # Base-14 fontlar (font dosyası yoksa) tek baytlık kodlamayla ölçülür; fitz'e bırakılır
+    return fitz.get_text_length(text, fontname=font_name, fontsize=fontsize)
+
+
+@lru_cache(maxsize=8)
+def get_font(name: str) -> fitz.Font:
+    """TextWriter için fitz.Font ("tr" / "tr-bold" gömülü Roboto, diğerleri base-14)."""
+    assets = get_assets()
+    if name == "tr" and assets.font_bytes:
+        return fitz.Font(fontbuffer=assets.font_bytes)
+    if name == "tr-bold" and assets.bold_font_bytes:
+        return fitz.Font(fontbuffer=assets.bold_font_bytes)
+    return fitz.Font(name)
+
+
+def warm_up() -> None:
+    """Render worker process başlangıcı: varlıkları ve genişlik tablolarını önceden yükler."""
+    assets = get_assets()
+    for path in (assets.font_path, assets.bold_font_path):
+        if path:
+            glyph_widths(path)
+    for name in ("tr", "tr-bold"):
+        get_font(name)
@@ -6,6 +6,8 @@ import uuid
 from datetime import datetime
 from typing import Optional, Union, Tuple, List, Any
 
+from app.services.pdf.assets import ASSETS_DIR, get_assets, get_font
+
 logger = logging.getLogger(__name__)
 
 class BasePDFService:
@@ -24,46 +26,22 @@ class BasePDFService:
         self.height = 0
         self.doc_uuid = str(uuid.uuid4())
         
-        # Resolve Asset Path
-        # base.py is in backend/app/services/pdf/
-        # Assets are in backend/app/assets/branding/
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.assets_dir = os.path.abspath(os.path.join(current_dir, "../../assets/branding"))
-        
         # Asset Discovery & Caching (Story 3-2: Performance and Brand Compliance)
-        self.font_path, self.bold_font_path = self._discover_fonts()
+        # Fontlar / logo process başına bir kez yüklenir (app.services.pdf.assets)
+        self.assets = get_assets()
+        self.assets_dir = ASSETS_DIR
+        self.font_path, self.bold_font_path = self.assets.font_path, self.assets.bold_font_path
         self.primary_font = "tr" if self.font_path else "Helvetica"
         self.bold_font = "tr-bold" if self.bold_font_path else (self.primary_font if self.font_path else "Helvetica-Bold")
         
-        self.logo_bytes = self._load_logo()
+        self.logo_bytes = self.assets.logo_png
+        self._logo_xref = 0
+        # Sayfa metni renk bazında TextWriter'larda toplanır, sayfa kapanırken yazılır
+        self._writers: dict = {}
         
         # Initialize first page
         self._new_page()
 
-    def _discover_fonts(self) -> Tuple[Optional[str], Optional[str]]:
-        """Finds bundled Roboto fonts."""
-        reg_path = os.path.join(self.assets_dir, "Roboto-Regular.ttf")
-        bold_path = os.path.join(self.assets_dir, "Roboto-Bold.ttf")
-        
-        res_reg = reg_path if os.path.exists(reg_path) else None
-        res_bold = bold_path if os.path.exists(bold_path) else None
-        
-        if res_reg:
-            logger.info(f"Found bundled Roboto-Regular: {res_reg}")
-        if res_bold:
-            logger.info(f"Found bundled Roboto-Bold: {res_bold}")
-            
-        return res_reg, res_bold
-
-    def _load_logo(self) -> Optional[bytes]:
-        """Caches logo bytes to minimize disk I/O."""
-        logo_path = os.path.join(self.assets_dir, "logo.png")
-        if os.path.exists(logo_path):
-            with open(logo_path, "rb") as f:
-                return f.read()
-        logger.warning("Logo not found for PDF caching.")
-        return None
-
     def _insert_text(self, point: Tuple[float, float], text: str, fontsize: float = 11, fontname: str = None, color: Tuple[float, float, float] = (0, 0, 0), bold: bool = False):
         """Helper to insert text with proper font embedding if needed."""
         if not self.page:
@@ -77,24 +55,26 @@ class BasePDFService:
         else:
             final_font = self.primary_font
         
-        self.page.insert_text(
-            point, 
-            text, 
-            fontname=final_font, 
-            fontsize=fontsize, 
-            color=color
-        )
+        self._append_text(self.page, point, text, final_font, fontsize, color)
+
+    def _append_text(self, page, point, text: str, fontname: str, fontsize: float, color):
+        key = (page.number, tuple(color))
+        writer = self._writers.get(key)
+        if writer is None:
+            writer = self._writers[key] = fitz.TextWriter(page.rect, color=color)
+        writer.append(point, text, font=get_font(fontname), fontsize=fontsize)
+
+    def _flush_text(self):
+        """Toplanan metni sayfalara yazar (font programı belgeye bir kez gömülür)."""
+        for (page_number, _), writer in self._writers.items():
+            writer.write_text(self.doc[page_number])
+        self._writers.clear()
 
     def _new_page(self):
         """Creates a new page and resets cursor."""
+        self._flush_text()
         self.page = self.doc.new_page()
         
-        # Register fonts on the NEW page
-        if self.font_path:
-            self.page.insert_font(fontname="tr", fontfile=self.font_path)
-        if self.bold_font_path:
-            self.page.insert_font(fontname="tr-bold", fontfile=self.bold_font_path)
-            
         self.width = self.page.rect.width - (2 * self.margin)
         self.height = self.page.rect.height
         self.y = self.margin
@@ -109,7 +89,11 @@ class BasePDFService:
         """Draws the branding logo from memory cache."""
         if self.logo_bytes:
             rect = fitz.Rect(self.margin, 20, self.margin + 100, 60)
-            self.page.insert_image(rect, stream=self.logo_bytes)
+            if self._logo_xref:
+                # Görüntü belgede zaten var: yeniden decode / gömme yok
+                self.page.insert_image(rect, xref=self._logo_xref)
+            else:
+                self._logo_xref = self.page.insert_image(rect, stream=self.logo_bytes)
         else:
             logger.warning("No logo data available to draw.")
 
@@ -146,6 +130,7 @@ class BasePDFService:
 
     def draw_footer(self):
         """Draws footer on all pages without redundant registrations."""
+        self._flush_text()
         for i in range(len(self.doc)):
             page = self.doc[i]
             
@@ -157,9 +142,9 @@ class BasePDFService:
             point_sec = (self.margin, self.height - 20)
             text_sec = f"UroLog Secure PDF | Verification: {self.doc_uuid}"
             
-            # We assume fonts are registered per page in _new_page
-            page.insert_text(point_info, text_info, fontname=self.primary_font, fontsize=8, color=(0.6, 0.6, 0.6))
-            page.insert_text(point_sec, text_sec, fontname=self.primary_font, fontsize=7, color=(0.5, 0.5, 0.5))
+            self._append_text(page, point_info, text_info, self.primary_font, 8, (0.6, 0.6, 0.6))
+            self._append_text(page, point_sec, text_sec, self.primary_font, 7, (0.5, 0.5, 0.5))
+        self._flush_text()
 
     def draw_section_title(self, text: str):
         """Draws a themed section title."""
@@ -195,8 +180,10 @@ class BasePDFService:
     def save(self) -> io.BytesIO:
         """Finalizes and returns the PDF stream."""
         self.draw_footer()
+        # Yalnız kullanılan glifler gömülür (Roboto ~1MB -> birkaç KB); garbage ile tam font atılır
+        self.doc.subset_fonts()
         stream = io.BytesIO()
-        self.doc.save(stream)
+        self.doc.save(stream, garbage=3, deflate=True)
         self.doc.close()
         stream.seek(0)
         return stream
@@ -0,0 +1,55 @@
+"""
+Üretilmiş PDF'ler için ETag anahtarlı LRU önbellek (process içi, toplam boyutla sınırlı).
+
+ETag hastanın klinik verisinin revizyonundan türetilir (bkz. ReportOrchestrator.get_report_revision);
+veri değiştiğinde anahtar değişir, eski kayıt erişilmediği için LRU ile düşer — ayrıca
+invalidation gerekmez.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class PDFCache:
+    def __init__(self, max_bytes: Optional[int] = None):
+        self._max_bytes = settings.PDF_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if len(data) > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+pdf_cache = PDFCache()
@@ -0,0 +1,61 @@
+"""
+PDF render havuzu: rapor üretimi event loop dışında çalışır.
+
+- Worker process'ler başlarken font / logo / glif genişlik tablolarını yükler (assets.warm_up),
+  böylece ilk rapor da soğuk başlangıç maliyeti ödemez.
+- PyMuPDF thread-safe olmadığından PDF_RENDER_WORKERS=0 iken tek bir arka plan thread'i kullanılır.
+- Havuz çökerse (BrokenProcessPool) yeniden kurulur ve iş bir kez daha denenir.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.services.pdf.assets import warm_up
+
+logger = logging.getLogger(__name__)
+
+
+class PDFRenderer:
+    def __init__(self, workers: Optional[int] = None):
+        self._workers = settings.PDF_RENDER_WORKERS if workers is None else workers
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._workers > 0:
+                # spawn: uvicorn process'inin thread / event loop durumunu fork ile kopyalamamak için
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render", initializer=warm_up)
+        return self._executor
+
+    async def render(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """fn(*args)'ı havuzda çalıştırır; fn ve argümanlar picklable olmalıdır."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            logger.warning("PDF render pool broken, restarting")
+            self._reset()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def _reset(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, True, cancel_futures=True)
+
+
+pdf_renderer = PDFRenderer()
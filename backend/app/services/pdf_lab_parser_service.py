@@ -1,9 +1,13 @@
 """PDF Lab Parser Service - Extract lab results from PDF documents."""
 
 import re
+from datetime import date
 from typing import List, Optional
+from uuid import UUID
 from pydantic import BaseModel
 
+from app.schemas.clinical_schemas import TetkikSonucCreate
+
 # PyMuPDF (fitz) for PDF text extraction - REQUIRED
 try:
     import fitz  # PyMuPDF
@@ -404,3 +408,26 @@ class PDFLabParserService:
             report_date=report_date,
             results=unique_results
         )
+
+    @classmethod
+    def to_tetkik_sonuclari(cls, parsed: PDFLabParserResponse, hasta_id: UUID, tarih: Optional[date] = None) -> List[TetkikSonucCreate]:
+        """Ayrıştırılmış paneli ClinicalRepository.bulk_create_tetkik_sonuclari girdisine çevirir."""
+        report_date = tarih
+        if report_date is None and parsed.report_date:
+            try:
+                report_date = date.fromisoformat(parsed.report_date)
+            except ValueError:
+                report_date = None  # find_date 31.02 gibi geçersiz bir eşleşme bulmuş olabilir
+        report_date = report_date or date.today()
+        return [
+            TetkikSonucCreate(
+                hasta_id=hasta_id,
+                tarih=report_date,
+                kategori="Laboratuvar",
+                tetkik_adi=r.test_name,
+                sonuc=r.value,
+                birim=r.unit,
+                referans_araligi=r.reference,
+            )
+            for r in parsed.results
+        ]
@@ -8,6 +8,9 @@ from app.services.pdf.utils import wrap_text
 
 logger = logging.getLogger(__name__)
 
+# Rapor düzeni değiştiğinde artırılır: önbellekteki / istemcideki eski PDF'lerin ETag'i geçersiz olur
+PDF_LAYOUT_VERSION = 1
+
 class PDFReportService(BasePDFService):
     """
     Refactored service for patient reports using standardized BasePDFService.
@@ -101,3 +104,8 @@ class PDFReportService(BasePDFService):
         """Legacy static entry point for compatibility."""
         service = PDFReportService(report)
         return service.generate()
+
+
+def render_patient_report(report: PatientReportDTO) -> bytes:
+    """Render havuzu giriş noktası (modül seviyesinde, picklable): PDF baytlarını döner."""
+    return PDFReportService(report).generate().getvalue()
@@ -0,0 +1,99 @@
+"""
+Muayene tanılarının hizmet / yan dal kategorisine, hasta referansının referans kategorisine eşlenmesi.
+
+Kategori yazma anında hesaplanıp kolonda saklanır (ShardedMuayene.service_category,
+ShardedPatientDemographics.reference_category); dashboard dağılımları düz GROUP BY ile okunur.
+Eşlemeler değiştiğinde mevcut kayıtlar maintenance.reclassify_categories ile yeniden sınıflandırılır.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Reference category mappings
+REFERENCE_CATEGORIES = {
+    "hekim": {
+        "label": "Hekim Referansı",
+        "keywords": ["dr.", "dr ", "doktor", "hekim", "uzman", "prof.", "doç.", "yrd.doç.", "op.dr.", "pratisyen"]
+    },
+    "hasta": {
+        "label": "Hasta Referansı",
+        "keywords": ["hasta", "tanıdık", "arkadaş", "akraba", "aile", "komşu", "tavsiye", "öneri"]
+    },
+    "dijital": {
+        "label": "Dijital/Akademik",
+        "keywords": ["web", "internet", "google", "makale", "yayın", "sosyal medya", "instagram", "facebook", "twitter", "youtube", "linkedin"]
+    }
+}
+OTHER_REFERENCE = "diger"
+REFERENCE_LABELS: Dict[str, str] = {
+    **{key: data["label"] for key, data in REFERENCE_CATEGORIES.items()},
+    OTHER_REFERENCE: "Diğer",
+}
+
+# Service/Subspecialty mappings based on diagnosis codes and keywords
+SERVICE_MAPPINGS = {
+    "Üroonkoloji": ["C61", "C67", "C64", "C65", "C66", "C68", "D41", "tümör", "kanser", "onko", "malign"],
+    "Androloji": ["N48", "N49", "N50", "erekti", "impotans", "infertil", "varikosel", "peyronie", "libido"],
+    "Taş Hastalığı": ["N20", "N21", "N22", "N23", "taş", "ürolitiyaz", "nefrolitiyaz", "ESWL", "URS", "PCNL"],
+    "Prostat": ["N40", "N41", "N42", "BPH", "prostat", "TURP", "prostatit"],
+    "Enfeksiyon": ["N30", "N34", "N39", "sistit", "üretrit", "piyelonefrit", "enfeksiyon", "idrar yolu"],
+    "Ürodinamik": ["N31", "N32", "N39.3", "N39.4", "inkontinans", "aşırı aktif", "nörojenik", "ürodinami"]
+}
+OTHER_SERVICE = "Diğer"
+
+_ICD_RE = re.compile(r"^[A-Z]\d{2}(\.\d+)?$")
+
+# ICD kodu / prefix -> hizmet. En uzun prefix önce denenir (N39.3 -> Ürodinamik, N39.0 -> Enfeksiyon)
+ICD_SERVICE_PREFIXES: Dict[str, str] = {
+    kw: service
+    for service, keywords in SERVICE_MAPPINGS.items()
+    for kw in keywords
+    if _ICD_RE.match(kw)
+}
+_ICD_PREFIX_ORDER: List[str] = sorted(ICD_SERVICE_PREFIXES, key=len, reverse=True)
+
+_SERVICE_KEYWORDS: List[Tuple[str, List[str]]] = [
+    (service, [kw.lower() for kw in keywords]) for service, keywords in SERVICE_MAPPINGS.items()
+]
+
+
+def service_for_icd(code: Optional[str]) -> Optional[str]:
+    if not code:
+        return None
+    code = code.strip().upper()
+    for prefix in _ICD_PREFIX_ORDER:
+        if code.startswith(prefix):
+            return ICD_SERVICE_PREFIXES[prefix]
+    return None
+
+
+def classify_service(tani1: Optional[str], tani1_kodu: Optional[str], tani2: Optional[str], tani2_kodu: Optional[str]) -> str:
+    """
+    Önce tanı kodları (birincil tanı öncelikli) ICD prefix tablosunda aranır; kod eşleşmezse
+    tanı metinleri + kodlar anahtar kelime listeleriyle taranır (eski davranış).
+    """
+    for code in (tani1_kodu, tani2_kodu):
+        service = service_for_icd(code)
+        if service:
+            return service
+
+    combined_text = f"{tani1 or ''} {tani1_kodu or ''} {tani2 or ''} {tani2_kodu or ''}".lower()
+    for service, keywords in _SERVICE_KEYWORDS:
+        if any(kw in combined_text for kw in keywords):
+            return service
+    return OTHER_SERVICE
+
+
+def classify_exam(exam) -> str:
+    """ShardedMuayene nesnesi (veya aynı alanlara sahip satır) için service_category."""
+    return classify_service(exam.tani1, exam.tani1_kodu, exam.tani2, exam.tani2_kodu)
+
+
+def classify_reference(referans: Optional[str]) -> Optional[str]:
+    """Referans kategorisi anahtarı; referans boşsa None."""
+    if not referans or not referans.strip():
+        return None
+    ref_lower = referans.lower()
+    for cat_key, cat_data in REFERENCE_CATEGORIES.items():
+        if any(kw in ref_lower for kw in cat_data["keywords"]):
+            return cat_key
+    return OTHER_REFERENCE
@@ -0,0 +1,218 @@
+"""
+İçerik adresli (content-addressed) LLM sonuç önbelleği.
+
+Aynı ses kaydı / lab PDF'i / metin tekrar gönderildiğinde (arayüz takılması, çift tıklama)
+sağlayıcı yeniden çağrılmaz. Anahtar; girdi baytlarının (veya maskelenmiş metnin),
+şablonun, modelin ve modun SHA-256 özetidir — anahtarda hasta verisi bulunmaz.
+
+- Redis varsa orada tutulur (TTL + kayıt sayısı sınırı, en eski kayıtlar atılır).
+- Redis yoksa diskte tutulur (TTL + toplam boyut sınırı, en eski dosyalar atılır).
+- Eşzamanlı özdeş istekler tek bir sağlayıcı çağrısını paylaşır (in-flight de-duplication).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bu boyutun üzerindeki girdiler event loop'u bloklamamak için thread'de özetlenir
+_HASH_IN_THREAD_BYTES = 4 * 1024 * 1024
+_INDEX_KEY = "ai-result-cache:index"
+
+
+def _digest(parts: tuple) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, (bytes, bytearray)) else str(part).encode("utf-8")
+        # Uzunluk öneki: ("ab", "c") ile ("a", "bc") aynı özeti üretmesin
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+async def cache_key(namespace: str, *parts: Union[bytes, str, None]) -> str:
+    if sum(len(p) for p in parts if isinstance(p, (bytes, bytearray))) > _HASH_IN_THREAD_BYTES:
+        digest = await asyncio.to_thread(_digest, parts)
+    else:
+        digest = _digest(parts)
+    return f"{namespace}:{digest}"
+
+
+class DiskCacheBackend:
+    def __init__(self, root: Optional[str] = None):
+        self._root = Path(root or settings.AI_RESULT_CACHE_DIR)
+
+    def _path(self, key: str) -> Path:
+        namespace, digest = key.split(":", 1)
+        return self._root / namespace / f"{digest}.json"
+
+    def _get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry.get("value")
+
+    def _set(self, key: str, value: dict, ttl: int) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"expires_at": time.time() + ttl, "value": value}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Toplam boyut sınırı aşılırsa en eski dosyalardan başlayarak %90'a iner."""
+        limit = settings.AI_RESULT_CACHE_MAX_DISK_MB * 1024 * 1024
+        files = [(p.stat(), p) for p in self._root.glob("*/*.json")]
+        total = sum(st.st_size for st, _ in files)
+        if total <= limit:
+            return
+        for st, path in sorted(files, key=lambda f: f[0].st_mtime):
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+            if total <= limit * 0.9:
+                break
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+
+class RedisCacheBackend:
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._redis.get(f"ai-result-cache:{key}")
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, value: dict, ttl: int) -> None:
+        full_key = f"ai-result-cache:{key}"
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(full_key, json.dumps(value, ensure_ascii=False), ex=ttl)
+            pipe.zadd(_INDEX_KEY, {full_key: time.time()})
+            pipe.zcard(_INDEX_KEY)
+            *_, count = await pipe.execute()
+
+        excess = count - settings.AI_RESULT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            # Kayıt sayısı sınırı: en eski kayıtları sil (süresi dolmuşlar da indeksten temizlenir)
+            oldest = await self._redis.zrange(_INDEX_KEY, 0, excess - 1)
+            if oldest:
+                await self._redis.delete(*oldest)
+                await self._redis.zrem(_INDEX_KEY, *oldest)
+
+
+class ResultCache:
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._redis = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        if not settings.AI_RESULT_CACHE_ENABLED or self._backend is not None:
+            return
+        try:
+            from redis import asyncio as aioredis
+            redis = aioredis.from_url(
+                f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}", encoding="utf8", decode_responses=True
+            )
+            await redis.ping()
+            self._redis = redis
+            self._backend = RedisCacheBackend(redis)
+        except Exception as e:
+            logger.info(f"AI result cache: Redis unavailable ({e}), using disk cache")
+            self._backend = DiskCacheBackend()
+
+    async def stop(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+            self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = DiskCacheBackend()
+        return self._backend
+
+    async def _safe_get(self, key: str) -> Optional[dict]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"AI result cache read failed: {e}")
+            return None
+
+    async def _safe_set(self, key: str, value: dict, ttl: int) -> None:
+        try:
+            await self.backend.set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"AI result cache write failed: {e}")
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+        ttl: Optional[int] = None,
+        should_cache: Callable[[dict], bool] = lambda value: True,
+    ) -> dict:
+        """
+        Önbellekte varsa döner; yoksa compute() çalıştırılır ve sonucu saklanır.
+        Aynı anahtar için süren bir hesaplama varsa onun sonucu beklenir.
+        Hata sonuçları önbelleğe alınmaz; bekleyen tüm çağıranlara aynı hata iletilir.
+        """
+        if not settings.AI_RESULT_CACHE_ENABLED:
+            return await compute()
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Hesaplayan istek iptal edildi (istemci koptu): bu çağıran kendisi hesaplar
+                return await self.get_or_compute(key, compute, ttl, should_cache)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            cached = await self._safe_get(key)
+            if cached is not None:
+                self.hits += 1
+                value = cached
+            else:
+                self.misses += 1
+                value = await compute()
+                if should_cache(value):
+                    await self._safe_set(key, value, ttl or settings.AI_RESULT_CACHE_TTL)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Bekleyen yoksa "exception was never retrieved" uyarısını bastır
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+result_cache = ResultCache()
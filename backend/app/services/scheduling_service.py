@@ -0,0 +1,381 @@
+"""
+Scheduling Engine
+=================
+Randevu çakışma kontrolü ve boş slot (availability) hesabı.
+
+- Çakışma kontrolünün otoritesi veritabanıdır (AppointmentRepository.get_conflicts);
+  bu modül "sonraki boş slot" / "günlük kapasite" gibi okuma ağırlıklı sorgular için
+  gün bazlı, doktora göre gruplanmış sıralı interval index'leri tutar.
+- Index gün gün ve lazy yüklenir (tek aralık sorgusu), TTL ile tazelenir ve
+  create/update/delete sonrası apply_change ile artımlı güncellenir. Her yüklemede
+  bugünden (ve istenen aralıktan) eski günler atılır, toplam gün sayısı
+  CALENDAR_AVAILABILITY_CACHE_MAX_DAYS ile sınırlanır.
+- Anahtarlar get_conflicts ile aynı kuralı izler: doktor adı (yalnız doctor_id varsa kullanıcının
+  adı), doktorsuz BLOCKED kayıtlar klinik geneli, doktorsuz diğer randevular ayrı bir grup.
+"""
+
+import asyncio
+import json
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dtime, timedelta, timezone, tzinfo
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.change_feed import change_feed
+
+BLOCKED_TYPE = "BLOCKED"
+CLINIC_WIDE_KEY = "*"  # Doktoru olmayan BLOCKED kayıtlar (tatil, toplantı) tüm kliniği kapatır
+UNASSIGNED_KEY = "-"  # Doktoru olmayan normal randevular: yalnız yine doktorsuz randevularla çakışır
+
+
+def _local_tz() -> tzinfo:
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(settings.CALENDAR_TIMEZONE)
+    except Exception:
+        # tzdata yoksa Türkiye için sabit ofset yeterli (DST yok)
+        return timezone(timedelta(hours=3))
+
+
+def _parse_hhmm(value: str) -> dtime:
+    hour, minute = value.split(":")
+    return dtime(int(hour), int(minute))
+
+
+def doctor_key(
+    doctor_name: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    appointment_type: Optional[str] = None,
+    doctor_names: Optional[Dict[int, str]] = None,
+) -> str:
+    """
+    Frontend doktorları isimle tanır: yalnız doctor_id'si olan kayıt kullanıcının adına (users.full_name)
+    eşlenir, ad bilinmiyorsa ID'ye düşülür. Doktorsuz kayıtlarda yalnız BLOCKED klinik geneli sayılır.
+    """
+    if doctor_name:
+        return doctor_name
+    if doctor_id is not None:
+        return (doctor_names or {}).get(doctor_id) or f"#{doctor_id}"
+    return CLINIC_WIDE_KEY if appointment_type == BLOCKED_TYPE else UNASSIGNED_KEY
+
+
+@dataclass(order=True)
+class BusyInterval:
+    start: datetime
+    end: datetime
+    id: int = field(compare=False)
+    key: str = field(compare=False, default=CLINIC_WIDE_KEY)
+
+
+class IntervalIndex:
+    """
+    Başlangıç zamanına göre sıralı interval listesi.
+    Bir günün randevu sayısı küçük olduğu için bisect + lineer tarama yeterli.
+    """
+
+    def __init__(self) -> None:
+        self._items: List[BusyInterval] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, interval: BusyInterval) -> None:
+        insort(self._items, interval)
+
+    def remove(self, interval_id: int) -> None:
+        self._items = [i for i in self._items if i.id != interval_id]
+
+    def overlapping(self, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> List[BusyInterval]:
+        """[start, end) ile kesişen interval'lar (uç uca değenler çakışma sayılmaz)."""
+        # start'ı `end`'den sonra olanlar kesişemez
+        hi = bisect_left(self._items, BusyInterval(end, end, -1))
+        return [
+            i for i in self._items[:hi]
+            if i.end > start and i.id != exclude_id
+        ]
+
+
+def merge_intervals(intervals: List[BusyInterval]) -> List[Tuple[datetime, datetime]]:
+    merged: List[Tuple[datetime, datetime]] = []
+    for interval in sorted(intervals):
+        if merged and interval.start <= merged[-1][1]:
+            if interval.end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], interval.end)
+        else:
+            merged.append((interval.start, interval.end))
+    return merged
+
+
+def free_slots_in_window(
+    window_start: datetime,
+    window_end: datetime,
+    busy: List[BusyInterval],
+    duration: timedelta,
+    step: timedelta,
+    not_before: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Mesai penceresindeki boşlukları gezerek `step` ızgarasına oturan ve `duration` kadar
+    sığan slotları döner. Her slot ayrı sorgulanmaz; birleşik dolu aralıklar tek geçişte atlanır.
+    """
+    slots: List[Tuple[datetime, datetime]] = []
+    cursor = window_start
+    if not_before and not_before > cursor:
+        # Izgaraya yukarı yuvarla
+        steps = -(-(not_before - window_start) // step)
+        cursor = window_start + steps * step
+
+    for busy_start, busy_end in merge_intervals(busy) + [(window_end, window_end)]:
+        gap_end = min(busy_start, window_end)
+        while cursor + duration <= gap_end:
+            slots.append((cursor, cursor + duration))
+            if limit is not None and len(slots) >= limit:
+                return slots
+            cursor += step
+        if busy_end > cursor:
+            steps = -(-(busy_end - window_start) // step)
+            cursor = window_start + steps * step
+        if cursor >= window_end:
+            break
+    return slots
+
+
+class SchedulingEngine:
+    def __init__(self) -> None:
+        self._days: Dict[date, Tuple[float, Dict[str, IntervalIndex]]] = {}
+        self._by_id: Dict[int, BusyInterval] = {}
+        self._doctor_names: Dict[int, str] = {}  # users.id -> full_name (get_busy_intervals'tan öğrenilir)
+        self._durations: Dict[str, int] = {}
+        self._durations_loaded_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    # --- Config ---
+    @property
+    def tz(self) -> tzinfo:
+        return _local_tz()
+
+    @property
+    def slot_step(self) -> timedelta:
+        return timedelta(minutes=settings.CALENDAR_SLOT_MINUTES)
+
+    def working_window(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        weekdays = {int(d) for d in settings.CALENDAR_WORKING_WEEKDAYS.split(",") if d.strip()}
+        if day.weekday() not in weekdays:
+            return None
+        tz = self.tz
+        return (
+            datetime.combine(day, _parse_hhmm(settings.CALENDAR_WORKDAY_START), tzinfo=tz),
+            datetime.combine(day, _parse_hhmm(settings.CALENDAR_WORKDAY_END), tzinfo=tz),
+        )
+
+    def day_capacity(self, day: date) -> int:
+        """Bir doktor için günlük slot sayısı (dashboard doluluk oranının paydası)."""
+        window = self.working_window(day)
+        if not window:
+            return 0
+        return int((window[1] - window[0]) / self.slot_step)
+
+    async def get_duration(self, db, appointment_type: Optional[str]) -> Optional[int]:
+        """'Randevu Türleri' tanımından ('Muayene | 30 | #ef4444') dakika cinsinden süre."""
+        if time.monotonic() - self._durations_loaded_at > settings.CALENDAR_AVAILABILITY_CACHE_TTL:
+            from app.repositories.setting_repository import SettingRepository
+            setting = await SettingRepository(db).get("system_definitions")
+            durations: Dict[str, int] = {}
+            try:
+                defs = json.loads(setting.value) if setting and setting.value else {}
+                for raw in defs.get("Randevu Türleri", []):
+                    parts = [p.strip() for p in str(raw).split("|")]
+                    if len(parts) > 1 and parts[1].isdigit():
+                        durations[parts[0].lower()] = int(parts[1])
+            except (ValueError, AttributeError):
+                pass
+            self._durations = durations
+            self._durations_loaded_at = time.monotonic()
+        if not appointment_type:
+            return None
+        return self._durations.get(appointment_type.strip().lower())
+
+    # --- Index maintenance ---
+    def _is_busy(self, status: Optional[str]) -> bool:
+        return status != "cancelled"
+
+    def days_between(self, start: datetime, end: datetime) -> List[date]:
+        """[start, end) aralığının değdiği yerel günler (artan sırada)."""
+        tz = self.tz
+        first = start.astimezone(tz).date()
+        last = (end - timedelta(microseconds=1)).astimezone(tz).date() if end > start else first
+        return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+    def _interval_days(self, interval: BusyInterval) -> List[date]:
+        return self.days_between(interval.start, interval.end)
+
+    def _index_interval(self, interval: BusyInterval) -> None:
+        self._by_id[interval.id] = interval
+        for day in self._interval_days(interval):
+            cached = self._days.get(day)
+            if cached:
+                cached[1].setdefault(interval.key, IntervalIndex()).add(interval)
+
+    def _unindex(self, interval_id: int) -> None:
+        old = self._by_id.pop(interval_id, None)
+        if not old:
+            return
+        for day in self._interval_days(old):
+            cached = self._days.get(day)
+            if cached and old.key in cached[1]:
+                cached[1][old.key].remove(interval_id)
+
+    def apply_change(self, randevu_id: int, obj: Any) -> None:
+        """
+        Repository create/update/delete sonrası çağrılır.
+        obj None ise (silme) kayıt index'ten düşer; aksi halde yeni zamanıyla yeniden eklenir.
+        """
+        self._unindex(randevu_id)
+        if obj is None or getattr(obj, "is_deleted", 0) == 1 or not self._is_busy(getattr(obj, "status", None)):
+            return
+        if not obj.start or not obj.end:
+            return
+        self._index_interval(BusyInterval(
+            start=obj.start, end=obj.end, id=randevu_id,
+            key=doctor_key(obj.doctor_name, obj.doctor_id, getattr(obj, "type", None), self._doctor_names),
+        ))
+
+    def on_feed_event(self, ev: Dict[str, Any], is_local: bool) -> None:
+        """Diğer worker'larda yapılan randevu değişikliklerini (change feed) index'e yansıtır."""
+        if is_local or ev.get("topic") != "appointment":
+            return
+        data = ev.get("data") or {}
+        if data.get("id") is None:
+            return
+        if ev.get("action") == "deleted":
+            self.apply_change(data["id"], None)
+            return
+        old = self._by_id.get(data["id"])
+        try:
+            start = datetime.fromisoformat(data["start"]) if data.get("start") else (old.start if old else None)
+            end = datetime.fromisoformat(data["end"]) if data.get("end") else (old.end if old else None)
+        except ValueError:
+            self.invalidate()
+            return
+        self.apply_change(data["id"], SimpleNamespace(
+            start=start, end=end, status=data.get("status"), is_deleted=data.get("is_deleted", 0),
+            doctor_name=data.get("doctor_name"), doctor_id=data.get("doctor_id"),
+            type=data.get("type"),
+        ))
+
+    def invalidate(self) -> None:
+        self._days.clear()
+        self._by_id.clear()
+        self._durations_loaded_at = 0.0
+
+    async def _ensure_days(self, db, first: date, last: date) -> None:
+        now = time.monotonic()
+        ttl = settings.CALENDAR_AVAILABILITY_CACHE_TTL
+        missing = [
+            first + timedelta(days=i) for i in range((last - first).days + 1)
+            if (first + timedelta(days=i)) not in self._days
+            or now - self._days[first + timedelta(days=i)][0] > ttl
+        ]
+        if not missing:
+            return
+
+        async with self._lock:
+            from app.repositories.appointment_repository import AppointmentRepository
+
+            tz = self.tz
+            range_start = datetime.combine(min(missing), dtime.min, tzinfo=tz)
+            range_end = datetime.combine(max(missing) + timedelta(days=1), dtime.min, tzinfo=tz)
+            rows = await AppointmentRepository(db).get_busy_intervals(range_start, range_end)
+
+            for day in missing:
+                self._days[day] = (now, {})
+            for row in rows:
+                if row.doctor_id is not None and row.doctor_full_name:
+                    self._doctor_names[row.doctor_id] = row.doctor_full_name
+            for row in rows:
+                self._unindex(row.id)
+                self._index_interval(BusyInterval(
+                    start=row.start, end=row.end, id=row.id,
+                    key=doctor_key(row.doctor_name, row.doctor_id, row.type, self._doctor_names),
+                ))
+            self._evict(first, last)
+
+    def _evict(self, first: date, last: date) -> None:
+        """Geçmiş günleri ve sınırı aşan en eski yüklenmiş günleri atar; [first, last] korunur."""
+        keep_from = min(first, datetime.now(self.tz).date())
+        stale = [day for day in self._days if day < keep_from]
+        overflow = len(self._days) - len(stale) - settings.CALENDAR_AVAILABILITY_CACHE_MAX_DAYS
+        if overflow > 0:
+            candidates = sorted(
+                (loaded_at, day) for day, (loaded_at, _) in self._days.items()
+                if day >= keep_from and not first <= day <= last
+            )
+            stale.extend(day for _, day in candidates[:overflow])
+        if not stale:
+            return
+        for day in stale:
+            del self._days[day]
+        # Hiçbir yüklü güne değmeyen interval'ler artık apply_change ile de gerekmez
+        for interval_id, interval in list(self._by_id.items()):
+            if not any(day in self._days for day in self._interval_days(interval)):
+                del self._by_id[interval_id]
+
+    def _busy_for(self, day: date, key: Optional[str]) -> List[BusyInterval]:
+        """key None: klinik geneli görünüm (herhangi bir doktorun randevusu slotu doldurur)."""
+        indexes = self._days.get(day, (0, {}))[1]
+        if key is None:
+            return [interval for index in indexes.values() for interval in index]
+        busy = list(indexes.get(CLINIC_WIDE_KEY, []))
+        if key != CLINIC_WIDE_KEY:
+            busy.extend(indexes.get(key, []))
+        return busy
+
+    # --- Queries ---
+    async def next_free_slots(
+        self,
+        db,
+        doctor: Optional[str] = None,
+        after: Optional[datetime] = None,
+        count: int = 5,
+        duration_minutes: Optional[int] = None,
+        appointment_type: Optional[str] = None,
+        horizon_days: int = 90,
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        `after` anından itibaren doktorun mesai içindeki ilk `count` boş slotu.
+        Süre verilmezse randevu türünden, o da yoksa slot adımından alınır.
+        Doktor verilmezse tüm doktorların randevuları ve klinik blokları dolu sayılır.
+        """
+        tz = self.tz
+        after = (after or datetime.now(tz)).astimezone(tz)
+        minutes = duration_minutes or await self.get_duration(db, appointment_type) or settings.CALENDAR_SLOT_MINUTES
+        duration = timedelta(minutes=minutes)
+        key = doctor or None
+
+        found: List[Tuple[datetime, datetime]] = []
+        day = after.date()
+        last_day = day + timedelta(days=horizon_days)
+        chunk = 7  # Haftalık bloklar halinde yükle; çoğu sorgu ilk haftada biter
+        while day <= last_day and len(found) < count:
+            chunk_end = min(day + timedelta(days=chunk - 1), last_day)
+            await self._ensure_days(db, day, chunk_end)
+            while day <= chunk_end and len(found) < count:
+                window = self.working_window(day)
+                if window and window[1] > after:
+                    found.extend(free_slots_in_window(
+                        window[0], window[1], self._busy_for(day, key), duration, self.slot_step,
+                        not_before=after, limit=count - len(found),
+                    ))
+                day += timedelta(days=1)
+        return found
+
+
+scheduling_engine = SchedulingEngine()
+change_feed.add_hook(scheduling_engine.on_feed_event)
@@ -0,0 +1,31 @@
+import hashlib
+from typing import Any, Optional
+
+
+def make_etag(*parts: Any, weak: bool = True) -> str:
+    """
+    Verilen parçalardan (sayaç, zaman damgası, filtre vb.) deterministik bir ETag üretir.
+
+    Example: make_etag("calendar", 42, "2026-01-01T10:00:00") -> 'W/"3f2a..."'
+    """
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match başlığını (virgüllü liste, '*' veya W/ önekli) verilen ETag ile karşılaştırır.
+    GET istekleri için weak comparison kullanılır (RFC 7232 §3.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def _opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    target = _opaque(etag)
+    return any(_opaque(candidate) == target for candidate in if_none_match.split(","))
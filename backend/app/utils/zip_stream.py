@@ -0,0 +1,46 @@
+import zipfile
+from typing import List
+
+
+class _ChunkSink:
+    """Yalnız write() destekleyen (seek/tell yok) hedef: zipfile data descriptor kullanır."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ZipStream:
+    """
+    Arşivi bellekte biriktirmeden parça parça üreten ZIP yazıcısı.
+
+    Her add() eklenen dosyanın baytlarını (yerel başlık + veri + descriptor), close() ise merkezi
+    dizini döner; çıktı doğrudan StreamingResponse'a yield edilebilir.
+
+    Example:
+        zs = ZipStream()
+        yield zs.add("a.pdf", pdf_bytes)
+        yield zs.close()
+    """
+
+    def __init__(self, compression: int = zipfile.ZIP_STORED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+
+    def add(self, name: str, data: bytes) -> bytes:
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
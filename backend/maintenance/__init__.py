@@ -4,8 +4,11 @@
 """
 This package contains tools for safe data migration:
 
-- verify_integrity.py: SHA-256 row hashing for data fidelity verification
-- db_import_sharded.py: Migration script for sharded schema population (TBD)
+- verify_integrity.py: Merkle-style (per id bucket) row hashing for data fidelity verification
+- db_import_sharded.py: Keyset-batched migration script for sharded schema population
+- backfill_lab_observations.py: Fills the normalized numeric lab observation table from tetkik results
+- reclassify_categories.py: Backfills / recomputes precomputed service and reference categories
+- export_analytics.py: Incremental, pseudonymized Parquet export of patient / clinical / finance shards
 
 Usage:
     python -m maintenance.verify_integrity --mode legacy
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+backfill_lab_observations.py - Lab Observation Backfill
+
+Mevcut tetkik sonuçlarından (clinical.sharded_clinical_tetkikler) normalize sayısal
+gözlem tablosunu (clinical.sharded_clinical_lab_observations) doldurur. Yeni kayıtlar
+ClinicalRepository tarafından yazma anında eklenir; bu iş yalnız eski veri ve kural
+değişikliği (app.services.lab_normalization) sonrası yeniden hesaplama içindir.
+
+Features:
+- Keyset batch processing on tetkik id (no LIMIT/OFFSET rescans)
+- Idempotent: INSERT ... ON CONFLICT (tetkik_id) DO UPDATE, tekrar çalıştırılabilir
+- Each batch commits in its own transaction; yarıda kalan iş kaldığı yerden devam eder
+- --rebuild: önce tabloyu boşaltır (normalizasyon kuralları değiştiğinde)
+- Dry-run mode (no writes, only counts)
+
+Usage:
+    # Dry run (no changes)
+    python -m maintenance.backfill_lab_observations --dry-run
+
+    # Backfill
+    python -m maintenance.backfill_lab_observations
+
+    # Rebuild from scratch with larger batches
+    python -m maintenance.backfill_lab_observations --rebuild --batch-size 20000
+
+Exit Codes:
+    0: SUCCESS - Backfill complete
+    1: FAILED - Backfill failed (check logs)
+    2: ERROR - Script execution error
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+# Add parent to path for imports
+sys.path.insert(0, str(__file__).rsplit("/maintenance", 1)[0])
+
+from app.db.session import SessionLocal
+from app.repositories.clinical.models import ShardedLabObservation, ShardedTetkikSonuc
+from app.services.lab_normalization import observation_from_tetkik
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+BATCH_SIZE = 10000
+
+_SOURCE_COLUMNS = (
+    ShardedTetkikSonuc.id,
+    ShardedTetkikSonuc.hasta_id,
+    ShardedTetkikSonuc.tarih,
+    ShardedTetkikSonuc.tetkik_adi,
+    ShardedTetkikSonuc.sonuc,
+    ShardedTetkikSonuc.birim,
+    ShardedTetkikSonuc.referans_araligi,
+    ShardedTetkikSonuc.sembol,
+)
+
+
+# =============================================================================
+# BACKFILL
+# =============================================================================
+
+def build_upsert(rows: list):
+    stmt = insert(ShardedLabObservation).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[ShardedLabObservation.tetkik_id],
+        set_={
+            col: stmt.excluded[col]
+            for col in ("hasta_id", "test_code", "tarih", "value", "unit", "flag")
+        },
+    )
+
+
+async def backfill(batch_size: int, dry_run: bool, rebuild: bool) -> dict:
+    stats = {"scanned": 0, "written": 0, "skipped": 0, "batches": 0}
+
+    if rebuild and not dry_run:
+        async with SessionLocal() as session:
+            await session.execute(delete(ShardedLabObservation))
+            await session.commit()
+        print("  🧹 Observation table truncated (--rebuild)")
+
+    last_id = 0
+    while True:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(*_SOURCE_COLUMNS)
+                .where(ShardedTetkikSonuc.id > last_id, ShardedTetkikSonuc.is_deleted == False)
+                .order_by(ShardedTetkikSonuc.id)
+                .limit(batch_size)
+            )
+            batch = [dict(row) for row in result.mappings().all()]
+            if not batch:
+                break
+
+            last_id = batch[-1]["id"]
+            rows = [obs for obs in map(observation_from_tetkik, batch) if obs is not None]
+            if rows and not dry_run:
+                await session.execute(build_upsert(rows))
+                await session.commit()
+
+        stats["batches"] += 1
+        stats["scanned"] += len(batch)
+        stats["written"] += len(rows)
+        stats["skipped"] += len(batch) - len(rows)
+        print(f"    batch {stats['batches']}: id <= {last_id}, {len(rows)}/{len(batch)} numeric")
+
+    return stats
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill normalized lab observations from tetkik results")
+    parser.add_argument("--dry-run", action="store_true", help="Only count, do not write")
+    parser.add_argument("--rebuild", action="store_true", help="Delete all observations before backfilling")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per batch (default {BATCH_SIZE})")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("UroLog Lab Observation Backfill")
+    print("=" * 60)
+    print(f"Mode: {'DRY RUN' if args.dry_run else '⚠️  LIVE EXECUTION'}{' + REBUILD' if args.rebuild else ''}")
+    print(f"Batch Size: {args.batch_size}")
+    print(f"Started: {datetime.now().isoformat()}")
+
+    try:
+        stats = await backfill(args.batch_size, args.dry_run, args.rebuild)
+    except Exception as e:
+        print(f"\n❌ Backfill failed: {e}")
+        return 1
+
+    print("\n" + "=" * 60)
+    print("BACKFILL SUMMARY")
+    print("=" * 60)
+    print(f"Scanned: {stats['scanned']} tetkik rows in {stats['batches']} batches")
+    print(f"{'Would write' if args.dry_run else 'Written'}: {stats['written']} observations")
+    print(f"Skipped (non-numeric / undated): {stats['skipped']}")
+    print(f"Completed: {datetime.now().isoformat()}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        exit_code = asyncio.run(main())
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR: {e}")
+        exit_code = 2
+    sys.exit(exit_code)
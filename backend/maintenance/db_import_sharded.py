@@ -9,10 +9,12 @@ This script migrates data from legacy tables (public schema) to the new
 domain-isolated schemas (patient, clinical, finance).
 
 Features:
-- Batch processing (10k records per batch per NFR5)
+- Keyset batch processing on id (10k records per batch per NFR5); batch cost stays
+  constant, no LIMIT/OFFSET rescans
+- Tables migrated in parallel (--jobs), each in its own transaction
 - Dry-run mode with diff reports
-- Integrity verification via SHA-256 hashing
-- Transactional safety (rollback on failure)
+- Integrity verification via maintenance.verify_integrity (Merkle bucket hashes)
+- Transactional safety (per-table rollback on failure)
 
 Usage:
     # Dry run (no changes)
@@ -24,6 +26,9 @@ Usage:
     # Migrate specific domain
     python -m maintenance.db_import_sharded --execute --domain patient
 
+    # 8 tables at a time
+    python -m maintenance.db_import_sharded --execute --jobs 8
+
 Exit Codes:
     0: SUCCESS - Migration complete
     1: FAILED - Migration failed (check logs)
@@ -50,6 +55,7 @@ from app.db.session import SessionLocal
 # =============================================================================
 
 BATCH_SIZE = 10000  # NFR5: Handle 10k records without memory leaks
+JOBS = 4  # Paralel taşınan tablo sayısı (her biri ayrı bağlantı / transaction)
 
 # Migration mapping: legacy_table -> (target_schema, target_table)
 # Note: In Phase 1, we're creating exact copies with same table names
@@ -196,29 +202,41 @@ async def migrate_table_data(
     # Clear target table first (idempotent migration)
     await session.execute(text(f"TRUNCATE {target_schema}.{target_table} CASCADE"))
     
-    # Migrate in batches
-    offset = 0
+    # Keyset batching: her parça son taşınan id'den devam eder (OFFSET taraması yok)
+    def batch_sql(after_last: bool):
+        where = "WHERE id > :last_id" if after_last else ""
+        return text(f"""
+            WITH batch AS (
+                SELECT {columns_str}
+                FROM public.{source_table}
+                {where}
+                ORDER BY id
+                LIMIT {batch_size}
+            ), inserted AS (
+                INSERT INTO {target_schema}.{target_table} ({columns_str})
+                SELECT {columns_str} FROM batch
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM inserted), (SELECT id FROM batch ORDER BY id DESC LIMIT 1)
+        """)
+
+    first_batch, next_batch = batch_sql(False), batch_sql(True)
+    last_id = None
     while True:
-        # Select batch from source
-        select_sql = f"""
-            INSERT INTO {target_schema}.{target_table} ({columns_str})
-            SELECT {columns_str} 
-            FROM public.{source_table}
-            ORDER BY id
-            LIMIT {batch_size} OFFSET {offset}
-        """
-        result = await session.execute(text(select_sql))
-        rows_affected = result.rowcount
-        
+        if last_id is None:
+            result = await session.execute(first_batch)
+        else:
+            result = await session.execute(next_batch, {"last_id": last_id})
+        rows_affected, last_id = result.one()
+
         if rows_affected == 0:
             break
-        
+
         stats["migrated_count"] += rows_affected
         stats["batches"] += 1
-        offset += batch_size
-        
+
         print(f"    {source_table}: Migrated {stats['migrated_count']}/{stats['source_count']} rows...")
-    
+
     stats["status"] = "completed"
     return stats
 
@@ -227,13 +245,53 @@ async def migrate_table_data(
 # DOMAIN MIGRATION
 # =============================================================================
 
+async def migrate_table(
+    source_table: str,
+    target_schema: str,
+    target_table: str,
+    batch_size: int = BATCH_SIZE,
+    dry_run: bool = True
+) -> dict[str, Any]:
+    """
+    Migrate a single table in its own session / transaction.
+
+    Returns:
+        Migration statistics (status "failed" on error, transaction rolled back)
+    """
+    print(f"\n  Processing: {source_table} -> {target_schema}.{target_table}")
+    async with SessionLocal() as session:
+        try:
+            await create_target_table(session, source_table, target_schema, target_table, dry_run)
+            stats = await migrate_table_data(
+                session, source_table, target_schema, target_table,
+                batch_size=batch_size, dry_run=dry_run
+            )
+            if not dry_run:
+                await session.commit()
+            return stats
+        except Exception as e:
+            if not dry_run:
+                await session.rollback()
+            print(f"    ❌ {source_table}: rolled back due to error: {e}")
+            return {
+                "source_table": source_table,
+                "target": f"{target_schema}.{target_table}",
+                "source_count": 0,
+                "migrated_count": 0,
+                "batches": 0,
+                "status": "failed",
+                "error": str(e),
+            }
+
+
 async def migrate_domain(
-    session: AsyncSession,
     domain: str,
+    semaphore: asyncio.Semaphore,
+    batch_size: int = BATCH_SIZE,
     dry_run: bool = True
-) -> dict[str, list[dict[str, Any]]]:
+) -> dict[str, dict[str, Any]]:
     """
-    Migrate all tables for a domain.
+    Migrate all tables for a domain; tables run concurrently (bounded by semaphore).
     
     Returns:
         Dictionary of table migration statistics
@@ -244,23 +302,14 @@ async def migrate_domain(
     print(f"\n{'='*60}")
     print(f"[{domain.upper()}] Migrating domain tables...")
     print(f"{'='*60}")
-    
-    results: dict[str, dict[str, Any]] = {}
-    
-    for source_table, (target_schema, target_table) in MIGRATION_MAP[domain].items():
-        print(f"\n  Processing: {source_table} -> {target_schema}.{target_table}")
-        
-        # Create target table
-        await create_target_table(session, source_table, target_schema, target_table, dry_run)
-        
-        # Migrate data
-        stats = await migrate_table_data(
-            session, source_table, target_schema, target_table, 
-            batch_size=BATCH_SIZE, dry_run=dry_run
-        )
-        results[source_table] = stats
-    
-    return results
+
+    async def run(source_table: str, target_schema: str, target_table: str) -> dict[str, Any]:
+        async with semaphore:
+            return await migrate_table(source_table, target_schema, target_table, batch_size, dry_run)
+
+    tables = list(MIGRATION_MAP[domain].items())
+    stats = await asyncio.gather(*(run(src, schema, table) for src, (schema, table) in tables))
+    return {src: result for (src, _), result in zip(tables, stats)}
 
 
 # =============================================================================
@@ -295,6 +344,12 @@ async def main() -> int:
         default=BATCH_SIZE,
         help=f"Batch size for data migration (default: {BATCH_SIZE})"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help=f"Tables migrated in parallel (default: {JOBS})"
+    )
     
     args = parser.parse_args()
     
@@ -307,6 +362,7 @@ async def main() -> int:
     print(f"Mode: {'DRY RUN' if dry_run else '⚠️  LIVE EXECUTION'}")
     print(f"Domain: {args.domain}")
     print(f"Batch Size: {args.batch_size}")
+    print(f"Jobs: {args.jobs}")
     print(f"Started: {datetime.now().isoformat()}")
     
     if not dry_run:
@@ -320,24 +376,26 @@ async def main() -> int:
     
     all_results: dict[str, dict[str, dict[str, Any]]] = {}
     
-    async with SessionLocal() as session:
-        try:
-            domains = list(MIGRATION_MAP.keys()) if args.domain == "all" else [args.domain]
-            
-            for domain in domains:
-                results = await migrate_domain(session, domain, dry_run)
-                all_results[domain] = results
-            
-            if not dry_run:
-                await session.commit()
-                print("\n✅ Transaction committed successfully")
-            
-        except Exception as e:
-            if not dry_run:
-                await session.rollback()
-                print(f"\n❌ Transaction rolled back due to error: {e}")
-            raise
-    
+    semaphore = asyncio.Semaphore(max(1, args.jobs))
+    domains = list(MIGRATION_MAP.keys()) if args.domain == "all" else [args.domain]
+
+    # patient önce: TRUNCATE ... CASCADE klinik/finans tablolarını da boşaltır,
+    # diğer domain'ler ondan sonra paralel taşınır
+    if "patient" in domains:
+        all_results["patient"] = await migrate_domain("patient", semaphore, args.batch_size, dry_run)
+    others = [d for d in domains if d != "patient"]
+    for domain, results in zip(others, await asyncio.gather(
+        *(migrate_domain(d, semaphore, args.batch_size, dry_run) for d in others)
+    )):
+        all_results[domain] = results
+
+    failed = [
+        table for tables in all_results.values()
+        for table, stats in tables.items() if stats["status"] == "failed"
+    ]
+    if not dry_run and not failed:
+        print("\n✅ All table transactions committed successfully")
+
     # Summary
     print("\n" + "=" * 60)
     print("MIGRATION SUMMARY")
@@ -349,7 +407,10 @@ async def main() -> int:
     for domain, tables in all_results.items():
         print(f"\n[{domain.upper()}]")
         for table, stats in tables.items():
-            status_icon = "✅" if stats["status"] in ("completed", "dry_run") else "⏭️"
+            if stats["status"] == "failed":
+                status_icon = "❌"
+            else:
+                status_icon = "✅" if stats["status"] in ("completed", "dry_run") else "⏭️"
             print(f"  {status_icon} {table}: {stats['migrated_count']}/{stats['source_count']} rows")
             total_source += stats["source_count"]
             total_migrated += stats["migrated_count"]
@@ -359,7 +420,10 @@ async def main() -> int:
     
     if dry_run:
         print("\n💡 To execute migration, run with --execute flag")
-    
+
+    if failed:
+        print(f"\n❌ {len(failed)} table(s) failed and were rolled back: {', '.join(failed)}")
+        return 1
     return 0
 
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+export_analytics.py - Columnar Analytics Export (Parquet)
+
+patient / clinical / finance şemalarını takma adlandırılmış, ay bazında bölümlenmiş Parquet
+dosyalarına yazar (app.services.analytics_export). Araştırma iş birlikleri ve DuckDB
+defterleri üretim veritabanı yerine bu dizini okur.
+
+Features:
+- Server-side cursor + Arrow record batches (tablo belleğe alınmaz)
+- Incremental: manifest watermark'ından beri değişen aylar yeniden yazılır
+- PII: SENSITIVE_KEYS kolonları yazılmaz, UUID'ler HMAC takma ad, serbest metin maskelenir
+- Atomic partition files (tmp + rename); yarıda kalan çalışma manifest'i bozmaz
+- Dry-run mode: hangi tablo / ayların yazılacağını gösterir
+
+Usage:
+    # Dry run (no files written)
+    python -m maintenance.export_analytics --dry-run
+
+    # Incremental export to ANALYTICS_EXPORT_DIR
+    python -m maintenance.export_analytics
+
+    # Full rebuild of selected tables into another directory
+    python -m maintenance.export_analytics --full --tables sharded_clinical_muayeneler,finance.sharded_finance_islemler --out /data/exports
+
+Exit Codes:
+    0: SUCCESS - Export complete
+    1: FAILED - Export failed (check logs)
+    2: ERROR - Script execution error
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent to path for imports
+sys.path.insert(0, str(__file__).rsplit("/maintenance", 1)[0])
+
+from app.core.config import settings
+from app.services.analytics_export import PARQUET_SUPPORT, AnalyticsExporter
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+BATCH_SIZE = 10000
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Export patient / clinical / finance shards to partitioned Parquet")
+    parser.add_argument("--out", default=settings.ANALYTICS_EXPORT_DIR, help="Output directory (default ANALYTICS_EXPORT_DIR)")
+    parser.add_argument("--tables", help="Comma separated table names (schema.table or table); default all")
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition (picks up hard deletes)")
+    parser.add_argument("--no-scrub-text", action="store_true", help="Skip PII masking of free-text columns")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would be exported")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per cursor batch (default {BATCH_SIZE})")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("UroLog Analytics Export")
+    print("=" * 60)
+    print(f"Mode: {'DRY RUN' if args.dry_run else '⚠️  LIVE EXECUTION'}{' + FULL' if args.full else ''}")
+    print(f"Output: {Path(args.out).resolve()}")
+    print(f"Started: {datetime.now().isoformat()}")
+
+    if not PARQUET_SUPPORT and not args.dry_run:
+        print("\n❌ pyarrow is not installed (pip install pyarrow)")
+        return 1
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()] if args.tables else None
+    exporter = AnalyticsExporter(
+        Path(args.out), batch_size=args.batch_size, scrub_text=not args.no_scrub_text,
+        full=args.full, dry_run=args.dry_run,
+    )
+
+    try:
+        results = await exporter.run(tables)
+    except Exception as e:
+        print(f"\n❌ Export failed: {e}")
+        return 1
+
+    print("\n" + "=" * 60)
+    print("EXPORT SUMMARY")
+    print("=" * 60)
+    total = 0
+    for name, stats in results.items():
+        parts = stats["partitions"]
+        scope = "all partitions" if parts is None else f"{len(parts)} partition(s)"
+        print(f"  {name}: {stats['mode']}, {scope}, {stats['rows']} rows")
+        total += stats["rows"]
+    print(f"Tables: {len(results)}, rows {'to export' if args.dry_run else 'written'}: {total if not args.dry_run else 'n/a'}")
+    print(f"Completed: {datetime.now().isoformat()}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        exit_code = asyncio.run(main())
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR: {e}")
+        exit_code = 2
+    sys.exit(exit_code)
@@ -1,1118 +1,580 @@
-import asyncio
-import csv
-import os
-import sys
-from datetime import datetime
-from sqlalchemy import text
-from sqlalchemy.future import select
-
-from app.db.session import SessionLocal, engine
-from app.models.patient import Hasta
-from app.models.clinical import Muayene, TetkikSonuc
-from app.models.base_class import Base
-
-# Path configurations
-# Path configurations
-# Varsayılan olarak scriptin yanındaki 'import_source' klasörüne bakar.
-# Veya komut satırından verilen yolu kullanır: python db_import.py /yol/csvler
-if len(sys.argv) > 1:
-    CSV_DIR = sys.argv[1]
-else:
-    CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_source")
-
-ENCODING = "cp1254" # Common for Turkish legacy exports, fallback to 'latin-5' or 'iso-8859-9'
-
-async def update_schema():
-    """Add new columns to tables if they don't exist."""
-    print("Updating schema...")
-    async with engine.begin() as conn:
-        # Create all tables (including new SystemSetting)
-        await conn.run_sync(Base.metadata.create_all)
-        
-        # Check and add columns to muayeneler
-        columns_to_add = [
-            ("ozgecmis", "TEXT"),
-            ("soygecmis", "TEXT"),
-            ("kullandigi_ilaclar", "TEXT"),
-            ("aliskanliklar", "TEXT"),
-            ("sistem_sorgu", "TEXT"),
-            ("ipss_skor", "VARCHAR"),
-            ("fizik_muayene", "TEXT"),
-            ("erektil_islev", "VARCHAR"),
-            ("ejakulasyon", "VARCHAR"),
-            ("mshq", "VARCHAR"),
-            ("tani1_kodu", "VARCHAR"),
-            ("tani2_kodu", "VARCHAR"),
-            ("prosedur", "TEXT"),
-            ("doktor", "VARCHAR"),
-            ("bulgu_notu", "TEXT"),
-            ("sonuc", "TEXT"),
-            ("recete", "TEXT"),
-            ("allerjiler", "TEXT")
-        ]
-        
-        for col_name, col_type in columns_to_add:
-            try:
-                await conn.execute(text(f"ALTER TABLE muayeneler ADD COLUMN IF NOT EXISTS {col_name} {col_type}"))
-                print(f"Added column {col_name} to muayeneler")
-            except Exception as e:
-                print(f"Column {col_name} might already exist or error: {e}")
-
-        # Check and add columns to hastalar
-        hastalar_cols = [
-            ("dogum_yeri", "VARCHAR"),
-            ("kan_grubu", "VARCHAR"),
-            ("medeni_hal", "VARCHAR"),
-            ("kimlik_notlar", "TEXT"),
-            ("doktor", "VARCHAR"),
-            ("referans", "VARCHAR"),
-            ("postakodu", "VARCHAR"),
-            ("kurum", "VARCHAR"),
-            ("sigorta", "VARCHAR"),
-            ("ozelsigorta", "VARCHAR"),
-            ("cocuk_sayisi", "VARCHAR"),
-            ("faks", "VARCHAR")
-        ]
-        
-        for col_name, col_type in hastalar_cols:
-            try:
-                await conn.execute(text(f"ALTER TABLE hastalar ADD COLUMN IF NOT EXISTS {col_name} {col_type}"))
-                print(f"Added column {col_name} to hastalar")
-            except Exception as e:
-                print(f"Column {col_name} might already exist or error: {e}")
-
-        # Check and add columns to tetkik_sonuclari
-        tetkik_cols = [
-            ("birim", "VARCHAR"),
-            ("referans_araligi", "VARCHAR")
-        ]
-        for col_name, col_type in tetkik_cols:
-            try:
-                await conn.execute(text(f"ALTER TABLE tetkik_sonuclari ADD COLUMN IF NOT EXISTS {col_name} {col_type}"))
-            except Exception as e:
-                pass
+#!/usr/bin/env python3
+"""
+db_import.py - Legacy UroLog (DBISAM CSV) Import Engine
 
-def parse_date(date_str):
-    if not date_str:
-        return None
-    for fmt in ["%m/%d/%Y", "%d.%m.%Y", "%Y-%m-%d"]:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except ValueError:
-            continue
-    return None
-
-def clean_text(text):
-    if not text:
-        return None
-    return text.replace('\x00', '').strip()
-
-def map_ipss(val):
-    if not val:
-        return "0"
-    v = val.lower().strip()
-    if v in ["var", "evet", "1", "true"]:
-        return "1"
-    if v in ["yok", "hayır", "hayir", "0", "false"]:
-        return "0"
-    # Try to return number if digit
-    if v.isdigit():
-        return str(int(v))
-    return "0" # Default fallback
-
-def get_csv_reader(file_path):
-    # Kullanıcı sadece istediği dosyaları klasöre koyacağı için filtrelemeye gerek yok.
-    # Dosya varsa işlenir, yoksa FileNotFoundError ile atlanır.
-    filename = os.path.basename(file_path)
-    
-    # Dosya var mı kontrolü (her ihtimale karşı)
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"{filename} not found in source dir.")
-
-    f = open(file_path, mode='r', encoding=ENCODING, errors='replace')
-    # Skip lines until we find the header
-    while True:
-        pos = f.tell()
-        line = f.readline()
-        if not line:
-            break
-        if '"#","' in line:
-            f.seek(pos) # Go back to start of header line
-            break
-            
-    return csv.DictReader(f), f
-
-async def import_data():
-    async with SessionLocal() as session:
-        # 1. Load Anamnez
-        print("Loading Anamnez data...")
-        anamnez_map = {} 
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "ANAMNEZ.CSV"))
-            for row in reader:
-                hid = row.get("HastaRecID")
-                if hid:
-                    anamnez_map[hid] = {
-                        "alkol": clean_text(row.get("Alkol")),
-                        "sigara": clean_text(row.get("Sigara")),
-                        "allerji": clean_text(row.get("Allerji")),
-                        "kilac": clean_text(row.get("Kilac")),
-                        "ozgecmis": clean_text(row.get("Ozgecmis")),
-                        "soygecmis": clean_text(row.get("Soygecmis"))
-                    }
-            f.close()
-        except FileNotFoundError:
-            print("ANAMNEZ.CSV not found.")
+Eski UroLog export'larından (HASTA.CSV, MUAYENE.CSV, ...) yeni kliniği doğrudan sharded
+şemalara (patient, clinical) aktarır.
 
-        # 2. Import Patients
-        print("Importing Patients...")
-        legacy_id_map = {} # map[Legacy_ID] -> Real_DB_ID
-        try:
-            # Prefetch existing IDs and TCKNs
-            result = await session.execute(select(Hasta.id, Hasta.tc_kimlik))
-            rows = result.all()
-            existing_ids = {r[0] for r in rows}
-            # Map TCKN to existing Real ID
-            tckn_map = {r[1]: r[0] for r in rows if r[1]} 
-            print(f"Found {len(existing_ids)} existing patients and {len(tckn_map)} TCKNs.")
-
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "HASTA.CSV"))
-            new_patients = []
-            count = 0
-
-            for row in reader:
-                try:
-                    rec_id_str = row.get("HastaRecID")
-                    if not rec_id_str: continue
-                    rec_id = int(rec_id_str)
-                    
-                    # Validation for TC Kimlik
-                    tc = clean_text(row.get("TCKimlik"))
-                    if tc and (len(tc) != 11 or not tc.isdigit()):
-                        tc = None
-                    
-                    # If TCKN already exists under DIFFERENT ID, remap legacy ID to usage ID
-                    if tc and tc in tckn_map and tckn_map[tc] != rec_id:
-                        real_id = tckn_map[tc]
-                        print(f"Skipping Patient {rec_id}: Duplicate TCKN {tc} -> Remapping to {real_id}")
-                        legacy_id_map[rec_id] = real_id
-                        continue
-
-                    p_data = {
-                        'id': rec_id,
-                        'ad': clean_text(row.get("Ad")),
-                        'soyad': clean_text(row.get("Soyad")),
-                        'tc_kimlik': tc,
-                        'cinsiyet': clean_text(row.get("Cinsiyet")),
-                        'dogum_tarihi': parse_date(row.get("DTarih")),
-                        'dogum_yeri': clean_text(row.get("DYer")),
-                        'kan_grubu': clean_text(row.get("Kangrubu")),
-                        'meslek': clean_text(row.get("Meslek")),
-                        'medeni_hal': clean_text(row.get("MedeniHal")),
-                        'adres': f"{clean_text(row.get('Adres1')) or ''} {clean_text(row.get('Adres2')) or ''} {clean_text(row.get('Postakod')) or ''} {clean_text(row.get('Adres3')) or ''}".replace('  ', ' ').strip(),
-                        'ev_tel': clean_text(row.get("Evtelefonu")),
-                        'is_tel': clean_text(row.get("IsTelefon")),
-                        'cep_tel': clean_text(row.get("Ceptelefonu")),
-                        'email': clean_text(row.get("Eposta")),
-                        'kimlik_notlar': clean_text(row.get("Notlar")),
-                        'doktor': clean_text(row.get("Doktor")),
-                        'referans': clean_text(row.get("Referans")),
-                        'postakodu': clean_text(row.get("Postakod")),
-                        'kurum': clean_text(row.get("Kurum")),
-                        'sigorta': clean_text(row.get("Sigorta")),
-                        'ozelsigorta': clean_text(row.get("OzelSigorta")),
-                        'cocuk_sayisi': clean_text(row.get("Cocuksay")),
-                        'faks': clean_text(row.get("Faks"))
-                    }
-
-                    if rec_id in existing_ids:
-                        # Update record
-                        await session.execute(text("""
-                            UPDATE hastalar SET
-                                ad=:ad, soyad=:soyad, tc_kimlik=:tc_kimlik, cinsiyet=:cinsiyet,
-                                dogum_tarihi=:dogum_tarihi, dogum_yeri=:dogum_yeri, kan_grubu=:kan_grubu,
-                                meslek=:meslek, medeni_hal=:medeni_hal, adres=:adres,
-                                ev_tel=:ev_tel, is_tel=:is_tel, cep_tel=:cep_tel, email=:email,
-                                kimlik_notlar=:kimlik_notlar, doktor=:doktor, referans=:referans,
-                                postakodu=:postakodu, kurum=:kurum, sigorta=:sigorta,
-                                ozelsigorta=:ozelsigorta, cocuk_sayisi=:cocuk_sayisi, faks=:faks
-                            WHERE id=:id
-                        """), p_data)
-                        legacy_id_map[rec_id] = rec_id
-                    else:
-                        # Insert record
-                        p = Hasta(**p_data)
-                        session.add(p)
-                        existing_ids.add(rec_id)
-                        legacy_id_map[rec_id] = rec_id
-                        if tc: tckn_map[tc] = rec_id
-                    
-                    count += 1
-                    if count % 100 == 0:
-                        await session.commit()
-                        print(f"Processed {count} patients...")
-
-                except Exception as e:
-                    print(f"Error processing patient row: {e}")
-
-            # Ensure remaining changes are committed
-            await session.commit()
-            
-            f.close()
-            print(f"Imported total {count} new patients.")
-        except FileNotFoundError:
-            print("HASTA.CSV not found.")
+Aşamalar:
+1. LOAD  - Her CSV akış halinde okunur, satırlar worker süreçlerinde dönüştürülür
+           (maintenance.migrations.legacy_transforms) ve asyncpg COPY ile
+           import_stage şemasındaki UNLOGGED staging tablolarına yüklenir. Dosyalar paralel yüklenir.
+2. MERGE - Staging'den hedef tablolara set-based SQL ile aktarılır
+           (hasta eşlemesi, upsert, (hasta, tarih, ad) tekilleştirme tek sorguda).
 
-        # 3. Import Examinations
-        print("Importing Examinations...")
-        try:
-            # Sync Sequence First
-            await session.execute(text("SELECT setval('muayeneler_id_seq', COALESCE((SELECT MAX(id)+1 FROM muayeneler), 1), false)"))
-            await session.commit()
-            
-            # Prefetch existing (hasta_id, tarih) -> ID map
-            result = await session.execute(select(Muayene.id, Muayene.hasta_id, Muayene.tarih))
-            # Map: (hasta_id, tarih) -> muayene_id
-            existing_exam_map = {(r[1], r[2]): r[0] for r in result.all()}
-            print(f"Found {len(existing_exam_map)} existing exams (by patient/date).")
-
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "MUAYENE.CSV"))
-            new_exams = []
-            updates = [] # List of dicts for bulk update (if supported, or just loop updates)
-            m_count = 0
-            u_count = 0
-            row_count = 0
-            
-            for row in reader:
-                row_count += 1
-                try:
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    anam = anamnez_map.get(str(legacy_hid), {})
-                    p_date = parse_date(row.get("Tarih"))
-                    
-                    # Prepare Data
-                    aliskanliklar = []
-                    if anam.get("alkol"): aliskanliklar.append(f"Alkol: {anam['alkol']}")
-                    if anam.get("sigara"): aliskanliklar.append(f"Sigara: {anam['sigara']}")
-                    if anam.get("allerji"): aliskanliklar.append(f"Allerji: {anam['allerji']}")
-                    
-                    s_sorgu = [] 
-                    for field in ["Disuri", "Pollakiuri", "Nokturi", "Hematuri", "GenitalAkinti", "Kabizlik", "TasOyku"]:
-                         val = clean_text(row.get(field))
-                         if val: s_sorgu.append(f"{field}: {val}")
-
-                     
-                    tedavi_val = clean_text(row.get('Prosedur'))
-                    recete_val = clean_text(row.get('Recete'))
-
-                    data = dict(
-                        hasta_id=hid,
-                        tarih=p_date,
-                        sikayet=clean_text(row.get("Sikayet")),
-                        oyku=clean_text(row.get("Oyku")),
-                        tansiyon=clean_text(row.get("Tansiyon")),
-                        ates=clean_text(row.get("Ates")),
-                        kvah=clean_text(row.get("KVAH")),
-                        bobrek_sag=clean_text(row.get("BobrekSag")),
-                        bobrek_sol=clean_text(row.get("BobrekSol")),
-                        suprapubik_kitle=clean_text(row.get("SuprapubikKitle")),
-                        ego=clean_text(row.get("EGO")),
-                        rektal_tuse=clean_text(row.get("DRE")),
-                        disuri=clean_text(row.get("Disuri")),
-                        pollakiuri=map_ipss(row.get("Pollakiuri")),
-                        nokturi=map_ipss(row.get("Nokturi")),
-                        hematuri=clean_text(row.get("Hematuri")),
-                        genital_akinti=clean_text(row.get("GenitalAkinti")),
-                        kabizlik=clean_text(row.get("Kabizlik")),
-                        tas_oyku=clean_text(row.get("TasOyku")),
-                        catallanma=clean_text(row.get("Catallanma")),
-                        projeksiyon_azalma=map_ipss(row.get("ProjeksiyonAzalma")),
-                        kalibre_incelme=clean_text(row.get("KalibreIncelme")),
-                        idrar_bas_zorluk=map_ipss(row.get("IdrarBasZorluk")),
-                        kesik_idrar_yapma=map_ipss(row.get("KesikIdrarYapma")),
-                        terminal_damlama=clean_text(row.get("TerminalDamlama")),
-                        residiv_hissi=map_ipss(row.get("ResidivHissi")),
-                        inkontinans=map_ipss(row.get("Inkontinans")),
-                        
-                        tani1=clean_text(row.get("Tani1")),
-                        tani2=clean_text(row.get("Tani2")),
-                        
-                        erektil_islev=clean_text(row.get("Erektil")),
-                        ejakulasyon=clean_text(row.get("Ejakulasyon")),
-                        mshq=clean_text(row.get("MSHQ")),
-                        
-                        # New Fields
-                        ipss_skor=clean_text(row.get("PSS")),
-                        prosedur=clean_text(row.get("Prosedur")),
-                        doktor=clean_text(row.get("Doktor")),
-                        tani1_kodu=clean_text(row.get("TKod1")),
-                        tani2_kodu=clean_text(row.get("TKod2")),
-                        bulgu_notu=None,
-
-                        
-                        # Extra Mappings for Treatment/Plan/Findings
-                        fizik_muayene=clean_text(row.get("BulguNot")), 
-                        oneriler=f"{clean_text(row.get('Oneriler') or '')}\n{clean_text(row.get('Prosedur') or '')}".strip(), 
-                        sonuc=clean_text(row.get("Sonuc")),
-                        
-                        tedavi=tedavi_val,
-                        recete=recete_val,
-
-                        sistem_sorgu="; ".join(s_sorgu),
-                        ozgecmis=clean_text(anam.get("ozgecmis")),
-                        soygecmis=clean_text(anam.get("soygecmis")),
-                        kullandigi_ilaclar=clean_text(anam.get("kilac")),
-                        aliskanliklar="; ".join(aliskanliklar) if aliskanliklar else None
-                    )
-                    
-                    # UPSERT Logic
-                    if (hid, p_date) in existing_exam_map:
-                        # Existing -> Update
-                        mid = existing_exam_map[(hid, p_date)]
-                        # We perform direct update statement for speed or ORM fetch-update. 
-                        # Given 2000 rows, fetch-update is fine. But we want bulk.
-                        # ORM bulk update by PK is tricky in async without fetching.
-                        # Let's just create a list of update params
-                        # NOTE: This overrides existing data!
-                        data['id'] = mid
-                        updates.append(data)
-                        u_count += 1
-                    else:
-                        # New -> Insert
-                        m = Muayene(**data)
-                        new_exams.append(m)
-                        existing_exam_map[(hid, p_date)] = 0 # Placeholder key
-                        m_count += 1
-
-                    if len(new_exams) >= 100:
-                        session.add_all(new_exams)
-                        await session.commit()
-                        new_exams = []
-                        print(f"Committed {m_count} new exams...")
-                    
-                    if len(updates) >= 100:
-                         await session.execute(
-                             text("""
-                                UPDATE muayeneler SET 
-                                    sikayet=:sikayet, oyku=:oyku, tansiyon=:tansiyon, ates=:ates, kvah=:kvah,
-                                    bobrek_sag=:bobrek_sag, bobrek_sol=:bobrek_sol, suprapubik_kitle=:suprapubik_kitle, ego=:ego, rektal_tuse=:rektal_tuse,
-                                    disuri=:disuri, pollakiuri=:pollakiuri, nokturi=:nokturi, hematuri=:hematuri, genital_akinti=:genital_akinti, kabizlik=:kabizlik, tas_oyku=:tas_oyku,
-                                    catallanma=:catallanma, projeksiyon_azalma=:projeksiyon_azalma, kalibre_incelme=:kalibre_incelme, idrar_bas_zorluk=:idrar_bas_zorluk,
-                                    kesik_idrar_yapma=:kesik_idrar_yapma, terminal_damlama=:terminal_damlama, residiv_hissi=:residiv_hissi, inkontinans=:inkontinans,
-                                    tani1=:tani1, tani1_kodu=:tani1_kodu, tani2=:tani2, tani2_kodu=:tani2_kodu,
-                                    fizik_muayene=:fizik_muayene, oneriler=:oneriler, sonuc=:sonuc, tedavi=:tedavi, recete=:recete,
-                                    sistem_sorgu=:sistem_sorgu, ozgecmis=:ozgecmis, soygecmis=:soygecmis, kullandigi_ilaclar=:kullandigi_ilaclar, aliskanliklar=:aliskanliklar,
-                                    erektil_islev=:erektil_islev, ejakulasyon=:ejakulasyon, mshq=:mshq,
-                                    ipss_skor=:ipss_skor, prosedur=:prosedur, doktor=:doktor, bulgu_notu=:bulgu_notu
-                                WHERE id=:id
-                             """),
-                             updates
-                         )
-                         await session.commit()
-                         updates = []
-                         print(f"Updated {u_count} existing exams...")
-
-                except Exception as e:
-                    pass # Silently skip errors to complete bulk import
-            
-            if new_exams:
-                session.add_all(new_exams)
-                await session.commit()
-                
-            if updates:
-                 await session.execute(
-                     text("""
-                        UPDATE muayeneler SET 
-                            sikayet=:sikayet, oyku=:oyku, tansiyon=:tansiyon, ates=:ates, kvah=:kvah,
-                            bobrek_sag=:bobrek_sag, bobrek_sol=:bobrek_sol, suprapubik_kitle=:suprapubik_kitle, ego=:ego, rektal_tuse=:rektal_tuse,
-                            disuri=:disuri, pollakiuri=:pollakiuri, nokturi=:nokturi, hematuri=:hematuri, genital_akinti=:genital_akinti, kabizlik=:kabizlik, tas_oyku=:tas_oyku,
-                            catallanma=:catallanma, projeksiyon_azalma=:projeksiyon_azalma, kalibre_incelme=:kalibre_incelme, idrar_bas_zorluk=:idrar_bas_zorluk,
-                            kesik_idrar_yapma=:kesik_idrar_yapma, terminal_damlama=:terminal_damlama, residiv_hissi=:residiv_hissi, inkontinans=:inkontinans,
-                            tani1=:tani1, tani1_kodu=:tani1_kodu, tani2=:tani2, tani2_kodu=:tani2_kodu,
-                            fizik_muayene=:fizik_muayene, oneriler=:oneriler, sonuc=:sonuc, tedavi=:tedavi, recete=:recete,
-                            sistem_sorgu=:sistem_sorgu, ozgecmis=:ozgecmis, soygecmis=:soygecmis, kullandigi_ilaclar=:kullandigi_ilaclar, aliskanliklar=:aliskanliklar,
-                            erektil_islev=:erektil_islev, ejakulasyon=:ejakulasyon, mshq=:mshq,
-                            ipss_skor=:ipss_skor, prosedur=:prosedur, doktor=:doktor, bulgu_notu=:bulgu_notu
-                        WHERE id=:id
-                     """),
-                     updates
-                 )
-                 await session.commit()
-
-            f.close()
-            print(f"Scanned {row_count} rows. Imported {m_count} new, Updated {u_count} existing.")
-            
-            # Reset Sequence
-            await session.execute(text("SELECT setval('muayeneler_id_seq', COALESCE((SELECT MAX(id)+1 FROM muayeneler), 1), false)"))
-            await session.commit()
-            
-        except FileNotFoundError:
-             print("MUAYENE.CSV not found.")
-
-        # 4. Import Patient Notes (Follow-up) -> HNOTLAR.CSV
-        print("Importing Patient Notes (Follow-up)...")
-        from app.models.clinical import HastaNotu
-        try:
-            # Dedup for Notes (hasta_id, tarih, type)
-            result = await session.execute(select(HastaNotu.hasta_id, HastaNotu.tarih, HastaNotu.tip))
-            existing_notes = set([(r[0], r[1], r[2]) for r in result.all()])
-            
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "HNOTLAR.CSV"))
-            new_notes = []
-            n_count = 0
-            
-            for row in reader:
-                try:
-                    rec_id_str = row.get("RecID") or row.get("HNotRecID")
-                    # Ignore RecID for PK
-                    
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    n_date = parse_date(row.get("Tarih"))
-                    n_type = clean_text(row.get("Tip"))
-                    
-                    if (hid, n_date, n_type) in existing_notes:
-                        continue
-
-                    note = HastaNotu(
-                        # id=rec_id, # Let DB handle
-                        hasta_id=hid,
-                        tarih=n_date,
-                        icerik=clean_text(row.get("Notlar")),
-                        tip=n_type,
-                        sembol=clean_text(row.get("Sembol"))
-                    )
-                    new_notes.append(note)
-                    existing_notes.add((hid, n_date, n_type))
-                    n_count += 1
-                    
-                    if len(new_notes) >= 100:
-                         session.add_all(new_notes)
-                         await session.commit()
-                         new_notes = []
-                         print(f"Committed {n_count} notes...")
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            if new_notes:
-                session.add_all(new_notes)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {n_count} patient notes.")
-            
-            # Reset Sequence
-            await session.execute(text("SELECT setval('hasta_notlari_id_seq', COALESCE((SELECT MAX(id)+1 FROM hasta_notlari), 1), false)"))
-            await session.commit()
+Checkpoint: her COPY parçası, okunan satır sayısıyla aynı transaction'da import_stage.checkpoints'e
+yazılır. Çökme sonrası tekrar çalıştırıldığında dosyanın kaldığı satırdan devam edilir; değişmiş
+dosyalar (boyut / mtime) ve staging'i kaybolmuş kaynaklar (ör. Postgres yeniden başladı,
+UNLOGGED tablo boşaldı) baştan yüklenir. Merge adımları idempotenttir.
 
-        except FileNotFoundError:
-            print("HNOTLAR.CSV not found.")
-
-        # 5. Import Imaging Results (GLABIST.CSV)
-        print("Importing Imaging Results (GLABIST.CSV)...")
-        try:
-             # Dedup set: (hasta_id, tarih, tetkik_adi)
-            result = await session.execute(select(TetkikSonuc.hasta_id, TetkikSonuc.tarih, TetkikSonuc.tetkik_adi))
-            existing_results = set([(r[0], r[1], r[2]) for r in result.all()])
-            
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "GLABIST.CSV"))
-            new_tests = []
-            t_count = 0
-            
-            for row in reader:
-                try:
-                    # GLABIST: HastaRecID, RecID, Tarih, Tetkik, Sonuc, Sembol
-                    
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    # Remap ID
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    t_name = clean_text(row.get("Tetkik"))
-                    
-                    # Dedup
-                    if (hid, t_date, t_name) in existing_results:
-                        continue
-                        
-                    res = TetkikSonuc(
-                        hasta_id=hid,
-                        tarih=t_date,
-                        kategori="Goruntuleme",
-                        tetkik_adi=t_name,
-                        sonuc=clean_text(row.get("Sonuc")),
-                        sembol=clean_text(row.get("Sembol"))
-                    )
-                    new_tests.append(res)
-                    existing_results.add((hid, t_date, t_name))
-                    t_count += 1
-                    
-                    if len(new_tests) >= 100:
-                         session.add_all(new_tests)
-                         await session.commit()
-                         new_tests = []
-                         print(f"Committed {t_count} imaging results...")
-
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-
-            if new_tests:
-                session.add_all(new_tests)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {t_count} imaging results.")
-        except FileNotFoundError:
-             print("GLABIST.CSV not found.")
-
-        # 6. Import Lab Results (LABIST.CSV)
-        print("Importing Lab Results (LABIST.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "LABIST.CSV"))
-            new_labs = []
-            l_count = 0
-            
-            for row in reader:
-                try:
-                    # LABIST: HastaRecID, RecID, Tarih, Tetkik, Sonuc, Kontrol, Notlar
-                    
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    t_name = clean_text(row.get("Tetkik"))
-                    
-                    if (hid, t_date, t_name) in existing_results:
-                         continue
-                         
-                    res = TetkikSonuc(
-                        hasta_id=hid,
-                        tarih=t_date,
-                        kategori="Laboratuvar",
-                        tetkik_adi=t_name,
-                        sonuc=clean_text(row.get("Sonuc")),
-                        sembol=clean_text(row.get("Kontrol")) # Using Kontrol column as Sembol/Flag
-                    )
-                    new_labs.append(res)
-                    existing_results.add((hid, t_date, t_name))
-                    l_count += 1
-                    
-                    if len(new_labs) >= 100:
-                        session.add_all(new_labs)
-                        await session.commit()
-                        new_labs = []
-                        print(f"Committed {l_count} lab results...")
-
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            if new_labs:
-                session.add_all(new_labs)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {l_count} lab results.")
-        except FileNotFoundError:
-            print("LABIST.CSV not found.")
+Eski HastaRecID -> deterministik UUID (uuid5). TC kimlik no'su mevcut bir hastayla çakışan
+kayıtlar o hastaya eşlenir (eski davranış).
 
+Usage:
+    # Varsayılan kaynak: scriptin yanındaki import_source/
+    python -m maintenance.migrations.db_import /path/to/csv_exports
 
-            
-        # 7. Import Operations (OPERASYON.CSV)
-        print("Importing Operations (OPERASYON.CSV)...")
-        from app.models.clinical import Operasyon
-        try:
-             # Dedup set: (hasta_id, tarih, ameliyat_adi)
-            result = await session.execute(select(Operasyon.hasta_id, Operasyon.tarih, Operasyon.ameliyat))
-            existing_ops = set([(r[0], r[1], r[2]) for r in result.all()])
-            
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "OPERASYON.CSV"))
-            new_ops = []
-            op_count = 0
-            
-            for row in reader:
-                try:
-                    # OPERASYON: HastaRecID, RecID, Tarih, Ameliyat, OpEkip, Hemsire, AnesteziEkip, AnesteziTur, Notlar, Patoloji, PostOp, OpVideo
-                    
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    # Remap ID
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    op_date = parse_date(row.get("Tarih"))
-                    op_name = clean_text(row.get("Ameliyat"))
-                    
-                    # Dedup
-                    if (hid, op_date, op_name) in existing_ops:
-                        continue
-                        
-                    op = Operasyon(
-                        hasta_id=hid,
-                        tarih=op_date,
-                        ameliyat=op_name,
-                        pre_op_tani=clean_text(row.get("AOTani")),
-                        post_op_tani=clean_text(row.get("ASTani")),
-                        ekip=clean_text(row.get("OpEkip")),
-                        hemsire=clean_text(row.get("Hemsire")),
-                        anestezi_ekip=clean_text(row.get("AnesteziEkip")),
-                        anestezi_tur=clean_text(row.get("AnesteziTur")),
-                        notlar=clean_text(row.get("Notlar")),
-                        patoloji=clean_text(row.get("Patoloji")),
-                        post_op=clean_text(row.get("PostOp")),
-                        video_url=clean_text(row.get("OpVideo"))
-                    )
-                    new_ops.append(op)
-                    existing_ops.add((hid, op_date, op_name))
-                    op_count += 1
-                    
-                    if len(new_ops) >= 100:
-                         session.add_all(new_ops)
-                         await session.commit()
-                         new_ops = []
-                         print(f"Committed {op_count} operations...")
-
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-
-            if new_ops:
-                session.add_all(new_ops)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {op_count} operations.")
-        except FileNotFoundError:
-             print("OPERASYON.CSV not found.")
+    # Süreç / bağlantı sayısı
+    python -m maintenance.migrations.db_import /path/to/csv_exports --workers 8 --jobs 4
 
-        # 8. Import Hemogram (KAN.CSV) - Split Parameters
-        print("Importing Hemogram (KAN.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "KAN.CSV"))
-            new_hemos = []
-            h_count = 0
-            
-            for row in reader:
-                try:
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    
-                    # Define parameters map
-                    params = [
-                        ("Hemoglobin", "Hemoglobin (HGB)", "g/dL"),
-                        ("Hematokrit", "Hematokrit (HCT)", "%"),
-                        ("Lokosit", "Lökosit (WBC)", "10^3/uL"),
-                        ("Trombosit", "Trombosit (PLT)", "10^3/uL")
-                    ]
-                    
-                    for col, name, unit in params:
-                        val = row.get(col)
-                        if val:
-                            if (hid, t_date, name) in existing_results: continue
-                            
-                            res = TetkikSonuc(
-                                hasta_id=hid,
-                                tarih=t_date,
-                                kategori="Laboratuvar",
-                                tetkik_adi=name,
-                                sonuc=f"{val} {unit}",
-                                sembol="info"
-                            )
-                            new_hemos.append(res)
-                            existing_results.add((hid, t_date, name))
-
-                    # Notes
-                    if row.get("Notlar"):
-                        name = "Hemogram Notu"
-                        if (hid, t_date, name) not in existing_results:
-                            res = TetkikSonuc(
-                                hasta_id=hid,
-                                tarih=t_date,
-                                kategori="Laboratuvar",
-                                tetkik_adi=name,
-                                sonuc=clean_text(row.get("Notlar")),
-                                sembol="info"
-                            )
-                            new_hemos.append(res)
-                            existing_results.add((hid, t_date, name))
-
-                    h_count += 1
-                    
-                    if len(new_hemos) >= 100:
-                        session.add_all(new_hemos)
-                        await session.commit()
-                        new_hemos = []
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            if new_hemos:
-                session.add_all(new_hemos)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {h_count} hemogram records (split).")
-            
-        except FileNotFoundError:
-            print("KAN.CSV not found.")
+    # Checkpoint'leri yok sayıp baştan yükle
+    python -m maintenance.migrations.db_import /path/to/csv_exports --restart
 
-        # 8.5 Import Urine (IDRAR.CSV)
-        print("Importing Urine (IDRAR.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "IDRAR.CSV"))
-            new_urine = []
-            u_count = 0
-            
-            for row in reader:
-                try:
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    
-                    # Parameters
-                    u_params = [
-                        ("Dansite", "İdrar - Dansite"),
-                        ("pH", "İdrar - pH"),
-                        ("Sediment", "İdrar - Sediment"),
-                        ("Steril", "İdrar Kültürü"),
-                        ("Koloni", "İdrar Kül. - Koloni"),
-                        ("Bakteri", "İdrar Kül. - Bakteri"),
-                        ("Antibiyogram", "İdrar Kül. - Antibiyogram")
-                    ]
-                    
-                    for col, name in u_params:
-                        val = clean_text(row.get(col))
-                        if val:
-                             if (hid, t_date, name) in existing_results: continue
-                             res = TetkikSonuc(
-                                hasta_id=hid,
-                                tarih=t_date,
-                                kategori="Laboratuvar",
-                                tetkik_adi=name,
-                                sonuc=val,
-                                sembol="info"
-                             )
-                             new_urine.append(res)
-                             existing_results.add((hid, t_date, name))
-                    
-                    if row.get("Notlar"):
-                         name = "İdrar Notu"
-                         if (hid, t_date, name) not in existing_results:
-                             res = TetkikSonuc(
-                                hasta_id=hid,
-                                tarih=t_date,
-                                kategori="Laboratuvar",
-                                tetkik_adi=name,
-                                sonuc=clean_text(row.get("Notlar")),
-                                sembol="info"
-                             )
-                             new_urine.append(res)
-                             existing_results.add((hid, t_date, name))
-                    
-                    u_count += 1
-                    if len(new_urine) >= 100:
-                        session.add_all(new_urine)
-                        await session.commit()
-                        new_urine = []
-
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-
-            if new_urine:
-                 session.add_all(new_urine)
-                 await session.commit()
-            f.close()
-            print(f"Imported total {u_count} urine records.")
-            
-        except FileNotFoundError:
-            print("IDRAR.CSV not found.")
+    # Sadece belirli dosyalar
+    python -m maintenance.migrations.db_import /path/to/csv_exports --only HASTA,MUAYENE
 
-        # 9. Import Spermiogram (SPERM.CSV)
-        print("Importing Spermiogram (SPERM.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "SPERM.CSV"))
-            new_sperms = []
-            s_count = 0
-            
-            for row in reader:
-                try:
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    t_name = "Spermiogram"
-                    
-                    if (hid, t_date, t_name) in existing_results:
-                        continue
-                     
-                    # Construct Result String
-                    res_parts = []
-                    if row.get("Perhiz"): res_parts.append(f"Perhiz: {row.get('Perhiz')} gün")
-                    if row.get("Volum"): res_parts.append(f"Volüm: {row.get('Volum')} cc")
-                    if row.get("Sayi"): res_parts.append(f"Sayı: {row.get('Sayi')} /ml")
-                    if row.get("Motilite"): res_parts.append(f"Motilite: {row.get('Motilite')}")
-                    if row.get("Kruger"): res_parts.append(f"Kruger: {row.get('Kruger')}")
-                    if row.get("Viskozite"): res_parts.append(f"Viskozite: {row.get('Viskozite')}")
-                    if row.get("Aglutinasyon"): res_parts.append(f"Aglutinasyon: {row.get('Aglutinasyon')}")
-                    if row.get("Notlar"): res_parts.append(f"Not: {clean_text(row.get('Notlar'))}")
-                    
-                    full_res = "\n".join(res_parts)
-                    
-                    res = TetkikSonuc(
-                        hasta_id=hid,
-                        tarih=t_date,
-                        kategori="Laboratuvar",
-                        tetkik_adi=t_name,
-                        sonuc=full_res,
-                        sembol="info"
-                    )
-                    new_sperms.append(res)
-                    existing_results.add((hid, t_date, t_name))
-                    s_count += 1
-                    
-                    if len(new_sperms) >= 100:
-                        session.add_all(new_sperms)
-                        await session.commit()
-                        new_sperms = []
-                        print(f"Committed {s_count} spermiograms...")
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            if new_sperms:
-                session.add_all(new_sperms)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {s_count} spermiograms.")
-            
-        except FileNotFoundError:
-            print("SPERM.CSV not found.")
+Exit Codes:
+    0: SUCCESS - Import complete
+    1: FAILED - One or more stages failed (checkpoint kept, re-run to resume)
+    2: ERROR - Script execution error
+"""
 
-        # 10. Import TRUS Biopsy (TRUS.CSV)
-        print("Importing TRUS Biopsy (TRUS.CSV)...")
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import asyncpg
+from sqlalchemy import String
+
+# Add parent to path for imports
+sys.path.insert(0, str(__file__).rsplit("/maintenance", 1)[0])
+
+from app.db.session import engine
+from app.models.finance import Kurum
+from app.repositories.clinical.models import ShardedClinicalNote, ShardedMuayene, ShardedOperasyon, ShardedTetkikSonuc
+from app.repositories.patient.models import ShardedPatientDemographics
+from maintenance.migrations import legacy_transforms as lt
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_CSV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_source")
+STAGE_SCHEMA = "import_stage"
+BATCH_SIZE = 5000  # Worker'a gönderilen / tek COPY'de yüklenen satır sayısı
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str                                   # checkpoint anahtarı ve staging tablo adı
+    filename: str
+    kind: str                                   # lt.STAGING_COLUMNS anahtarı
+    transform: Callable[[lt.Row], List[tuple]]
+
+    @property
+    def table(self) -> str:
+        return self.name.lower()
+
+
+SOURCES: List[Source] = [
+    Source("HASTA", "HASTA.CSV", "hasta", lt.transform_hasta),
+    Source("ANAMNEZ", "ANAMNEZ.CSV", "anamnez", lt.transform_anamnez),
+    Source("MUAYENE", "MUAYENE.CSV", "muayene", lt.transform_muayene),
+    Source("HNOTLAR", "HNOTLAR.CSV", "notlar", lt.transform_notlar),
+    Source("GLABIST", "GLABIST.CSV", "tetkik", lt.transform_glabist),
+    Source("LABIST", "LABIST.CSV", "tetkik", lt.transform_labist),
+    Source("KAN", "KAN.CSV", "tetkik", lt.transform_kan),
+    Source("IDRAR", "IDRAR.CSV", "tetkik", lt.transform_idrar),
+    Source("SPERM", "SPERM.CSV", "tetkik", lt.transform_sperm),
+    Source("TRUS", "TRUS.CSV", "tetkik", lt.transform_trus),
+    Source("OPERASYON", "OPERASYON.CSV", "operasyon", lt.transform_operasyon),
+    Source("KURUM", "KURUM.CSV", "kurum", lt.transform_kurum),
+]
+
+# Sharded şemada karşılığı olmayan eski tablolar
+UNSUPPORTED_FILES = {
+    "PLAN.CSV": "planlar tablosunun sharded karşılığı yok",
+    "URODINAMI.CSV": "urodinamiler tablosunun sharded karşılığı yok",
+}
+
+TETKIK_SOURCES = ["GLABIST", "LABIST", "KAN", "IDRAR", "SPERM", "TRUS"]
+
+
+def _dsn() -> str:
+    # session.py'deki host düzeltmesi (db -> localhost) dahil, uygulamanın kullandığı adres
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _stage(table: str) -> str:
+    return f"{STAGE_SCHEMA}.{table}"
+
+
+def _fit(model, column: str, expr: str) -> str:
+    """Hedef kolon VARCHAR(n) ise değeri kırp (eski import hatalı satırı sessizce atlıyordu)."""
+    col_type = model.__table__.c[column].type
+    if isinstance(col_type, String) and col_type.length:
+        return f"LEFT({expr}, {col_type.length})"
+    return expr
+
+
+def _target(model) -> str:
+    table = model.__table__
+    return f"{table.schema}.{table.name}" if table.schema else table.name
+
+
+# =============================================================================
+# STAGING & CHECKPOINTS
+# =============================================================================
+
+async def prepare_stage(conn: asyncpg.Connection, restart: bool) -> None:
+    if restart:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {STAGE_SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {STAGE_SCHEMA}")
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_stage('checkpoints')} (
+            source TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            rows_done BIGINT NOT NULL DEFAULT 0,
+            records BIGINT NOT NULL DEFAULT 0,
+            loaded BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_stage('merges')} (
+            stage TEXT PRIMARY KEY,
+            result TEXT,
+            merged_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    # Hasta eşlemesi merge'ler arasında kalıcı olmalı: LOGGED
+    await conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_stage('patient_map')} (
+            legacy_id BIGINT PRIMARY KEY,
+            hasta_id UUID NOT NULL
+        )
+    """)
+    for source in SOURCES:
+        cols = ", ".join(f"{name} {typ}" for name, typ in lt.STAGING_COLUMNS[source.kind])
+        await conn.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {_stage(source.table)} ({cols})")
+
+
+def _fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+async def _reset_source(conn: asyncpg.Connection, source: Source, fingerprint: str) -> None:
+    async with conn.transaction():
+        await conn.execute(f"TRUNCATE {_stage(source.table)}")
+        await conn.execute(
+            f"""
+            INSERT INTO {_stage('checkpoints')} (source, fingerprint) VALUES ($1, $2)
+            ON CONFLICT (source) DO UPDATE
+            SET fingerprint = EXCLUDED.fingerprint, rows_done = 0, records = 0, loaded = FALSE, updated_at = now()
+            """,
+            source.name, fingerprint,
+        )
+
+
+async def load_source(
+    source: Source,
+    csv_dir: str,
+    pool: ProcessPoolExecutor,
+    workers: int,
+    batch_size: int,
+) -> Dict[str, Any]:
+    """CSV'yi staging tablosuna yükler. (Yeniden) yükleme yapıldıysa stats['loaded_now'] True olur."""
+    stats = {"source": source.name, "status": "pending", "rows": 0, "records": 0, "skipped": 0, "loaded_now": False}
+    path = os.path.join(csv_dir, source.filename)
+    if not os.path.exists(path):
+        stats["status"] = "missing"
+        print(f"  {source.filename} not found (skipped)")
+        return stats
+
+    fingerprint = _fingerprint(path)
+    conn = await asyncpg.connect(_dsn())
+    try:
+        cp = await conn.fetchrow(f"SELECT * FROM {_stage('checkpoints')} WHERE source = $1", source.name)
+        staged = await conn.fetchval(f"SELECT count(*) FROM {_stage(source.table)}")
+
+        if cp is None or cp["fingerprint"] != fingerprint or cp["records"] != staged:
+            if cp is not None:
+                print(f"  {source.name}: checkpoint invalid (file changed or staging lost), reloading")
+            await _reset_source(conn, source, fingerprint)
+            rows_done, records = 0, 0
+        elif cp["loaded"]:
+            stats.update(status="cached", rows=cp["rows_done"], records=cp["records"])
+            print(f"  {source.name}: already staged ({cp['records']} records), skipping load")
+            return stats
+        else:
+            rows_done, records = cp["rows_done"], cp["records"]
+            print(f"  {source.name}: resuming from row {rows_done}")
+
+        columns = [name for name, _ in lt.STAGING_COLUMNS[source.kind]]
+        loop = asyncio.get_running_loop()
+        f, header, reader = await asyncio.to_thread(lt.open_csv, path)
+        started = time.monotonic()
         try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "TRUS.CSV"))
-            new_trus = []
-            trus_count = 0
-            
-            for row in reader:
-                try:
-                    hid_str = row.get("HastaRecID")
-                    if not hid_str: continue
-                    legacy_hid = int(hid_str)
-                    
-                    hid = legacy_id_map.get(legacy_hid)
-                    if not hid: continue
-                    
-                    t_date = parse_date(row.get("Tarih"))
-                    t_name = "TRUS / Prostat Biyopsi"
-                    
-                    if (hid, t_date, t_name) in existing_results:
-                        continue
-                     
-                    # Construct Result String
-                    res_parts = []
-                    # Prostat Boyutları
-                    px = row.get("Px")
-                    py = row.get("Py")
-                    pz = row.get("Pz")
-                    if px or py or pz:
-                        res_parts.append(f"Prostat Boyutları: {px or '-'} x {py or '-'} x {pz or '-'} mm")
-                    
-                    if row.get("TzVolume"): res_parts.append(f"TZ Volüm: {row.get('TzVolume')} cc")
-                    if row.get("Bulgu"): res_parts.append(f"Bulgu: {clean_text(row.get('Bulgu'))}")
-                    if row.get("Tani"): res_parts.append(f"Tanı: {clean_text(row.get('Tani'))}")
-                    
-                    # Biopsy Info
-                    b_date = row.get("BTarih")
-                    if b_date: res_parts.append(f"Biyopsi Tarihi: {b_date}")
-                    
-                    if row.get("BSay"): res_parts.append(f"Biyopsi Sayısı: {row.get('BSay')}")
-                    if row.get("Patoloji"): res_parts.append(f"Patoloji: {clean_text(row.get('Patoloji'))}")
-                    if row.get("Gleason"): res_parts.append(f"Gleason: {row.get('Gleason')}")
-
-                    full_res = "\n".join(res_parts)
-                    
-                    res = TetkikSonuc(
-                        hasta_id=hid,
-                        tarih=t_date,
-                        kategori="Goruntuleme",
-                        tetkik_adi=t_name,
-                        sonuc=full_res,
-                        sembol="warning" if row.get("Patoloji") else "info"
+            batches = lt.iter_batches(reader, batch_size, skip=rows_done)
+            in_flight: deque = deque()
+            exhausted = False
+
+            while True:
+                # Okuma + dönüştürme boru hattı: en fazla 2*workers parça bellekte
+                while not exhausted and len(in_flight) < workers * 2:
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    start, rows = batch
+                    future = loop.run_in_executor(pool, lt.transform_batch, source.transform, header, start, rows)
+                    in_flight.append((start + len(rows), future))
+                if not in_flight:
+                    break
+
+                end_row, future = in_flight.popleft()
+                batch_records, skipped = await future
+                async with conn.transaction():
+                    if batch_records:
+                        await conn.copy_records_to_table(
+                            source.table, records=batch_records, columns=columns, schema_name=STAGE_SCHEMA
+                        )
+                    records += len(batch_records)
+                    await conn.execute(
+                        f"UPDATE {_stage('checkpoints')} SET rows_done = $2, records = $3, updated_at = now() WHERE source = $1",
+                        source.name, end_row, records,
                     )
-                    new_trus.append(res)
-                    existing_results.add((hid, t_date, t_name))
-                    trus_count += 1
-                    
-                    if len(new_trus) >= 100:
-                        session.add_all(new_trus)
-                        await session.commit()
-                        new_trus = []
-                        print(f"Committed {trus_count} TRUS results...")
-                except Exception as e:
-                    print(f"Error importing row: {e}")
-            
-            if new_trus:
-                session.add_all(new_trus)
-                await session.commit()
-            
-            f.close()
-            print(f"Imported total {trus_count} TRUS results.")
-            
-        except FileNotFoundError:
-            print("TRUS.CSV not found.")
-
-        # 11. Import Plans (PLAN.CSV)
-        print("Importing Plans (PLAN.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "PLAN.CSV"))
-            p_count = 0
-            
-            for row in reader:
-                 hid_str = row.get("HastaRecID")
-                 if not hid_str: continue
-                 legacy_hid = int(hid_str)
-                 hid = legacy_id_map.get(legacy_hid)
-                 if not hid: continue
-                 
-                 rec_id = int(row.get("RecID") or 0)
-                 
-                 await session.execute(text("""
-                    INSERT INTO planlar (id, hasta_id, tarih, tip, aciklama, yapildi, hatirlat)
-                    VALUES (:id, :hasta_id, :tarih, :tip, :aciklama, :yapildi, :hatirlat)
-                    ON CONFLICT (id) DO UPDATE SET aciklama=EXCLUDED.aciklama
-                 """), {
-                     'id': rec_id,
-                     'hasta_id': hid,
-                     'tarih': parse_date(row.get("Tarih")),
-                     'tip': clean_text(row.get("Tip")),
-                     'aciklama': clean_text(row.get("TipNot")),
-                     'yapildi': clean_text(row.get("Uygulama")),
-                     'hatirlat': clean_text(row.get("Remindme"))
-                 })
-                 p_count += 1
-            f.close()
-            await session.commit()
-            print(f"Imported {p_count} plans.")
-        except FileNotFoundError:
-            print("PLAN.CSV not found.")
-
-        # 12. Import Institutions (KURUM.CSV)
-        print("Importing Institutions (KURUM.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "KURUM.CSV"))
-            k_count = 0
-            for row in reader:
-                 rec_id = int(row.get("#") or 0)
-                 if rec_id == 0: continue
-                 ad = clean_text(row.get("KurumAd"))
-                 if not ad: continue
-                 
-                 await session.execute(text("""
-                    INSERT INTO kurumlar (id, ad, adres, vergi_dairesi, vergi_no, telefon, faks, yetkili, notlar)
-                    VALUES (:id, :ad, :adres, :vergi_dairesi, :vergi_no, :telefon, :faks, :yetkili, :notlar)
-                    ON CONFLICT (id) DO UPDATE SET ad=EXCLUDED.ad
-                 """), {
-                     'id': rec_id,
-                     'ad': clean_text(row.get("KurumAd")),
-                     'adres': f"{clean_text(row.get('Adres1') or '')} {clean_text(row.get('Adres2') or '')} {clean_text(row.get('Adres3') or '')}".strip(),
-                     'vergi_dairesi': clean_text(row.get("VD")),
-                     'vergi_no': clean_text(row.get("VDNO")),
-                     'telefon': f"{clean_text(row.get('Telefon1') or '')} {clean_text(row.get('Telefon2') or '')}".strip(),
-                     'faks': clean_text(row.get("Faks")),
-                     'yetkili': f"{clean_text(row.get('Yetkili1') or '')} {clean_text(row.get('Yetkili2') or '')}".strip(),
-                     'notlar': clean_text(row.get("Notlar"))
-                 })
-                 k_count += 1
+                rows_done = end_row
+                stats["skipped"] += skipped
+        finally:
             f.close()
-            await session.commit()
-            print(f"Imported {k_count} institutions.")
-        except FileNotFoundError:
-            print("KURUM.CSV not found.")
 
-        # 13. Import Urodinami (URODINAMI.CSV)
-        print("Importing Urodinami (URODINAMI.CSV)...")
-        try:
-            reader, f = get_csv_reader(os.path.join(CSV_DIR, "URODINAMI.CSV"))
-            uro_count = 0
-            for row in reader:
-                 hid_str = row.get("HastaRecID")
-                 if not hid_str: continue
-                 legacy_hid = int(hid_str)
-                 hid = legacy_id_map.get(legacy_hid)
-                 if not hid: continue
-                 
-                 rec_id = int(row.get("RecID") or 0)
-
-                 await session.execute(text("""
-                    INSERT INTO urodinamiler (id, hasta_id, tarih, qmax, average_flow, voided_volume, residual_urine, sistometry, bac)
-                    VALUES (:id, :hasta_id, :tarih, :qmax, :avg, :vol, :res, :sis, :bac)
-                    ON CONFLICT (id) DO UPDATE SET qmax=EXCLUDED.qmax
-                 """), {
-                     'id': rec_id,
-                     'hasta_id': hid,
-                     'tarih': parse_date(row.get("Tarih")),
-                     'qmax': float(row.get("QMax") or 0) if row.get("QMax") else None,
-                     'avg': float(row.get("Ortalama") or 0) if row.get("Ortalama") else None,
-                     'vol': float(row.get("Volume") or 0) if row.get("Volume") else None,
-                     'res': float(row.get("Residuel") or 0) if row.get("Residuel") else None,
-                     'sis': clean_text(row.get("Sistometry")),
-                     'bac': clean_text(row.get("BAC"))
-                 })
-                 uro_count += 1
-            f.close()
-            await session.commit()
-            print(f"Imported {uro_count} urodynamics.")
-        except FileNotFoundError:
-            print("URODINAMI.CSV not found.")
-
-        # Reset Sequences
-        tables = ['operasyonlar', 'muayeneler', 'planlar', 'urodinamiler', 'kurumlar', 'tetkik_sonuclari', 'hastalar']
-        print("Resetting sequences...")
-        for t in tables:
+        await conn.execute(f"UPDATE {_stage('checkpoints')} SET loaded = TRUE, updated_at = now() WHERE source = $1", source.name)
+        elapsed = time.monotonic() - started
+        stats.update(status="loaded", rows=rows_done, records=records, loaded_now=True)
+        print(f"  {source.name}: {rows_done} rows -> {records} staged records in {elapsed:.1f}s (skipped {stats['skipped']})")
+        return stats
+    finally:
+        await conn.close()
+
+
+# =============================================================================
+# SET-BASED MERGES
+# =============================================================================
+
+def merge_patients_sql() -> List[str]:
+    model = ShardedPatientDemographics
+    fields = lt.HASTA_FIELDS
+    exprs = []
+    for f in fields:
+        expr = _fit(model, f, f"s.{f}")
+        if f in ("ad", "soyad"):
+            expr = f"COALESCE({expr}, '')"
+        exprs.append(expr)
+    updates = ", ".join(f"{f} = EXCLUDED.{f}" for f in fields)
+    return [
+        f"TRUNCATE {_stage('patient_map')}",
+        # Aynı TC'ye sahip kayıtlar: DB'de varsa o hastaya, yoksa dosyadaki ilk kayda eşlenir
+        f"""
+        INSERT INTO {_stage('patient_map')} (legacy_id, hasta_id)
+        SELECT DISTINCT ON (legacy_id) legacy_id, hasta_id FROM (
+            SELECT s.legacy_id, s.row_no,
+                   COALESCE(d.id, FIRST_VALUE(s.hasta_id) OVER (
+                       PARTITION BY COALESCE(s.tc_kimlik, 'legacy:' || s.legacy_id) ORDER BY s.legacy_id
+                   )) AS hasta_id
+            FROM {_stage('hasta')} s
+            LEFT JOIN {_target(model)} d ON d.tc_kimlik = s.tc_kimlik
+        ) mapped
+        ORDER BY legacy_id, row_no DESC
+        """,
+        f"""
+        INSERT INTO {_target(model)} (id, {", ".join(fields)}, is_deleted)
+        SELECT DISTINCT ON (s.legacy_id) s.hasta_id, {", ".join(exprs)}, FALSE
+        FROM {_stage('hasta')} s
+        JOIN {_stage('patient_map')} m ON m.legacy_id = s.legacy_id AND m.hasta_id = s.hasta_id
+        ORDER BY s.legacy_id, s.row_no DESC
+        ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = now()
+        """,
+    ]
+
+
+def merge_exams_sql() -> List[str]:
+    model = ShardedMuayene
+    target = _target(model)
+    anamnez_cols = {
+        "ozgecmis": "a.ozgecmis",
+        "soygecmis": "a.soygecmis",
+        "kullandigi_ilaclar": "a.kilac",
+        "aliskanliklar": "NULLIF(concat_ws('; ', 'Alkol: ' || a.alkol, 'Sigara: ' || a.sigara, 'Allerji: ' || a.allerji), '')",
+    }
+    src_cols = [f"s.{f}" for f in lt.MUAYENE_FIELDS] + [f"{expr} AS {name}" for name, expr in anamnez_cols.items()]
+    fields = lt.MUAYENE_FIELDS + list(anamnez_cols)
+    set_clause = ", ".join(f"{f} = {_fit(model, f, f'src.{f}')}" for f in fields)
+    values = ", ".join(_fit(model, f, f"src.{f}") for f in fields)
+    return [f"""
+        WITH src AS (
+            SELECT DISTINCT ON (m.hasta_id, s.tarih)
+                   m.hasta_id, s.tarih::timestamp AS tarih, {", ".join(src_cols)}
+            FROM {_stage('muayene')} s
+            JOIN {_stage('patient_map')} m ON m.legacy_id = s.hasta_legacy_id
+            LEFT JOIN (
+                SELECT DISTINCT ON (hasta_legacy_id) * FROM {_stage('anamnez')}
+                ORDER BY hasta_legacy_id, row_no DESC
+            ) a ON a.hasta_legacy_id = s.hasta_legacy_id
+            WHERE s.tarih IS NOT NULL
+            ORDER BY m.hasta_id, s.tarih, s.row_no
+        ), updated AS (
+            UPDATE {target} t SET {set_clause}, updated_at = now()
+            FROM src WHERE t.hasta_id = src.hasta_id AND t.tarih = src.tarih
+            RETURNING 1
+        ), inserted AS (
+            INSERT INTO {target} (hasta_id, tarih, {", ".join(fields)}, is_deleted)
+            SELECT src.hasta_id, src.tarih, {values}, FALSE FROM src
+            WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.hasta_id = src.hasta_id AND t.tarih = src.tarih)
+            RETURNING 1
+        )
+        SELECT 'updated ' || (SELECT count(*) FROM updated) || ', inserted ' || (SELECT count(*) FROM inserted)
+    """]
+
+
+def _insert_missing_sql(
+    model, union_sql: str, key: Sequence[str], fields: Sequence[str], order: Sequence[str] = ("row_no",)
+) -> str:
+    """Staging'deki (hasta_id, tarih, ...) anahtarı hedefte olmayan kayıtları ekler (ilk gelen kazanır)."""
+    target = _target(model)
+    key_match = " AND ".join(f"t.{k} IS NOT DISTINCT FROM src.{k}" for k in key)
+    values = ", ".join(_fit(model, f, f"src.{f}") for f in fields)
+    staged = ", ".join(f"s.{c}" for c in (*fields, *order))
+    return f"""
+        WITH src AS (
+            SELECT DISTINCT ON ({", ".join(key)}) *
+            FROM (
+                SELECT m.hasta_id, s.tarih::timestamp AS tarih, {staged}
+                FROM ({union_sql}) s
+                JOIN {_stage('patient_map')} m ON m.legacy_id = s.hasta_legacy_id
+            ) joined
+            ORDER BY {", ".join(key)}, {", ".join(order)}
+        ), inserted AS (
+            INSERT INTO {target} (hasta_id, tarih, {", ".join(fields)}, is_deleted)
+            SELECT src.hasta_id, src.tarih, {values}, FALSE FROM src
+            WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.hasta_id = src.hasta_id AND {key_match})
+            RETURNING 1
+        )
+        SELECT 'inserted ' || count(*) FROM inserted
+    """
+
+
+def merge_notes_sql() -> List[str]:
+    return [_insert_missing_sql(
+        ShardedClinicalNote, f"SELECT * FROM {_stage('hnotlar')}",
+        key=("hasta_id", "tarih", "tip"), fields=("tip", "icerik", "sembol"),
+    )]
+
+
+def merge_tetkik_sql() -> List[str]:
+    cols = "row_no, source_order, hasta_legacy_id, tarih, kategori, tetkik_adi, sonuc, sembol"
+    union = " UNION ALL ".join(f"SELECT {cols} FROM {_stage(name.lower())}" for name in TETKIK_SOURCES)
+    return [_insert_missing_sql(
+        ShardedTetkikSonuc, union,
+        key=("hasta_id", "tarih", "tetkik_adi"), fields=("kategori", "tetkik_adi", "sonuc", "sembol"),
+        order=("source_order", "row_no"),
+    )]
+
+
+def merge_operations_sql() -> List[str]:
+    return [_insert_missing_sql(
+        ShardedOperasyon, f"SELECT * FROM {_stage('operasyon')}",
+        key=("hasta_id", "tarih", "ameliyat"), fields=lt.OPERASYON_FIELDS,
+    )]
+
+
+def merge_institutions_sql() -> List[str]:
+    fields = lt.KURUM_FIELDS
+    return [
+        f"""
+        INSERT INTO {_target(Kurum)} (id, {", ".join(fields)})
+        SELECT DISTINCT ON (id) id, {", ".join(fields)} FROM {_stage('kurum')}
+        ORDER BY id, row_no DESC
+        ON CONFLICT (id) DO UPDATE SET ad = EXCLUDED.ad
+        """,
+        # Açık id ile eklendi: sequence'ı ileri al
+        f"""
+        SELECT setval(pg_get_serial_sequence('{_target(Kurum)}', 'id'), COALESCE((SELECT MAX(id) FROM {_target(Kurum)}), 0) + 1, false)
+        WHERE pg_get_serial_sequence('{_target(Kurum)}', 'id') IS NOT NULL
+        """,
+    ]
+
+
+@dataclass(frozen=True)
+class Merge:
+    name: str
+    sources: Sequence[str]
+    build: Callable[[], List[str]]
+
+
+# Hasta eşlemesi diğer tüm merge'lerden önce; geri kalanlar farklı tablolara yazdığından paralel
+PATIENT_MERGE = Merge("patients", ["HASTA"], merge_patients_sql)
+MERGES = [
+    Merge("exams", ["MUAYENE", "ANAMNEZ"], merge_exams_sql),
+    Merge("notes", ["HNOTLAR"], merge_notes_sql),
+    Merge("tetkik", TETKIK_SOURCES, merge_tetkik_sql),
+    Merge("operations", ["OPERASYON"], merge_operations_sql),
+    Merge("institutions", ["KURUM"], merge_institutions_sql),
+]
+
+
+async def run_merge(merge: Merge, load_stats: Dict[str, Dict[str, Any]], force: bool) -> Dict[str, Any]:
+    present = [s for s in merge.sources if load_stats.get(s, {}).get("status") not in (None, "missing")]
+    if not present:
+        return {"stage": merge.name, "status": "skipped"}
+
+    conn = await asyncpg.connect(_dsn())
+    try:
+        done = await conn.fetchval(f"SELECT result FROM {_stage('merges')} WHERE stage = $1", merge.name)
+        reloaded = any(load_stats[s].get("loaded_now") for s in present)
+        if done is not None and not reloaded and not force:
+            print(f"  {merge.name}: already merged ({done}), skipping")
+            return {"stage": merge.name, "status": "cached", "result": done}
+
+        started = time.monotonic()
+        result = None
+        async with conn.transaction():
+            for sql in merge.build():
+                # Sayım döndüren sorgular (WITH ... SELECT) merge sonucunu verir
+                if sql.lstrip().upper().startswith(("WITH", "SELECT")):
+                    value = await conn.fetchval(sql)
+                    if value is not None:
+                        result = str(value)
+                else:
+                    await conn.execute(sql)
+            result = result or "ok"
+            await conn.execute(
+                f"""
+                INSERT INTO {_stage('merges')} (stage, result) VALUES ($1, $2)
+                ON CONFLICT (stage) DO UPDATE SET result = EXCLUDED.result, merged_at = now()
+                """,
+                merge.name, result,
+            )
+        print(f"  {merge.name}: {result} in {time.monotonic() - started:.1f}s")
+        return {"stage": merge.name, "status": "merged", "result": result}
+    finally:
+        await conn.close()
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+async def run_import(
+    csv_dir: str,
+    workers: int,
+    jobs: int,
+    batch_size: int,
+    restart: bool = False,
+    only: Optional[Sequence[str]] = None,
+) -> int:
+    conn = await asyncpg.connect(_dsn())
+    try:
+        await prepare_stage(conn, restart)
+    finally:
+        await conn.close()
+
+    sources = [s for s in SOURCES if not only or s.name in only]
+    for filename, reason in UNSUPPORTED_FILES.items():
+        if os.path.exists(os.path.join(csv_dir, filename)):
+            print(f"  {filename}: skipped ({reason})")
+
+    print(f"\n[1/2] Loading {len(sources)} sources into staging (workers={workers}, jobs={jobs})...")
+    semaphore = asyncio.Semaphore(jobs)
+    failed = False
+
+    async def guarded_load(source: Source) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await load_source(source, csv_dir, pool, workers, batch_size)
+            except Exception as e:
+                print(f"  ❌ {source.name}: load failed: {e}")
+                return {"source": source.name, "status": "failed"}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = await asyncio.gather(*(guarded_load(s) for s in sources))
+    load_stats = {r["source"]: r for r in results}
+    failed = any(r["status"] == "failed" for r in results)
+
+    print("\n[2/2] Merging into sharded schemas...")
+    patients_failed = load_stats.get("HASTA", {}).get("status") == "failed"
+    if patients_failed:
+        print("  ❌ patients not staged; clinical merges need the patient map, aborting")
+        return 1
+
+    force = load_stats.get("HASTA", {}).get("loaded_now", False)
+    try:
+        await run_merge(PATIENT_MERGE, load_stats, force=False)
+    except Exception as e:
+        print(f"  ❌ patients: merge failed: {e}")
+        return 1
+
+    async def guarded_merge(merge: Merge) -> Dict[str, Any]:
+        async with semaphore:
             try:
-                await session.execute(text(f"SELECT setval('{t}_id_seq', COALESCE((SELECT MAX(id)+1 FROM {t}), 1), false)"))
-                await session.commit()
+                # Hasta eşlemesi yenilendiyse bağımlı merge'ler de yeniden çalışır
+                return await run_merge(merge, load_stats, force)
             except Exception as e:
-                 print(f"Warning: Could not reset sequence for {t}: {e}")
+                print(f"  ❌ {merge.name}: merge failed: {e}")
+                return {"stage": merge.name, "status": "failed"}
+
+    merge_results = await asyncio.gather(*(
+        guarded_merge(m) for m in MERGES
+        if any(s in load_stats and load_stats[s]["status"] != "failed" for s in m.sources)
+    ))
+    failed = failed or any(r["status"] == "failed" for r in merge_results)
+    return 1 if failed else 0
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Import legacy UroLog CSV exports into sharded schemas")
+    parser.add_argument("csv_dir", nargs="?", default=DEFAULT_CSV_DIR, help="Directory with *.CSV exports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Transform worker processes")
+    parser.add_argument("--jobs", type=int, default=4, help="Parallel DB connections (files / merges)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per COPY batch (default: {BATCH_SIZE})")
+    parser.add_argument("--restart", action="store_true", help="Drop staging + checkpoints and start over")
+    parser.add_argument("--only", type=lambda v: [x.strip().upper() for x in v.split(",") if x.strip()],
+                        help="Comma separated source names (HASTA,MUAYENE,...)")
+    parser.add_argument("--drop-staging", action="store_true", help=f"Drop {STAGE_SCHEMA} schema after a successful run")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("UroLog Legacy Import Engine")
+    print("=" * 60)
+    print(f"Source: {args.csv_dir}")
+    print(f"Mode: {'RESTART' if args.restart else 'RESUME'}")
+
+    started = time.monotonic()
+    code = await run_import(args.csv_dir, max(1, args.workers), max(1, args.jobs), args.batch_size, args.restart, args.only)
+
+    if code == 0 and args.drop_staging:
+        conn = await asyncpg.connect(_dsn())
+        try:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {STAGE_SCHEMA} CASCADE")
+        finally:
+            await conn.close()
 
+    status = "✅ Import complete" if code == 0 else "❌ Import incomplete - re-run to resume from checkpoints"
+    print(f"\n{status} ({time.monotonic() - started:.1f}s)")
+    return code
 
-async def main():
-    await update_schema()
-    await import_data()
 
 if __name__ == "__main__":
-    asyncio.run(main())
-
+    try:
+        sys.exit(asyncio.run(main()))
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR: {e}")
+        sys.exit(2)
@@ -0,0 +1,441 @@
+"""
+legacy_transforms.py - DBISAM CSV satırlarını staging tablosu kayıtlarına dönüştüren saf fonksiyonlar.
+
+db_import.py bu fonksiyonları worker süreçlerinde (ProcessPoolExecutor) çalıştırır; bu yüzden
+modül DB'ye / uygulama ayarlarına dokunmaz ve tüm fonksiyonlar modül seviyesindedir (pickle).
+
+Her transform bir CSV satırı (dict) alır ve STAGING_COLUMNS sırasında (row_no hariç) sıfır veya
+daha fazla tuple döner. Eşleme kuralları eski db_import.import_data() ile aynıdır.
+"""
+
+import csv
+import uuid
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ENCODING = "cp1254"  # Common for Turkish legacy exports, fallback to 'latin-5' or 'iso-8859-9'
+
+# Eski HastaRecID -> UUID: deterministik, böylece yarıda kalan import tekrar çalıştığında
+# aynı hasta aynı UUID'yi alır ve worker'lar ortak bir eşleme tablosuna ihtiyaç duymaz.
+LEGACY_PATIENT_NAMESPACE = uuid.UUID("6f1c8a52-3b7e-4c1d-9a55-2f0e8d4b7c10")
+
+
+def legacy_patient_uuid(rec_id: int) -> uuid.UUID:
+    return uuid.uuid5(LEGACY_PATIENT_NAMESPACE, f"hasta:{rec_id}")
+
+
+# =============================================================================
+# FIELD HELPERS
+# =============================================================================
+
+def parse_date(date_str: Optional[str]) -> Optional[date]:
+    if not date_str:
+        return None
+    for fmt in ["%m/%d/%Y", "%d.%m.%Y", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(date_str.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def clean_text(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    return text.replace('\x00', '').strip() or None
+
+
+def map_ipss(val: Optional[str]) -> str:
+    if not val:
+        return "0"
+    v = val.lower().strip()
+    if v in ["var", "evet", "1", "true"]:
+        return "1"
+    if v in ["yok", "hayır", "hayir", "0", "false"]:
+        return "0"
+    # Try to return number if digit
+    if v.isdigit():
+        return str(int(v))
+    return "0"  # Default fallback
+
+
+def _int(val: Optional[str]) -> Optional[int]:
+    val = (val or "").strip()
+    return int(val) if val.isdigit() else None
+
+
+def _joined(*parts: Optional[str], sep: str = " ") -> Optional[str]:
+    return sep.join(p for p in (clean_text(x) for x in parts) if p) or None
+
+
+# =============================================================================
+# STAGING LAYOUT
+# =============================================================================
+
+MUAYENE_FIELDS = [
+    "sikayet", "oyku", "tansiyon", "ates", "kvah", "bobrek_sag", "bobrek_sol", "suprapubik_kitle",
+    "ego", "rektal_tuse", "disuri", "pollakiuri", "nokturi", "hematuri", "genital_akinti", "kabizlik",
+    "tas_oyku", "catallanma", "projeksiyon_azalma", "kalibre_incelme", "idrar_bas_zorluk",
+    "kesik_idrar_yapma", "terminal_damlama", "residiv_hissi", "inkontinans", "tani1", "tani2",
+    "erektil_islev", "ejakulasyon", "mshq", "ipss_skor", "prosedur", "doktor", "tani1_kodu",
+    "tani2_kodu", "fizik_muayene", "oneriler", "sonuc", "tedavi", "recete", "sistem_sorgu",
+]
+
+HASTA_FIELDS = [
+    "tc_kimlik", "ad", "soyad", "cinsiyet", "dogum_tarihi", "dogum_yeri", "kan_grubu", "meslek",
+    "medeni_hal", "adres", "ev_tel", "is_tel", "cep_tel", "email", "kimlik_notlar", "doktor",
+    "referans", "postakodu", "kurum", "sigorta", "ozelsigorta", "cocuk_sayisi",
+]
+
+OPERASYON_FIELDS = [
+    "ameliyat", "pre_op_tani", "post_op_tani", "ekip", "hemsire", "anestezi_ekip", "anestezi_tur",
+    "notlar", "patoloji", "post_op", "video_url",
+]
+
+KURUM_FIELDS = ["ad", "adres", "vergi_dairesi", "vergi_no", "telefon", "faks", "yetkili", "notlar"]
+
+_TYPES = {"dogum_tarihi": "date", "cocuk_sayisi": "integer"}
+
+# staging tablosu -> [(kolon, tip)]; her tabloda ilk kolon row_no (CSV'deki veri satırı sırası)
+STAGING_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "hasta": [("row_no", "bigint"), ("legacy_id", "bigint"), ("hasta_id", "uuid")]
+    + [(f, _TYPES.get(f, "text")) for f in HASTA_FIELDS],
+    "anamnez": [("row_no", "bigint"), ("hasta_legacy_id", "bigint")]
+    + [(f, "text") for f in ("alkol", "sigara", "allerji", "kilac", "ozgecmis", "soygecmis")],
+    "muayene": [("row_no", "bigint"), ("hasta_legacy_id", "bigint"), ("tarih", "date")]
+    + [(f, "text") for f in MUAYENE_FIELDS],
+    "notlar": [("row_no", "bigint"), ("hasta_legacy_id", "bigint"), ("tarih", "date"),
+               ("tip", "text"), ("icerik", "text"), ("sembol", "text")],
+    # Birden çok kaynak aynı tabloya yüklenir; source_order eski import sırasını korur (ilk gelen kazanır)
+    "tetkik": [("row_no", "bigint"), ("source_order", "integer"), ("hasta_legacy_id", "bigint"),
+               ("tarih", "date"), ("kategori", "text"), ("tetkik_adi", "text"), ("sonuc", "text"),
+               ("sembol", "text")],
+    "operasyon": [("row_no", "bigint"), ("hasta_legacy_id", "bigint"), ("tarih", "date")]
+    + [(f, "text") for f in OPERASYON_FIELDS],
+    "kurum": [("row_no", "bigint"), ("id", "integer")] + [(f, "text") for f in KURUM_FIELDS],
+}
+
+Row = Dict[str, str]
+
+
+# =============================================================================
+# TRANSFORMS
+# =============================================================================
+
+def transform_hasta(row: Row) -> List[tuple]:
+    rec_id = _int(row.get("HastaRecID"))
+    if rec_id is None:
+        return []
+    tc = clean_text(row.get("TCKimlik"))
+    if tc and (len(tc) != 11 or not tc.isdigit()):
+        tc = None
+    values = {
+        "tc_kimlik": tc,
+        "ad": clean_text(row.get("Ad")),
+        "soyad": clean_text(row.get("Soyad")),
+        "cinsiyet": clean_text(row.get("Cinsiyet")),
+        "dogum_tarihi": parse_date(row.get("DTarih")),
+        "dogum_yeri": clean_text(row.get("DYer")),
+        "kan_grubu": clean_text(row.get("Kangrubu")),
+        "meslek": clean_text(row.get("Meslek")),
+        "medeni_hal": clean_text(row.get("MedeniHal")),
+        "adres": _joined(row.get("Adres1"), row.get("Adres2"), row.get("Postakod"), row.get("Adres3")),
+        "ev_tel": clean_text(row.get("Evtelefonu")),
+        "is_tel": clean_text(row.get("IsTelefon")),
+        "cep_tel": clean_text(row.get("Ceptelefonu")),
+        "email": clean_text(row.get("Eposta")),
+        "kimlik_notlar": clean_text(row.get("Notlar")),
+        "doktor": clean_text(row.get("Doktor")),
+        "referans": clean_text(row.get("Referans")),
+        "postakodu": clean_text(row.get("Postakod")),
+        "kurum": clean_text(row.get("Kurum")),
+        "sigorta": clean_text(row.get("Sigorta")),
+        "ozelsigorta": clean_text(row.get("OzelSigorta")),
+        "cocuk_sayisi": _int(row.get("Cocuksay")),
+    }
+    return [(rec_id, legacy_patient_uuid(rec_id), *(values[f] for f in HASTA_FIELDS))]
+
+
+def transform_anamnez(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    return [(
+        hid,
+        clean_text(row.get("Alkol")),
+        clean_text(row.get("Sigara")),
+        clean_text(row.get("Allerji")),
+        clean_text(row.get("Kilac")),
+        clean_text(row.get("Ozgecmis")),
+        clean_text(row.get("Soygecmis")),
+    )]
+
+
+def transform_muayene(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    s_sorgu = []
+    for field in ["Disuri", "Pollakiuri", "Nokturi", "Hematuri", "GenitalAkinti", "Kabizlik", "TasOyku"]:
+        val = clean_text(row.get(field))
+        if val:
+            s_sorgu.append(f"{field}: {val}")
+
+    values = {
+        "sikayet": clean_text(row.get("Sikayet")),
+        "oyku": clean_text(row.get("Oyku")),
+        "tansiyon": clean_text(row.get("Tansiyon")),
+        "ates": clean_text(row.get("Ates")),
+        "kvah": clean_text(row.get("KVAH")),
+        "bobrek_sag": clean_text(row.get("BobrekSag")),
+        "bobrek_sol": clean_text(row.get("BobrekSol")),
+        "suprapubik_kitle": clean_text(row.get("SuprapubikKitle")),
+        "ego": clean_text(row.get("EGO")),
+        "rektal_tuse": clean_text(row.get("DRE")),
+        "disuri": clean_text(row.get("Disuri")),
+        "pollakiuri": map_ipss(row.get("Pollakiuri")),
+        "nokturi": map_ipss(row.get("Nokturi")),
+        "hematuri": clean_text(row.get("Hematuri")),
+        "genital_akinti": clean_text(row.get("GenitalAkinti")),
+        "kabizlik": clean_text(row.get("Kabizlik")),
+        "tas_oyku": clean_text(row.get("TasOyku")),
+        "catallanma": clean_text(row.get("Catallanma")),
+        "projeksiyon_azalma": map_ipss(row.get("ProjeksiyonAzalma")),
+        "kalibre_incelme": clean_text(row.get("KalibreIncelme")),
+        "idrar_bas_zorluk": map_ipss(row.get("IdrarBasZorluk")),
+        "kesik_idrar_yapma": map_ipss(row.get("KesikIdrarYapma")),
+        "terminal_damlama": clean_text(row.get("TerminalDamlama")),
+        "residiv_hissi": map_ipss(row.get("ResidivHissi")),
+        "inkontinans": map_ipss(row.get("Inkontinans")),
+        "tani1": clean_text(row.get("Tani1")),
+        "tani2": clean_text(row.get("Tani2")),
+        "erektil_islev": clean_text(row.get("Erektil")),
+        "ejakulasyon": clean_text(row.get("Ejakulasyon")),
+        "mshq": clean_text(row.get("MSHQ")),
+        "ipss_skor": clean_text(row.get("PSS")),
+        "prosedur": clean_text(row.get("Prosedur")),
+        "doktor": clean_text(row.get("Doktor")),
+        "tani1_kodu": clean_text(row.get("TKod1")),
+        "tani2_kodu": clean_text(row.get("TKod2")),
+        "fizik_muayene": clean_text(row.get("BulguNot")),
+        "oneriler": _joined(row.get("Oneriler"), row.get("Prosedur"), sep="\n"),
+        "sonuc": clean_text(row.get("Sonuc")),
+        "tedavi": clean_text(row.get("Prosedur")),
+        "recete": clean_text(row.get("Recete")),
+        "sistem_sorgu": "; ".join(s_sorgu) or None,
+    }
+    return [(hid, parse_date(row.get("Tarih")), *(values[f] for f in MUAYENE_FIELDS))]
+
+
+def transform_notlar(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    return [(
+        hid,
+        parse_date(row.get("Tarih")),
+        clean_text(row.get("Tip")),
+        clean_text(row.get("Notlar")),
+        clean_text(row.get("Sembol")),
+    )]
+
+
+def _tetkik(order: int, hid: int, tarih, kategori: str, name: str, sonuc, sembol) -> tuple:
+    return (order, hid, tarih, kategori, name, sonuc, sembol)
+
+
+def transform_glabist(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    return [_tetkik(1, hid, parse_date(row.get("Tarih")), "Goruntuleme", clean_text(row.get("Tetkik")),
+                    clean_text(row.get("Sonuc")), clean_text(row.get("Sembol")))]
+
+
+def transform_labist(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    # Kontrol kolonu sembol / bayrak olarak kullanılıyor
+    return [_tetkik(2, hid, parse_date(row.get("Tarih")), "Laboratuvar", clean_text(row.get("Tetkik")),
+                    clean_text(row.get("Sonuc")), clean_text(row.get("Kontrol")))]
+
+
+HEMOGRAM_PARAMS = [
+    ("Hemoglobin", "Hemoglobin (HGB)", "g/dL"),
+    ("Hematokrit", "Hematokrit (HCT)", "%"),
+    ("Lokosit", "Lökosit (WBC)", "10^3/uL"),
+    ("Trombosit", "Trombosit (PLT)", "10^3/uL"),
+]
+
+
+def transform_kan(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    tarih = parse_date(row.get("Tarih"))
+    out = [
+        _tetkik(3, hid, tarih, "Laboratuvar", name, f"{row[col]} {unit}", "info")
+        for col, name, unit in HEMOGRAM_PARAMS if row.get(col)
+    ]
+    if row.get("Notlar"):
+        out.append(_tetkik(3, hid, tarih, "Laboratuvar", "Hemogram Notu", clean_text(row.get("Notlar")), "info"))
+    return out
+
+
+URINE_PARAMS = [
+    ("Dansite", "İdrar - Dansite"),
+    ("pH", "İdrar - pH"),
+    ("Sediment", "İdrar - Sediment"),
+    ("Steril", "İdrar Kültürü"),
+    ("Koloni", "İdrar Kül. - Koloni"),
+    ("Bakteri", "İdrar Kül. - Bakteri"),
+    ("Antibiyogram", "İdrar Kül. - Antibiyogram"),
+]
+
+
+def transform_idrar(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    tarih = parse_date(row.get("Tarih"))
+    out = []
+    for col, name in URINE_PARAMS:
+        val = clean_text(row.get(col))
+        if val:
+            out.append(_tetkik(4, hid, tarih, "Laboratuvar", name, val, "info"))
+    if row.get("Notlar"):
+        out.append(_tetkik(4, hid, tarih, "Laboratuvar", "İdrar Notu", clean_text(row.get("Notlar")), "info"))
+    return out
+
+
+def transform_sperm(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    res_parts = []
+    if row.get("Perhiz"): res_parts.append(f"Perhiz: {row.get('Perhiz')} gün")
+    if row.get("Volum"): res_parts.append(f"Volüm: {row.get('Volum')} cc")
+    if row.get("Sayi"): res_parts.append(f"Sayı: {row.get('Sayi')} /ml")
+    if row.get("Motilite"): res_parts.append(f"Motilite: {row.get('Motilite')}")
+    if row.get("Kruger"): res_parts.append(f"Kruger: {row.get('Kruger')}")
+    if row.get("Viskozite"): res_parts.append(f"Viskozite: {row.get('Viskozite')}")
+    if row.get("Aglutinasyon"): res_parts.append(f"Aglutinasyon: {row.get('Aglutinasyon')}")
+    if row.get("Notlar"): res_parts.append(f"Not: {clean_text(row.get('Notlar'))}")
+    return [_tetkik(5, hid, parse_date(row.get("Tarih")), "Laboratuvar", "Spermiogram", "\n".join(res_parts), "info")]
+
+
+def transform_trus(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    res_parts = []
+    px, py, pz = row.get("Px"), row.get("Py"), row.get("Pz")
+    if px or py or pz:
+        res_parts.append(f"Prostat Boyutları: {px or '-'} x {py or '-'} x {pz or '-'} mm")
+    if row.get("TzVolume"): res_parts.append(f"TZ Volüm: {row.get('TzVolume')} cc")
+    if row.get("Bulgu"): res_parts.append(f"Bulgu: {clean_text(row.get('Bulgu'))}")
+    if row.get("Tani"): res_parts.append(f"Tanı: {clean_text(row.get('Tani'))}")
+    if row.get("BTarih"): res_parts.append(f"Biyopsi Tarihi: {row.get('BTarih')}")
+    if row.get("BSay"): res_parts.append(f"Biyopsi Sayısı: {row.get('BSay')}")
+    if row.get("Patoloji"): res_parts.append(f"Patoloji: {clean_text(row.get('Patoloji'))}")
+    if row.get("Gleason"): res_parts.append(f"Gleason: {row.get('Gleason')}")
+    sembol = "warning" if row.get("Patoloji") else "info"
+    return [_tetkik(6, hid, parse_date(row.get("Tarih")), "Goruntuleme", "TRUS / Prostat Biyopsi", "\n".join(res_parts), sembol)]
+
+
+def transform_operasyon(row: Row) -> List[tuple]:
+    hid = _int(row.get("HastaRecID"))
+    if hid is None:
+        return []
+    values = {
+        "ameliyat": clean_text(row.get("Ameliyat")),
+        "pre_op_tani": clean_text(row.get("AOTani")),
+        "post_op_tani": clean_text(row.get("ASTani")),
+        "ekip": clean_text(row.get("OpEkip")),
+        "hemsire": clean_text(row.get("Hemsire")),
+        "anestezi_ekip": clean_text(row.get("AnesteziEkip")),
+        "anestezi_tur": clean_text(row.get("AnesteziTur")),
+        "notlar": clean_text(row.get("Notlar")),
+        "patoloji": clean_text(row.get("Patoloji")),
+        "post_op": clean_text(row.get("PostOp")),
+        "video_url": clean_text(row.get("OpVideo")),
+    }
+    return [(hid, parse_date(row.get("Tarih")), *(values[f] for f in OPERASYON_FIELDS))]
+
+
+def transform_kurum(row: Row) -> List[tuple]:
+    rec_id = _int(row.get("#"))
+    ad = clean_text(row.get("KurumAd"))
+    if not rec_id or not ad:
+        return []
+    return [(
+        rec_id,
+        ad,
+        _joined(row.get("Adres1"), row.get("Adres2"), row.get("Adres3")),
+        clean_text(row.get("VD")),
+        clean_text(row.get("VDNO")),
+        _joined(row.get("Telefon1"), row.get("Telefon2")),
+        clean_text(row.get("Faks")),
+        _joined(row.get("Yetkili1"), row.get("Yetkili2")),
+        clean_text(row.get("Notlar")),
+    )]
+
+
+# =============================================================================
+# CSV STREAMING / BATCH TRANSFORM
+# =============================================================================
+
+def open_csv(path: str):
+    """
+    DBISAM export'unda başlık satırına ('"#","...') kadar olan önsözü atlar.
+    (dosya, başlık, csv.reader) döner; satırlar akış halinde okunur.
+    """
+    f = open(path, mode="r", encoding=ENCODING, errors="replace", newline="")
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if '"#","' in line:
+            f.seek(pos)
+            break
+    reader = csv.reader(f)
+    header = next(reader, [])
+    return f, header, reader
+
+
+def iter_batches(reader, batch_size: int, skip: int = 0) -> Iterator[Tuple[int, List[List[str]]]]:
+    """(ilk satır numarası, ham satırlar) parçaları; checkpoint'ten devamda ilk `skip` satır atlanır."""
+    row_no = 0
+    batch: List[List[str]] = []
+    start = skip
+    for raw in reader:
+        if row_no < skip:
+            row_no += 1
+            continue
+        batch.append(raw)
+        row_no += 1
+        if len(batch) >= batch_size:
+            yield start, batch
+            start, batch = row_no, []
+    if batch:
+        yield start, batch
+
+
+def transform_batch(
+    transform: Callable[[Row], List[tuple]], header: Sequence[str], start: int, rows: List[List[str]]
+) -> Tuple[List[tuple], int]:
+    """Worker sürecinde çalışır: (staging kayıtları, atlanan satır sayısı)."""
+    records: List[tuple] = []
+    skipped = 0
+    for offset, raw in enumerate(rows):
+        try:
+            out = transform(dict(zip(header, raw)))
+        except (ValueError, TypeError, KeyError):
+            out = []
+        if not out:
+            skipped += 1
+        for values in out:
+            records.append((start + offset, *values))
+    return records, skipped
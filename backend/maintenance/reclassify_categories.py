@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+reclassify_categories.py - Service / Reference Category Backfill
+
+Muayenelerin service_category ve hasta kayıtlarının reference_category kolonlarını
+app.services.report_classification kurallarıyla (yeniden) hesaplar. İlk kurulumdaki
+backfill ve SERVICE_MAPPINGS / REFERENCE_CATEGORIES / ICD prefix tablosu değiştikten
+sonraki yeniden sınıflandırma için kullanılır; yeni kayıtlar yazma anında sınıflandırılır.
+
+Features:
+- Keyset batch processing on primary key (no LIMIT/OFFSET rescans)
+- Only rows whose category actually changes are updated (tekrar çalıştırmak ucuzdur)
+- Each batch commits in its own transaction
+- Dry-run mode (default): per-category change counts without writing
+
+Usage:
+    # Dry run (no changes)
+    python -m maintenance.reclassify_categories
+
+    # Backfill / reclassify everything
+    python -m maintenance.reclassify_categories --execute
+
+    # Only examinations
+    python -m maintenance.reclassify_categories --execute --target exams
+
+Exit Codes:
+    0: SUCCESS - Reclassification complete
+    1: FAILED - Reclassification failed (check logs)
+    2: ERROR - Script execution error
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+# Add parent to path for imports
+sys.path.insert(0, str(__file__).rsplit("/maintenance", 1)[0])
+
+from app.db.session import SessionLocal
+from app.repositories.clinical.models import ShardedMuayene
+from app.repositories.patient.models import ShardedPatientDemographics
+from app.services.report_classification import classify_reference, classify_service
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+BATCH_SIZE = 10000
+
+# hedef -> (model, kategori kolonu, okunacak kolonlar, sınıflandırıcı)
+TARGETS = {
+    "exams": (
+        ShardedMuayene,
+        "service_category",
+        (ShardedMuayene.tani1, ShardedMuayene.tani1_kodu, ShardedMuayene.tani2, ShardedMuayene.tani2_kodu),
+        lambda row: classify_service(row.tani1, row.tani1_kodu, row.tani2, row.tani2_kodu),
+    ),
+    "references": (
+        ShardedPatientDemographics,
+        "reference_category",
+        (ShardedPatientDemographics.referans,),
+        lambda row: classify_reference(row.referans),
+    ),
+}
+
+
+# =============================================================================
+# RECLASSIFY
+# =============================================================================
+
+async def reclassify(target: str, batch_size: int, dry_run: bool) -> Counter:
+    model, column, source_columns, classify = TARGETS[target]
+    category = getattr(model, column)
+    stats: Counter = Counter()
+
+    last_id = None
+    while True:
+        async with SessionLocal() as session:
+            stmt = select(model.id, category, *source_columns).order_by(model.id).limit(batch_size)
+            if last_id is not None:
+                stmt = stmt.where(model.id > last_id)
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            changes = []
+            for row in rows:
+                new = classify(row)
+                if new != getattr(row, column):
+                    changes.append({"id": row.id, column: new})
+                    stats[new or "-"] += 1
+            stats["_scanned"] += len(rows)
+
+            if changes and not dry_run:
+                # ORM bulk UPDATE by primary key (executemany)
+                await session.execute(update(model), changes)
+                await session.commit()
+
+        print(f"    {target}: {stats['_scanned']} scanned, {sum(v for k, v in stats.items() if k != '_scanned')} changed")
+
+    return stats
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill / recompute precomputed report categories")
+    parser.add_argument("--execute", action="store_true", help="Write changes (default is dry run)")
+    parser.add_argument("--target", choices=["all", *TARGETS], default="all")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Rows per batch (default {BATCH_SIZE})")
+    args = parser.parse_args()
+
+    dry_run = not args.execute
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+
+    print("=" * 60)
+    print("UroLog Report Category Reclassification")
+    print("=" * 60)
+    print(f"Mode: {'DRY RUN' if dry_run else '⚠️  LIVE EXECUTION'}")
+    print(f"Targets: {', '.join(targets)}")
+    print(f"Started: {datetime.now().isoformat()}")
+
+    results = {}
+    try:
+        for target in targets:
+            print(f"\n  Processing: {target}")
+            results[target] = await reclassify(target, args.batch_size, dry_run)
+    except Exception as e:
+        print(f"\n❌ Reclassification failed: {e}")
+        return 1
+
+    print("\n" + "=" * 60)
+    print("RECLASSIFICATION SUMMARY")
+    print("=" * 60)
+    for target, stats in results.items():
+        scanned = stats.pop("_scanned", 0)
+        print(f"\n[{target.upper()}] {scanned} rows scanned, {sum(stats.values())} {'would change' if dry_run else 'updated'}")
+        for category, count in stats.most_common():
+            print(f"  -> {category}: {count}")
+
+    if dry_run:
+        print("\n💡 To write changes, run with --execute flag")
+    print(f"Completed: {datetime.now().isoformat()}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        exit_code = asyncio.run(main())
+    except Exception as e:
+        print(f"\n❌ FATAL ERROR: {e}")
+        exit_code = 2
+    sys.exit(exit_code)
@@ -2,18 +2,30 @@
 """
 verify_integrity.py - Data Integrity Verification Tool
 
-Story 1.3: Integrity Verification (SHA-256 Row Hashing)
+Story 1.3: Integrity Verification (Merkle-style Row Hashing)
 
-This tool calculates cryptographic hashes of database rows to verify:
+This tool calculates hashes of database rows to verify:
 1. Legacy data completeness before migration
 2. Sharded data fidelity after migration
 3. Zero-diff comparison between legacy and sharded states
 
+Hashing runs inside Postgres as a two-level Merkle tree:
+- Leaf: md5(ROW(...)::text) per row, aggregated per id-range bucket
+  (BUCKET_SIZE ids; non-integer ids are bucketed by hashtext(id) % HASH_BUCKETS)
+- Root: SHA-256 over the ordered bucket digests
+
+Buckets are read with keyset pagination on id, so memory stays constant and each
+row is scanned once. In compare mode only buckets whose digests differ are
+drilled into row by row (MISSING / MISMATCH / EXTRA).
+
 Usage:
     python -m maintenance.verify_integrity --mode legacy
     python -m maintenance.verify_integrity --mode sharded
     python -m maintenance.verify_integrity --mode compare
 
+    # Bucket boyutu / paralel tablo sayısı
+    python -m maintenance.verify_integrity --mode compare --bucket-size 50000 --jobs 8
+
 Exit Codes:
     0: PASS - All checksums match
     1: FAIL - Mismatch detected (see diff report)
@@ -25,10 +37,8 @@ import asyncio
 import hashlib
 import json
 import sys
-from datetime import date, datetime
-from decimal import Decimal
-from typing import Any
-from uuid import UUID
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -37,6 +47,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 sys.path.insert(0, str(__file__).rsplit("/maintenance", 1)[0])
 
 from app.db.session import SessionLocal
+from maintenance.db_import_sharded import MIGRATION_MAP
 
 
 # =============================================================================
@@ -69,54 +80,100 @@ VERIFICATION_TARGETS = {
     ],
 }
 
+# Legacy table -> sharded (schema, table); migration haritasıyla aynı kaynak
+SHARDED_TARGETS: dict[str, tuple[str, str]] = {
+    legacy: target for tables in MIGRATION_MAP.values() for legacy, target in tables.items()
+}
+
 # Columns to exclude from hash (audit columns, auto-generated)
 EXCLUDE_COLUMNS = {"created_at", "updated_at"}
+# Sharded tablolara migration sırasında eklenen kolonlar (legacy'de yok)
+SHARDED_ONLY_COLUMNS = {"is_deleted", "created_by", "updated_by"}
+
+BUCKET_SIZE = 10000      # Integer id'ler: bucket başına id aralığı
+HASH_BUCKETS = 1024      # UUID / text id'ler: sabit bucket sayısı
+BUCKETS_PER_QUERY = 100  # Keyset sayfası başına okunan bucket
+MAX_DRILL_BUCKETS = 50   # Satır satır incelenecek en fazla uyumsuz bucket (tablo başına)
+JOBS = 4
+
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
 
 
 # =============================================================================
-# HASH UTILITIES
+# MERKLE TREE
 # =============================================================================
 
-def serialize_value(value: Any) -> str:
-    """Convert a value to a stable string representation for hashing."""
-    if value is None:
-        return "NULL"
-    if isinstance(value, (datetime, date)):
-        return value.isoformat()
-    if isinstance(value, UUID):
-        return str(value)
-    if isinstance(value, Decimal):
-        return str(value.normalize())
-    if isinstance(value, (dict, list)):
-        return json.dumps(value, sort_keys=True, default=str)
-    return str(value)
-
-
-def hash_row(row: dict[str, Any], exclude: set[str] | None = None) -> str:
-    """
-    Calculate SHA-256 hash of a row's contents.
-    
-    Args:
-        row: Dictionary of column -> value
-        exclude: Set of column names to exclude from hash
-    
-    Returns:
-        Hexadecimal SHA-256 hash string
-    """
-    exclude = exclude or EXCLUDE_COLUMNS
-    
-    # Sort keys for deterministic ordering
-    sorted_keys = sorted(k for k in row.keys() if k not in exclude)
-    
-    # Build canonical string representation
-    parts = []
-    for key in sorted_keys:
-        value = serialize_value(row[key])
-        parts.append(f"{key}:{value}")
-    
-    canonical = "|".join(parts)
-    
-    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+@dataclass
+class TableDigest:
+    """Two-level Merkle summary of a table: bucket -> (row count, md5) and a root hash."""
+    schema: str
+    table: str
+    columns: list[str]
+    buckets: dict[int, tuple[int, str]] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.schema}.{self.table}"
+
+    @property
+    def rows(self) -> int:
+        return sum(count for count, _ in self.buckets.values())
+
+    @property
+    def root(self) -> str:
+        return merkle_root(self.buckets)
+
+    def summary(self) -> dict[str, Any]:
+        if self.error:
+            return {"__error__": self.error}
+        return {
+            "root": self.root,
+            "rows": self.rows,
+            "buckets": {str(b): {"rows": c, "md5": h} for b, (c, h) in sorted(self.buckets.items())},
+        }
+
+
+def merkle_root(buckets: dict[int, tuple[int, str]]) -> str:
+    """Root hash over ordered bucket digests (bucket numarası ve satır sayısı dahil)."""
+    digest = hashlib.sha256()
+    for bucket in sorted(buckets):
+        count, md5 = buckets[bucket]
+        digest.update(f"{bucket}:{count}:{md5}|".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def diff_buckets(
+    left: dict[int, tuple[int, str]],
+    right: dict[int, tuple[int, str]]
+) -> list[int]:
+    """Buckets whose (count, md5) differ or exist on one side only."""
+    return sorted(b for b in left.keys() | right.keys() if left.get(b) != right.get(b))
+
+
+@dataclass(frozen=True)
+class Bucketing:
+    """id -> bucket eşlemesi; karşılaştırılan iki tabloda aynı olmalı."""
+    integer_ids: bool
+    size: int = BUCKET_SIZE
+    hash_buckets: int = HASH_BUCKETS
+
+    @property
+    def expr(self) -> str:
+        if self.integer_ids:
+            return f"(id / {self.size})"
+        return f"(abs(hashtext(id::text)) % {self.hash_buckets})"
+
+    def bucket_filter(self, bucket_param: str = "bucket") -> str:
+        # Integer id: id aralığı (index kullanılır); diğerleri: hash eşitliği
+        if self.integer_ids:
+            return f"id >= :{bucket_param} * {self.size} AND id < (:{bucket_param} + 1) * {self.size}"
+        return f"{self.expr} = :{bucket_param}"
+
+
+def row_hash_expr(columns: list[str]) -> str:
+    cols = ", ".join(f'"{c}"' for c in columns)
+    return f"md5(ROW({cols})::text)"
 
 
 # =============================================================================
@@ -129,127 +186,261 @@ async def get_table_row_count(session: AsyncSession, table: str) -> int:
     return result.scalar() or 0
 
 
-async def get_table_rows(
-    session: AsyncSession, 
-    table: str, 
-    batch_size: int = 10000,
-    offset: int = 0
-) -> list[dict[str, Any]]:
-    """Fetch rows from a table in batches."""
-    query = text(f"SELECT * FROM {table} ORDER BY id LIMIT :limit OFFSET :offset")
-    result = await session.execute(query, {"limit": batch_size, "offset": offset})
-    
-    # Convert to list of dicts
-    columns = result.keys()
-    return [dict(zip(columns, row)) for row in result.fetchall()]
+async def get_columns(session: AsyncSession, schema: str, table: str) -> dict[str, str]:
+    """Column name -> data type, in ordinal order. Empty if the table does not exist."""
+    query = text("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+        ORDER BY ordinal_position
+    """)
+    result = await session.execute(query, {"schema": schema, "table": table})
+    return {name: data_type for name, data_type in result.fetchall()}
+
 
+def hashed_columns(columns: dict[str, str], exclude: set[str]) -> list[str]:
+    return [c for c in columns if c not in exclude]
 
-async def compute_table_hashes(
+
+async def compute_bucket_digests(
     session: AsyncSession,
-    table: str,
-    batch_size: int = 10000
-) -> dict[str, str]:
+    digest: TableDigest,
+    bucketing: Bucketing
+) -> None:
     """
-    Compute SHA-256 hashes for all rows in a table.
-    
-    Returns:
-        Dictionary mapping row ID -> hash
+    Fill digest.buckets: per bucket row count and md5 of the ordered row hashes.
+
+    Integer ids are paged by keyset (WHERE id >= next bucket start), BUCKETS_PER_QUERY
+    buckets per query, skipping id gaps. Other id types are hashed in a single grouped scan.
     """
-    hashes: dict[str, str] = {}
-    offset = 0
-    
-    while True:
-        rows = await get_table_rows(session, table, batch_size, offset)
-        if not rows:
-            break
-        
-        for row in rows:
-            row_id = str(row.get("id", offset))
-            hashes[row_id] = hash_row(row)
-        
-        offset += batch_size
-        print(f"  Processed {offset} rows from {table}...")
-    
-    return hashes
+    table = digest.name
+    leaf = f"md5(string_agg({row_hash_expr(digest.columns)}, '' ORDER BY id))"
+
+    if not bucketing.integer_ids:
+        result = await session.execute(text(f"""
+            SELECT {bucketing.expr} AS bucket, count(*), {leaf}
+            FROM {table} GROUP BY 1
+        """))
+        digest.buckets = {b: (c, h) for b, c, h in result.fetchall()}
+        return
+
+    span = bucketing.size * BUCKETS_PER_QUERY
+    page = text(f"""
+        SELECT {bucketing.expr} AS bucket, count(*), {leaf}
+        FROM {table}
+        WHERE id >= :lo AND id < :hi
+        GROUP BY 1
+    """)
+    next_id = text(f"SELECT min(id) FROM {table} WHERE id >= :lo")
+
+    lo = (await session.execute(text(f"SELECT min(id) FROM {table}"))).scalar()
+    while lo is not None:
+        lo = (lo // bucketing.size) * bucketing.size
+        hi = lo + span
+        result = await session.execute(page, {"lo": lo, "hi": hi})
+        for bucket, count, md5 in result.fetchall():
+            digest.buckets[bucket] = (count, md5)
+        # Keyset: sonraki dolu id'ye atla (seyrek id aralıklarında boş sayfa taranmaz)
+        lo = (await session.execute(next_id, {"lo": hi})).scalar()
+
+
+async def get_bucket_rows(
+    session: AsyncSession,
+    digest: TableDigest,
+    bucketing: Bucketing,
+    bucket: int
+) -> dict[str, str]:
+    """Row id -> md5 for a single bucket (drill-down)."""
+    query = text(f"""
+        SELECT id::text, {row_hash_expr(digest.columns)}
+        FROM {digest.name}
+        WHERE {bucketing.bucket_filter()}
+    """)
+    result = await session.execute(query, {"bucket": bucket})
+    return dict(result.fetchall())
+
+
+async def digest_table(
+    schema: str,
+    table: str,
+    exclude: set[str],
+    columns: Optional[list[str]] = None,
+    bucketing: Optional[Bucketing] = None,
+    bucket_size: int = BUCKET_SIZE
+) -> tuple[TableDigest, Bucketing]:
+    """Compute a table's Merkle digest in its own session."""
+    async with SessionLocal() as session:
+        types = await get_columns(session, schema, table)
+        digest = TableDigest(schema, table, columns or hashed_columns(types, exclude))
+        if not types:
+            digest.error = "table not found"
+            return digest, bucketing or Bucketing(False, bucket_size)
+        if "id" not in types:
+            digest.error = "no id column"
+            return digest, bucketing or Bucketing(False, bucket_size)
+
+        bucketing = bucketing or Bucketing(types["id"] in INTEGER_TYPES, bucket_size)
+        await compute_bucket_digests(session, digest, bucketing)
+        return digest, bucketing
 
 
 # =============================================================================
 # VERIFICATION MODES
 # =============================================================================
 
-async def verify_legacy(session: AsyncSession) -> dict[str, dict[str, str]]:
+async def _run_bounded(jobs: int, coros: list) -> list:
+    semaphore = asyncio.Semaphore(max(1, jobs))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def verify_tables(
+    targets: list[tuple[str, str, str]],
+    jobs: int,
+    bucket_size: int,
+    exclude: set[str]
+) -> dict[str, dict[str, dict[str, Any]]]:
     """
-    Compute hashes for all legacy tables.
-    
+    Compute Merkle digests for (domain, schema, table) targets in parallel.
+
     Returns:
-        Dictionary: domain -> table -> {id: hash}
+        Dictionary: domain -> table -> {root, rows, buckets}
     """
-    results: dict[str, dict[str, dict[str, str]]] = {}
-    
-    for domain, tables in VERIFICATION_TARGETS.items():
-        results[domain] = {}
-        print(f"\n[{domain.upper()}] Verifying legacy tables...")
-        
-        for table in tables:
-            try:
-                count = await get_table_row_count(session, table)
-                print(f"  {table}: {count} rows")
-                
-                hashes = await compute_table_hashes(session, table)
-                results[domain][table] = hashes
-                
-            except Exception as e:
-                print(f"  ERROR: {table} - {e}")
-                results[domain][table] = {"__error__": str(e)}
-    
+    async def one(domain: str, schema: str, table: str):
+        try:
+            digest, _ = await digest_table(schema, table, exclude, bucket_size=bucket_size)
+        except Exception as e:
+            digest = TableDigest(schema, table, [], error=str(e))
+        if digest.error:
+            print(f"  ERROR: {digest.name} - {digest.error}")
+        else:
+            print(f"  {digest.name}: {digest.rows} rows, {len(digest.buckets)} buckets, root {digest.root[:16]}")
+        return domain, table, digest
+
+    results: dict[str, dict[str, dict[str, Any]]] = {}
+    for domain, table, digest in await _run_bounded(jobs, [one(*t) for t in targets]):
+        results.setdefault(domain, {})[table] = digest.summary()
     return results
 
 
-async def verify_sharded(session: AsyncSession) -> dict[str, dict[str, str]]:
+async def verify_legacy(jobs: int, bucket_size: int) -> dict[str, dict[str, dict[str, Any]]]:
+    """Compute digests for all legacy tables."""
+    print("\n[LEGACY] Hashing legacy tables...")
+    targets = [(d, "public", t) for d, tables in VERIFICATION_TARGETS.items() for t in tables]
+    return await verify_tables(targets, jobs, bucket_size, EXCLUDE_COLUMNS)
+
+
+async def verify_sharded(jobs: int, bucket_size: int) -> dict[str, dict[str, dict[str, Any]]]:
+    """Compute digests for sharded tables (legacy table adıyla raporlanır)."""
+    print("\n[SHARDED] Hashing sharded tables...")
+    targets = [
+        (domain, *SHARDED_TARGETS[t]) for domain, tables in VERIFICATION_TARGETS.items()
+        for t in tables if t in SHARDED_TARGETS
+    ]
+    return await verify_tables(targets, jobs, bucket_size, EXCLUDE_COLUMNS | SHARDED_ONLY_COLUMNS)
+
+
+async def compare_table(
+    domain: str,
+    legacy_table: str,
+    bucket_size: int,
+    max_drill: int = MAX_DRILL_BUCKETS
+) -> list[str]:
     """
-    Compute hashes for sharded tables.
-    
-    Note: This will be implemented when sharded schemas exist.
-    Currently returns empty dict as placeholder.
+    Compare a legacy table with its sharded copy.
+
+    Her iki taraf da ortak kolonlar ve aynı bucket eşlemesiyle hashlenir; root'lar eşitse
+    tablo doğrulanmıştır. Aksi halde yalnızca farklı bucket'ların satırları çekilir.
     """
-    print("\n[SHARDED] Sharded tables not yet implemented.")
-    print("  Run migration first, then use --mode compare")
-    return {}
+    target_schema, target_table = SHARDED_TARGETS[legacy_table]
+    label = f"{domain}.{legacy_table}"
+
+    async with SessionLocal() as session:
+        legacy_types = await get_columns(session, "public", legacy_table)
+        sharded_types = await get_columns(session, target_schema, target_table)
+    if not legacy_types:
+        return [f"ERROR: {label} - legacy table not found"]
+    if not sharded_types:
+        return [f"MISSING TABLE: {target_schema}.{target_table}"]
+    if "id" not in legacy_types or "id" not in sharded_types:
+        return [f"ERROR: {label} - no id column"]
+
+    columns = [
+        c for c in hashed_columns(legacy_types, EXCLUDE_COLUMNS)
+        if c in sharded_types and sharded_types[c] == legacy_types[c]
+    ]
+    bucketing = Bucketing(legacy_types["id"] in INTEGER_TYPES, bucket_size)
+
+    (legacy, _), (sharded, _) = await asyncio.gather(
+        digest_table("public", legacy_table, EXCLUDE_COLUMNS, columns, bucketing),
+        digest_table(target_schema, target_table, EXCLUDE_COLUMNS, columns, bucketing),
+    )
+    if legacy.root == sharded.root:
+        print(f"  ✅ {label}: {legacy.rows} rows match (root {legacy.root[:16]})")
+        return []
+
+    mismatched = diff_buckets(legacy.buckets, sharded.buckets)
+    print(f"  ❌ {label}: {len(mismatched)}/{len(legacy.buckets | sharded.buckets)} buckets differ, drilling down")
+
+    diffs: list[str] = []
+    async with SessionLocal() as left, SessionLocal() as right:
+        for bucket in mismatched[:max_drill]:
+            legacy_rows = await get_bucket_rows(left, legacy, bucketing, bucket)
+            sharded_rows = await get_bucket_rows(right, sharded, bucketing, bucket)
+            diffs.extend(compare_hashes(label, legacy_rows, sharded_rows))
+    if len(mismatched) > max_drill:
+        diffs.append(f"TRUNCATED: {label} - {len(mismatched) - max_drill} more mismatched buckets not inspected")
+    return diffs
 
 
 def compare_hashes(
-    legacy: dict[str, dict[str, dict[str, str]]],
-    sharded: dict[str, dict[str, dict[str, str]]]
-) -> tuple[bool, list[str]]:
+    label: str,
+    legacy_hashes: dict[str, str],
+    sharded_hashes: dict[str, str]
+) -> list[str]:
     """
-    Compare legacy and sharded hashes.
-    
+    Compare row hashes of one bucket.
+
     Returns:
-        (passed: bool, diff_report: list[str])
+        diff_report lines (MISSING / MISMATCH / EXTRA)
     """
     diffs: list[str] = []
-    
-    for domain, tables in legacy.items():
-        for table, legacy_hashes in tables.items():
-            sharded_hashes = sharded.get(domain, {}).get(table, {})
-            
-            # Check for missing rows in sharded
-            for row_id, legacy_hash in legacy_hashes.items():
-                if row_id == "__error__":
-                    continue
-                    
-                sharded_hash = sharded_hashes.get(row_id)
-                
-                if sharded_hash is None:
-                    diffs.append(f"MISSING: {domain}.{table}.{row_id}")
-                elif sharded_hash != legacy_hash:
-                    diffs.append(f"MISMATCH: {domain}.{table}.{row_id}")
-            
-            # Check for extra rows in sharded
-            for row_id in sharded_hashes:
-                if row_id not in legacy_hashes:
-                    diffs.append(f"EXTRA: {domain}.{table}.{row_id}")
-    
+    for row_id, legacy_hash in legacy_hashes.items():
+        sharded_hash = sharded_hashes.get(row_id)
+        if sharded_hash is None:
+            diffs.append(f"MISSING: {label}.{row_id}")
+        elif sharded_hash != legacy_hash:
+            diffs.append(f"MISMATCH: {label}.{row_id}")
+    for row_id in sharded_hashes:
+        if row_id not in legacy_hashes:
+            diffs.append(f"EXTRA: {label}.{row_id}")
+    return diffs
+
+
+async def verify_compare(jobs: int, bucket_size: int) -> tuple[bool, list[str]]:
+    """
+    Compare every migrated legacy table with its sharded copy.
+
+    Returns:
+        (passed: bool, diff_report: list[str])
+    """
+    print("\n[COMPARE] Legacy vs sharded Merkle roots...")
+    pairs = [(d, t) for d, tables in VERIFICATION_TARGETS.items() for t in tables if t in SHARDED_TARGETS]
+    skipped = [t for tables in VERIFICATION_TARGETS.values() for t in tables if t not in SHARDED_TARGETS]
+    for table in skipped:
+        print(f"  ⏭️  {table}: not sharded (skipped)")
+
+    async def one(domain: str, table: str) -> list[str]:
+        try:
+            return await compare_table(domain, table, bucket_size)
+        except Exception as e:
+            return [f"ERROR: {domain}.{table} - {e}"]
+
+    diffs = [line for result in await _run_bounded(jobs, [one(*p) for p in pairs]) for line in result]
     return len(diffs) == 0, diffs
 
 
@@ -272,60 +463,63 @@ async def main() -> int:
         "--output",
         type=str,
         default=None,
-        help="Output file for hash results (JSON)"
+        help="Output file for Merkle digests (JSON, legacy/sharded modes)"
+    )
+    parser.add_argument(
+        "--bucket-size",
+        type=int,
+        default=BUCKET_SIZE,
+        help=f"Ids per Merkle bucket (default: {BUCKET_SIZE})"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help=f"Tables hashed in parallel (default: {JOBS})"
     )
-    
+
     args = parser.parse_args()
-    
+
     print("=" * 60)
     print("UroLog Data Integrity Verification Tool")
     print("=" * 60)
-    
-    async with SessionLocal() as session:
+
+    if args.mode in ("legacy", "sharded"):
+        print(f"\nMode: {args.mode.upper()} - Computing Merkle digests")
         if args.mode == "legacy":
-            print(f"\nMode: LEGACY - Computing hashes for current tables")
-            results = await verify_legacy(session)
-            
-            # Summary
-            total_rows = sum(
-                len(hashes) for tables in results.values() 
-                for hashes in tables.values() 
-                if "__error__" not in hashes
-            )
-            print(f"\n✅ Computed hashes for {total_rows} rows")
-            
-            if args.output:
-                with open(args.output, "w") as f:
-                    json.dump(results, f, indent=2)
-                print(f"📄 Results saved to: {args.output}")
-            
-            return 0
-            
-        elif args.mode == "sharded":
-            print(f"\nMode: SHARDED - Computing hashes for sharded tables")
-            results = await verify_sharded(session)
+            results = await verify_legacy(args.jobs, args.bucket_size)
+        else:
+            results = await verify_sharded(args.jobs, args.bucket_size)
+
+        total_rows = sum(
+            summary["rows"] for tables in results.values()
+            for summary in tables.values()
+            if "__error__" not in summary
+        )
+        print(f"\n✅ Computed hashes for {total_rows} rows")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"📄 Results saved to: {args.output}")
+
+        return 0
+
+    elif args.mode == "compare":
+        print(f"\nMode: COMPARE - Comparing legacy vs sharded")
+        passed, diffs = await verify_compare(args.jobs, args.bucket_size)
+
+        if passed:
+            print("\n✅ VERIFICATION PASSED: Zero diffs detected")
             return 0
-            
-        elif args.mode == "compare":
-            print(f"\nMode: COMPARE - Comparing legacy vs sharded")
-            
-            # Load cached legacy hashes or compute fresh
-            legacy = await verify_legacy(session)
-            sharded = await verify_sharded(session)
-            
-            passed, diffs = compare_hashes(legacy, sharded)
-            
-            if passed:
-                print("\n✅ VERIFICATION PASSED: Zero diffs detected")
-                return 0
-            else:
-                print(f"\n❌ VERIFICATION FAILED: {len(diffs)} differences found")
-                for diff in diffs[:20]:  # Show first 20
-                    print(f"  - {diff}")
-                if len(diffs) > 20:
-                    print(f"  ... and {len(diffs) - 20} more")
-                return 1
-    
+        else:
+            print(f"\n❌ VERIFICATION FAILED: {len(diffs)} differences found")
+            for diff in diffs[:20]:  # Show first 20
+                print(f"  - {diff}")
+            if len(diffs) > 20:
+                print(f"  ... and {len(diffs) - 20} more")
+            return 1
+
     return 2
 
 
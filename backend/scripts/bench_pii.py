@@ -0,0 +1,99 @@
+"""
+PII maskeleme throughput ölçümü: eski AIScribeService._sanitize_data (3x re.sub + her eşleşmede
+liste tarayan callback) ile app.core.pii tek geçişli motorun uzun transkriptlerde karşılaştırması.
+
+Usage:
+    python -m scripts.bench_pii --minutes 10 30 60 --repeat 5
+"""
+import argparse
+import random
+import re
+import time
+
+from app.core.pii import name_tokens, pii_scrubber
+
+SENTENCES = [
+    "Hasta {name} idrar yaparken yanma ve sık idrara çıkma şikayeti ile başvurdu.",
+    "Gece 3-4 kez idrara kalkıyor, Akut Sistit öyküsü mevcut.",
+    "Sol Böbrek alt polde 6 mm taş izlendi, Renal Kolik atakları tarif ediyor.",
+    "Benign Prostatik Hiperplazi tanısıyla Alfa Bloker kullanıyor.",
+    "Telefon {phone} numarasından ulaşılabilir, TC {tc}.",
+    "PSA 4.2 ng/mL, Tam İdrar Tahlili normal sınırlarda.",
+    "Eşi {name} ile birlikte kontrole geldi, Ürodinami planlandı.",
+    "Fizik Muayene: batın rahat, kostovertebral açı hassasiyeti yok.",
+]
+NAMES = ["Ahmet Yılmaz", "Ayşe Demir", "Mehmet Kaya", "Fatma Çelik", "Mustafa Şahin"]
+
+
+def legacy_sanitize(data):
+    """Eski uygulama (referans)."""
+    if isinstance(data, dict):
+        return {k: legacy_sanitize(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [legacy_sanitize(i) for i in data]
+    if isinstance(data, str):
+        data = re.sub(r'\b[1-9]\d{10}\b', '[ID_MASKED]', data)
+        data = re.sub(r'\b0?5\d{9}\b', '[PHONE_MASKED]', data)
+        name_pattern = r'\b[A-ZİĞÜŞÖÇ][a-zıiğüşöç]{1,}\s+[A-ZİĞÜŞÖÇ][a-zıiğüşöç]{1,}\b'
+
+        def replace_name(match):
+            val = match.group(0)
+            whitelist = ["Akut", "Kronik", "Sol", "Sag", "Bobrek", "Mesane", "Prostat", "Idrar", "Klinik", "Fizik", "Muayene"]
+            if any(w in val for w in whitelist):
+                return val
+            return "[NAME_MASKED]"
+
+        return re.sub(name_pattern, replace_name, data)
+    return data
+
+
+def make_transcript(minutes: int, seed: int = 42) -> str:
+    """Konuşma hızı ~130 kelime/dk varsayımıyla sentetik muayene transkripti."""
+    rng = random.Random(seed)
+    words, out = 0, []
+    while words < minutes * 130:
+        sentence = rng.choice(SENTENCES).format(
+            name=rng.choice(NAMES),
+            phone=f"05{rng.randint(100000000, 999999999)}",
+            tc=str(rng.randint(10**10, 10**11 - 1)),
+        )
+        out.append(sentence)
+        words += len(sentence.split())
+    return " ".join(out)
+
+
+def bench(fn, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PII scrubber throughput")
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    names = name_tokens(*NAMES)
+    print(f"{'transcript':>12} {'size':>9} {'legacy':>10} {'engine':>10} {'+names':>10} {'speedup':>8}")
+    for minutes in args.minutes:
+        text = make_transcript(minutes)
+        # LLM çıktısı gibi iç içe yapı: transkript + alan başına cümleler
+        payload = {"transcript": text, "fields": {f"f{i}": s for i, s in enumerate(text.split(". "))}}
+
+        legacy = bench(legacy_sanitize, payload, args.repeat)
+        engine = bench(pii_scrubber.scrub, payload, args.repeat)
+        with_names = bench(lambda p: pii_scrubber.scrub(p, names), payload, args.repeat)
+        size_kb = len(text.encode("utf-8")) * 2 / 1024
+        print(
+            f"{minutes:>9} dk {size_kb:>7.0f}KB {legacy * 1000:>8.1f}ms {engine * 1000:>8.1f}ms "
+            f"{with_names * 1000:>8.1f}ms {legacy / engine:>7.1f}x"
+        )
+        print(f"{'':>12} throughput: {size_kb / 1024 / engine:.1f} MB/s (engine)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,32 @@
+"""
+Legacy (public) -> sharded tablo senkronizasyonu.
+
+Modlar:
+- full: tüm tabloyu INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE ile senkronlar. Sadece
+  gerçekten değişen satırlar yazılır (IS DISTINCT FROM koşulu), aynı kalan satırlar için
+  yeni tuple / WAL üretilmez.
+- incremental: sadece son watermark'tan sonra değişen satırlar, sınırlı batch'lerle senkronlanır.
+  Tablo başına strateji:
+    * change_log: --install-triggers ile kurulan trigger'ın doldurduğu sync_state.change_log
+      (silinen satırlar da yakalanır, hedefte is_deleted = true yapılır)
+    * updated_at: kaynakta updated_at varsa (coalesce(updated_at, created_at), id) keyset watermark'ı
+      (son OVERLAP_SECONDS yeniden taranır; geç commit olan transaction'lar kaçmaz; legacy
+      insert'ler updated_at'i NULL bıraktığından yeni satırlar created_at ile yakalanır)
+  İlerleme (watermark / son seq / senkronlanan satır) her batch ile aynı transaction'da
+  sync_state.table_progress'e yazılır. İlk çalıştırmada tablo full sync ile başlatılır.
+
+Usage:
+    python -m scripts.sync_shards                                  # full sync
+    python -m scripts.sync_shards --mode incremental               # son çalıştırmadan beri değişenler
+    python -m scripts.sync_shards --mode incremental --dry-run     # bekleyen insert / update sayıları
+    python -m scripts.sync_shards --install-triggers               # updated_at'siz tablolar için change log
+    python -m scripts.sync_shards --mode incremental --tables hastalar,muayeneler --batch-size 2000
+"""
+import argparse
 import asyncio
 import sys
 import logging
+import time
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy import text
 from app.core.config import settings
@@ -14,218 +40,604 @@ logger = logging.getLogger("sync_shards")
 
 DATABASE_URL = str(settings.DATABASE_URL)
 
-async def sync_table(conn, source_table, target_table, mapping, schema=None):
+STATE_SCHEMA = "sync_state"
+TRIGGER_NAME = "trg_sync_change_log"
+BATCH_SIZE = 5000
+OVERLAP_SECONDS = 5
+
+# 1. Patients -> patient.sharded_patient_demographics
+patient_map = {
+    "id": "s.id", "tc_kimlik": "s.tc_kimlik", "ad": "s.ad", "soyad": "s.soyad",
+    "dogum_tarihi": "s.dogum_tarihi", "cinsiyet": "s.cinsiyet", "cep_tel": "s.cep_tel",
+    "email": "s.email", "adres": "s.adres", 
+    "dogum_yeri": "LEFT(s.dogum_yeri, 100)",
+    "kan_grubu": "s.kan_grubu", "medeni_hal": "s.medeni_hal", 
+    "meslek": "LEFT(s.meslek, 100)",
+    "doktor": "LEFT(s.doktor, 100)", 
+    "kimlik_notlar": "s.kimlik_notlar", 
+    "protokol_no": "LEFT(s.protokol_no, 50)",
+    "ev_tel": "s.ev_tel", "is_tel": "s.is_tel", 
+    "referans": "LEFT(s.referans, 100)",
+    "postakodu": "LEFT(s.postakodu, 10)", 
+    "kurum": "LEFT(s.kurum, 100)", 
+    "sigorta": "LEFT(s.sigorta, 100)",
+    "ozelsigorta": "LEFT(s.ozelsigorta, 100)", 
+    "cocuk_sayisi": "NULLIF(REGEXP_REPLACE(s.cocuk_sayisi, '[^0-9]', '', 'g'), '')::INTEGER", 
+    "sms_izin": "COALESCE(s.sms_izin = 'Evet', false)", 
+    "email_izin": "COALESCE(s.email_izin = 'Evet', false)", 
+    "iletisim_kaynagi": "LEFT(s.iletisim_kaynagi, 50)", 
+    "iletisim_tercihi": "LEFT(s.iletisim_tercihi, 50)", 
+    "indirim_grubu": "LEFT(s.indirim_grubu, 50)", 
+    "dil": "s.dil", "etiketler": "s.etiketler", "kayit_notu": "s.kayit_notu"
+}
+
+# 2. Muayeneler -> clinical.sharded_clinical_muayeneler
+muayene_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", "sikayet": "s.sikayet",
+    "oyku": "s.oyku", "bulgu_notu": "s.bulgu_notu", "tani1": "LEFT(s.tani1, 255)", 
+    "tani1_kodu": "LEFT(s.tani1_kodu, 50)", "tani2": "LEFT(s.tani2, 255)", 
+    "tani2_kodu": "LEFT(s.tani2_kodu, 50)",
+    "tani3": "LEFT(s.tani3, 255)", "tani3_kodu": "LEFT(s.tani3_kodu, 50)",
+    "tani4": "LEFT(s.tani4, 255)", "tani4_kodu": "LEFT(s.tani4_kodu, 50)",
+    "tani5": "LEFT(s.tani5, 255)", "tani5_kodu": "LEFT(s.tani5_kodu, 50)",
+    "tedavi": "s.tedavi", "doktor": "LEFT(s.doktor, 100)", "recete": "s.recete", 
+    "ozgecmis": "s.ozgecmis", "soygecmis": "s.soygecmis", 
+    "kullandigi_ilaclar": "s.kullandigi_ilaclar", "kan_sulandirici": "s.kan_sulandirici",
+    "aliskanliklar": "s.aliskanliklar", "sistem_sorgu": "s.sistem_sorgu", 
+    "ipss_skor": "LEFT(s.ipss_skor, 50)", 
+    "iief_ef_skor": "LEFT(s.iief_ef_skor, 50)", 
+    "iief_ef_answers": "s.iief_ef_answers",
+    "fizik_muayene": "s.fizik_muayene", 
+    "erektil_islev": "LEFT(s.erektil_islev, 50)", 
+    "ejakulasyon": "LEFT(s.ejakulasyon, 50)", 
+    "mshq": "LEFT(s.mshq, 50)", 
+    "prosedur": "s.prosedur", 
+    "allerjiler": "s.allerjiler", "oneriler": "s.oneriler", "sonuc": "s.sonuc"
+}
+v10_cols = ['disuri', 'pollakiuri', 'nokturi', 'hematuri', 'genital_akinti', 'kabizlik', 'tas_oyku', 'catallanma', 'projeksiyon_azalma', 'kalibre_incelme', 'idrar_bas_zorluk', 'kesik_idrar_yapma', 'terminal_damlama', 'residiv_hissi', 'inkontinans']
+v50_cols = ['tansiyon', 'ates', 'kvah', 'bobrek_sag', 'bobrek_sol', 'suprapubik_kitle', 'ego', 'rektal_tuse']
+for c in v10_cols: muayene_map[c] = f"LEFT(s.{c}, 10)"
+for c in v50_cols: muayene_map[c] = f"LEFT(s.{c}, 50)"
+
+# 3. Operasyonlar -> clinical.sharded_clinical_operasyonlar
+op_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", 
+    "ameliyat": "LEFT(s.ameliyat, 255)", "pre_op_tani": "LEFT(s.pre_op_tani, 255)", 
+    "post_op_tani": "LEFT(s.post_op_tani, 255)",
+    "ekip": "s.ekip", "hemsire": "LEFT(s.hemsire, 100)", 
+    "anestezi_ekip": "LEFT(s.anestezi_ekip, 100)",
+    "anestezi_tur": "LEFT(s.anestezi_tur, 50)", "notlar": "s.notlar", 
+    "patoloji": "s.patoloji", "post_op": "s.post_op", "video_url": "LEFT(s.video_url, 255)"
+}
+
+# 4. Tetkik Sonuçları -> clinical.sharded_clinical_tetkikler
+tetkik_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", 
+    "kategori": "LEFT(s.kategori, 50)",
+    "tetkik_adi": "LEFT(s.tetkik_adi, 255)", 
+    "sonuc": "s.sonuc", 
+    "birim": "LEFT(s.birim, 50)",
+    "referans_araligi": "LEFT(s.referans_araligi, 100)", 
+    "sembol": "LEFT(s.sembol, 50)",
+    "dosya_yolu": "LEFT(s.dosya_yolu, 255)", 
+    "dosya_adi": "LEFT(s.dosya_adi, 255)"
+}
+
+# 5. Hasta Notları -> clinical.sharded_clinical_notlar
+notlar_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", "tip": "s.tip",
+    "icerik": "s.icerik", "sembol": "s.sembol", "etiketler": "s.etiketler"
+}
+
+# 6. Finance -> finance.sharded_finance_islemler
+finance_map = {
+    "id": "s.id", "referans_kodu": "s.referans_kodu", "hasta_id": "s.hasta_id", 
+    "muayene_id": "s.muayene_id", "tarih": "s.tarih", "islem_tipi": "s.islem_tipi", 
+    "tutar": "s.tutar", "net_tutar": "s.net_tutar", "para_birimi": "s.para_birimi",
+    "durum": "s.durum", "aciklama": "s.aciklama", "doktor": "s.doktor"
+}
+
+# 6b. Photos -> clinical.sharded_clinical_fotograflar
+photo_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "dosya_yolu": "s.dosya_yolu", "kategori": "s.kategori", "notlar": "s.notlar"
+}
+
+# 7. Additional Clinical Tables
+istirahat_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "baslangic_tarihi": "s.baslangic_tarihi", "bitis_tarihi": "s.bitis_tarihi",
+    "icd_kodu": "s.icd_kodu", "tani": "s.tani", "karar": "s.karar",
+    "kontrol_tarihi": "s.kontrol_tarihi"
+}
+
+durum_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "tani_bulgular": "s.tani_bulgular", "icd_kodu": "s.icd_kodu", "sonuc_kanaat": "s.sonuc_kanaat"
+}
+
+tibbi_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "islem_basligi": "s.islem_basligi", "islem_detayi": "s.islem_detayi", "sonuc_oneriler": "s.sonuc_oneriler"
+}
+
+trus_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "psa_total": "s.psa_total", "rektal_tuse": "s.rektal_tuse", 
+    "mri_var": "COALESCE(s.mri_var, false)", 
+    "mri_tarih": "s.mri_tarih", "mri_ozet": "s.mri_ozet",
+    "pirads_lezyon_boyut": "s.pirads_lezyon_boyut", 
+    "pirads_lezyon_lokasyon": "s.pirads_lezyon_lokasyon",
+    "lokasyonlar": "s.lokasyonlar", "prosedur_notu": "s.prosedur_notu"
+}
+
+telefon_map = {
+    "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
+    "notlar": "s.notlar", "doktor": "s.doktor"
+}
+
+# Senkron sırası: önce hastalar (klinik / finans tabloları hasta_id ile bağlı)
+SYNC_TABLES = [
+    ("hastalar", "sharded_patient_demographics", patient_map, "patient"),
+    ("muayeneler", "sharded_clinical_muayeneler", muayene_map, "clinical"),
+    ("operasyonlar", "sharded_clinical_operasyonlar", op_map, "clinical"),
+    ("tetkik_sonuclari", "sharded_clinical_tetkikler", tetkik_map, "clinical"),
+    ("hasta_notlari", "sharded_clinical_notlar", notlar_map, "clinical"),
+    ("finans_islemler", "sharded_finance_islemler", finance_map, "finance"),
+    ("fotograf_arsivi", "sharded_clinical_fotograflar", photo_map, "clinical"),
+    ("istirahat_raporlari", "sharded_clinical_istirahat_raporlari", istirahat_map, "clinical"),
+    ("durum_bildirir_raporlari", "sharded_clinical_durum_bildirir_raporlari", durum_map, "clinical"),
+    ("tibbi_mudahale_raporlari", "sharded_clinical_tibbi_mudahale_raporlari", tibbi_map, "clinical"),
+    ("trus_biyopsileri", "sharded_clinical_trus_biyopsileri", trus_map, "clinical"),
+    ("telefon_gorusmeleri", "sharded_clinical_telefon_gorusmeleri", telefon_map, "clinical"),
+]
+
+
+def _qualified(target_table, schema=None):
+    return f"{schema}.{target_table}" if schema else target_table
+
+
+def upsert_sql(source_from, qualified_target, mapping, returning=""):
     """
-    Synchronizes data from source_table to target_table using the provided mapping.
-    Includes ON CONFLICT (id) DO UPDATE for idempotency.
+    INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE; sadece kolonlardan biri değiştiyse günceller.
+    source_from: kaynak tablo veya alt sorgu (alias 's' ile kullanılır).
     """
-    qualified_target = f"{schema}.{target_table}" if schema else target_table
-    logger.info(f"Syncing {source_table} -> {qualified_target}...")
-    
     target_cols_list = list(mapping.keys())
-    source_exprs_list = [mapping[k] for k in target_cols_list]
-    
-    target_cols = ", ".join(target_cols_list)
-    source_exprs = ", ".join(source_exprs_list)
-    
-    update_clause_list = []
-    for col in target_cols_list:
-        if col != 'id':
-            update_clause_list.append(f"{col} = EXCLUDED.{col}")
-    update_clause = ", ".join(update_clause_list)
-    
-    query = f"""
-    INSERT INTO {qualified_target} ({target_cols}, created_at, updated_at, is_deleted)
+    source_exprs = ", ".join(mapping[k] for k in target_cols_list)
+    updatable = [col for col in target_cols_list if col != 'id']
+    update_clause = ", ".join(f"{col} = EXCLUDED.{col}" for col in updatable)
+    current = ", ".join(f"t.{col}" for col in updatable)
+    incoming = ", ".join(f"EXCLUDED.{col}" for col in updatable)
+
+    return f"""
+    INSERT INTO {qualified_target} AS t ({", ".join(target_cols_list)}, created_at, updated_at, is_deleted)
     SELECT {source_exprs}, now(), now(), false
-    FROM {source_table} s
+    FROM {source_from} s
     ON CONFLICT (id) DO UPDATE SET
     {update_clause},
     updated_at = now()
+    WHERE ({current}) IS DISTINCT FROM ({incoming})
+    {returning}
     """
-    
+
+
+async def reset_sequence(conn, target_table, schema=None):
+    """Reset id sequence to MAX(id) (integer id'li tablolar)."""
+    qualified_target = _qualified(target_table, schema)
+    seq_exists_query = f"SELECT pg_get_serial_sequence('{qualified_target}', 'id') IS NOT NULL as has_seq;"
     try:
-        result = await conn.execute(text(query))
-        logger.info(f"✅ Synced {result.rowcount} rows in {qualified_target}.")
-        
-        # Reset sequence only if it exists
-        seq_exists_query = f"SELECT pg_get_serial_sequence('{qualified_target}', 'id') IS NOT NULL as has_seq;"
-        try:
-            seq_res = await conn.execute(text(seq_exists_query))
-            has_seq = seq_res.scalar()
-            
-            if has_seq:
-                # Type check for id to avoid MAX(uuid) error
-                id_type_query = f"SELECT data_type FROM information_schema.columns WHERE table_schema = '{schema or 'public'}' AND table_name = '{target_table}' AND column_name = 'id';"
-                id_type_res = await conn.execute(text(id_type_query))
-                id_type = id_type_res.scalar()
-                
-                if id_type in ('integer', 'bigint', 'smallint'):
-                    seq_query = f"SELECT setval(pg_get_serial_sequence('{qualified_target}', 'id'), COALESCE((SELECT MAX(id) FROM {qualified_target}), 1));"
-                    await conn.execute(text(seq_query))
-                    logger.info(f"🔄 Sequence reset for {qualified_target}.")
-                else:
-                    logger.info(f"ℹ️ Skipping sequence reset for {qualified_target} (Type: {id_type})")
+        seq_res = await conn.execute(text(seq_exists_query))
+        has_seq = seq_res.scalar()
+
+        if has_seq:
+            # Type check for id to avoid MAX(uuid) error
+            id_type_query = f"SELECT data_type FROM information_schema.columns WHERE table_schema = '{schema or 'public'}' AND table_name = '{target_table}' AND column_name = 'id';"
+            id_type_res = await conn.execute(text(id_type_query))
+            id_type = id_type_res.scalar()
+
+            if id_type in ('integer', 'bigint', 'smallint'):
+                seq_query = f"SELECT setval(pg_get_serial_sequence('{qualified_target}', 'id'), COALESCE((SELECT MAX(id) FROM {qualified_target}), 1));"
+                await conn.execute(text(seq_query))
+                logger.info(f"🔄 Sequence reset for {qualified_target}.")
             else:
-                logger.debug(f"ℹ️ No sequence found for {qualified_target}.")
-        except Exception as seq_err:
-            logger.warning(f"⚠️ Sequence reset skipped for {qualified_target}: {seq_err}")
-            
+                logger.info(f"ℹ️ Skipping sequence reset for {qualified_target} (Type: {id_type})")
+        else:
+            logger.debug(f"ℹ️ No sequence found for {qualified_target}.")
+    except Exception as seq_err:
+        logger.warning(f"⚠️ Sequence reset skipped for {qualified_target}: {seq_err}")
+
+
+async def sync_table(conn, source_table, target_table, mapping, schema=None):
+    """
+    Synchronizes data from source_table to target_table using the provided mapping.
+    Includes ON CONFLICT (id) DO UPDATE for idempotency; unchanged rows are not rewritten.
+    """
+    qualified_target = _qualified(target_table, schema)
+    logger.info(f"Syncing {source_table} -> {qualified_target}...")
+
+    try:
+        result = await conn.execute(text(upsert_sql(source_table, qualified_target, mapping)))
+        logger.info(f"✅ Synced {result.rowcount} changed rows in {qualified_target}.")
+        await reset_sequence(conn, target_table, schema)
     except Exception as e:
         logger.error(f"❌ Failed to sync {source_table} -> {qualified_target}: {e}")
         raise
 
-async def full_sync():
+
+# =============================================================================
+# INCREMENTAL SYNC
+# =============================================================================
+
+async def ensure_state(conn):
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {STATE_SCHEMA}"))
+    await conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_SCHEMA}.table_progress (
+            source_table TEXT PRIMARY KEY,
+            target_table TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            watermark TEXT,
+            watermark_id TEXT,
+            last_seq BIGINT,
+            rows_synced BIGINT NOT NULL DEFAULT 0,
+            last_run_at TIMESTAMPTZ,
+            last_run_rows BIGINT NOT NULL DEFAULT 0
+        )
+    """))
+    await conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_SCHEMA}.change_log (
+            seq BIGSERIAL PRIMARY KEY,
+            source_table TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """))
+    await conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_change_log_table_seq ON {STATE_SCHEMA}.change_log (source_table, seq)"
+    ))
+
+
+async def install_triggers(conn, source_tables):
+    """Kaynak tablolara değişen id'leri sync_state.change_log'a yazan trigger kurar."""
+    await ensure_state(conn)
+    await conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {STATE_SCHEMA}.log_change() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO {STATE_SCHEMA}.change_log (source_table, row_id)
+            VALUES (TG_TABLE_NAME, CASE WHEN TG_OP = 'DELETE' THEN OLD.id::text ELSE NEW.id::text END);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    for source_table in source_tables:
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON public.{source_table}"))
+        await conn.execute(text(f"""
+            CREATE TRIGGER {TRIGGER_NAME}
+            AFTER INSERT OR UPDATE OR DELETE ON public.{source_table}
+            FOR EACH ROW EXECUTE FUNCTION {STATE_SCHEMA}.log_change()
+        """))
+        logger.info(f"🪝 Change log trigger installed on public.{source_table}")
+
+
+async def get_column_types(conn, table, schema="public"):
+    result = await conn.execute(text("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = :schema AND table_name = :table
+    """), {"schema": schema, "table": table})
+    return dict(result.fetchall())
+
+
+async def detect_strategy(conn, source_table, column_types):
+    has_trigger = (await conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = :name AND tgrelid = to_regclass(:table)
+        )
+    """), {"name": TRIGGER_NAME, "table": f"public.{source_table}"})).scalar()
+    if has_trigger:
+        return "change_log"
+    if "updated_at" in column_types:
+        return "updated_at"
+    return None
+
+
+def changed_at_column(types, alias="s"):
+    """Değişiklik zamanı: updated_at, insert'te NULL kaldığı için created_at'e düşer."""
+    prefix = f"{alias}." if alias else ""
+    if "created_at" in types:
+        return f"coalesce({prefix}updated_at, {prefix}created_at)"
+    return f"{prefix}updated_at"
+
+
+def changed_at_type(types):
+    # coalesce(timestamp, timestamptz) timestamptz'dir
+    if "created_at" in types and "with time zone" in types["created_at"]:
+        return types["created_at"]
+    return types["updated_at"]
+
+
+def _cast(param, pg_type):
+    # Watermark'lar tipten bağımsız olarak text saklanır, sorguda kolon tipine çevrilir
+    return f"CAST(CAST(:{param} AS text) AS {pg_type})"
+
+
+def _diff_count_sql(source_filter, qualified_target, mapping):
+    updatable = [col for col in mapping if col != 'id']
+    current = ", ".join(f"t.{col}" for col in updatable)
+    incoming = ", ".join(mapping[col] for col in updatable)
+    return f"""
+        SELECT
+            count(*) FILTER (WHERE t.id IS NULL),
+            count(*) FILTER (WHERE t.id IS NOT NULL AND ({current}) IS DISTINCT FROM ({incoming}))
+        FROM ({source_filter}) s
+        LEFT JOIN {qualified_target} t ON t.id = s.id
+    """
+
+
+async def save_progress(conn, source_table, **values):
+    sets = ", ".join(f"{k} = :{k}" for k in values)
+    await conn.execute(
+        text(f"UPDATE {STATE_SCHEMA}.table_progress SET {sets} WHERE source_table = :source_table"),
+        {"source_table": source_table, **values},
+    )
+
+
+async def bootstrap_table(conn, source_table, target_table, mapping, schema, strategy, types, dry_run):
+    """İlk çalıştırma: watermark'ı full sync'ten ÖNCE al, sonra tabloyu full senkronla."""
+    if strategy == "updated_at":
+        changed_at = changed_at_column(types, alias=None)
+        start = {"watermark": (await conn.execute(text(f"SELECT max({changed_at})::text FROM public.{source_table}"))).scalar()}
+    elif dry_run:
+        start = {}
+    else:
+        # Şu an görünen (commit edilmiş) kayıtlar full sync'e dahildir: full sync'ten ÖNCE tüketilir.
+        # Daha sonra commit edilen kayıtlar (seq'i küçük olsa bile) change_log'da kalır
+        start = {"last_seq": (await conn.execute(
+            text(f"""
+                WITH consumed AS (DELETE FROM {STATE_SCHEMA}.change_log WHERE source_table = :t RETURNING seq)
+                SELECT COALESCE(max(seq), 0) FROM consumed
+            """),
+            {"t": source_table},
+        )).scalar()}
+
+    if dry_run:
+        total = (await conn.execute(text(f"SELECT count(*) FROM public.{source_table}"))).scalar()
+        logger.info(f"[DRY RUN] {source_table}: no progress yet, bootstrap full sync of {total} rows")
+        return {"inserted": total, "updated": 0, "deleted": 0, "bootstrap": True}
+
+    await sync_table(conn, source_table, target_table, mapping, schema)
+    await conn.execute(text(f"""
+        INSERT INTO {STATE_SCHEMA}.table_progress (source_table, target_table, strategy, watermark, last_seq, last_run_at)
+        VALUES (:source_table, :target_table, :strategy, :watermark, :last_seq, now())
+    """), {
+        "source_table": source_table, "target_table": _qualified(target_table, schema), "strategy": strategy,
+        "watermark": start.get("watermark"), "last_seq": start.get("last_seq"),
+    })
+    return {"inserted": 0, "updated": 0, "deleted": 0, "bootstrap": True}
+
+
+async def sync_updated_at(conn, source_table, qualified_target, mapping, types, progress, batch_size, overlap, dry_run):
+    ts_type, id_type = changed_at_type(types), types["id"]
+    changed_at, batch_changed_at = changed_at_column(types), changed_at_column(types, alias=None)
+    # Her çalıştırma son watermark'ın OVERLAP_SECONDS öncesinden başlar; aynı satırlar
+    # tekrar gelirse IS DISTINCT FROM koşulu yüzünden yazılmaz
+    start_filter = f"{changed_at} >= {_cast('watermark', ts_type)} - interval '{int(overlap)} seconds'"
+    keyset_filter = f"({changed_at}, s.id) > ({_cast('watermark', ts_type)}, {_cast('watermark_id', id_type)})"
+    stats = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    if progress["watermark"] is None:
+        # Bootstrap sırasında tablo boştu: değişiklik zamanı olan tüm satırlar
+        start_filter = f"{changed_at} IS NOT NULL"
+
+    if dry_run:
+        source_filter = f"SELECT * FROM public.{source_table} s WHERE {start_filter}"
+        result = await conn.execute(text(_diff_count_sql(source_filter, qualified_target, mapping)),
+                                    {"watermark": progress["watermark"]})
+        stats["inserted"], stats["updated"] = result.one()
+        return stats
+
+    def batch_sql(where):
+        batch = f"SELECT * FROM public.{source_table} s WHERE {where} ORDER BY {changed_at}, s.id LIMIT {batch_size}"
+        return text(f"""
+            WITH batch AS ({batch}),
+            upserted AS ({upsert_sql('batch', qualified_target, mapping, 'RETURNING (xmax = 0) AS inserted')}),
+            last AS (
+                SELECT ({batch_changed_at})::text AS watermark, id::text AS watermark_id
+                FROM batch ORDER BY {batch_changed_at} DESC, id DESC LIMIT 1
+            )
+            SELECT
+                (SELECT count(*) FROM batch),
+                (SELECT count(*) FILTER (WHERE inserted) FROM upserted),
+                (SELECT count(*) FILTER (WHERE NOT inserted) FROM upserted),
+                (SELECT watermark FROM last),
+                (SELECT watermark_id FROM last)
+        """)
+
+    first, following = batch_sql(start_filter), batch_sql(keyset_filter)
+    params = {"watermark": progress["watermark"]}
+    query = first
+    while True:
+        async with conn.begin():
+            read, inserted, updated, watermark, watermark_id = (await conn.execute(query, params)).one()
+            if read == 0:
+                break
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            await save_progress(conn, source_table, watermark=watermark, watermark_id=watermark_id)
+        params = {"watermark": watermark, "watermark_id": watermark_id}
+        query = following
+        if read < batch_size:
+            break
+    return stats
+
+
+async def sync_change_log(conn, source_table, qualified_target, mapping, types, progress, batch_size, dry_run):
+    id_type = types["id"]
+    stats = {"inserted": 0, "updated": 0, "deleted": 0}
+    # seq watermark'ı kullanılmaz: BIGSERIAL insert anında atanır ama commit sırası farklıdır, küçük seq'li
+    # kayıt büyük seq tüketildikten sonra görünebilir. İşlenen kayıtlar silindiğinden kalan her kayıt bekleyendir
+    pending = f"SELECT row_id FROM {STATE_SCHEMA}.change_log WHERE source_table = :t"
+
+    if dry_run:
+        source_filter = f"SELECT * FROM public.{source_table} s WHERE s.id::text IN ({pending})"
+        params = {"t": source_table}
+        result = await conn.execute(text(_diff_count_sql(source_filter, qualified_target, mapping)), params)
+        stats["inserted"], stats["updated"] = result.one()
+        stats["deleted"] = (await conn.execute(text(f"""
+            SELECT count(DISTINCT c.row_id) FROM ({pending}) c
+            WHERE NOT EXISTS (SELECT 1 FROM public.{source_table} s WHERE s.id::text = c.row_id)
+        """), params)).scalar()
+        return stats
+
+    ids_param = f"CAST(CAST(:ids AS text[]) AS {id_type}[])"
+    claim = text(f"""
+        SELECT array_agg(seq), array_agg(DISTINCT row_id) FROM (
+            SELECT seq, row_id FROM {STATE_SCHEMA}.change_log
+            WHERE source_table = :t ORDER BY seq LIMIT {batch_size}
+            FOR UPDATE SKIP LOCKED
+        ) c
+    """)
+    upsert = text(f"""
+        WITH upserted AS ({upsert_sql(
+            f"(SELECT * FROM public.{source_table} WHERE id = ANY({ids_param}))",
+            qualified_target, mapping, 'RETURNING (xmax = 0) AS inserted',
+        )})
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+    """)
+    # Kaynakta artık olmayan id'ler: hedefte soft delete
+    soft_delete = text(f"""
+        UPDATE {qualified_target} t SET is_deleted = true, updated_at = now()
+        WHERE t.id = ANY({ids_param}) AND NOT t.is_deleted
+          AND NOT EXISTS (SELECT 1 FROM public.{source_table} s WHERE s.id = t.id)
+    """)
+    # Yalnız okunan kayıtlar silinir (seq <= max değil: araya geç commit edilen kayıt girebilir)
+    consume = text(f"DELETE FROM {STATE_SCHEMA}.change_log WHERE seq = ANY(CAST(:seqs AS bigint[]))")
+
+    while True:
+        async with conn.begin():
+            seqs, ids = (await conn.execute(claim, {"t": source_table})).one()
+            if not seqs:
+                break
+            inserted, updated = (await conn.execute(upsert, {"ids": ids})).one()
+            deleted = (await conn.execute(soft_delete, {"ids": ids})).rowcount
+            await conn.execute(consume, {"seqs": seqs})
+            await save_progress(conn, source_table, last_seq=max(seqs))
+        stats["inserted"] += inserted
+        stats["updated"] += updated
+        stats["deleted"] += deleted
+        if len(seqs) < batch_size:
+            break
+    return stats
+
+
+async def incremental_sync_table(engine, source_table, target_table, mapping, schema, batch_size, overlap, dry_run):
+    qualified_target = _qualified(target_table, schema)
+    started = time.monotonic()
+    async with engine.connect() as conn:
+        types = await get_column_types(conn, source_table)
+        strategy = await detect_strategy(conn, source_table, types)
+        if strategy is None:
+            logger.warning(
+                f"⚠️ {source_table}: no updated_at column and no change log trigger; "
+                f"run with --install-triggers or use --mode full"
+            )
+            await conn.rollback()
+            return None
+
+        progress = (await conn.execute(
+            text(f"SELECT * FROM {STATE_SCHEMA}.table_progress WHERE source_table = :t"), {"t": source_table}
+        )).mappings().first()
+        await conn.commit()
+
+        if progress is None or progress["strategy"] != strategy:
+            if progress is not None and not dry_run:
+                # Strateji değişti (ör. trigger kuruldu): ilerleme yeniden başlatılır
+                async with conn.begin():
+                    await conn.execute(text(f"DELETE FROM {STATE_SCHEMA}.table_progress WHERE source_table = :t"), {"t": source_table})
+            async with conn.begin():
+                stats = await bootstrap_table(conn, source_table, target_table, mapping, schema, strategy, types, dry_run)
+        elif strategy == "updated_at":
+            stats = await sync_updated_at(conn, source_table, qualified_target, mapping, types, progress, batch_size, overlap, dry_run)
+        else:
+            stats = await sync_change_log(conn, source_table, qualified_target, mapping, types, progress, batch_size, dry_run)
+
+        changed = stats["inserted"] + stats["updated"] + stats["deleted"]
+        if not dry_run:
+            async with conn.begin():
+                if stats["inserted"]:
+                    await reset_sequence(conn, target_table, schema)
+                await conn.execute(text(f"""
+                    UPDATE {STATE_SCHEMA}.table_progress
+                    SET rows_synced = rows_synced + :changed, last_run_rows = :changed, last_run_at = now()
+                    WHERE source_table = :t
+                """), {"t": source_table, "changed": changed})
+
+    prefix = "[DRY RUN] pending" if dry_run else "✅ synced"
+    logger.info(
+        f"{prefix} {source_table} -> {qualified_target} ({strategy}): "
+        f"{stats['inserted']} insert, {stats['updated']} update, {stats['deleted']} delete "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return stats
+
+
+async def incremental_sync(tables, batch_size=BATCH_SIZE, overlap=OVERLAP_SECONDS, dry_run=False):
+    logger.info(f"Connecting to database: {DATABASE_URL}")
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await ensure_state(conn)
+        for source_table, target_table, mapping, schema in tables:
+            await incremental_sync_table(engine, source_table, target_table, mapping, schema, batch_size, overlap, dry_run)
+    finally:
+        await engine.dispose()
+    logger.info("🎉 Incremental Sharded Sync completed." if not dry_run else "🔍 Dry run completed (no changes).")
+
+
+async def full_sync(tables=None):
     logger.info(f"Connecting to database: {DATABASE_URL}")
     engine = create_async_engine(DATABASE_URL)
     
     async with engine.begin() as conn:
         # Pre-requisite: UUID extension
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\""))
-        
-        # 1. Patients -> patient.sharded_patient_demographics
-        patient_map = {
-            "id": "s.id", "tc_kimlik": "s.tc_kimlik", "ad": "s.ad", "soyad": "s.soyad",
-            "dogum_tarihi": "s.dogum_tarihi", "cinsiyet": "s.cinsiyet", "cep_tel": "s.cep_tel",
-            "email": "s.email", "adres": "s.adres", 
-            "dogum_yeri": "LEFT(s.dogum_yeri, 100)",
-            "kan_grubu": "s.kan_grubu", "medeni_hal": "s.medeni_hal", 
-            "meslek": "LEFT(s.meslek, 100)",
-            "doktor": "LEFT(s.doktor, 100)", 
-            "kimlik_notlar": "s.kimlik_notlar", 
-            "protokol_no": "LEFT(s.protokol_no, 50)",
-            "ev_tel": "s.ev_tel", "is_tel": "s.is_tel", 
-            "referans": "LEFT(s.referans, 100)",
-            "postakodu": "LEFT(s.postakodu, 10)", 
-            "kurum": "LEFT(s.kurum, 100)", 
-            "sigorta": "LEFT(s.sigorta, 100)",
-            "ozelsigorta": "LEFT(s.ozelsigorta, 100)", 
-            "cocuk_sayisi": "NULLIF(REGEXP_REPLACE(s.cocuk_sayisi, '[^0-9]', '', 'g'), '')::INTEGER", 
-            "sms_izin": "COALESCE(s.sms_izin = 'Evet', false)", 
-            "email_izin": "COALESCE(s.email_izin = 'Evet', false)", 
-            "iletisim_kaynagi": "LEFT(s.iletisim_kaynagi, 50)", 
-            "iletisim_tercihi": "LEFT(s.iletisim_tercihi, 50)", 
-            "indirim_grubu": "LEFT(s.indirim_grubu, 50)", 
-            "dil": "s.dil", "etiketler": "s.etiketler", "kayit_notu": "s.kayit_notu"
-        }
-        await sync_table(conn, "hastalar", "sharded_patient_demographics", patient_map, schema="patient")
-        
-        # 2. Muayeneler -> clinical.sharded_clinical_muayeneler
-        muayene_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", "sikayet": "s.sikayet",
-            "oyku": "s.oyku", "bulgu_notu": "s.bulgu_notu", "tani1": "LEFT(s.tani1, 255)", 
-            "tani1_kodu": "LEFT(s.tani1_kodu, 50)", "tani2": "LEFT(s.tani2, 255)", 
-            "tani2_kodu": "LEFT(s.tani2_kodu, 50)",
-            "tani3": "LEFT(s.tani3, 255)", "tani3_kodu": "LEFT(s.tani3_kodu, 50)",
-            "tani4": "LEFT(s.tani4, 255)", "tani4_kodu": "LEFT(s.tani4_kodu, 50)",
-            "tani5": "LEFT(s.tani5, 255)", "tani5_kodu": "LEFT(s.tani5_kodu, 50)",
-            "tedavi": "s.tedavi", "doktor": "LEFT(s.doktor, 100)", "recete": "s.recete", 
-            "ozgecmis": "s.ozgecmis", "soygecmis": "s.soygecmis", 
-            "kullandigi_ilaclar": "s.kullandigi_ilaclar", "kan_sulandirici": "s.kan_sulandirici",
-            "aliskanliklar": "s.aliskanliklar", "sistem_sorgu": "s.sistem_sorgu", 
-            "ipss_skor": "LEFT(s.ipss_skor, 50)", 
-            "iief_ef_skor": "LEFT(s.iief_ef_skor, 50)", 
-            "iief_ef_answers": "s.iief_ef_answers",
-            "fizik_muayene": "s.fizik_muayene", 
-            "erektil_islev": "LEFT(s.erektil_islev, 50)", 
-            "ejakulasyon": "LEFT(s.ejakulasyon, 50)", 
-            "mshq": "LEFT(s.mshq, 50)", 
-            "prosedur": "s.prosedur", 
-            "allerjiler": "s.allerjiler", "oneriler": "s.oneriler", "sonuc": "s.sonuc"
-        }
-        v10_cols = ['disuri', 'pollakiuri', 'nokturi', 'hematuri', 'genital_akinti', 'kabizlik', 'tas_oyku', 'catallanma', 'projeksiyon_azalma', 'kalibre_incelme', 'idrar_bas_zorluk', 'kesik_idrar_yapma', 'terminal_damlama', 'residiv_hissi', 'inkontinans']
-        v50_cols = ['tansiyon', 'ates', 'kvah', 'bobrek_sag', 'bobrek_sol', 'suprapubik_kitle', 'ego', 'rektal_tuse']
-        for c in v10_cols: muayene_map[c] = f"LEFT(s.{c}, 10)"
-        for c in v50_cols: muayene_map[c] = f"LEFT(s.{c}, 50)"
-        await sync_table(conn, "muayeneler", "sharded_clinical_muayeneler", muayene_map, schema="clinical")
-        
-        # 3. Operasyonlar -> clinical.sharded_clinical_operasyonlar
-        op_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", 
-            "ameliyat": "LEFT(s.ameliyat, 255)", "pre_op_tani": "LEFT(s.pre_op_tani, 255)", 
-            "post_op_tani": "LEFT(s.post_op_tani, 255)",
-            "ekip": "s.ekip", "hemsire": "LEFT(s.hemsire, 100)", 
-            "anestezi_ekip": "LEFT(s.anestezi_ekip, 100)",
-            "anestezi_tur": "LEFT(s.anestezi_tur, 50)", "notlar": "s.notlar", 
-            "patoloji": "s.patoloji", "post_op": "s.post_op", "video_url": "LEFT(s.video_url, 255)"
-        }
-        await sync_table(conn, "operasyonlar", "sharded_clinical_operasyonlar", op_map, schema="clinical")
-        
-        # 4. Tetkik Sonuçları -> clinical.sharded_clinical_tetkikler
-        tetkik_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", 
-            "kategori": "LEFT(s.kategori, 50)",
-            "tetkik_adi": "LEFT(s.tetkik_adi, 255)", 
-            "sonuc": "s.sonuc", 
-            "birim": "LEFT(s.birim, 50)",
-            "referans_araligi": "LEFT(s.referans_araligi, 100)", 
-            "sembol": "LEFT(s.sembol, 50)",
-            "dosya_yolu": "LEFT(s.dosya_yolu, 255)", 
-            "dosya_adi": "LEFT(s.dosya_adi, 255)"
-        }
-        await sync_table(conn, "tetkik_sonuclari", "sharded_clinical_tetkikler", tetkik_map, schema="clinical")
-        
-        # 5. Hasta Notları -> clinical.sharded_clinical_notlar
-        notlar_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih", "tip": "s.tip",
-            "icerik": "s.icerik", "sembol": "s.sembol", "etiketler": "s.etiketler"
-        }
-        await sync_table(conn, "hasta_notlari", "sharded_clinical_notlar", notlar_map, schema="clinical")
-        
-        # 6. Finance -> finance.sharded_finance_islemler
-        finance_map = {
-            "id": "s.id", "referans_kodu": "s.referans_kodu", "hasta_id": "s.hasta_id", 
-            "muayene_id": "s.muayene_id", "tarih": "s.tarih", "islem_tipi": "s.islem_tipi", 
-            "tutar": "s.tutar", "net_tutar": "s.net_tutar", "para_birimi": "s.para_birimi",
-            "durum": "s.durum", "aciklama": "s.aciklama", "doktor": "s.doktor"
-        }
-        await sync_table(conn, "finans_islemler", "sharded_finance_islemler", finance_map, schema="finance")
-
-        # 6b. Photos -> clinical.sharded_clinical_fotograflar
-        photo_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "dosya_yolu": "s.dosya_yolu", "kategori": "s.kategori", "notlar": "s.notlar"
-        }
-        await sync_table(conn, "fotograf_arsivi", "sharded_clinical_fotograflar", photo_map, schema="clinical")
-
-        # 7. Additional Clinical Tables
-        istirahat_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "baslangic_tarihi": "s.baslangic_tarihi", "bitis_tarihi": "s.bitis_tarihi",
-            "icd_kodu": "s.icd_kodu", "tani": "s.tani", "karar": "s.karar",
-            "kontrol_tarihi": "s.kontrol_tarihi"
-        }
-        await sync_table(conn, "istirahat_raporlari", "sharded_clinical_istirahat_raporlari", istirahat_map, schema="clinical")
-
-        durum_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "tani_bulgular": "s.tani_bulgular", "icd_kodu": "s.icd_kodu", "sonuc_kanaat": "s.sonuc_kanaat"
-        }
-        await sync_table(conn, "durum_bildirir_raporlari", "sharded_clinical_durum_bildirir_raporlari", durum_map, schema="clinical")
-
-        tibbi_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "islem_basligi": "s.islem_basligi", "islem_detayi": "s.islem_detayi", "sonuc_oneriler": "s.sonuc_oneriler"
-        }
-        await sync_table(conn, "tibbi_mudahale_raporlari", "sharded_clinical_tibbi_mudahale_raporlari", tibbi_map, schema="clinical")
-
-        trus_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "psa_total": "s.psa_total", "rektal_tuse": "s.rektal_tuse", 
-            "mri_var": "COALESCE(s.mri_var, false)", 
-            "mri_tarih": "s.mri_tarih", "mri_ozet": "s.mri_ozet",
-            "pirads_lezyon_boyut": "s.pirads_lezyon_boyut", 
-            "pirads_lezyon_lokasyon": "s.pirads_lezyon_lokasyon",
-            "lokasyonlar": "s.lokasyonlar", "prosedur_notu": "s.prosedur_notu"
-        }
-        await sync_table(conn, "trus_biyopsileri", "sharded_clinical_trus_biyopsileri", trus_map, schema="clinical")
-
-        telefon_map = {
-            "id": "s.id", "hasta_id": "s.hasta_id", "tarih": "s.tarih",
-            "notlar": "s.notlar", "doktor": "s.doktor"
-        }
-        await sync_table(conn, "telefon_gorusmeleri", "sharded_clinical_telefon_gorusmeleri", telefon_map, schema="clinical")
+        for source_table, target_table, mapping, schema in tables or SYNC_TABLES:
+            await sync_table(conn, source_table, target_table, mapping, schema=schema)
 
+    await engine.dispose()
     logger.info("🎉 Full Sharded Sync completed successfully.")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync legacy tables into sharded schemas")
+    parser.add_argument("--mode", choices=["full", "incremental"], default="full")
+    parser.add_argument("--dry-run", action="store_true", help="Incremental: only count pending inserts / updates / deletes")
+    parser.add_argument("--tables", type=lambda v: [t.strip() for t in v.split(",") if t.strip()],
+                        help="Comma separated legacy table names (default: all)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--overlap-seconds", type=int, default=OVERLAP_SECONDS)
+    parser.add_argument("--install-triggers", action="store_true", help="Install change log triggers on legacy tables")
+    args = parser.parse_args()
+
+    tables = [t for t in SYNC_TABLES if not args.tables or t[0] in args.tables]
+    unknown = set(args.tables or []) - {t[0] for t in SYNC_TABLES}
+    if unknown:
+        logger.error(f"❌ Unknown tables: {', '.join(sorted(unknown))}")
+        sys.exit(2)
+
+    async def run():
+        if args.install_triggers:
+            engine = create_async_engine(DATABASE_URL)
+            async with engine.begin() as conn:
+                await install_triggers(conn, [t[0] for t in tables])
+            await engine.dispose()
+            return
+        if args.mode == "incremental":
+            await incremental_sync(tables, args.batch_size, args.overlap_seconds, args.dry_run)
+        else:
+            await full_sync(tables)
+
+    asyncio.run(run())
+
+
 if __name__ == "__main__":
-    asyncio.run(full_sync())
+    main()
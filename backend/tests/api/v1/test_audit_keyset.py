@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import psycopg2
+
+import app.main  # noqa: F401  (tüm mapper'ların kaydı için)
+from app.api.v1.endpoints.audit import _export_line, _filtered, decode_cursor, encode_cursor
+from app.models.audit import AuditLog
+
+
+def test_cursor_roundtrip_preserves_timezone_and_id():
+    ts = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(ts, "A1B2C3")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ts, "A1B2C3")
+
+
+def test_invalid_cursor_is_400():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("bm90LWEtY3Vyc29y")
+    assert exc.value.status_code == 400
+
+
+def test_filters_only_add_given_conditions():
+    sql = str(_filtered(select(AuditLog.id), action="PATIENT_VIEW", resource_type="patient")
+              .compile(dialect=psycopg2.dialect(paramstyle="named")))
+    assert "audit_logs.action = :action_1" in sql
+    assert "audit_logs.resource_type = :resource_type_1" in sql
+    assert "user_id" not in sql and "created_at" not in sql
+
+
+def test_export_line_formats():
+    record = {
+        "id": "A1B2C3", "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "action": "PATIENT_VIEW",
+        "user_id": 1, "username": "dr", "resource_type": "patient", "resource_id": "x",
+        "ip_address": None, "user_agent": None, "details": {"ad": "Ayşe"},
+    }
+    assert '"Ayşe"' in _export_line(record, "ndjson")
+    line = _export_line(record, "csv")
+    assert line.startswith("A1B2C3,2026-01-01T00:00:00+00:00,PATIENT_VIEW,1,dr,patient,x,,,")
+    assert line.endswith("\r\n")
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+from app.api.v1.endpoints.appointments import _bounded_window
+from app.core.config import settings
+
+
+def test_bounded_window_defaults_when_missing():
+    start, end = _bounded_window(None, None)
+    assert end - start == timedelta(days=settings.CALENDAR_MAX_WINDOW_DAYS)
+    assert start < datetime.now(timezone.utc) < end
+
+
+def test_bounded_window_clamps_oversized_range():
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    end = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    s, e = _bounded_window(start, end)
+    assert s == start
+    assert e == start + timedelta(days=settings.CALENDAR_MAX_WINDOW_DAYS)
+
+
+def test_bounded_window_keeps_small_range():
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=7)
+    assert _bounded_window(start, end) == (start, end)
+
+
+def test_bounded_window_mixes_naive_and_aware_bounds():
+    start = datetime(2026, 1, 1)  # saat dilimsiz: UTC kabul edilir
+    end = datetime(2026, 1, 8, 3, tzinfo=timezone(timedelta(hours=3)))
+    s, e = _bounded_window(start, end)
+    assert (s, e) == (start.replace(tzinfo=timezone.utc), datetime(2026, 1, 8, tzinfo=timezone.utc))
+    assert s.tzinfo is timezone.utc and e.tzinfo is timezone.utc
+
+
+def test_parse_iso_returns_aware_utc():
+    from app.api.v1.endpoints.appointments import _parse_iso
+
+    assert _parse_iso("2026-01-01T10:00:00") == datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+    assert _parse_iso("2026-01-01T13:00:00+03:00") == datetime(2026, 1, 1, 10, tzinfo=timezone.utc)
+    assert _parse_iso("not-a-date") is None
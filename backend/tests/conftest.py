@@ -0,0 +1,10 @@
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _disable_ai_result_cache(monkeypatch):
+    # Servis testleri sağlayıcı mock'larının çağrıldığını doğrular; çalıştırmalar arası
+    # disk önbelleği bu çağrıları atlatmasın. Önbellek testleri kendisi açar.
+    monkeypatch.setattr(settings, "AI_RESULT_CACHE_ENABLED", False)
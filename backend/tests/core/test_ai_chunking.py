@@ -0,0 +1,108 @@
+import asyncio
+import io
+import math
+import wave
+from array import array
+
+import pytest
+
+from app.core.ai import chunking
+from app.core.ai.chunking import merge_overlap, plan_segments, stitch_transcripts, transcribe_chunked
+from app.core.ai.interfaces import VoiceProvider
+
+RATE = 16000
+
+
+def _consultation_wav(speech_blocks: int, speech_s: float = 20, pause_s: float = 2.0) -> bytes:
+    """Konuşma (ton) blokları ve aralarında sessizlikten oluşan sentetik kayıt."""
+    samples = array("h")
+    for _ in range(speech_blocks):
+        samples.extend(int(8000 * math.sin(2 * math.pi * 220 * i / RATE)) for i in range(int(speech_s * RATE)))
+        samples.extend([0] * int(pause_s * RATE))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+class StubWhisper(VoiceProvider):
+    """Yerel Whisper endpoint'i yerine: her parçaya sırası ve örtüşme kelimesiyle metin döner."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def transcribe(self, audio_bytes: bytes, mime_type: str, language: str = "tr-TR") -> str:
+        index = self.calls
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        # İlk parçalar en geç biter: birleştirme sırası tamamlanma sırasından bağımsız olmalı
+        await asyncio.sleep(0.05 / (index + 1))
+        self.in_flight -= 1
+        overlap = f"köprü{index - 1} kelime{index - 1} " if index else ""
+        return f"{overlap}parça{index} metin{index} köprü{index} kelime{index}"
+
+
+def test_plan_segments_cuts_in_silence():
+    # 30 ms kareler: 20 s konuşma (enerji 1000) + 2 s sessizlik (20), 4 kez
+    block = [1000] * 667 + [20] * 67
+    energies = block * 4
+    segments = plan_segments(energies, target_ms=30_000, max_ms=50_000, overlap_ms=900)
+
+    assert segments[0].start_ms == 0
+    for prev, seg in zip(segments, segments[1:]):
+        cut_frame = prev.end_ms // 30
+        assert energies[cut_frame] == 20
+        assert seg.start_ms == prev.end_ms - 900
+    assert segments[-1].end_ms == len(energies) * 30
+
+
+def test_plan_segments_forces_cut_without_silence():
+    segments = plan_segments([1000] * 5000, target_ms=30_000, max_ms=45_000, overlap_ms=0)
+    assert [s.end_ms - s.start_ms for s in segments][:3] == [45_000, 45_000, 45_000]
+
+
+def test_stitch_drops_overlapping_words():
+    parts = ["idrar yaparken yanma oluyor", "yanma oluyor ve sık idrara çıkıyor", "ve gece kalkıyor"]
+    assert stitch_transcripts(parts) == "idrar yaparken yanma oluyor ve sık idrara çıkıyor ve gece kalkıyor"
+    # Tek kısa kelime örtüşmesi kabul edilmez
+    assert merge_overlap(["bu"], ["bu", "sabah"]) == ["bu", "sabah"]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_chunked_streams_partials_in_order():
+    provider = StubWhisper()
+    partials = []
+    transcript = await transcribe_chunked(
+        provider,
+        _consultation_wav(speech_blocks=6),
+        "audio/wav",
+        target_seconds=30,
+        max_seconds=50,
+        overlap_ms=1000,
+        concurrency=3,
+        on_partial=lambda index, total, text: partials.append((index, total, text)),
+    )
+
+    total = provider.calls
+    assert total > 1 and provider.peak <= 3
+    assert [p[0] for p in partials] == list(range(total))
+    assert partials[1][2] == "parça1 metin1 köprü1 kelime1"
+    assert transcript.split().count("köprü0") == 1
+    assert transcript.startswith("parça0 metin0")
+
+
+@pytest.mark.asyncio
+async def test_transcribe_chunked_falls_back_when_undecodable(monkeypatch):
+    monkeypatch.setattr(chunking.shutil, "which", lambda name: None)
+    provider = StubWhisper()
+    result = await transcribe_chunked(
+        provider, b"not-audio" * 200, "audio/webm",
+        target_seconds=30, max_seconds=50, overlap_ms=1000, concurrency=2,
+    )
+    assert result is None and provider.calls == 0
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from app.core.ai import runtime as runtime_module
+from app.core.ai.runtime import CircuitBreaker, ProviderRuntime, ProviderUnavailableError
+from app.schemas.ai_scribe import AIScribeMode, AIScribeRequest, AIScribeTextRequest
+from app.services.ai_scribe_service import AIScribeService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_threshold_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("local_llm", failure_threshold=2, reset_seconds=30, clock=clock)
+
+    breaker.record_failure()
+    breaker.before_call()  # henüz kapalı
+    breaker.record_failure()
+    with pytest.raises(ProviderUnavailableError):
+        breaker.before_call()
+
+    clock.now += 31
+    breaker.before_call()  # tek deneme çağrısı
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.is_open
+
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_reopens_breaker_and_allows_single_probe(monkeypatch):
+    monkeypatch.setattr(runtime_module.settings, "AI_SCRIBE_BREAKER_RESET_SECONDS", 30)
+    clock = FakeClock()
+    runtime = ProviderRuntime()
+    breaker = runtime.breaker("local_llm")
+    breaker._clock = clock
+    breaker.record_failure(trip=True)
+    clock.now += 31
+
+    entered = asyncio.Event()
+
+    async def probe_call():
+        async with runtime.call("local_llm"):
+            entered.set()
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(probe_call())
+    await entered.wait()
+    assert breaker.state == "half_open"
+    with pytest.raises(ProviderUnavailableError):
+        async with runtime.call("local_llm"):
+            pytest.fail("deneme sürerken ikinci çağrı yapılmamalı")
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.state == "open" and breaker.opened_at == clock.now
+
+    # Süre dolunca yeni deneme; girdi hatası (ValueError) da başarı sayılmaz
+    clock.now += 31
+    with pytest.raises(ValueError):
+        async with runtime.call("local_llm"):
+            raise ValueError("bad input")
+    assert breaker.is_open
+
+    clock.now += 31
+    async with runtime.call("local_llm"):
+        pass
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_connect_error_trips_immediately():
+    runtime = ProviderRuntime()
+    with pytest.raises(httpx.ConnectError):
+        async with runtime.call("local_whisper"):
+            raise httpx.ConnectError("refused")
+
+    started = time.monotonic()
+    with pytest.raises(ProviderUnavailableError):
+        async with runtime.call("local_whisper"):
+            pytest.fail("açık devrede sağlayıcı çağrılmamalı")
+    assert time.monotonic() - started < 0.1
+
+    # Girdi hataları sağlayıcı sağlığını etkilemez
+    with pytest.raises(ValueError):
+        async with runtime.call("local_llm"):
+            raise ValueError("bad input")
+    assert runtime.breaker("local_llm").state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_health_is_cached_and_trips_breaker(monkeypatch):
+    monkeypatch.setattr(runtime_module.settings, "AI_SCRIBE_HEALTH_TTL", 60)
+    runtime = ProviderRuntime()
+    probe = AsyncMock(side_effect=lambda endpoint: "11434" in endpoint)
+    monkeypatch.setattr(runtime, "_probe", probe)
+
+    first = await runtime.health()
+    second = await runtime.health()
+
+    assert first == second == {"whisper": False, "ollama": True}
+    assert probe.await_count == 2  # servis başına bir yoklama, ikinci çağrı önbellekten
+    assert runtime.breaker("local_whisper").is_open
+
+
+def _service_with_fresh_runtime():
+    service = AIScribeService()
+    service.runtime = ProviderRuntime()
+    service.gemini_provider = AsyncMock()
+    service.gemini_provider.is_available = lambda: True
+    return service
+
+
+@pytest.mark.asyncio
+async def test_local_audio_falls_back_to_gemini_when_whisper_down(monkeypatch):
+    monkeypatch.setattr(runtime_module.settings, "AI_SCRIBE_FALLBACK_ENABLED", True)
+    service = _service_with_fresh_runtime()
+    service.runtime.breaker("local_whisper").record_failure(trip=True)
+    service.local_voice_provider = AsyncMock()
+    service.gemini_provider.analyze_audio.return_value = {"sikayet": "Dizüri"}
+
+    result = await service.analyze_consultation(b"x" * 2000, "audio/webm", AIScribeRequest(mode=AIScribeMode.LOCAL))
+
+    assert result.mode_used == AIScribeMode.GEMINI and result.sikayet == "Dizüri"
+    service.local_voice_provider.transcribe.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_local_text_falls_back_to_gemini_on_connect_error(monkeypatch):
+    monkeypatch.setattr(runtime_module.settings, "AI_SCRIBE_FALLBACK_ENABLED", True)
+    service = _service_with_fresh_runtime()
+    service.local_llm_provider = AsyncMock()
+    service.local_llm_provider.analyze_text.side_effect = httpx.ConnectError("refused")
+    service.gemini_provider.analyze_text.return_value = {"sikayet": "Pollakiüri"}
+
+    result = await service.analyze_text("Sık idrara çıkma şikayeti var.", AIScribeTextRequest(text="Sık idrara çıkma şikayeti var.", mode=AIScribeMode.LOCAL))
+
+    assert result.mode_used == AIScribeMode.GEMINI and result.sikayet == "Pollakiüri"
+    assert service.runtime.breaker("local_llm").is_open
@@ -0,0 +1,109 @@
+import logging
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.instrumentation import (
+    InstrumentationMiddleware, MetricsRegistry, install_query_hooks, metrics_access_status, normalize_sql, timed,
+)
+
+
+def test_normalize_sql_collapses_literals_params_and_in_lists():
+    a = normalize_sql("SELECT * FROM t WHERE id IN ($1::UUID, $2::UUID, $3::UUID) AND ad = 'Ali'  LIMIT 100")
+    b = normalize_sql("SELECT * FROM t WHERE id IN ($1::UUID) AND ad = 'O''Brien' LIMIT 5")
+    assert a == "SELECT * FROM t WHERE id IN (?...) AND ad = ? LIMIT ?"
+    assert b == "SELECT * FROM t WHERE id IN (?) AND ad = ? LIMIT ?"
+    assert normalize_sql("SELECT tani1 FROM m WHERE x = %(x_1)s") == "SELECT tani1 FROM m WHERE x = ?"
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("http_requests_total", method="GET", route="/a", status="200")
+    registry.observe("http_request_duration_seconds", 0.5, method="GET", route='/b"')
+    body = registry.render()
+    assert 'http_requests_total{method="GET",route="/a",status="200"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/b\\"",le="0.1"} 0' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/b\\"",le="1"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/b\\""} 1' in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+
+
+def test_metrics_require_token_in_production(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    monkeypatch.setattr(settings, "ENVIRONMENT", "development")
+    assert metrics_access_status(None) is None
+
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    assert metrics_access_status(None) == 404  # token tanımlanmadan açılmaz
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+    assert metrics_access_status(None) == 401
+    assert metrics_access_status("Bearer wrong") == 401
+    assert metrics_access_status("Bearer s3cret") is None
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert metrics_access_status("Bearer s3cret") == 404
+
+
+@pytest_asyncio.fixture
+async def instrumented_app(monkeypatch):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 0)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    install_query_hooks(engine)
+    install_query_hooks(engine)  # idempotent
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with engine.connect() as conn:
+            with timed("lookup"):
+                for i in range(4):
+                    await conn.execute(text(f"SELECT {i} + :x"), {"x": item_id})
+        return {"id": item_id}
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield b"data: hi\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.add_middleware(InstrumentationMiddleware, registry=registry)
+    yield app, registry
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_middleware_records_route_db_time_and_n_plus_one(instrumented_app, caplog):
+    app, registry = instrumented_app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        with caplog.at_level(logging.INFO, logger="app.core.instrumentation"):
+            plain = await client.get("/items/7")
+            profiled = await client.get("/items/8", headers={"X-Profile": "1"})
+            await client.get("/nope")
+            await client.get("/events")
+
+    assert "server-timing" not in plain.headers
+    assert profiled.headers["x-db-query-count"] == "4"
+    assert profiled.headers["server-timing"].startswith("app;dur=")
+    assert 'db;dur=' in profiled.headers["server-timing"] and "lookup;dur=" in profiled.headers["server-timing"]
+
+    body = registry.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in body
+    assert 'http_request_db_queries_total{method="GET",route="/items/{item_id}"} 8' in body
+    assert 'http_request_n_plus_one_total{method="GET",route="/items/{item_id}"} 2' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/events"}' not in body  # SSE histograma girmez
+
+    events = [r.getMessage() for r in caplog.records]
+    assert sum('"event": "n_plus_one"' in m for m in events) == 2
+    assert any('"event": "profile"' in m and '"path": "/items/8"' in m for m in events)
+    assert not any('"event": "slow_request"' in m and "/events" in m for m in events)
@@ -0,0 +1,44 @@
+from app.core.pii import PIIScrubber, name_tokens, pii_scrubber
+from app.services.audit_service import serialize_for_json
+
+
+def test_single_pass_masks_ids_phones_and_names():
+    text = "Hasta Ahmet Yılmaz, TC: 12345678901, Tel: 05321234567 şikayeti ile geldi."
+    scrubbed = pii_scrubber.scrub_text(text)
+
+    assert scrubbed == "[NAME_MASKED], TC: [ID_MASKED], Tel: [PHONE_MASKED] şikayeti ile geldi."
+
+
+def test_clinical_terms_and_stems_are_kept():
+    text = "Sol Böbrek alt polde taş. Benign Prostatik Hiperplazi, Akut Sistit öyküsü."
+    assert pii_scrubber.scrub_text(text) == text
+
+
+def test_name_next_to_clinical_term_is_still_masked():
+    # Beyaz listedeki kelime diziyi bölse de iki aday kelime isim sayılır
+    assert pii_scrubber.scrub_text("Prostat Mehmet Kaya kontrolü") == "Prostat [NAME_MASKED] kontrolü"
+
+
+def test_patient_name_dictionary_masks_single_words():
+    names = name_tokens("Ayşe Nur", "Demir")
+    text = "Ayşe hanım idrar yaparken yanma tarif ediyor. Demir eksikliği? Nur Demir kontrol."
+
+    scrubbed = pii_scrubber.scrub_text(text, names)
+
+    assert "Ayşe" not in scrubbed and "Nur Demir" not in scrubbed
+    assert scrubbed.startswith("[NAME_MASKED] hanım")
+    assert scrubbed.endswith("[NAME_MASKED] kontrol.")
+
+
+def test_whitelist_is_loaded_as_set():
+    scrubber = PIIScrubber(["İdrar", "MESANE"])
+    assert scrubber.clinical_terms == {"idrar", "mesane"}
+    assert scrubber.scrub_text("İdrar Mesanede") == "İdrar Mesanede"
+
+
+def test_nested_structures_and_audit_redaction_share_engine():
+    data = {"note": ["Ali Veli 5321234567 aradı"], "count": 3}
+    assert pii_scrubber.scrub(data) == {"note": ["[NAME_MASKED] [PHONE_MASKED] aradı"], "count": 3}
+
+    details = serialize_for_json({"cep_tel": "05321234567", "reason": "TC 12345678901 ile arandı", "Ad": "x"})
+    assert details == {"cep_tel": "[REDACTED]", "reason": "TC [ID_MASKED] ile arandı", "Ad": "[REDACTED]"}
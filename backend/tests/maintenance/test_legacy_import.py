@@ -0,0 +1,64 @@
+from maintenance.migrations import legacy_transforms as lt
+
+
+def _write_csv(tmp_path, lines):
+    path = tmp_path / "HASTA.CSV"
+    path.write_bytes("\r\n".join(lines).encode(lt.ENCODING))
+    return str(path)
+
+
+def test_open_csv_skips_preamble_and_streams_batches(tmp_path):
+    path = _write_csv(tmp_path, [
+        "DBISAM Export",
+        "Tablo: HASTA",
+        '"#","HastaRecID","Ad","Soyad","TCKimlik"',
+        *[f'"{i}","{i}","Ayşe","Yılmaz",""' for i in range(1, 8)],
+    ])
+
+    f, header, reader = lt.open_csv(path)
+    try:
+        batches = list(lt.iter_batches(reader, batch_size=3))
+    finally:
+        f.close()
+
+    assert header == ["#", "HastaRecID", "Ad", "Soyad", "TCKimlik"]
+    assert [(start, len(rows)) for start, rows in batches] == [(0, 3), (3, 3), (6, 1)]
+    assert batches[0][1][0][2] == "Ayşe"
+
+
+def test_iter_batches_resumes_from_checkpoint(tmp_path):
+    rows = [[str(i)] for i in range(10)]
+
+    batches = list(lt.iter_batches(iter(rows), batch_size=4, skip=6))
+
+    assert batches == [(6, [["6"], ["7"], ["8"], ["9"]])]
+
+
+def test_transform_batch_prepends_row_numbers_and_counts_skips():
+    header = ["HastaRecID", "Tarih", "Hemoglobin", "Lokosit", "Notlar"]
+    rows = [
+        ["12", "03/15/2019", "13.5", "7.2", ""],
+        ["", "03/15/2019", "14", "", ""],  # HastaRecID yok -> atlanır
+    ]
+
+    records, skipped = lt.transform_batch(lt.transform_kan, header, 40, rows)
+
+    assert skipped == 1
+    assert [r[0] for r in records] == [40, 40]
+    assert records[0][1:] == (3, 12, lt.parse_date("03/15/2019"), "Laboratuvar", "Hemoglobin (HGB)", "13.5 g/dL", "info")
+    columns = [name for name, _ in lt.STAGING_COLUMNS["tetkik"]]
+    assert all(len(r) == len(columns) for r in records)
+
+
+def test_patient_ids_are_deterministic_and_invalid_tc_dropped():
+    row = {"HastaRecID": "7", "Ad": " Ali ", "Soyad": "Veli", "TCKimlik": "123", "Cocuksay": "2"}
+
+    (record,) = lt.transform_hasta(row)
+
+    assert record[0] == 7
+    assert record[1] == lt.legacy_patient_uuid(7) == lt.transform_hasta(row)[0][1]
+    values = dict(zip(lt.HASTA_FIELDS, record[2:]))
+    assert values["tc_kimlik"] is None
+    assert values["ad"] == "Ali"
+    assert values["cocuk_sayisi"] == 2
+    assert len(record) + 1 == len(lt.STAGING_COLUMNS["hasta"])
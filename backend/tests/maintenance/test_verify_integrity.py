@@ -0,0 +1,36 @@
+from maintenance.verify_integrity import Bucketing, compare_hashes, diff_buckets, merkle_root, row_hash_expr
+
+
+def test_merkle_root_is_order_independent_and_sensitive_to_counts():
+    buckets = {0: (10, "a" * 32), 1: (7, "b" * 32)}
+
+    assert merkle_root(buckets) == merkle_root(dict(reversed(list(buckets.items()))))
+    assert merkle_root(buckets) != merkle_root({0: (10, "a" * 32), 1: (8, "b" * 32)})
+    assert merkle_root(buckets) != merkle_root({0: (10, "a" * 32)})
+
+
+def test_diff_buckets_reports_changed_and_one_sided_buckets():
+    legacy = {0: (3, "x"), 1: (3, "y"), 2: (1, "z")}
+    sharded = {0: (3, "x"), 1: (3, "changed"), 3: (1, "extra")}
+
+    assert diff_buckets(legacy, sharded) == [1, 2, 3]
+
+
+def test_compare_hashes_classifies_rows():
+    diffs = compare_hashes("clinical.muayeneler", {"1": "a", "2": "b", "3": "c"}, {"1": "a", "2": "B", "4": "d"})
+
+    assert diffs == [
+        "MISMATCH: clinical.muayeneler.2",
+        "MISSING: clinical.muayeneler.3",
+        "EXTRA: clinical.muayeneler.4",
+    ]
+
+
+def test_bucketing_uses_id_ranges_for_integer_keys():
+    ranged = Bucketing(integer_ids=True, size=500)
+    hashed = Bucketing(integer_ids=False, hash_buckets=64)
+
+    assert ranged.expr == "(id / 500)"
+    assert "id >= :bucket * 500" in ranged.bucket_filter()
+    assert hashed.bucket_filter() == "(abs(hashtext(id::text)) % 64) = :bucket"
+    assert row_hash_expr(["id", "ad"]) == 'md5(ROW("id", "ad")::text)'
@@ -51,49 +51,49 @@ async def test_detect_critical_change():
 @pytest.mark.asyncio
 async def test_get_lab_trends():
     service = LabAnalysisService()
-    
-    # Mock DB Session and Result
+
+    from types import SimpleNamespace
     from unittest.mock import AsyncMock, MagicMock
     mock_db = AsyncMock()
-    
-    # Mock data return from sharded_clinical_lab_results
-    # Assuming the query returns objects with attribute access or dict
-    # Let's assume the repository returns a list of dictionaries or objects
-    # For now, we'll mock the internal fetch method if we decide to separate Repos, 
-    # but here we might need to mock the db.execute result.
-    
-    # Let's mock a method `_fetch_lab_data` to isolate DB logic if possible, 
-    # or mock the db execution result directly.
-    
-    # Mock row objects
-    row1 = MagicMock()
-    row1.tetkik_adi = "PSA"
-    row1.sonuc = "4.0"
-    row1.birim = "ng/mL"
-    row1.tarih = datetime(2023, 1, 1)
-    row1.bayrak = None
-    
-    row2 = MagicMock()
-    row2.tetkik_adi = "PSA"
-    row2.sonuc = "5.0"
-    row2.birim = "ng/ml" # Test normalization
-    row2.tarih = datetime(2023, 4, 1)
-    row2.bayrak = None
 
-    # Mock execute result
+    def obs(test_code, tarih, value, unit, slope_per_day, flag=None):
+        # ShardedLabObservation satırı + regr_slope pencere kolonu (test_code başına)
+        return SimpleNamespace(test_code=test_code, tarih=tarih, value=value, unit=unit, flag=flag, slope_per_day=slope_per_day)
+
+    rows = [
+        obs("CREA", datetime(2023, 1, 1), 1.0, "mg/dL", 0.0),
+        obs("CREA", datetime(2023, 3, 1), 1.0, "mg/dL", 0.0),
+        obs("PSA_TOTAL", datetime(2023, 1, 1), 4.0, "ng/mL", 0.01),
+        obs("PSA_TOTAL", datetime(2023, 4, 1), 5.0, "ng/mL", 0.01, flag="H"),
+        # Kanonik birimi olmayan test: karışık birimli seri son birime çevrilir, eğim Python'da hesaplanır
+        obs("TESTO_TOTAL", datetime(2023, 1, 1), 500.0, "ng/dL", 3.0),
+        obs("TESTO_TOTAL", datetime(2023, 1, 31), 6.0, "ng/mL", 3.0),
+    ]
     mock_result = MagicMock()
-    mock_result.scalars.return_value.all.return_value = [row1, row2]
+    mock_result.all.return_value = rows
     mock_db.execute.return_value = mock_result
-    
-    request = LabTrendRequest(patient_id="123", test_names=["PSA"])
-    
+
+    request = LabTrendRequest(patient_id="123", test_names=["PSA", "Total Testosterone", "Kreatinin", "Üre"])
+
     response_list = await service.get_lab_trends(mock_db, request)
-    
-    assert len(response_list) == 1
-    psa_trend = response_list[0]
-    assert psa_trend.test_name == "PSA"
-    assert psa_trend.current_value == 5.0
-    assert psa_trend.is_critical == True # 4.0 -> 5.0 is > 20%
-    assert len(psa_trend.history) == 2
-    assert psa_trend.history[0].unit == "ng/mL"
-    assert psa_trend.history[1].unit == "ng/mL" # Should be normalized
+
+    import app.repositories.patient.models  # noqa: F401  (mapper yapılandırması için)
+    stmt = str(mock_db.execute.await_args.args[0])
+    assert "regr_slope" in stmt and "PARTITION BY" in stmt
+
+    # Yanıt sırası isteği izler; verisi olmayan test (Üre) atlanır
+    assert [t.test_name for t in response_list] == ["PSA (Total)", "Testosteron (Total)", "Kreatinin"]
+    psa, testo, crea = response_list
+
+    assert psa.current_value == 5.0 and psa.unit == "ng/mL"
+    assert psa.trend_slope == pytest.approx(0.3)  # SQL eğimi (gün başına) aylığa çevrilir
+    assert psa.is_critical == False
+    assert [h.value for h in psa.history] == [4.0, 5.0]
+    assert psa.history[-1].flag == "H"
+
+    assert [h.value for h in testo.history] == pytest.approx([5.0, 6.0])
+    assert all(h.unit == "ng/mL" for h in testo.history)
+    assert testo.current_value == 6.0
+    assert testo.trend_slope == pytest.approx(1.0)  # karışık birim: SQL eğimi yerine çevrilmiş seri
+
+    assert crea.trend_slope == 0.0 and len(crea.history) == 2
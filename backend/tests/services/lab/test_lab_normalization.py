@@ -0,0 +1,67 @@
+import uuid
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.lab_analysis import LabTrendRequest
+from app.services.lab_analysis_service import LabAnalysisService
+from app.services.lab_normalization import lab_test_code, observation_from_tetkik, reference_flag
+
+
+def test_observation_from_tetkik_normalizes_code_unit_and_date():
+    hasta_id = uuid.uuid4()
+    obs = observation_from_tetkik({
+        "id": 5, "hasta_id": hasta_id, "tarih": date(2024, 3, 1), "tetkik_adi": "Total PSA",
+        "sonuc": "4,8", "birim": "ug/l", "referans_araligi": "0-4", "sembol": None,
+    })
+    assert obs == {
+        "tetkik_id": 5, "hasta_id": hasta_id, "test_code": "PSA_TOTAL", "tarih": datetime(2024, 3, 1),
+        "value": 4.8, "unit": "ng/mL", "flag": "high",
+    }
+
+
+def test_observation_skips_non_numeric_results():
+    assert observation_from_tetkik({"id": 1, "tarih": date.today(), "tetkik_adi": "USG", "sonuc": "Normal"}) is None
+    assert observation_from_tetkik({"id": 1, "tarih": None, "tetkik_adi": "PSA", "sonuc": "1.0"}) is None
+
+
+def test_reference_flag_formats():
+    assert reference_flag(5.0, "< 4") == "high"
+    assert reference_flag(0.5, "1,0 - 3,5") == "low"
+    assert reference_flag(60.0, ">= 50") == "normal"
+    assert reference_flag(1.0, "bkz. not", sembol="H") == "H"
+    assert lab_test_code("tpsa") == lab_test_code("PSA") == "PSA_TOTAL"
+
+
+def test_slope_is_least_squares_over_all_points():
+    service = LabAnalysisService()
+    start = datetime(2024, 1, 1)
+    # Ara noktadaki sıçrama uç nokta farkını değiştirmez ama regresyon eğimini etkiler
+    data = [
+        {"value": 1.0, "date": start},
+        {"value": 4.0, "date": start + timedelta(days=30)},
+        {"value": 3.0, "date": start + timedelta(days=60)},
+    ]
+    assert service._calculate_slope(data) == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_get_lab_trends_reads_observations_with_sql_slope():
+    service = LabAnalysisService()
+    db = AsyncMock()
+    rows = [
+        MagicMock(test_code="PSA_TOTAL", tarih=datetime(2024, 1, 1), value=2.0, unit="ng/mL", flag="normal", slope_per_day=0.01),
+        MagicMock(test_code="PSA_TOTAL", tarih=datetime(2024, 4, 1), value=3.0, unit="ng/mL", flag="normal", slope_per_day=0.01),
+    ]
+    db.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=rows)))
+
+    trends = await service.get_lab_trends(db, LabTrendRequest(patient_id=str(uuid.uuid4()), test_names=["PSA", "Kreatinin"]))
+
+    assert len(trends) == 1
+    assert trends[0].test_name == "PSA (Total)"
+    assert trends[0].trend_slope == pytest.approx(0.3)
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "sharded_clinical_lab_observations" in sql
+    assert "regr_slope" in sql and "PARTITION BY" in sql
@@ -0,0 +1,139 @@
+import asyncio
+import io
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import UploadFile
+
+import app.main  # noqa: F401
+from app.models.ai_scribe_job import AIScribeJob
+from app.schemas.ai_scribe import AIScribeMode, AIScribeRequest, AIScribeResponse
+from app.services import ai_scribe_jobs as jobs_module
+from app.services.ai_scribe_jobs import AIScribeJobQueue, JobQueueFullError, spool_upload
+from app.core.ai.runtime import ProviderRuntime
+from app.services.ai_scribe_service import AIScribeService
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: AIScribeJob.__table__.create(c))
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs_module.settings, "AI_SCRIBE_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_spool_upload_rejects_oversized_file(spool_dir, monkeypatch):
+    monkeypatch.setattr(jobs_module.settings, "AI_SCRIBE_MAX_UPLOAD_MB", 1)
+    small = UploadFile(io.BytesIO(b"x" * 5000))
+    path, size = await spool_upload(small, "job-1", "audio/webm")
+    assert size == 5000 and path.endswith("job-1.webm")
+
+    big = UploadFile(io.BytesIO(b"x" * (1024 * 1024 + 1)))
+    with pytest.raises(ValueError):
+        await spool_upload(big, "job-2", "audio/webm")
+    assert not (spool_dir / "job-2.webm").exists()
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background_and_cleans_spool(session_factory, spool_dir):
+    service = AsyncMock()
+    service.analyze_consultation.return_value = AIScribeResponse(mode_used=AIScribeMode.LOCAL, sikayet="Dizüri")
+    queue = AIScribeJobQueue(session_factory=session_factory, service_factory=lambda: service)
+    await queue.start()
+    try:
+        audio = spool_dir / "j1.webm"
+        audio.write_bytes(b"a" * 2000)
+        job = await queue.submit(
+            job_id="j1", request=AIScribeRequest(mode=AIScribeMode.LOCAL),
+            mime_type="audio/webm", spool_path=str(audio), size_bytes=2000, user_id=7,
+        )
+        assert job["status"] == "queued"
+
+        # Test motoru tek bağlantılı (StaticPool): worker bitene kadar DB'yi okumadan bekle
+        await asyncio.wait_for(queue._queue.join(), timeout=5)
+        stored = await queue.get("j1")
+    finally:
+        await queue.stop()
+
+    assert stored.status == "done" and stored.result["sikayet"] == "Dizüri"
+    assert stored.spool_path is None and not audio.exists()
+    assert service.analyze_consultation.await_args.kwargs["audio_bytes"] == b"a" * 2000
+
+
+@pytest.mark.asyncio
+async def test_missing_spool_marks_job_failed(session_factory):
+    queue = AIScribeJobQueue(session_factory=session_factory, service_factory=AsyncMock)
+    queue._queue = asyncio.Queue(maxsize=1)
+    await queue.submit(
+        job_id="j2", request=AIScribeRequest(), mime_type="audio/webm",
+        spool_path="/nonexistent/j2.webm", size_bytes=2000,
+    )
+    with pytest.raises(JobQueueFullError):
+        await queue.submit(
+            job_id="j3", request=AIScribeRequest(), mime_type="audio/webm",
+            spool_path="/nonexistent/j3.webm", size_bytes=2000,
+        )
+
+    await queue.process("j2")
+    stored = await queue.get("j2")
+    assert stored.status == "failed" and "bulunamadı" in stored.error
+    # İkinci process çağrısı işi tekrar almaz (koşullu claim)
+    await queue.process("j2")
+    assert (await queue.get("j2")).attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_provider_slot_limits_concurrency(monkeypatch):
+    monkeypatch.setattr(jobs_module.settings, "AI_SCRIBE_CONCURRENCY_LOCAL_WHISPER", 1)
+    service = AIScribeService()
+    service.runtime = ProviderRuntime()
+    active, peak = 0, 0
+
+    async def call():
+        nonlocal active, peak
+        async with service.provider_slot("local_whisper"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(call() for _ in range(4)))
+    assert peak == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submit_reserves_slot_before_insert(session_factory):
+    queue = AIScribeJobQueue(session_factory=session_factory, service_factory=AsyncMock)
+    queue._queue = asyncio.Queue(maxsize=1)
+
+    results = await asyncio.gather(*(
+        queue.submit(
+            job_id=f"r{i}", request=AIScribeRequest(), mime_type="audio/webm",
+            spool_path=f"/nonexistent/r{i}.webm", size_bytes=2000,
+        ) for i in range(2)
+    ), return_exceptions=True)
+
+    assert sum(isinstance(r, JobQueueFullError) for r in results) == 1
+    accepted = next(r for r in results if isinstance(r, dict))
+    # Kabul edilen iş kuyrukta; reddedilen iş için DB satırı yazılmadı
+    assert queue._queue.qsize() == 1 and queue._reserved == 0
+    rejected = {"r0", "r1"} - {accepted["id"]}
+    assert await queue.get(rejected.pop()) is None
+
+
+@pytest.mark.asyncio
+async def test_wait_for_change_drops_event_after_timeout():
+    queue = AIScribeJobQueue(session_factory=AsyncMock, service_factory=AsyncMock)
+    await asyncio.gather(queue.wait_for_change("other-process", 0.01), queue.wait_for_change("other-process", 0.02))
+    assert queue._waiters == {} and queue._waiter_counts == {}
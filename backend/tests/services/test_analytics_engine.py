@@ -0,0 +1,120 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.services.analytics_engine import AnalyticsEngine, diagnosis_filter
+from app.services.analytics_export import Manifest
+
+pq = pytest.importorskip("pyarrow.parquet")
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("duckdb")
+
+
+def _write(out_dir, fullname, month, rows):
+    schema, table = fullname.split(".")
+    part_dir = out_dir / schema / table / f"month={month}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pylist(rows), part_dir / "part-0.parquet")
+
+
+def _replica(out_dir, tables):
+    manifest = Manifest.load(out_dir)
+    for fullname, months in tables.items():
+        for month, rows in months.items():
+            _write(out_dir, fullname, month, rows)
+        manifest.update_table(fullname, {"partitions": {m: len(r) for m, r in months.items()}})
+    manifest.save()
+
+
+@pytest.fixture
+def duckdb_engine(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYTICS_ENGINE", "duckdb")
+    monkeypatch.setattr(settings, "ANALYTICS_MAX_STALENESS_MINUTES", 60)
+
+
+def _exam(id, hasta_id, tarih, **extra):
+    row = {"id": id, "hasta_id": hasta_id, "tarih": tarih, "service_category": None}
+    row.update({"tani1": None, "tani1_kodu": None, "tani2": None, "tani2_kodu": None}, **extra)
+    return row
+
+
+def test_diagnosis_filter_escapes_like_wildcards():
+    conditions, params = diagnosis_filter("n40", "100%_x", alias="d")
+    assert conditions == ["d.icd_code LIKE ? ESCAPE '\\'", "d.text ILIKE ? ESCAPE '\\'"]
+    assert params == ["N40%", "%100\\%\\_x%"]
+    assert diagnosis_filter(None, "  ") == ([], [])
+
+
+def test_enabled_requires_setting_and_fresh_replica(tmp_path, monkeypatch, duckdb_engine):
+    engine = AnalyticsEngine(tmp_path)
+    assert not engine.enabled  # replika yok
+
+    _replica(tmp_path, {})
+    assert engine.enabled
+
+    manifest = Manifest.load(tmp_path)
+    manifest.data["updated_at"] = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    manifest.path.write_text(json.dumps(manifest.data), encoding="utf-8")
+    assert not engine.enabled  # ANALYTICS_MAX_STALENESS_MINUTES aşıldı
+
+    monkeypatch.setattr(settings, "ANALYTICS_ENGINE", "postgres")
+    _replica(tmp_path, {})
+    assert not engine.enabled
+
+
+@pytest.mark.asyncio
+async def test_cohort_counts_and_rebind_on_new_export(tmp_path, duckdb_engine):
+    _replica(tmp_path, {
+        "clinical.sharded_clinical_muayeneler": {
+            "2024-01": [_exam(1, "a", datetime(2024, 1, 3)), _exam(2, "b", datetime(2024, 1, 20))],
+            "2024-03": [_exam(3, "a", datetime(2024, 3, 9)), _exam(4, "c", datetime(2024, 3, 1))],
+        },
+        "clinical.sharded_clinical_notlar": {
+            "2024-02": [{"id": 1, "hasta_id": "b", "tarih": datetime(2024, 2, 14)}],
+        },
+    })
+    engine = AnalyticsEngine(tmp_path, threads=1)
+
+    counts = await engine.cohort_counts(date(2024, 1, 1), date(2024, 3, 1), date(2024, 3, 31))
+    assert counts == {("2024-01", 0): 2, ("2024-01", 1): 1, ("2024-01", 2): 1, ("2024-03", 0): 1}
+
+    # Yeni dışa aktarım: manifest değişince view'lar yeniden bağlanır
+    _write(tmp_path, "clinical.sharded_clinical_muayeneler", "2024-04", [_exam(5, "c", datetime(2024, 4, 2))])
+    manifest = Manifest.load(tmp_path)
+    manifest.data["tables"]["clinical.sharded_clinical_muayeneler"]["partitions"]["2024-04"] = 1
+    manifest.save()
+    os.utime(manifest.path, (0, datetime.now().timestamp() + 5))
+
+    counts = await engine.cohort_counts(date(2024, 3, 1), date(2024, 3, 1), date(2024, 4, 30))
+    assert counts == {("2024-03", 0): 1, ("2024-03", 1): 1}
+
+
+@pytest.mark.asyncio
+async def test_diagnosis_aggregates_and_service_counts(tmp_path, duckdb_engine):
+    _replica(tmp_path, {
+        "clinical.sharded_clinical_muayeneler": {
+            "2024-05": [
+                _exam(1, "a", datetime(2024, 5, 2), service_category="androloji"),
+                _exam(2, "b", datetime(2024, 5, 3), tani1="BPH", tani1_kodu="N40"),
+                _exam(3, "a", datetime(2024, 5, 31, 15)),  # bitiş günü 00:00'dan sonra: PostgreSQL gibi dışarıda
+            ],
+        },
+        "clinical.sharded_clinical_exam_diagnoses": {
+            "2024-05": [
+                {"exam_id": 2, "hasta_id": "b", "tarih": datetime(2024, 5, 3), "icd_code": "N40.0", "text": "BPH"},
+                {"exam_id": 1, "hasta_id": "a", "tarih": datetime(2024, 5, 2), "icd_code": "N52", "text": "ED"},
+            ],
+        },
+        "patient.sharded_patient_demographics": {"none": [{"id": "a"}, {"id": "b"}, {"id": "c"}]},
+    })
+    engine = AnalyticsEngine(tmp_path, threads=1)
+
+    total, portfolio, per_year = await engine.diagnosis_aggregates("N40", None, date(2024, 5, 1), date(2024, 5, 31), 2022, 2024)
+    assert (total, portfolio, per_year) == (1, 3, {2024: 1})
+
+    classified, unclassified = await engine.service_counts(date(2024, 5, 1), date(2024, 5, 31))
+    assert sorted(classified, key=str) == [("androloji", 1), (None, 1)]
+    assert unclassified == [("BPH", "N40", None, None, 1)]
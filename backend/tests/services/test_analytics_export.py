@@ -0,0 +1,167 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.repositories.clinical.models import ShardedMuayene, ShardedOperasyon
+from app.repositories.finance.models import ShardedFinansIslemSatir
+from app.repositories.patient.models import ShardedPatientDemographics
+from app.services.analytics_export import (
+    AnalyticsExporter, Manifest, column_plan, export_tables, month_range, partition_key, pseudonym,
+)
+
+MUAYENE = ShardedMuayene.__table__
+
+
+def _row(table, **values):
+    return tuple(values.get(c.name) for c in table.columns)
+
+
+class _StreamResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def partitions(self, size):
+        for i in range(0, len(self._rows), size):
+            yield self._rows[i:i + size]
+
+    async def close(self):
+        pass
+
+
+class _Session:
+    """execute: sırayla verilen scalar / scalars sonuçları; stream: verilen satırlar."""
+
+    def __init__(self, execute_results, rows):
+        self._execute_results = list(execute_results)
+        self._rows = rows
+        self.streamed = []
+
+    async def execute(self, stmt):
+        value = self._execute_results.pop(0)
+        result = MagicMock()
+        result.scalar.return_value = value
+        result.scalars.return_value.all.return_value = value
+        result.all.return_value = value
+        return result
+
+    async def stream(self, stmt):
+        self.streamed.append(stmt)
+        return _StreamResult(self._rows)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_demographics_plan_drops_identifiers_and_generalizes_birth_date():
+    plan = {name for _, name, _ in column_plan(ShardedPatientDemographics.__table__, b"k")}
+    assert {"ad", "soyad", "tc_kimlik", "cep_tel", "adres", "email", "protokol_no", "dogum_tarihi"}.isdisjoint(plan)
+    assert {"id", "cinsiyet", "dogum_yili", "reference_category"} <= plan
+
+
+def test_free_text_string_columns_are_scrubbed_or_dropped():
+    def plan(table):
+        return {name: convert for _, name, convert in column_plan(table, b"k")}
+
+    demographics = plan(ShardedPatientDemographics.__table__)
+    assert {"dogum_yeri", "referans"}.isdisjoint(demographics)
+    assert demographics["cinsiyet"] is None
+
+    operasyon = plan(ShardedOperasyon.__table__)
+    assert {"hemsire", "anestezi_ekip"}.isdisjoint(operasyon)
+    assert operasyon["ameliyat"] is not None and operasyon["anestezi_tur"] is None
+
+    satir = plan(ShardedFinansIslemSatir.__table__)
+    assert satir["aciklama"]("Ahmet Yılmaz ödedi, tel 05321112233") == "[NAME_MASKED] ödedi, tel [PHONE_MASKED]"
+    raw = {name: convert for _, name, convert in column_plan(ShardedFinansIslemSatir.__table__, b"k", scrub_text=False)}
+    assert raw["aciklama"] is None
+
+
+def test_pseudonym_is_stable_and_keyed():
+    hasta_id = uuid4()
+    assert pseudonym(hasta_id, b"a") == pseudonym(hasta_id, b"a")
+    assert pseudonym(hasta_id, b"a") != pseudonym(hasta_id, b"b")
+    assert str(hasta_id).replace("-", "") not in pseudonym(hasta_id, b"a")
+
+
+def test_partition_helpers():
+    assert partition_key(datetime(2024, 3, 9, 10)) == "2024-03"
+    assert partition_key(None) == "none"
+    assert month_range("2024-12") == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+
+def test_revision_table_is_not_exported():
+    names = {t.fullname for t in export_tables()}
+    assert "clinical.sharded_clinical_muayeneler" in names
+    assert "patient.sharded_patient_revisions" not in names
+    assert all(name.split(".")[0] in ("patient", "clinical", "finance") for name in names)
+
+
+@pytest.mark.asyncio
+async def test_full_then_incremental_export(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    hasta_id = uuid4()
+    rows = [
+        _row(MUAYENE, id=1, hasta_id=hasta_id, tarih=datetime(2024, 1, 5), sikayet="Ahmet Yılmaz idrar yaparken yanma", is_deleted=False),
+        _row(MUAYENE, id=2, hasta_id=hasta_id, tarih=datetime(2024, 1, 20), sikayet="Kontrol", is_deleted=False),
+        _row(MUAYENE, id=3, hasta_id=hasta_id, tarih=datetime(2024, 2, 2), sikayet=None, is_deleted=False),
+    ]
+    watermark = datetime(2024, 2, 2, 12, tzinfo=timezone.utc)
+    session = _Session([watermark], rows)
+    exporter = AnalyticsExporter(tmp_path, session_factory=lambda: session, batch_size=2)
+
+    results = await exporter.run(["sharded_clinical_muayeneler"])
+
+    stats = results["clinical.sharded_clinical_muayeneler"]
+    assert stats == {"mode": "full", "partitions": ["2024-01", "2024-02"], "rows": 3}
+    table_dir = tmp_path / "clinical" / "sharded_clinical_muayeneler"
+    january = pq.read_table(table_dir / "month=2024-01" / "part-0.parquet").to_pylist()
+    assert [r["id"] for r in january] == [1, 2]
+    assert january[0]["hasta_id"] == pseudonym(hasta_id, exporter.key)
+    assert "Ahmet" not in january[0]["sikayet"] and "yanma" in january[0]["sikayet"]
+
+    entry = Manifest.load(tmp_path).table("clinical.sharded_clinical_muayeneler")
+    assert entry["partitions"] == {"2024-01": 2, "2024-02": 1}
+    assert entry["watermark"] == watermark.isoformat()
+
+    # Artımlı: yalnız şubat değişti (id=3 silindi) -> ocak dosyası ve manifest kaydı korunur
+    session = _Session([watermark, [(3, datetime(2024, 2, 1))]], [])
+    exporter.session_factory = lambda: session
+    results = await exporter.run(["sharded_clinical_muayeneler"])
+
+    assert results["clinical.sharded_clinical_muayeneler"] == {"mode": "incremental", "partitions": ["2024-02"], "rows": 0}
+    assert not (table_dir / "month=2024-02").exists()
+    assert (table_dir / "month=2024-01" / "part-0.parquet").exists()
+    assert Manifest.load(tmp_path).table("clinical.sharded_clinical_muayeneler")["partitions"] == {"2024-01": 2}
+    assert "2024-02-01" in str(session.streamed[0].compile(compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_incremental_export_rewrites_month_a_row_moved_out_of(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = [
+        _row(MUAYENE, id=1, tarih=datetime(2024, 1, 5), is_deleted=False),
+        _row(MUAYENE, id=2, tarih=datetime(2024, 1, 20), is_deleted=False),
+        _row(MUAYENE, id=3, tarih=datetime(2024, 2, 2), is_deleted=False),
+        _row(MUAYENE, id=4, tarih=datetime(2024, 3, 2), is_deleted=False),
+    ]
+    watermark = datetime(2024, 3, 2, 12, tzinfo=timezone.utc)
+    exporter = AnalyticsExporter(tmp_path, session_factory=lambda: _Session([watermark], rows))
+    await exporter.run(["sharded_clinical_muayeneler"])
+
+    # id=2'nin tarihi ocaktan şubata taşındı: şubat (yeni ay) ve ocak (eski kopya) yeniden yazılır, mart dokunulmaz
+    moved = [rows[0], _row(MUAYENE, id=2, tarih=datetime(2024, 2, 10), is_deleted=False), rows[2]]
+    session = _Session([watermark, [(2, datetime(2024, 2, 1))]], moved)
+    exporter.session_factory = lambda: session
+    results = await exporter.run(["sharded_clinical_muayeneler"])
+
+    assert results["clinical.sharded_clinical_muayeneler"] == {"mode": "incremental", "partitions": ["2024-01", "2024-02"], "rows": 3}
+    table_dir = tmp_path / "clinical" / "sharded_clinical_muayeneler"
+    read = lambda month: [r["id"] for r in pq.read_table(table_dir / f"month={month}" / "part-0.parquet").to_pylist()]
+    assert (read("2024-01"), read("2024-02"), read("2024-03")) == ([1], [2, 3], [4])
+    entry = Manifest.load(tmp_path).table("clinical.sharded_clinical_muayeneler")
+    assert entry["partitions"] == {"2024-01": 1, "2024-02": 2, "2024-03": 1}
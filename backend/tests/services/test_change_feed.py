@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import change_feed as feed_module
+from app.services.change_feed import ChangeFeed, Subscriber, _coalesce, format_sse, stage_change
+
+
+def test_coalesce_keeps_last_state_per_record():
+    events = [
+        {"topic": "appointment", "action": "created", "data": {"id": 1, "status": "scheduled"}},
+        {"topic": "appointment", "action": "updated", "data": {"id": 1, "status": "confirmed"}},
+        {"topic": "appointment", "action": "updated", "data": {"id": 2, "status": "cancelled"}},
+        {"topic": "finance", "action": "deleted", "data": {"hasta_id": "x"}},
+    ]
+    merged = _coalesce(events)
+    assert merged[0] == {"topic": "appointment", "action": "created", "data": {"id": 1, "status": "confirmed"}}
+    assert merged[1]["data"]["id"] == 2
+    assert merged[2]["topic"] == "finance"
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_reset(monkeypatch):
+    monkeypatch.setattr(feed_module.settings, "CHANGE_FEED_QUEUE_SIZE", 2)
+    sub = Subscriber({"appointment"})
+    for i in range(3):
+        sub.offer({"seq": i, "topic": "appointment", "action": "updated", "data": {"id": i}})
+    sub.offer({"seq": 9, "topic": "patient", "action": "updated", "data": {"id": 9}})  # filtrelenir
+
+    assert sub.overflowed
+    assert sub.queue.qsize() == 1
+    assert sub.queue.get_nowait()["topic"] == "reset"
+
+
+@pytest.mark.asyncio
+async def test_publish_after_commit_delivers_locally_and_replays():
+    feed = ChangeFeed()
+    sub = feed.subscribe()
+    session = SimpleNamespace(info={})
+    stage_change(session, "finance", "deleted", {"id": 5})
+
+    original = feed_module.change_feed
+    feed_module.change_feed = feed
+    try:
+        feed_module._publish_after_commit(session)
+        await asyncio.gather(*feed._tasks)
+    finally:
+        feed_module.change_feed = original
+
+    ev = sub.queue.get_nowait()
+    seq = feed_module.LOCAL_SEQ_BASE + 1  # Redis'siz yayın ayrı aralıktan numaralanır
+    assert (ev["seq"], ev["topic"], ev["data"]) == (seq, "finance", {"id": 5})
+    assert "origin" not in format_sse(ev) and format_sse(ev).startswith(f"id: {seq}\nevent: finance\n")
+    assert feed.replay_since(feed_module.LOCAL_SEQ_BASE) == [ev]
+    assert feed.replay_since(seq) == []
+    assert feed.replay_since(0) is None  # Redis aralığından gelen istemci tam yenileme yapar
+
+
+def test_replay_since_reports_gap():
+    feed = ChangeFeed()
+    feed._history.extend({"seq": s, "topic": "patient"} for s in (10, 11))
+    assert feed.replay_since(5) is None
+    assert [e["seq"] for e in feed.replay_since(10)] == [11]
+    assert feed.replay_since(None) == []
+
+
+def test_seq_source_switch_resets_history():
+    feed = ChangeFeed()
+    for seq in (41, 42):
+        feed._dispatch({"seq": seq, "topic": "appointment", "data": {"id": seq}})
+    local = feed_module.LOCAL_SEQ_BASE + 1
+    feed._dispatch({"seq": local, "topic": "appointment", "data": {"id": 1}})
+
+    assert [e["seq"] for e in feed._history] == [local]
+    assert feed.replay_since(42) is None
+    assert feed.replay_since(local) == []
+    assert feed.replay_since(local + 5) is None  # geçmişin önünde: bilinmeyen numara
+
+
+def test_patient_and_finance_events_carry_only_ids():
+    from app.repositories.finance.models import ShardedFinansIslem
+    from app.repositories.patient.models import ShardedPatientDemographics
+
+    feed_module._register_tracked_models()
+    assert feed_module._TRACKED[ShardedPatientDemographics] == ("patient", ("id", "is_deleted"))
+    assert feed_module._TRACKED[ShardedFinansIslem] == ("finance", ("id", "hasta_id", "is_deleted"))
+
+    session = SimpleNamespace(info={})
+    stage_change(session, "finance", "updated", {"id": 3, "durum": "iptal", "net_tutar": 100})
+    stage_change(session, "appointment", "updated", {"id": 4, "status": "cancelled"})
+    staged = session.info[feed_module.PENDING_KEY]
+    assert staged[0]["data"] == {"id": 3}
+    assert staged[1]["data"] == {"id": 4, "status": "cancelled"}
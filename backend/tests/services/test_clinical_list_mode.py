@@ -0,0 +1,40 @@
+import uuid
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+import app.main  # noqa: F401
+from app.repositories.clinical.models import ShardedMuayene, ShardedOperasyon
+from app.repositories.clinical.repository import (
+    MUAYENE_LIST_COLUMNS, OPERASYON_LIST_COLUMNS, _list_mode,
+)
+from app.schemas.clinical_schemas import MuayeneListItem, OperasyonListItem
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_summary_mode_skips_large_text_columns():
+    full = _sql(_list_mode(select(ShardedMuayene), MUAYENE_LIST_COLUMNS, summary=False))
+    slim = _sql(_list_mode(select(ShardedMuayene), MUAYENE_LIST_COLUMNS, summary=True))
+
+    assert "oyku" in full and "recete" in full
+    assert "oyku" not in slim and "recete" not in slim and "fizik_muayene" not in slim
+    assert "tani1_kodu" in slim and "sikayet" in slim
+
+    ops = _sql(_list_mode(select(ShardedOperasyon), OPERASYON_LIST_COLUMNS, summary=True))
+    assert "ameliyat" in ops and "notlar" not in ops
+
+
+def test_list_items_validate_from_dicts():
+    hasta_id = uuid.uuid4()
+    item = MuayeneListItem.model_validate({
+        "id": 1, "hasta_id": hasta_id, "tarih": date(2024, 5, 1), "sikayet": "ağrı", "is_promoted": True,
+    })
+    assert item.hasta_id == hasta_id and item.is_promoted
+    assert "oyku" not in MuayeneListItem.model_fields
+
+    op = OperasyonListItem.model_validate({"id": 2, "hasta_id": hasta_id, "ameliyat": "TURP"})
+    assert op.tarih is None and op.ameliyat == "TURP"
@@ -0,0 +1,81 @@
+import uuid
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.repositories.patient.search import build_advanced_search_query
+from app.repositories.clinical.diagnoses import diagnosis_rows, normalize_icd_code, patients_with_diagnosis
+from app.repositories.clinical.models import ShardedMuayene
+from app.repositories.clinical.repository import ClinicalRepository
+from app.repositories.report_repository import ReportRepository
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _exam(**kwargs):
+    return ShardedMuayene(id=9, hasta_id=uuid.uuid4(), tarih=datetime(2024, 3, 1), **kwargs)
+
+
+def test_diagnosis_rows_skip_empty_positions():
+    exam = _exam(tani1="BPH", tani1_kodu=" n40.0", tani3_kodu="N20", tani2="  ")
+    rows = diagnosis_rows(exam)
+    assert [(r["position"], r["icd_code"], r["text"]) for r in rows] == [(1, "N40.0", "BPH"), (3, "N20", None)]
+    assert all(r["exam_id"] == 9 and r["hasta_id"] == exam.hasta_id for r in rows)
+    assert normalize_icd_code("n40.*") == "N40"
+
+
+def test_patients_with_diagnosis_uses_prefix_match():
+    sql = _sql(patients_with_diagnosis("N40.*", start_date=date(2022, 1, 1)))
+    assert "icd_code LIKE 'N40%%'" in sql  # literal_binds % işaretini kaçırır
+    assert "sharded_clinical_exam_diagnoses.tarih >= '2022-01-01'" in sql
+    assert "muayeneler" not in sql
+
+
+def test_advanced_search_reads_diagnosis_table():
+    stmt = build_advanced_search_query(
+        tani="bph", yas_min=None, yas_max=None,
+        muayene_tarihi_baslangic=None, muayene_tarihi_bitis=None,
+        son_islem_tarihi_baslangic=None, son_islem_tarihi_bitis=None,
+        ilk_kayit_tarihi_baslangic=None, ilk_kayit_tarihi_bitis=None,
+        operasyon_tarihi_baslangic=None, operasyon_tarihi_bitis=None,
+        operasyon_adi=None, sikayet=None, bulgu=None,
+    )
+    sql = _sql(stmt)
+    assert "sharded_clinical_exam_diagnoses" in sql
+    assert "tani1" not in sql and "tani5_kodu" not in sql
+
+
+@pytest.mark.asyncio
+async def test_create_examination_writes_diagnoses_in_same_transaction():
+    session = AsyncMock()
+    session.add = MagicMock()
+    repo = ClinicalRepository(session)
+
+    await repo.create_examination({"hasta_id": uuid.uuid4(), "tarih": date(2024, 3, 1), "tani1": "BPH", "tani1_kodu": "N40"})
+
+    stmt, rows = session.execute.await_args.args
+    assert stmt.table.name == "sharded_clinical_exam_diagnoses"
+    assert rows[0]["icd_code"] == "N40" and rows[0]["position"] == 1
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_diagnosis_stats_trend_is_one_grouped_query():
+    db = AsyncMock()
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(scalar=MagicMock(return_value=2)),   # count
+        MagicMock(all=MagicMock(return_value=[])),      # ilk 100
+        MagicMock(scalar=MagicMock(return_value=10)),   # portföy
+        MagicMock(all=MagicMock(return_value=[(date.today().year, 2)])),  # yıllık trend
+    ])
+
+    stats = await ReportRepository.get_diagnosis_stats(db, icd_code="N40")
+
+    assert db.execute.await_count == 4
+    assert stats.total_count == 2 and stats.percentage_of_portfolio == 20.0
+    assert [p.count for p in stats.trend] == [0, 0, 2]
+    assert "GROUP BY EXTRACT(year FROM clinical.sharded_clinical_exam_diagnoses.tarih)" in _sql(db.execute.await_args.args[0])
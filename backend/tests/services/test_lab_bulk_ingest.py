@@ -0,0 +1,126 @@
+import uuid
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import app.main  # noqa: F401
+from app.core.user_context import UserContext
+from app.repositories.clinical.models import ShardedTetkikSonuc
+from app.repositories.clinical.repository import ClinicalRepository
+from app.schemas.clinical_schemas import TetkikSonucCreate
+from app.services.pdf_lab_parser_service import PDFLabParserResponse, PDFLabParserService, PDFLabResult
+
+
+def _panel(hasta_id, n):
+    return [TetkikSonucCreate(hasta_id=hasta_id, tarih=date(2024, 5, 1), tetkik_adi=f"T{i}", sonuc=str(i)) for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_uses_single_insert_and_single_commit():
+    session = AsyncMock()
+    result = MagicMock()
+    result.all.return_value = ["row"] * 25
+    session.scalars = AsyncMock(return_value=result)
+    repo = ClinicalRepository(session, UserContext(user_id=7, username="lab"))
+
+    created = await repo.bulk_create_tetkik_sonuclari(_panel(uuid.uuid4(), 25))
+
+    assert len(created) == 25
+    session.scalars.assert_awaited_once()
+    stmt, rows = session.scalars.await_args.args
+    assert len(rows) == 25
+    assert rows[0]["tarih"] == datetime(2024, 5, 1)  # date -> timestamp kolonu
+    assert rows[0]["created_by"] == 7 and rows[0]["is_deleted"] is False
+    session.commit.assert_awaited_once()
+    session.flush.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_switches_to_copy_for_large_batches():
+    hasta_id = uuid.uuid4()
+    session = AsyncMock()
+    ids = MagicMock()
+    ids.scalars.return_value.all.return_value = [101, 102, 103]
+    session.execute = AsyncMock(return_value=ids)
+    driver = MagicMock()
+    driver.copy_records_to_table = AsyncMock()
+    raw = MagicMock(driver_connection=driver)
+    conn = MagicMock()
+    conn.get_raw_connection = AsyncMock(return_value=raw)
+    session.connection = AsyncMock(return_value=conn)
+    repo = ClinicalRepository(session)
+
+    with patch("app.repositories.clinical.repository.settings.LAB_BULK_COPY_THRESHOLD", 3):
+        created = await repo.bulk_create_tetkik_sonuclari(_panel(hasta_id, 3))
+
+    assert [c.id for c in created] == [101, 102, 103]
+    assert all(isinstance(c, ShardedTetkikSonuc) and c.hasta_id == hasta_id for c in created)
+    kwargs = driver.copy_records_to_table.await_args.kwargs
+    assert kwargs["schema_name"] == "clinical" and kwargs["columns"][0] == "id"
+    assert kwargs["records"][0][0] == 101
+    session.scalars.assert_not_called()
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_is_one_update():
+    session = AsyncMock()
+    session.execute = AsyncMock(return_value=MagicMock(rowcount=3))
+    repo = ClinicalRepository(session)
+
+    assert await repo.bulk_delete_tetkik_sonuclari([1, 2, 3]) == 3
+    assert await repo.bulk_delete_tetkik_sonuclari([]) == 0
+    # soft delete + aynı transaction'da gözlem satırlarının silinmesi
+    assert session.execute.await_count == 2
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_patient_clinical_delete_removes_lab_observations():
+    session = AsyncMock()
+    repo = ClinicalRepository(session)
+    hasta_id = uuid.uuid4()
+
+    assert await repo.delete_patient_clinical_data(hasta_id) is True
+
+    deletes = [str(c.args[0]) for c in session.execute.await_args_list if str(c.args[0]).startswith("DELETE")]
+    assert any("sharded_clinical_lab_observations" in sql and "hasta_id" in sql for sql in deletes)
+    session.commit.assert_awaited_once()
+
+
+def test_parsed_pdf_panel_maps_to_tetkik_rows():
+    hasta_id = uuid.uuid4()
+    parsed = PDFLabParserResponse(
+        success=True, message="", report_date="2024-02-31",  # geçersiz tarih -> bugün
+        results=[PDFLabResult(test_name="PSA", value="1.2", unit="ng/mL", reference="0-4")],
+    )
+    rows = PDFLabParserService.to_tetkik_sonuclari(parsed, hasta_id)
+    assert rows[0].tetkik_adi == "PSA" and rows[0].birim == "ng/mL" and rows[0].referans_araligi == "0-4"
+    assert rows[0].tarih == date.today() and rows[0].kategori == "Laboratuvar"
+
+
+@pytest.mark.asyncio
+async def test_urine_endpoint_writes_panel_in_one_bulk_call():
+    from httpx import ASGITransport, AsyncClient
+    from app.api import deps
+
+    hasta_id = uuid.uuid4()
+    app.main.app.dependency_overrides[deps.get_db] = lambda: AsyncMock()
+    try:
+        with patch.object(ClinicalRepository, "bulk_create_tetkik_sonuclari", AsyncMock(return_value=[])) as bulk:
+            async with AsyncClient(transport=ASGITransport(app=app.main.app), base_url="http://test") as client:
+                response = await client.post("/api/v1/lab/urine", json={
+                    "hasta_id": str(hasta_id), "tarih": "2024-05-01",
+                    "ph": "6", "mik_lokosit": "10", "kultur": "ureme_yok", "protein": "",
+                })
+    finally:
+        app.main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200 and response.json() is True
+    bulk.assert_awaited_once()
+    rows = bulk.await_args.args[0]
+    assert [(r.tetkik_adi, r.sonuc) for r in rows] == [
+        ("İdrar - pH", "6"), ("İdrar Mik. - Lökosit", "10 /HPF"), ("İdrar Kültürü", "Üreme Yok"),
+    ]
+    assert all(r.hasta_id == hasta_id and r.kategori == "Laboratuvar" for r in rows)
@@ -0,0 +1,216 @@
+import ast
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+from fastapi import Response
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.repositories.clinical.models import ShardedTetkikSonuc
+from app.repositories.clinical.repository import ClinicalRepository
+from app.services.patient_revision import (
+    EPOCH, MAX_SINCE, REVISION_HEADER, conditional_get, revision_etag, since_datetime,
+)
+
+
+def _db(revision):
+    db = AsyncMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar=MagicMock(return_value=revision)))
+    return db
+
+
+def _request(if_none_match=None):
+    request = MagicMock()
+    request.headers = {"if-none-match": if_none_match} if if_none_match else {}
+    return request
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_sets_headers_then_returns_304():
+    hasta_id = str(uuid4())
+    response = Response()
+
+    assert await conditional_get(_request(), response, _db(42), hasta_id, "labs") is None
+    etag = response.headers["etag"]
+    assert not etag.startswith("W/")  # strong ETag
+    assert response.headers[REVISION_HEADER] == "42"
+
+    not_modified = await conditional_get(_request(etag), Response(), _db(42), hasta_id, "labs")
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    # Yeni yazım revizyonu artırır -> eski ETag eşleşmez
+    assert await conditional_get(_request(etag), Response(), _db(43), hasta_id, "labs") is None
+
+
+def test_revision_etag_varies_by_resource_and_variant():
+    hasta_id = uuid4()
+    base = revision_etag("muayeneler", hasta_id, 1, "full", None)
+    assert base != revision_etag("muayeneler", hasta_id, 1, "summary", None)
+    assert base != revision_etag("operasyonlar", hasta_id, 1, "full", None)
+    assert base != revision_etag("muayeneler", hasta_id, 1, "full", 5)
+
+
+@pytest.mark.asyncio
+async def test_invalid_patient_id_has_revision_zero():
+    db = _db(None)
+    response = Response()
+    await conditional_get(_request(), response, db, "not-a-uuid", "takip")
+    assert response.headers[REVISION_HEADER] == "0"
+    db.execute.assert_not_awaited()
+
+
+def test_since_datetime_applies_overlap():
+    moment = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+    since = int(moment.timestamp() * 1_000_000)
+    assert since_datetime(since) == moment - timedelta(seconds=settings.PATIENT_DELTA_OVERLAP_SECONDS)
+
+
+def test_since_datetime_bounds():
+    assert since_datetime(0) == EPOCH
+    assert since_datetime(MAX_SINCE) < datetime.max.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_out_of_range_since_is_rejected_with_422():
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+
+    from app.api.v1.endpoints.clinical import SINCE_QUERY
+
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items(since: int = SINCE_QUERY):
+        return {"since": since_datetime(since).isoformat()}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/items", params={"since": MAX_SINCE})).status_code == 200
+        assert (await client.get("/items", params={"since": MAX_SINCE + 1})).status_code == 422
+        assert (await client.get("/items", params={"since": 10 ** 30})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_patient_changes_returns_rows_and_deleted_ids():
+    deleted_id = uuid4()
+    session = AsyncMock()
+    session.execute = AsyncMock(side_effect=[
+        MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=["row"])))),
+        MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[deleted_id])))),
+    ])
+    repo = ClinicalRepository(session)
+
+    rows, deleted = await repo.get_patient_changes(
+        ShardedTetkikSonuc, uuid4(), datetime(2024, 5, 1, tzinfo=timezone.utc),
+        ShardedTetkikSonuc.kategori == "Laboratuvar",
+    )
+
+    assert rows == ["row"] and deleted == [deleted_id]
+    changed_sql, deleted_sql = (
+        str(call.args[0].compile(dialect=postgresql.dialect())) for call in session.execute.await_args_list
+    )
+    assert "coalesce(clinical.sharded_clinical_tetkikler.updated_at" in changed_sql
+    assert "is_deleted = false" in changed_sql and "kategori" in changed_sql
+    assert "is_deleted = true" in deleted_sql and "kategori" in deleted_sql
+
+
+@pytest.mark.asyncio
+async def test_read_patient_audits_view_on_304():
+    from unittest.mock import patch
+    from app.api.v1.endpoints import patients
+
+    hasta_id = uuid4()
+    request = MagicMock()
+    request.state.user_id, request.state.username = 7, "dr"
+    request.client.host = "10.0.0.1"
+    with patch.object(patients, "conditional_get", AsyncMock(return_value=Response(status_code=304))), \
+         patch.object(patients.AuditService, "log", AsyncMock()) as log, \
+         patch.object(patients, "PatientController") as controller:
+        result = await patients.read_patient(request=request, response=Response(), db=AsyncMock(), id=hasta_id)
+
+    assert result.status_code == 304
+    controller.assert_not_called()
+    kwargs = log.await_args.kwargs
+    assert kwargs["action"] == "PATIENT_VIEW" and kwargs["user_id"] == 7
+    assert kwargs["resource_id"] == str(hasta_id) and kwargs["ip_address"] == "10.0.0.1"
+
+
+REVISION_MIGRATION = Path(__file__).resolve().parents[2] / "alembic" / "versions" / "a7c9e1b3d5f8_add_patient_revisions.py"
+
+
+def _revision_migration():
+    import importlib.util
+    pytest.importorskip("alembic.op")
+    path = REVISION_MIGRATION
+    spec = importlib.util.spec_from_file_location("patient_revisions_migration", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.asyncio
+async def test_revision_trigger_accepts_multi_row_writes_for_one_patient():
+    """Trigger'lar PostgreSQL ister: TEST_POSTGRES_URL (postgresql+asyncpg://...) verilmezse atlanır."""
+    import os
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL tanımlı değil")
+    pytest.importorskip("asyncpg")
+    migration = _revision_migration()
+    hasta_id = uuid4()
+
+    engine = create_async_engine(url)
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                await conn.execute(text("CREATE SCHEMA IF NOT EXISTS patient"))
+                await conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS patient.sharded_patient_revisions "
+                    "(hasta_id uuid PRIMARY KEY, revision bigint NOT NULL, updated_at timestamptz DEFAULT now())"
+                ))
+                await conn.execute(text(migration.BUMP_REVISIONS_SQL))
+                await conn.execute(text(migration.trigger_function_sql("hasta_id")))
+                await conn.execute(text("CREATE TABLE patient.revision_probe (id serial PRIMARY KEY, hasta_id uuid)"))
+                for event in migration.EVENTS:
+                    await conn.execute(text(migration.trigger_sql("patient.revision_probe", "hasta_id", event)))
+
+                # Panel / COPY ingest gibi: tek ifadede aynı hastaya çok satır
+                await conn.execute(
+                    text("INSERT INTO patient.revision_probe (hasta_id) SELECT CAST(:h AS uuid) FROM generate_series(1, 25)"),
+                    {"h": str(hasta_id)},
+                )
+                first = (await conn.execute(
+                    text("SELECT revision FROM patient.sharded_patient_revisions WHERE hasta_id = :h"), {"h": hasta_id}
+                )).scalar()
+                await conn.execute(text("DELETE FROM patient.revision_probe WHERE hasta_id = :h"), {"h": hasta_id})
+                second = (await conn.execute(
+                    text("SELECT revision FROM patient.sharded_patient_revisions WHERE hasta_id = :h"), {"h": hasta_id}
+                )).scalar()
+            finally:
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+
+    assert first and second > first
+
+
+def test_revision_triggers_cover_every_timeline_table():
+    """Timeline / workspace yanıtları revizyon ETag'i taşır: okudukları her tablo revizyonu artırmalı."""
+    from app.repositories.patient import timeline_repository
+
+    module = ast.parse(REVISION_MIGRATION.read_text(encoding="utf-8"))
+    tracked = next(
+        set(ast.literal_eval(node.value)) for node in module.body
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "TRACKED_TABLES"
+    )
+    models = [v for v in vars(timeline_repository).values() if isinstance(v, type) and hasattr(v, "__table__")]
+    read = {f"{m.__table__.schema or 'public'}.{m.__table__.name}" for m in models}
+    assert {"public.randevular", "public.hasta_finans_hareketleri"} <= read
+    assert read <= tracked, sorted(read - tracked)
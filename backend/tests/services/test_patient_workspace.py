@@ -0,0 +1,170 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.repositories.clinical.repository import ClinicalRepository
+from app.services.orchestrators.workspace_orchestrator import (
+    WORKSPACE_SECTIONS, PatientWorkspaceOrchestrator, parse_sections,
+)
+
+PATIENT_ID = uuid4()
+
+
+def _row(id, tarih, **fields):
+    return SimpleNamespace(id=id, hasta_id=PATIENT_ID, tarih=tarih, created_at=None, **fields)
+
+
+class _SessionFactory:
+    """Her çağrıda yeni (sahte) session; aynı anda açık session sayısının tepe değerini tutar."""
+
+    def __init__(self):
+        self.opened = 0
+        self.active = 0
+        self.peak = 0
+
+    @asynccontextmanager
+    async def _session(self):
+        self.opened += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0)
+            yield MagicMock()
+        finally:
+            self.active -= 1
+
+    def __call__(self):
+        return self._session()
+
+
+def test_parse_sections():
+    assert parse_sections(None) == list(WORKSPACE_SECTIONS)
+    assert parse_sections("labs, muayeneler") == ["muayeneler", "labs"]
+    with pytest.raises(ValueError):
+        parse_sections("muayeneler,finans")
+
+
+@pytest.mark.asyncio
+async def test_clinical_sections_share_one_session_and_base_queries():
+    exams = [_row(1, date(2024, 3, 1), sikayet="Ağrı", oyku="Öykü")]
+    notes = [SimpleNamespace(
+        id=7, hasta_id=PATIENT_ID, tarih=date(2024, 2, 1), tip="Not", icerik="Kontrol", sembol=None,
+        etiketler=None, created_at=None,
+    )]
+    tetkikler = [
+        _row(10, date(2024, 3, 2), kategori="Laboratuvar", tetkik_adi="PSA"),
+        _row(11, date(2024, 1, 5), kategori="Goruntuleme", tetkik_adi="USG"),
+        _row(12, date(2023, 1, 5), kategori="Laboratuvar", tetkik_adi="Kreatinin"),
+    ]
+    factory = _SessionFactory()
+    with patch.object(ClinicalRepository, "get_examinations_by_patient", AsyncMock(return_value=exams)) as get_exams, \
+         patch.object(ClinicalRepository, "get_notes_by_patient", AsyncMock(return_value=notes)) as get_notes, \
+         patch.object(ClinicalRepository, "get_tetkikler_by_patient", AsyncMock(return_value=tetkikler)) as get_tetkik, \
+         patch.object(ClinicalRepository, "get_operations_by_patient", AsyncMock(return_value=[])) as get_ops:
+        result = await PatientWorkspaceOrchestrator(factory).get_workspace(
+            PATIENT_ID, ["muayeneler", "takip", "imagings", "labs"], summary=True
+        )
+
+    assert factory.opened == 1
+    get_exams.assert_awaited_once_with(PATIENT_ID, summary=False, limit=None)  # takip öyküyü kullanır
+    get_notes.assert_awaited_once()
+    get_tetkik.assert_awaited_once_with(PATIENT_ID)  # görüntüleme + lab tek sorgu
+    get_ops.assert_not_awaited()
+
+    assert list(result) == ["muayeneler", "takip", "imagings", "labs", "warnings"]
+    assert [m.id for m in result["muayeneler"]] == [1]
+    assert [t.id for t in result["takip"]] == [1, 7]
+    assert [t.id for t in result["imagings"]] == [11]
+    assert [t.id for t in result["labs"]] == [10, 12]
+    assert result["warnings"] == []
+
+
+@pytest.mark.asyncio
+async def test_limit_is_pushed_into_each_source_query():
+    exams = [_row(1, date(2024, 3, 1), sikayet="Ağrı", oyku="Öykü")]
+    notes = [SimpleNamespace(
+        id=7, hasta_id=PATIENT_ID, tarih=date(2024, 2, 1), tip="Not", icerik="Kontrol", sembol=None,
+        etiketler=None, created_at=None,
+    )]
+    by_kategori = {
+        "Laboratuvar": [_row(10, date(2024, 3, 2), kategori="Laboratuvar", tetkik_adi="PSA")],
+        "Goruntuleme": [_row(11, date(2024, 1, 5), kategori="Goruntuleme", tetkik_adi="USG")],
+    }
+
+    async def tetkikler(patient_id, kategori=None, limit=None):
+        return by_kategori[kategori]
+
+    factory = _SessionFactory()
+    with patch.object(ClinicalRepository, "get_examinations_by_patient", AsyncMock(return_value=exams)) as get_exams, \
+         patch.object(ClinicalRepository, "get_notes_by_patient", AsyncMock(return_value=notes)) as get_notes, \
+         patch.object(ClinicalRepository, "get_tetkikler_by_patient", AsyncMock(side_effect=tetkikler)) as get_tetkik, \
+         patch.object(ClinicalRepository, "get_operations_by_patient", AsyncMock(return_value=[])) as get_ops, \
+         patch.object(ClinicalRepository, "get_photos_by_patient", AsyncMock(return_value=[])) as get_photos:
+        result = await PatientWorkspaceOrchestrator(factory).get_workspace(
+            PATIENT_ID, ["muayeneler", "operasyonlar", "takip", "photos", "imagings", "labs"], summary=True, limit=1
+        )
+
+    get_exams.assert_awaited_once_with(PATIENT_ID, summary=False, limit=1)
+    get_notes.assert_awaited_once_with(PATIENT_ID, limit=1)
+    get_ops.assert_awaited_once_with(PATIENT_ID, summary=True, limit=1)
+    get_photos.assert_awaited_once_with(PATIENT_ID, limit=1)
+    # Kategori başına ayrı kesim: lab'ların en yenisi görüntülemelerin arkasında kalmaz
+    assert sorted(c.kwargs["kategori"] for c in get_tetkik.await_args_list) == ["Goruntuleme", "Laboratuvar"]
+    assert all(c.kwargs["limit"] == 1 for c in get_tetkik.await_args_list)
+
+    assert list(result) == ["muayeneler", "operasyonlar", "takip", "photos", "imagings", "labs", "warnings"]
+    assert [m.id for m in result["muayeneler"]] == [1]
+    assert [t.id for t in result["takip"]] == [1]  # limit=1: en yeni kayıt
+    assert [t.id for t in result["imagings"]] == [11]
+    assert [t.id for t in result["labs"]] == [10]
+    assert result["warnings"] == []
+
+
+@pytest.mark.asyncio
+async def test_failed_section_becomes_warning_and_concurrency_is_bounded():
+    factory = _SessionFactory()
+    with patch("app.services.orchestrators.workspace_orchestrator.PatientStatsRepository") as stats, \
+         patch("app.services.orchestrators.workspace_orchestrator.PatientTimelineRepository") as timeline, \
+         patch.object(ClinicalRepository, "get_photos_by_patient", AsyncMock(return_value=[])), \
+         patch.object(ClinicalRepository, "get_operations_by_patient", AsyncMock(return_value=[])):
+        stats.return_value.get_counts = AsyncMock(return_value={"muayene": 3})
+        timeline.return_value.get_timeline = AsyncMock(side_effect=RuntimeError("shard down"))
+        result = await PatientWorkspaceOrchestrator(factory, concurrency=2).get_workspace(
+            PATIENT_ID, ["counts", "timeline", "operasyonlar", "photos"]
+        )
+
+    assert factory.opened == 4 and factory.peak <= 2
+    assert result["counts"] == {"muayene": 3}
+    assert "timeline" not in result
+    assert result["warnings"] == ["Zaman çizelgesi alınamadı"]
+    assert result["operasyonlar"] == [] and result["photos"] == []
+
+
+@pytest.mark.asyncio
+async def test_partial_workspace_drops_etag_and_is_not_stored():
+    from fastapi import Response
+    from app.api.v1.endpoints import patients
+
+    async def conditional_get(request, response, *args):
+        response.headers.update({"ETag": '"rev"', "Cache-Control": "private, no-cache"})
+
+    request = MagicMock()
+    request.client.host = "10.0.0.1"
+    user = SimpleNamespace(id=7)
+    for warnings, etag in ((["Zaman çizelgesi alınamadı"], None), ([], '"rev"')):
+        response = Response()
+        workspace = AsyncMock(return_value={"counts": {}, "warnings": warnings})
+        with patch.object(patients, "conditional_get", conditional_get), \
+             patch.object(patients.AuditService, "log", AsyncMock()), \
+             patch.object(patients.PatientWorkspaceOrchestrator, "get_workspace", workspace):
+            await patients.get_patient_workspace(
+                request=request, response=response, db=AsyncMock(), id=PATIENT_ID,
+                sections="counts,timeline", view="summary", limit=None, current_user=user,
+            )
+        assert response.headers.get("etag") == etag
+        assert (response.headers["cache-control"] == "no-store") == bool(warnings)
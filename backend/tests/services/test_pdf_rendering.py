@@ -0,0 +1,81 @@
+import fitz
+import pytest
+from datetime import date, datetime
+from uuid import uuid4
+
+from app.schemas.patient_report import ExaminationSummary, PatientDemographics, PatientReportDTO
+from app.services.pdf.assets import get_assets, text_length
+from app.services.pdf.cache import PDFCache
+from app.services.pdf.renderer import PDFRenderer
+from app.services.pdf.utils import wrap_text
+from app.services.pdf_report_service import render_patient_report
+
+
+def _report(visits: int = 3) -> PatientReportDTO:
+    return PatientReportDTO(
+        demographics=PatientDemographics(id=uuid4(), ad="Ayşe", soyad="Yılmaz", tc_kimlik="12345678901"),
+        examinations=[
+            ExaminationSummary(
+                id=uuid4(), tarih=date(2024, 1, 1),
+                sikayet="Gece sık idrara çıkma ve alt karın ağrısı şikayeti ile başvurdu. " * 3,
+                on_tani="BPH",
+            )
+            for _ in range(visits)
+        ],
+        lab_results=[],
+        finance_summary=None,
+        warnings=[],
+        generated_at=datetime(2024, 1, 2, 10, 0),
+    )
+
+
+def test_glyph_table_matches_font_measurement():
+    """Genişlik tablosu, fitz.Font ölçümüyle aynı sonucu vermeli (Türkçe karakterler dahil)."""
+    font_path = get_assets().font_path
+    assert font_path
+    text = "Şikayet: ığüşöç İĞÜŞÖÇ 123 ₺"
+    expected = fitz.Font(fontfile=font_path).text_length(text, fontsize=9)
+    assert text_length(text, 9, font_path=font_path) == pytest.approx(expected)
+
+
+def test_wrap_text_respects_width():
+    font_path = get_assets().font_path
+    text = ("Gece sık idrara çıkma ve alt karın ağrısı şikayeti ile başvurdu. " * 5).strip()
+    lines = wrap_text(text, "tr", 9, 200, font_path=font_path)
+    assert len(lines) > 1
+    assert " ".join(lines) == text
+    assert all(text_length(line, 9, font_path=font_path) <= 200 for line in lines)
+
+
+def test_render_patient_report_embeds_text():
+    data = render_patient_report(_report(visits=40))
+    doc = fitz.open(stream=data, filetype="pdf")
+    text = "".join(page.get_text() for page in doc)
+    assert len(doc) > 1
+    assert "Ayşe Yılmaz" in text
+    assert "UroLog Secure PDF" in text
+
+
+@pytest.mark.asyncio
+async def test_renderer_thread_mode():
+    renderer = PDFRenderer(workers=0)
+    try:
+        data = await renderer.render(render_patient_report, _report())
+    finally:
+        await renderer.stop()
+    assert data.startswith(b"%PDF")
+
+
+def test_pdf_cache_evicts_least_recently_used():
+    cache = PDFCache(max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    assert cache.get("a") == b"1234"  # a en son kullanılan olur
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 8
+
+    cache.set("huge", b"x" * 11)  # sınırdan büyük kayıt önbelleğe alınmaz
+    assert cache.get("huge") is None
+    assert len(cache) == 2
@@ -0,0 +1,55 @@
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.repositories.report_repository import ReportRepository
+
+
+def _db(rows):
+    db = AsyncMock()
+    db.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=rows)))
+    return db
+
+
+def _sql(db) -> str:
+    stmt = db.execute.await_args.args[0]
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_revenue_chart_is_one_bucketed_query():
+    db = _db([(datetime(2024, 1, 1), 100), (datetime(2024, 2, 1), 0), (datetime(2024, 3, 1), 25.5)])
+
+    data = await ReportRepository.get_revenue_chart(db, date(2024, 1, 20), date(2024, 3, 5))
+
+    assert [(p.name, p.value) for p in data] == [("Jan 24", 100.0), ("Feb 24", 0.0), ("Mar 24", 25.5)]
+    db.execute.assert_awaited_once()
+    sql = _sql(db)
+    assert "generate_series(CAST('2024-01-01 00:00:00'" in sql and "interval '1 month'" in sql
+    assert "date_trunc('month'" in sql and "LEFT OUTER JOIN" in sql
+    assert "< '2024-04-01 00:00:00'" in sql  # son ay tam dahil
+
+
+@pytest.mark.asyncio
+async def test_weekly_new_patients_aligns_to_monday():
+    db = _db([(datetime(2024, 1, 15), 3)])
+
+    data = await ReportRepository.get_weekly_new_patients(db, date(2024, 1, 17), date(2024, 1, 19))
+
+    assert [(p.name, p.value) for p in data] == [("15 Jan '24", 3.0)]
+    sql = _sql(db)
+    assert "date_trunc('week'" in sql and "'2024-01-22 00:00:00'" in sql
+
+
+@pytest.mark.asyncio
+async def test_patient_trends_source_follows_summary_setting():
+    db = _db([])
+    with patch("app.repositories.report_repository.settings.REPORT_ACTIVITY_SUMMARY", True):
+        await ReportRepository.get_patient_trends(db, date(2024, 1, 1), date(2024, 2, 1))
+    assert "sharded_clinical_patient_activity" in _sql(db) and "UNION ALL" not in _sql(db)
+
+    with patch("app.repositories.report_repository.settings.REPORT_ACTIVITY_SUMMARY", False):
+        await ReportRepository.get_patient_trends(db, date(2024, 1, 1), date(2024, 2, 1))
+    assert "UNION ALL" in _sql(db) and "sharded_clinical_notlar" in _sql(db)
@@ -0,0 +1,68 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.repositories.report_repository import ReportRepository
+from app.services.report_classification import classify_exam, classify_reference, classify_service, service_for_icd
+
+
+def test_icd_lookup_prefers_longest_prefix():
+    assert service_for_icd("N39.3") == "Ürodinamik"
+    assert service_for_icd("n39.0 ") == "Enfeksiyon"
+    assert service_for_icd("C61.9") == "Üroonkoloji"
+    assert service_for_icd("Z00") is None
+
+
+def test_classify_service_codes_before_keywords():
+    # Birincil tanı kodu, ikincil tanı metnindeki anahtar kelimeden önce gelir
+    assert classify_service("BPH", "N40", "böbrek taşı", None) == "Prostat"
+    assert classify_service("Erektil disfonksiyon", None, None, None) == "Androloji"
+    assert classify_service(None, None, None, None) == "Diğer"
+    exam = SimpleNamespace(tani1="Kontrol", tani1_kodu="Z00", tani2=None, tani2_kodu="N20.0")
+    assert classify_exam(exam) == "Taş Hastalığı"
+
+
+def test_classify_reference():
+    assert classify_reference("Op.Dr. Ahmet") == "hekim"
+    assert classify_reference("Instagram") == "dijital"
+    assert classify_reference("Gazete") == "diger"
+    assert classify_reference("  ") is None
+
+
+def _db(*results):
+    db = AsyncMock()
+    db.execute = AsyncMock(side_effect=[MagicMock(all=MagicMock(return_value=rows)) for rows in results])
+    return db
+
+
+@pytest.mark.asyncio
+async def test_service_distribution_groups_by_precomputed_category():
+    db = _db([("Prostat", 6), ("Diğer", 2)])
+
+    result = await ReportRepository.get_service_distribution(db, date(2024, 1, 1), date(2024, 1, 31))
+
+    assert [(r.name, r.count, r.percentage) for r in result] == [("Prostat", 6, 75.0), ("Diğer", 2, 25.0)]
+    db.execute.assert_awaited_once()
+    assert "GROUP BY clinical.sharded_clinical_muayeneler.service_category" in str(db.execute.await_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_service_distribution_classifies_unbackfilled_rows():
+    db = _db([("Prostat", 1), (None, 3)], [("Taş", None, None, None, 3)])
+
+    result = await ReportRepository.get_service_distribution(db, date(2024, 1, 1), date(2024, 1, 31))
+
+    assert {r.name: r.count for r in result} == {"Taş Hastalığı": 3, "Prostat": 1}
+    assert db.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_reference_categories_use_stored_category():
+    db = _db([("hekim", "Dr. Ali", 4), (None, "Google", 1)])
+
+    result = await ReportRepository.get_reference_categories(db, date(2024, 1, 1), date(2024, 1, 31))
+
+    assert [(r.category, r.count) for r in result] == [("hekim", 4), ("dijital", 1)]
+    assert result[0].sources[0].name == "Dr. Ali"
@@ -83,3 +83,62 @@ def test_pdf_generation_with_partial_data():
     assert pdf_stream is not None
     assert pdf_stream.getbuffer().nbytes > 0
     # If it didn't crash, it handles partial data
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_group_rows_and_degrade_per_shard():
+    """Toplu rapor: shard başına tek sorgu, satırlar hastaya göre gruplanır; finans hatası tüm raporlara uyarı."""
+    orchestrator = ReportOrchestrator(AsyncMock(), UserContext(user_id=1, username="test"))
+    p1, p2, missing = uuid4(), uuid4(), uuid4()
+
+    def patient(pid, ad):
+        m = MagicMock()
+        m.id, m.ad, m.soyad, m.tc_kimlik, m.dogum_tarihi = pid, ad, "Test", None, None
+        for attr in ("cinsiyet", "dogum_yeri", "kan_grubu", "medeni_hal", "meslek", "cocuk_sayisi", "cep_tel",
+                     "ev_tel", "is_tel", "email", "adres", "ilce", "sehir", "postakodu", "kurum", "sigorta",
+                     "ozelsigorta", "protokol_no"):
+            setattr(m, attr, None)
+        return m
+
+    def exam(pid):
+        m = MagicMock(spec=["id", "hasta_id", "tarih", "doktor", "sikayet", "tani1", "tani_kesin"])
+        m.id, m.hasta_id, m.tarih, m.doktor, m.sikayet, m.tani1, m.tani_kesin = uuid4(), pid, date(2024, 1, 1), None, None, "BPH", None
+        return m
+
+    orchestrator.patient_repo.get_by_ids = AsyncMock(return_value=[patient(p1, "A"), patient(p2, "B")])
+    orchestrator.clinical_repo.get_examinations_for_patients = AsyncMock(return_value=[exam(p1), exam(p1), exam(p2)])
+    orchestrator.income_repo.get_transactions_for_patients = AsyncMock(side_effect=Exception("Finance Shard Down"))
+
+    reports = await orchestrator.get_patient_reports([p1, p2, missing])
+
+    assert set(reports) == {p1, p2}
+    assert len(reports[p1].examinations) == 2 and len(reports[p2].examinations) == 1
+    assert all(r.finance_summary is None and "Finansal bilgiler alınamadı" in r.warnings for r in reports.values())
+    orchestrator.clinical_repo.get_examinations_for_patients.assert_awaited_once_with([p1, p2])
+
+
+@pytest.mark.asyncio
+async def test_batch_zip_commits_audit_before_streaming():
+    from app.api.v1.endpoints import patient_report
+    from app.schemas.patient_report import PatientReportBatchRequest
+
+    pid = uuid4()
+    db = AsyncMock()
+    events = []
+    db.commit = AsyncMock(side_effect=lambda: events.append("commit"))
+    log = AsyncMock(side_effect=lambda **kw: events.append(kw["action"]))
+    orchestrator = MagicMock()
+    orchestrator.get_patient_reports = AsyncMock(side_effect=lambda ids: events.append("reports") or {})
+    user = MagicMock(id=7, username="dr", role="doctor")
+
+    with patch.object(patient_report.AuditService, "log", log), \
+         patch.object(patient_report, "get_report_orchestrator", return_value=orchestrator):
+        response = await patient_report.get_patient_reports_zip(
+            body=PatientReportBatchRequest(patient_ids=[pid]), db=db, current_user=user
+        )
+        assert events == ["PATIENT_REPORT_BATCH", "commit"]  # akış başlamadan kalıcı
+        async for _ in response.body_iterator:
+            pass
+
+    # Her grup okunduktan sonra transaction kapanır
+    assert events == ["PATIENT_REPORT_BATCH", "commit", "reports", "commit"]
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.ai_scribe import AIScribeMode, AIScribeTextRequest
+from app.services.ai_scribe_service import AIScribeService
+from app.services.result_cache import DiskCacheBackend, ResultCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AI_RESULT_CACHE_ENABLED", True)
+    return ResultCache(backend=DiskCacheBackend(str(tmp_path)))
+
+
+@pytest.mark.asyncio
+async def test_cache_key_depends_on_every_part():
+    base = await cache_key("ns", b"audio", "BPH", "gemini")
+    assert base == await cache_key("ns", b"audio", "BPH", "gemini")
+    assert base != await cache_key("ns", b"audio", "OAB", "gemini")
+    assert base != await cache_key("ns", b"audi", "oBPH", "gemini")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call(cache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"sikayet": "Dizüri"}
+
+    results = await asyncio.gather(*(cache.get_or_compute("ns:abc", compute) for _ in range(5)))
+
+    assert calls == 1 and all(r == {"sikayet": "Dizüri"} for r in results)
+    assert await cache.get_or_compute("ns:abc", compute) == {"sikayet": "Dizüri"}
+    assert calls == 1 and cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_and_rejected_results_are_not_cached(cache):
+    failing = AsyncMock(side_effect=RuntimeError("provider down"))
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("ns:err", failing)
+
+    compute = AsyncMock(return_value={"mode_used": "gemini"})
+    await cache.get_or_compute("ns:err", compute, should_cache=lambda v: False)
+    await cache.get_or_compute("ns:err", compute)
+    await cache.get_or_compute("ns:err", compute)
+    assert compute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_disk_backend_expires_and_evicts(tmp_path, monkeypatch):
+    backend = DiskCacheBackend(str(tmp_path))
+    await backend.set("ns:old", {"v": 1}, ttl=60)
+    assert await backend.get("ns:old") == {"v": 1}
+
+    await backend.set("ns:expired", {"v": 2}, ttl=-1)
+    assert await backend.get("ns:expired") is None
+
+    # Boyut sınırı aşılınca en eski dosya silinir
+    old_path = tmp_path / "ns" / "old.json"
+    os.utime(old_path, (time.time() - 100, time.time() - 100))
+    monkeypatch.setattr(settings, "AI_RESULT_CACHE_MAX_DISK_MB", 0)
+    await backend.set("ns:new", {"v": "x" * 100}, ttl=60)
+    assert not old_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_repeated_text_analysis_hits_cache(cache):
+    service = AIScribeService()
+    service.result_cache = cache
+    service.local_llm_provider = AsyncMock()
+    service.local_llm_provider.analyze_text.return_value = {"sikayet": "Pollakiüri"}
+    text = "Sık idrara çıkma şikayeti var."
+    request = AIScribeTextRequest(text=text, mode=AIScribeMode.LOCAL)
+
+    first = await service.analyze_text(text, request)
+    second = await service.analyze_text(text, request)
+
+    assert first.sikayet == second.sikayet == "Pollakiüri"
+    assert second.mode_used == AIScribeMode.LOCAL
+    assert service.local_llm_provider.analyze_text.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_lab_analysis_cache_does_not_store_patient_name(cache, tmp_path, monkeypatch):
+    from app.schemas.lab_analysis import LabAnalysisResponse
+    from app.services import lab_analysis_service
+    from app.services.lab_analysis_service import LabAnalysisService
+
+    monkeypatch.setattr(lab_analysis_service, "result_cache", cache)
+    service = LabAnalysisService()
+    service.model = object()
+    extracted = LabAnalysisResponse(patient_name="Ahmet Yılmaz", report_date="2024-05-01", results=[{"test": "PSA", "value": "4.1"}])
+    monkeypatch.setattr(service, "_analyze_lab_file_uncached", AsyncMock(return_value=extracted))
+
+    first = await service.analyze_lab_file(b"%PDF", "application/pdf")
+    second = await service.analyze_lab_file(b"%PDF", "application/pdf")
+
+    assert service._analyze_lab_file_uncached.await_count == 1
+    assert first.patient_name == "Ahmet Yılmaz"  # canlı çıkarım
+    assert second.patient_name is None and second.results == first.results  # önbellekten
+    stored = "".join(p.read_text(encoding="utf-8") for p in tmp_path.rglob("*.json"))
+    assert "PSA" in stored and "Ahmet" not in stored
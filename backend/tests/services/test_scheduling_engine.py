@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.scheduling_service import (
+    BusyInterval, IntervalIndex, SchedulingEngine, free_slots_in_window, doctor_key, CLINIC_WIDE_KEY, UNASSIGNED_KEY
+)
+
+TZ = timezone(timedelta(hours=3))
+
+
+def _at(hour, minute=0):
+    return datetime(2026, 3, 2, hour, minute, tzinfo=TZ)  # Pazartesi
+
+
+def test_interval_index_half_open_overlap():
+    idx = IntervalIndex()
+    idx.add(BusyInterval(_at(10), _at(10, 30), id=1))
+    idx.add(BusyInterval(_at(9), _at(9, 30), id=2))
+
+    assert [i.id for i in idx.overlapping(_at(9, 15), _at(10, 15))] == [2, 1]
+    # Uç uca değen randevular çakışma sayılmaz
+    assert idx.overlapping(_at(9, 30), _at(10)) == []
+    assert idx.overlapping(_at(9), _at(9, 30), exclude_id=2) == []
+
+
+def test_free_slots_skip_busy_and_respect_grid():
+    busy = [
+        BusyInterval(_at(9), _at(9, 45), id=1),
+        BusyInterval(_at(9, 30), _at(10), id=2),  # birleşik dolu aralık 09:00-10:00
+        BusyInterval(_at(11), _at(11, 15), id=3),
+    ]
+    slots = free_slots_in_window(
+        _at(9), _at(12), busy, timedelta(minutes=30), timedelta(minutes=30)
+    )
+    assert [s.strftime("%H:%M") for s, _ in slots] == ["10:00", "10:30", "11:30"]
+
+
+def test_free_slots_not_before_and_limit():
+    slots = free_slots_in_window(
+        _at(9), _at(18), [], timedelta(minutes=15), timedelta(minutes=30),
+        not_before=_at(13, 10), limit=2,
+    )
+    assert [s.strftime("%H:%M") for s, _ in slots] == ["13:30", "14:00"]
+
+
+def test_apply_change_reindexes_loaded_days():
+    engine = SchedulingEngine()
+    day = _at(0).astimezone(engine.tz).date()
+    engine._days[day] = (float("inf"), {})
+
+    appt = SimpleNamespace(start=_at(10), end=_at(10, 30), doctor_name="Dr. A", doctor_id=None,
+                           status="scheduled", is_deleted=0)
+    engine.apply_change(7, appt)
+    assert [i.id for i in engine._busy_for(day, "Dr. A")] == [7]
+    assert engine._busy_for(day, "Dr. B") == []
+
+    appt.status = "cancelled"
+    engine.apply_change(7, appt)
+    assert engine._busy_for(day, "Dr. A") == []
+
+
+def test_clinic_wide_block_applies_to_every_doctor():
+    engine = SchedulingEngine()
+    day = _at(0).astimezone(engine.tz).date()
+    engine._days[day] = (float("inf"), {})
+    block = SimpleNamespace(start=_at(12), end=_at(13), doctor_name=None, doctor_id=None,
+                            type="BLOCKED", status="blocked", is_deleted=0)
+    engine.apply_change(1, block)
+
+    assert doctor_key(None, None, "BLOCKED") == CLINIC_WIDE_KEY
+    assert [i.id for i in engine._busy_for(day, "Dr. A")] == [1]
+    assert engine.day_capacity(date(2026, 3, 7)) == 0  # Cumartesi
+
+
+def test_unassigned_visit_does_not_block_doctors_and_ids_resolve_to_names():
+    engine = SchedulingEngine()
+    day = _at(0).astimezone(engine.tz).date()
+    engine._days[day] = (float("inf"), {})
+    engine._doctor_names[5] = "Dr. A"
+    engine.apply_change(1, SimpleNamespace(start=_at(9), end=_at(9, 30), doctor_name=None, doctor_id=None,
+                                           type="Muayene", status="scheduled", is_deleted=0))
+    engine.apply_change(2, SimpleNamespace(start=_at(10), end=_at(10, 30), doctor_name=None, doctor_id=5,
+                                           type="Muayene", status="scheduled", is_deleted=0))
+    engine.apply_change(3, SimpleNamespace(start=_at(11), end=_at(11, 30), doctor_name="Dr. B", doctor_id=None,
+                                           type="Kontrol", status="scheduled", is_deleted=0))
+
+    assert doctor_key(None, None, "Muayene") == UNASSIGNED_KEY
+    assert doctor_key(None, 9) == "#9"
+    assert [i.id for i in engine._busy_for(day, "Dr. A")] == [2]  # doctor_id -> ad
+    assert [i.id for i in engine._busy_for(day, UNASSIGNED_KEY)] == [1]
+    assert sorted(i.id for i in engine._busy_for(day, None)) == [1, 2, 3]  # doktorsuz sorgu: klinik geneli
+
+
+@pytest.mark.asyncio
+async def test_lock_schedule_takes_one_lock_per_doctor_day_in_order():
+    from app.repositories.appointment_repository import AppointmentRepository
+
+    db = AsyncMock()
+    name = MagicMock()
+    name.scalar.return_value = "Dr. A"
+    db.execute = AsyncMock(return_value=name)
+    await AppointmentRepository(db).lock_schedule(_at(23), _at(23) + timedelta(hours=2), doctor_id=5)
+
+    statements = [str(call.args[0].compile(compile_kwargs={"literal_binds": True})) for call in db.execute.await_args_list]
+    assert "users.full_name" in statements[0]  # ID -> ad: isimle gelen istekle aynı kilit
+    assert [s.split("'")[1] for s in statements[1:]] == ["randevu:Dr. A:2026-03-02", "randevu:Dr. A:2026-03-03"]
+    assert all("pg_advisory_xact_lock" in s for s in statements[1:])
+
+
+def test_evict_drops_past_days_and_caps_cache(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "CALENDAR_AVAILABILITY_CACHE_MAX_DAYS", 3)
+    engine = SchedulingEngine()
+    today = datetime.now(engine.tz).date()
+    days = [today + timedelta(days=i) for i in range(-2, 5)]
+    for loaded_at, day in enumerate(days):
+        engine._days[day] = (float(loaded_at), {})
+    past = datetime.combine(days[0], datetime.min.time(), tzinfo=engine.tz) + timedelta(hours=10)
+    engine._index_interval(BusyInterval(start=past, end=past + timedelta(minutes=30), id=1, key="Dr. A"))
+
+    engine._evict(days[5], days[6])
+
+    # Geçmiş günler gider; sınırı aşan en eski yüklenen günler atılır, istenen aralık kalır
+    assert sorted(engine._days) == [days[4], days[5], days[6]]
+    assert 1 not in engine._by_id
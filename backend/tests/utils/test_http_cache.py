@@ -0,0 +1,23 @@
+from datetime import datetime
+from app.utils.http_cache import make_etag, etag_matches
+
+
+def test_make_etag_is_deterministic_and_weak():
+    ts = datetime(2026, 1, 1, 10, 0)
+    a = make_etag("calendar", 3, ts, None)
+    b = make_etag("calendar", 3, ts, None)
+    assert a == b
+    assert a.startswith('W/"')
+    assert make_etag("calendar", 4, ts, None) != a
+    assert make_etag("x", weak=False).startswith('"')
+
+
+def test_etag_matches_handles_lists_and_weak_prefix():
+    etag = make_etag("calendar", 1)
+    opaque = etag[2:]
+    assert etag_matches(etag, etag)
+    assert etag_matches(opaque, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
@@ -0,0 +1,16 @@
+import io
+import zipfile
+
+from app.utils.zip_stream import ZipStream
+
+
+def test_zip_stream_emits_valid_archive_incrementally():
+    archive = ZipStream()
+    parts = [archive.add("a.pdf", b"%PDF" * 1000), archive.add("HATALAR.txt", "ş bulunamadı".encode("utf-8"))]
+    assert all(parts)  # her dosya eklendiği anda baytları döner
+    parts.append(archive.close())
+
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(parts)))
+    assert zf.testzip() is None
+    assert zf.namelist() == ["a.pdf", "HATALAR.txt"]
+    assert zf.read("a.pdf") == b"%PDF" * 1000
@@ -33,6 +33,7 @@ import { ScrollArea } from "@/components/ui/scroll-area";
 import { FileText, Trash2, ExternalLink, Banknote } from 'lucide-react';
 import { useRouter } from 'next/navigation';
 import { useAuthStore } from '@/stores/auth-store';
+import { useChangeFeed, applyAppointmentChange } from '@/hooks/useChangeFeed';
 
 const DnDCalendar = withDragAndDrop(Calendar);
 
@@ -229,9 +230,12 @@ export default function CalendarPage() {
     // Fetch appointments
     const { data: appointments, isLoading, refetch } = useQuery({
         queryKey: ['appointments', dateRange.start, dateRange.end],
-        queryFn: () => api.appointments.list({ start: dateRange.start, end: dateRange.end }),
+        queryFn: () => api.appointments.calendar({ start: dateRange.start, end: dateRange.end }),
     });
 
+    // Diğer kullanıcıların değişiklikleri SSE ile delta olarak gelir ve cache'e doğrudan uygulanır
+    useChangeFeed(['appointment'], (event) => applyAppointmentChange(queryClient, event));
+
     // Delete Mutation
     const deleteAppointmentMutation = useMutation({
         mutationFn: ({ id, reason }: { id: number; reason?: string }) => api.appointments.delete(id, reason),
@@ -246,12 +250,21 @@ export default function CalendarPage() {
 
     // Update Mutation
     const updateAppointmentMutation = useMutation({
-        mutationFn: ({ id, data }: { id: number; data: any }) => api.appointments.update(id, data),
+        mutationFn: ({ id, data, force }: { id: number; data: any; force?: boolean }) => api.appointments.update(id, data, force),
         onSuccess: () => {
             queryClient.invalidateQueries({ queryKey: ['appointments'] });
             toast.success('Randevu güncellendi');
         },
-        onError: () => {
+        onError: (e: any, variables) => {
+            if (String(e?.message || '').includes('API Error: 409')) {
+                const confirmed = window.confirm("Yeni saatte başka bir randevu var. Yinede taşımak istiyor musunuz?");
+                if (confirmed) {
+                    updateAppointmentMutation.mutate({ ...variables, force: true });
+                } else {
+                    queryClient.invalidateQueries({ queryKey: ['appointments'] });
+                }
+                return;
+            }
             toast.error('Güncelleme başarısız');
         }
     });
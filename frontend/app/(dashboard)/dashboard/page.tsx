@@ -1,6 +1,6 @@
 "use client";
 import { useRouter } from "next/navigation";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import {
     Calendar,
@@ -47,6 +47,7 @@ import { toast } from "sonner";
 import { Popover, PopoverContent, PopoverAnchor } from '@/components/ui/popover';
 import { FileText, Stethoscope, Binoculars } from 'lucide-react';
 import { cn } from "@/lib/utils";
+import { useChangeFeed, applyAppointmentChange } from "@/hooks/useChangeFeed";
 
 function calculateAge(dob?: string) {
     if (!dob) return '-';
@@ -91,11 +92,30 @@ export default function DashboardPage() {
         return () => clearTimeout(timer);
     }, [adInput, soyadInput]);
 
-    // Fetch Dashboard Summary
+    // Canlı değişiklik akışı: polling yerine ilgili commit geldiğinde yenile.
+    // Art arda gelen olaylar (ör. toplu işlem) tek bir yenilemede birleştirilir.
+    const feedRefreshTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+    const pendingFeedKeys = useRef<Set<string>>(new Set());
+    useChangeFeed(['appointment', 'patient', 'finance'], (event) => {
+        if (event.topic === 'appointment' || event.topic === 'reset') applyAppointmentChange(queryClient, event);
+        if (event.topic === 'patient' || event.topic === 'reset') pendingFeedKeys.current.add('patients');
+        if (event.topic === 'finance' || event.topic === 'reset') {
+            pendingFeedKeys.current.add('finance_summary');
+            pendingFeedKeys.current.add('finance_debtors');
+        }
+        pendingFeedKeys.current.add('dashboard');
+        if (feedRefreshTimer.current) clearTimeout(feedRefreshTimer.current);
+        feedRefreshTimer.current = setTimeout(() => {
+            pendingFeedKeys.current.forEach((key) => queryClient.invalidateQueries({ queryKey: [key] }));
+            pendingFeedKeys.current.clear();
+        }, 500);
+    });
+
+    // Fetch Dashboard Summary (polling sadece akış koparsa diye seyrek yedek)
     const { data: dashboardData, isLoading: isDashboardLoading } = useQuery({
         queryKey: ['dashboard'],
         queryFn: api.dashboard.get,
-        refetchInterval: 60000
+        refetchInterval: 600000
     });
 
     // Fetch Patients (Activity-Sorted)
@@ -128,14 +148,14 @@ export default function DashboardPage() {
     const { data: financeSummary } = useQuery({
         queryKey: ['finance_summary'],
         queryFn: () => api.finance.getSummary(),
-        refetchInterval: 120000
+        refetchInterval: 600000
     });
 
     // Debtors
     const { data: debtors = [] } = useQuery({
         queryKey: ['finance_debtors'],
         queryFn: () => api.finance.getDebtors(0),
-        refetchInterval: 120000
+        refetchInterval: 600000
     });
 
     // Delete Mutation
@@ -13,7 +13,7 @@ import {
     Upload, X, Play, FileText, Save, Pause, PlayCircle, Download
 } from "lucide-react";
 import { toast } from "sonner";
-import { api, AIScribeResponse, AIScribeTemplate } from "@/lib/api";
+import { api, AIScribeJob, AIScribeResponse, AIScribeTemplate } from "@/lib/api";
 import { useSettingsStore } from "@/stores/settings-store";
 import { useAIScribeStore } from "@/stores/ai-scribe-store";
 import { useAuthStore } from "@/stores/auth-store";
@@ -42,6 +42,8 @@ export function AIScribeWidget({ onResult, patientId }: AIScribeWidgetProps) {
     const [templates, setTemplates] = useState<AIScribeTemplate[]>([]);
     const [selectedTemplate, setSelectedTemplate] = useState<string>('none');
     const [activePatientId, setActivePatientId] = useState<string | undefined>(undefined);
+    const [jobStatus, setJobStatus] = useState<AIScribeJob['status'] | null>(null);
+    const [partialTranscript, setPartialTranscript] = useState<string | null>(null);
 
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
     const chunksRef = useRef<Blob[]>([]);
@@ -272,7 +274,11 @@ export function AIScribeWidget({ onResult, patientId }: AIScribeWidgetProps) {
                 aiScribeMode,
                 selectedTemplate === 'none' ? undefined : selectedTemplate,
                 false,
-                activePatientId || patientId
+                activePatientId || patientId,
+                (job) => {
+                    setJobStatus(job.status);
+                    if (job.partial_transcript) setPartialTranscript(job.partial_transcript);
+                }
             );
 
             setResult(response);
@@ -286,6 +292,8 @@ export function AIScribeWidget({ onResult, patientId }: AIScribeWidgetProps) {
             toast.error(message);
         } finally {
             setIsProcessing(false);
+            setJobStatus(null);
+            setPartialTranscript(null);
         }
     };
 
@@ -580,9 +588,16 @@ export function AIScribeWidget({ onResult, patientId }: AIScribeWidgetProps) {
                         )}
 
                         {recordingState === 'analyzing' && (
-                            <div className="flex items-center gap-2 text-sm text-slate-500 w-full justify-center py-2">
-                                <Loader2 className="w-4 h-4 animate-spin" />
-                                <span>Analiz ediliyor...</span>
+                            <div className="w-full space-y-2">
+                                <div className="flex items-center gap-2 text-sm text-slate-500 w-full justify-center py-2">
+                                    <Loader2 className="w-4 h-4 animate-spin" />
+                                    <span>{jobStatus === 'queued' ? 'Sırada bekliyor...' : 'Analiz ediliyor...'}</span>
+                                </div>
+                                {partialTranscript && (
+                                    <p className="text-xs text-slate-500 bg-slate-50 rounded p-2 max-h-24 overflow-y-auto">
+                                        {partialTranscript.length > 400 ? `…${partialTranscript.slice(-400)}` : partialTranscript}
+                                    </p>
+                                )}
                             </div>
                         )}
 
@@ -285,11 +285,11 @@ export function CreateAppointmentDialog({ isOpen, onClose, patientId: propPatien
 
 
     // Mutations
-    const mutationFn = async (data: any) => {
+    const mutationFn = async ({ payload, force }: { payload: any; force: boolean }) => {
         if (appointment) {
-            return api.appointments.update(appointment.id, data);
+            return api.appointments.update(appointment.id, payload, force);
         } else {
-            return api.appointments.create(data);
+            return api.appointments.create(payload, force);
         }
     };
 
@@ -300,7 +300,13 @@ export function CreateAppointmentDialog({ isOpen, onClose, patientId: propPatien
             toast.success(appointment ? 'Randevu güncellendi' : 'Randevu oluşturuldu');
             onClose();
         },
-        onError: (e) => {
+        onError: (e: any, variables) => {
+            // Sunucu tarafı çakışma kontrolü (ekranda yüklü olmayan randevular dahil)
+            if (String(e?.message || '').includes('API Error: 409')) {
+                const confirmed = window.confirm("Seçilen saatte başka bir randevu var. Yinede devam etmek istiyor musunuz?");
+                if (confirmed) createAppointmentMutation.mutate({ ...variables, force: true });
+                return;
+            }
             console.error(e);
             toast.error('İşlem başarısız');
         }
@@ -356,7 +362,7 @@ export function CreateAppointmentDialog({ isOpen, onClose, patientId: propPatien
         );
         const doctorId = matchedDoctor ? matchedDoctor.id : undefined;
 
-        createAppointmentMutation.mutate({
+        createAppointmentMutation.mutate({ force: !!collisionWarning, payload: {
             hasta_id: isBlockedMode ? null : (selectedPatient?.id || null),
             title: finalTitle,
             start: formatWithTZ(finalStart),
@@ -366,7 +372,7 @@ export function CreateAppointmentDialog({ isOpen, onClose, patientId: propPatien
             status: isBlockedMode ? 'blocked' : 'scheduled',
             doctor_name: selectedDoctorName,
             doctor_id: doctorId,
-        });
+        } });
     };
 
     const handleDateChange = (type: 'start' | 'end', d: Date | undefined) => {
@@ -47,8 +47,8 @@ export function PatientDetailPanel({ patientId, onPatientDeleted }: { patientId:
     });
 
     const { data: muayeneler, isLoading: muayeneLoading } = useQuery({
-        queryKey: ['muayeneler', patientId],
-        queryFn: () => api.clinical.getMuayeneler(patientId),
+        queryKey: ['muayeneler', patientId, 'summary'],
+        queryFn: () => api.clinical.getMuayeneler(patientId, 'summary'),
         enabled: !!patient,
     });
 
@@ -6,8 +6,8 @@ import { Card, CardContent } from "@/components/ui/card";
 
 export function PatientRightPanel({ patientId }: { patientId: string }) {
     const { data: muayeneler, isLoading } = useQuery({
-        queryKey: ['muayeneler', patientId],
-        queryFn: () => api.clinical.getMuayeneler(patientId),
+        queryKey: ['muayeneler', patientId, 'summary'],
+        queryFn: () => api.clinical.getMuayeneler(patientId, 'summary'),
     });
 
     if (isLoading) {
@@ -2,14 +2,14 @@
 
 import { useState } from "react";
 import { useQuery } from "@tanstack/react-query";
-import { api, AuditLog } from "@/lib/api";
+import { api, AuditLog, AuditLogFilters } from "@/lib/api";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
 import { format } from "date-fns";
 import { tr } from "date-fns/locale";
-import { Loader2, ShieldAlert, Key, ChevronDown, ChevronRight, User, Clock, MapPin, Monitor, FileText, Activity } from "lucide-react";
+import { Loader2, ShieldAlert, Key, ChevronDown, ChevronRight, User, Clock, MapPin, Monitor, FileText, Activity, Download } from "lucide-react";
 import { toast } from "sonner";
 import { cn } from "@/lib/utils";
 
@@ -77,15 +77,49 @@ export function AuditLogsSettings() {
     const [isUnlocked, setIsUnlocked] = useState(false);
     const [password, setPassword] = useState("");
     const [isVerifying, setIsVerifying] = useState(false);
-    const [page, setPage] = useState(0);
+    // Keyset sayfalama: her sayfanın başlangıç imleci yığında tutulur (geri gitmek için)
+    const [cursorStack, setCursorStack] = useState<(string | null)[]>([null]);
+    const page = cursorStack.length - 1;
+    const [filters, setFilters] = useState<AuditLogFilters>({});
+    const [isExporting, setIsExporting] = useState(false);
     const [expandedRows, setExpandedRows] = useState<Set<string>>(new Set());
     const pageSize = 50;
 
-    const { data: logs, isLoading } = useQuery({
-        queryKey: ['audit-logs', page],
-        queryFn: () => api.audit.list({ skip: page * pageSize, limit: pageSize }),
+    const { data: pageData, isLoading } = useQuery({
+        queryKey: ['audit-logs', filters, cursorStack[page]],
+        queryFn: () => api.audit.page({ ...filters, cursor: cursorStack[page], limit: pageSize }),
         enabled: isUnlocked,
     });
+    const logs = pageData?.items;
+
+    const { data: totalCount } = useQuery({
+        queryKey: ['audit-logs-count', filters],
+        queryFn: () => api.audit.count({ ...filters, mode: 'approx' }),
+        enabled: isUnlocked,
+    });
+
+    const updateFilter = (key: keyof AuditLogFilters, value: string) => {
+        setFilters(prev => ({ ...prev, [key]: value || undefined }));
+        setCursorStack([null]);
+    };
+
+    const handleExport = async (exportFormat: 'ndjson' | 'csv') => {
+        setIsExporting(true);
+        try {
+            const blob = await api.audit.export({ ...filters, format: exportFormat });
+            const url = URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = `audit_logs_${format(new Date(), 'yyyyMMdd_HHmm')}.${exportFormat}`;
+            a.click();
+            URL.revokeObjectURL(url);
+        } catch (e) {
+            console.error(e);
+            toast.error("Dışa aktarma başarısız.");
+        } finally {
+            setIsExporting(false);
+        }
+    };
 
     const toggleRowExpand = (id: string) => {
         const newExpanded = new Set(expandedRows);
@@ -164,10 +198,25 @@ export function AuditLogsSettings() {
                         </CardTitle>
                         <CardDescription>Sistemdeki kritik işlemlerin log kayıtları. Satıra tıklayarak detayları görüntüleyebilirsiniz.</CardDescription>
                     </div>
-                    <div className="text-xs text-slate-400">
-                        Sayfa: {page + 1}
+                    <div className="flex items-center gap-2">
+                        <Button variant="outline" size="sm" onClick={() => handleExport('csv')} disabled={isExporting}>
+                            <Download className="mr-1 h-3.5 w-3.5" /> CSV
+                        </Button>
+                        <Button variant="outline" size="sm" onClick={() => handleExport('ndjson')} disabled={isExporting}>
+                            <Download className="mr-1 h-3.5 w-3.5" /> NDJSON
+                        </Button>
+                        <div className="text-xs text-slate-400">
+                            Sayfa: {page + 1}
+                        </div>
                     </div>
                 </div>
+                <div className="grid grid-cols-2 md:grid-cols-5 gap-2 pt-3">
+                    <Input placeholder="İşlem (örn. PATIENT_VIEW)" value={filters.action || ''} onChange={e => updateFilter('action', e.target.value.toUpperCase())} />
+                    <Input placeholder="Kaynak tipi (örn. patient)" value={filters.resource_type || ''} onChange={e => updateFilter('resource_type', e.target.value)} />
+                    <Input placeholder="Kaynak ID" value={filters.resource_id || ''} onChange={e => updateFilter('resource_id', e.target.value)} />
+                    <Input type="date" value={filters.start_date?.substring(0, 10) || ''} onChange={e => updateFilter('start_date', e.target.value ? `${e.target.value}T00:00:00` : '')} />
+                    <Input type="date" value={filters.end_date?.substring(0, 10) || ''} onChange={e => updateFilter('end_date', e.target.value ? `${e.target.value}T23:59:59` : '')} />
+                </div>
             </CardHeader>
             <CardContent>
                 {isLoading ? (
@@ -312,11 +361,12 @@ export function AuditLogsSettings() {
 
                 <div className="flex items-center justify-between py-4">
                     <div className="text-xs text-slate-400">
-                        Toplam {logs?.length || 0} kayıt (Bu sayfada)
+                        Bu sayfada {logs?.length || 0} kayıt
+                        {totalCount && ` · Toplam ${totalCount.approximate ? '~' : ''}${totalCount.count.toLocaleString('tr-TR')}`}
                     </div>
                     <div className="flex space-x-2">
-                        <Button variant="outline" size="sm" onClick={() => setPage(p => Math.max(0, p - 1))} disabled={page === 0}>Önceki</Button>
-                        <Button variant="outline" size="sm" onClick={() => setPage(p => p + 1)} disabled={!logs || logs.length < pageSize}>Sonraki</Button>
+                        <Button variant="outline" size="sm" onClick={() => setCursorStack(s => s.length > 1 ? s.slice(0, -1) : s)} disabled={page === 0}>Önceki</Button>
+                        <Button variant="outline" size="sm" onClick={() => pageData?.next_cursor && setCursorStack(s => [...s, pageData.next_cursor!])} disabled={!pageData?.next_cursor}>Sonraki</Button>
                     </div>
                 </div>
             </CardContent>
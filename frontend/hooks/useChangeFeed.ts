@@ -0,0 +1,86 @@
+import { useEffect, useRef } from 'react';
+import { QueryClient } from '@tanstack/react-query';
+import { useAuthStore } from '@/stores/auth-store';
+import type { Appointment } from '@/lib/api';
+
+export type ChangeTopic = 'appointment' | 'patient' | 'finance';
+
+export interface ChangeEvent {
+    seq?: number;
+    topic: ChangeTopic | 'reset';
+    action: 'created' | 'updated' | 'deleted' | 'reset';
+    data: Record<string, any>;
+}
+
+/**
+ * Backend change feed'ine (SSE) abone olur. Polling yerine kullanılır:
+ * sunucu randevu / hasta / finans commit'lerinde delta gönderir, 'reset' gelirse veriler yeniden çekilmelidir.
+ * EventSource bağlantı koparsa Last-Event-ID ile kendiliğinden devam eder.
+ */
+export function useChangeFeed(topics: ChangeTopic[], onEvent: (event: ChangeEvent) => void) {
+    const token = useAuthStore((s) => s.token);
+    const handlerRef = useRef(onEvent);
+    handlerRef.current = onEvent;
+    const topicKey = topics.join(',');
+
+    useEffect(() => {
+        if (!token || typeof window === 'undefined' || typeof EventSource === 'undefined') return;
+
+        const url = `/api/v1/events/stream?token=${encodeURIComponent(token)}&topics=${encodeURIComponent(topicKey)}`;
+        const source = new EventSource(url);
+
+        const listener = (e: MessageEvent) => {
+            try {
+                handlerRef.current(JSON.parse(e.data) as ChangeEvent);
+            } catch (err) {
+                console.error('Change feed parse error', err);
+            }
+        };
+
+        const names = [...topicKey.split(','), 'reset'];
+        names.forEach((name) => source.addEventListener(name, listener as EventListener));
+
+        return () => {
+            names.forEach((name) => source.removeEventListener(name, listener as EventListener));
+            source.close();
+        };
+    }, [token, topicKey]);
+}
+
+const overlaps = (apt: { start?: string; end?: string }, start: Date, end: Date) =>
+    !!apt.start && !!apt.end && new Date(apt.start) <= end && new Date(apt.end) >= start;
+
+/**
+ * Randevu delta'sını ['appointments', start, end] cache'lerine uygular.
+ * Pencere bilgisi olmayan cache'ler (ör. ['appointments', 'today']) sadece invalidate edilir.
+ */
+export function applyAppointmentChange(queryClient: QueryClient, event: ChangeEvent) {
+    if (event.topic === 'reset') {
+        queryClient.invalidateQueries({ queryKey: ['appointments'] });
+        return;
+    }
+    if (event.topic !== 'appointment') return;
+
+    const delta = event.data as Partial<Appointment> & { id: number };
+    queryClient.getQueryCache().findAll({ queryKey: ['appointments'] }).forEach((query) => {
+        const [, rawStart, rawEnd] = query.queryKey as [string, unknown, unknown];
+        const start = typeof rawStart === 'string' ? new Date(rawStart) : null;
+        const end = typeof rawEnd === 'string' ? new Date(rawEnd) : null;
+        if (!start || !end || isNaN(start.getTime()) || isNaN(end.getTime())) {
+            queryClient.invalidateQueries({ queryKey: query.queryKey });
+            return;
+        }
+
+        queryClient.setQueryData<Appointment[]>(query.queryKey, (old) => {
+            if (!old) return old;
+            const rest = old.filter((a) => a.id !== delta.id);
+            if (event.action === 'deleted') return rest;
+
+            const existing = old.find((a) => a.id === delta.id);
+            // Delta hasta/doktor nesnelerini taşımaz; mevcut kayıttakiler korunur
+            const merged = { ...(existing || {}), ...delta } as Appointment;
+            if (existing && existing.hasta_id !== merged.hasta_id) merged.hasta = undefined;
+            return overlaps(merged, start, end) ? [...rest, merged] : rest;
+        });
+    });
+}
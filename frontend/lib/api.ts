@@ -39,7 +39,7 @@ export async function apiFetch<T>(
     const response = await fetch(`${API_BASE_URL}${endpoint}`, {
         ...fetchOptions,
         headers,
-        cache: 'no-store',
+        cache: 'no-cache',  // ETag'li yanıtlar tarayıcı önbelleğinden 304 ile doğrulanır
     });
 
     if (!response.ok) {
@@ -131,6 +131,8 @@ export interface PatientReportDTO {
     generated_at: string;
 }
 
+export type ClinicalListView = 'summary' | 'full';
+
 export interface Muayene {
     id: number;
     hasta_id: string;
@@ -324,6 +326,28 @@ export interface AuditLog {
     created_at: string;
 }
 
+export interface AuditLogFilters {
+    action?: string;
+    user_id?: number;
+    resource_type?: string;
+    resource_id?: string;
+    start_date?: string;
+    end_date?: string;
+}
+
+export interface AuditLogPage {
+    items: AuditLog[];
+    next_cursor?: string | null;
+}
+
+const auditFilterParams = (params: Record<string, any>) => {
+    const searchParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') searchParams.set(key, String(value));
+    });
+    return searchParams;
+};
+
 // API methods
 export interface StockProduct {
     id: number;
@@ -540,10 +564,12 @@ export const api = {
             apiFetch<PatientReportDTO>(`/api/v1/patient-report/${id}`),
     },
     clinical: {
-        getMuayeneler: (patientId: string) =>
-            apiFetch<Muayene[]>(`/api/v1/clinical/patients/${patientId}/muayeneler`),
-        getAllMuayenelerReport: (params?: { start_date?: string; end_date?: string; search?: string }) => {
+        // view='summary' sadece liste kolonlarını döner (oyku, bulgu, recete vb. yok)
+        getMuayeneler: (patientId: string, view: ClinicalListView = 'full') =>
+            apiFetch<Muayene[]>(`/api/v1/clinical/patients/${patientId}/muayeneler?view=${view}`),
+        getAllMuayenelerReport: (params?: { start_date?: string; end_date?: string; search?: string; view?: ClinicalListView }) => {
             const searchParams = new URLSearchParams();
+            if (params?.view) searchParams.set('view', params.view);
             if (params?.start_date) searchParams.set('start_date', params.start_date);
             if (params?.end_date) searchParams.set('end_date', params.end_date);
             if (params?.search) searchParams.set('search', params.search);
@@ -558,10 +584,11 @@ export const api = {
             apiFetch<Muayene>(`/api/v1/clinical/muayeneler/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
         deleteMuayene: (id: number) =>
             apiFetch<void>(`/api/v1/clinical/muayeneler/${id}`, { method: 'DELETE' }),
-        getOperations: (patientId: string) =>
-            apiFetch<Operation[]>(`/api/v1/clinical/patients/${patientId}/operasyonlar`),
-        getAllOperationsReport: (params?: { start_date?: string; end_date?: string; search?: string }) => {
+        getOperations: (patientId: string, view: ClinicalListView = 'full') =>
+            apiFetch<Operation[]>(`/api/v1/clinical/patients/${patientId}/operasyonlar?view=${view}`),
+        getAllOperationsReport: (params?: { start_date?: string; end_date?: string; search?: string; view?: ClinicalListView }) => {
             const searchParams = new URLSearchParams();
+            if (params?.view) searchParams.set('view', params.view);
             if (params?.start_date) searchParams.set('start_date', params.start_date);
             if (params?.end_date) searchParams.set('end_date', params.end_date);
             if (params?.search) searchParams.set('search', params.search);
@@ -726,12 +753,28 @@ export const api = {
             if (params?.end) searchParams.set('end', params.end);
             return apiFetch<Appointment[]>(`/api/v1/appointments?${searchParams.toString()}`);
         },
+        // Takvim projection endpoint'i (pencere zorunlu, ETag ile ucuz polling)
+        calendar: (params: { start: string; end: string; doctorId?: number }) => {
+            const searchParams = new URLSearchParams({ start: params.start, end: params.end });
+            if (params.doctorId) searchParams.set('doctor_id', String(params.doctorId));
+            return apiFetch<Appointment[]>(`/api/v1/appointments/calendar?${searchParams.toString()}`);
+        },
         getForPatient: (patientId: string) =>
             apiFetch<Appointment[]>(`/api/v1/appointments/patient/${patientId}`),
-        create: (data: AppointmentCreate) =>
-            apiFetch<Appointment>('/api/v1/appointments/', { method: 'POST', body: JSON.stringify(data) }),
-        update: (id: number, data: any) =>
-            apiFetch<Appointment>(`/api/v1/appointments/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
+        // force: sunucu çakışma (409) döndürse bile kaydet (kullanıcı overbooking'i onayladı)
+        create: (data: AppointmentCreate, force = false) =>
+            apiFetch<Appointment>(`/api/v1/appointments/${force ? '?force=true' : ''}`, { method: 'POST', body: JSON.stringify(data) }),
+        update: (id: number, data: any, force = false) =>
+            apiFetch<Appointment>(`/api/v1/appointments/${id}${force ? '?force=true' : ''}`, { method: 'PUT', body: JSON.stringify(data) }),
+        availability: (params: { doctor?: string; after?: string; count?: number; duration?: number; type?: string }) => {
+            const searchParams = new URLSearchParams();
+            if (params.doctor) searchParams.set('doctor', params.doctor);
+            if (params.after) searchParams.set('after', params.after);
+            if (params.count) searchParams.set('count', String(params.count));
+            if (params.duration) searchParams.set('duration', String(params.duration));
+            if (params.type) searchParams.set('type', params.type);
+            return apiFetch<{ start: string; end: string; doctor_name?: string }[]>(`/api/v1/appointments/availability?${searchParams.toString()}`);
+        },
         delete: (id: number, reason?: string) =>
             apiFetch<void>(`/api/v1/appointments/${id}${reason ? `?reason=${encodeURIComponent(reason)}` : ''}`, { method: 'DELETE' }),
     },
@@ -1046,6 +1089,22 @@ export const api = {
             if (params?.end_date) searchParams.set('end_date', params.end_date);
             return apiFetch<AuditLog[]>(`/api/v1/audit?${searchParams.toString()}`);
         },
+        // Keyset sayfalama: derin sayfalarda da sabit süre (offset yerine next_cursor)
+        page: (params: AuditLogFilters & { cursor?: string | null; limit?: number }) =>
+            apiFetch<AuditLogPage>(`/api/v1/audit/page?${auditFilterParams(params).toString()}`),
+        count: (params: AuditLogFilters & { mode?: 'approx' | 'exact' }) =>
+            apiFetch<{ count: number; approximate: boolean }>(`/api/v1/audit/count?${auditFilterParams(params).toString()}`),
+        export: async (params: AuditLogFilters & { format: 'ndjson' | 'csv' }) => {
+            const token = useAuthStore.getState().token;
+            const response = await fetch(`/api/v1/audit/export?${auditFilterParams(params).toString()}`, {
+                headers: token ? { 'Authorization': `Bearer ${token}` } : {},
+            });
+            if (!response.ok) {
+                const errorData = await response.json().catch(() => ({}));
+                throw new Error(errorData.detail || `API Error: ${response.status}`);
+            }
+            return response.blob();
+        },
     },
     stock: {
         getProducts: (params?: { search?: string; skip?: number; limit?: number }) => {
@@ -1085,7 +1144,8 @@ export const api = {
     aiScribe: {
         getStatus: () => apiFetch<AIScribeStatus>('/api/v1/ai-scribe/status'),
         getTemplates: () => apiFetch<AIScribeTemplate[]>('/api/v1/ai-scribe/templates'),
-        analyze: async (audioBlob: Blob, mode: string = 'gemini', template?: string, includeTranscript: boolean = false, patientId?: string) => {
+        // Ses kuyruğa alınır (202), sonuç long-poll ile beklenir; istek süresince sunucuda bağlantı tutulmaz
+        createJob: async (audioBlob: Blob, mode: string = 'gemini', template?: string, includeTranscript: boolean = false, patientId?: string) => {
             const formData = new FormData();
             formData.append('audio', audioBlob, 'recording.webm');
             formData.append('mode', mode);
@@ -1094,7 +1154,7 @@ export const api = {
             if (patientId) formData.append('patient_id', patientId);
 
             const token = useAuthStore.getState().token;
-            const response = await fetch('/api/v1/ai-scribe/analyze', {
+            const response = await fetch('/api/v1/ai-scribe/jobs', {
                 method: 'POST',
                 headers: token ? { 'Authorization': `Bearer ${token}` } : {},
                 body: formData
@@ -1104,7 +1164,22 @@ export const api = {
                 const errorData = await response.json().catch(() => ({}));
                 throw new Error(errorData.detail || `API Error: ${response.status}`);
             }
-            return response.json() as Promise<AIScribeResponse>;
+            return response.json() as Promise<AIScribeJob>;
+        },
+        getJob: (jobId: string, wait: number = 0) =>
+            apiFetch<AIScribeJob>(`/api/v1/ai-scribe/jobs/${jobId}?wait=${wait}`),
+        analyze: async (audioBlob: Blob, mode: string = 'gemini', template?: string, includeTranscript: boolean = false, patientId?: string, onStatus?: (job: AIScribeJob) => void) => {
+            let job = await api.aiScribe.createJob(audioBlob, mode, template, includeTranscript, patientId);
+            onStatus?.(job);
+            while (job.status === 'queued' || job.status === 'running') {
+                // Durum değişiminde veya yeni transkript parçası geldiğinde sunucu beklemeyi erken bitirir
+                job = await api.aiScribe.getJob(job.id, 25);
+                onStatus?.(job);
+            }
+            if (job.status === 'failed' || !job.result) {
+                throw new Error(job.error || 'Analiz sırasında hata oluştu');
+            }
+            return job.result;
         }
     },
     integrations: {
@@ -2037,6 +2112,19 @@ export interface AIScribeTemplate {
     description: string;
 }
 
+export interface AIScribeJob {
+    id: string;
+    status: 'queued' | 'running' | 'done' | 'failed';
+    mode: AIScribeResponse['mode_used'];
+    patient_id?: string;
+    error?: string;
+    result?: AIScribeResponse;
+    partial_transcript?: string;
+    created_at?: string;
+    started_at?: string;
+    finished_at?: string;
+}
+
 export interface AIScribeResponse {
     mode_used: 'gemini' | 'local' | 'hybrid_google_local' | 'hybrid_google_gemini'; // Updated modes
     processing_time_seconds: number;